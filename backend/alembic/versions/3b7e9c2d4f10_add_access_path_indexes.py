@@ -0,0 +1,173 @@
+"""Add composite, covering, partial and BRIN indexes for the API access paths
+
+Revision ID: 3b7e9c2d4f10
+Revises: 061e66819f74
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7e9c2d4f10"
+down_revision: Union[str, None] = "061e66819f74"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción;
+    # así no se bloquean las escrituras de la ingestión en tablas grandes
+    with op.get_context().autocommit_block():
+        # financial_sentiment_correlation: filtros por ventana de `hour`
+        # (dashboard, timeline, resumen) resueltos con index-only scans
+        op.create_index(
+            "ix_financial_sentiment_correlation_hour_covering",
+            "financial_sentiment_correlation",
+            ["hour"],
+            postgresql_include=[
+                "sentiment_category",
+                "avg_sentiment_score",
+                "avg_sentiment_subjectivity",
+                "avg_close_price",
+                "total_volume",
+            ],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # Precios por símbolo (ORDER BY symbol, hour DESC) y búsquedas
+        # de la ingestión por (symbol, hour)
+        op.create_index(
+            "ix_financial_sentiment_correlation_symbol_hour",
+            "financial_sentiment_correlation",
+            ["symbol", sa.text("hour DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_financial_sentiment_correlation_hour_brin",
+            "financial_sentiment_correlation",
+            ["hour"],
+            postgresql_using="brin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # news_with_sentiment: últimas noticias (ORDER BY published_at DESC
+        # con published_at IS NOT NULL) y resumen por símbolo en una ventana
+        op.create_index(
+            "ix_news_with_sentiment_published_at_recent",
+            "news_with_sentiment",
+            [sa.text("published_at DESC")],
+            postgresql_include=[
+                "symbol",
+                "sentiment_score",
+                "sentiment_subjectivity",
+            ],
+            postgresql_where=sa.text("published_at IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # Promedio de sentimiento por símbolo en las últimas horas (ingestión)
+        op.create_index(
+            "ix_news_with_sentiment_symbol_published_at",
+            "news_with_sentiment",
+            ["symbol", "published_at"],
+            postgresql_include=["sentiment_score", "sentiment_subjectivity"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # El DAG une noticias y precios por (symbol, DATE_TRUNC('hour', ...))
+        op.create_index(
+            "ix_news_with_sentiment_symbol_published_hour",
+            "news_with_sentiment",
+            ["symbol", sa.text("DATE_TRUNC('hour', published_at)")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_news_with_sentiment_published_at_brin",
+            "news_with_sentiment",
+            ["published_at"],
+            postgresql_using="brin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # stock_prices: lado de precios del mismo join del DAG
+        op.create_index(
+            "ix_stock_prices_symbol_timestamp_hour",
+            "stock_prices",
+            ["symbol", sa.text("DATE_TRUNC('hour', \"timestamp\")")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_stock_prices_timestamp_brin",
+            "stock_prices",
+            ["timestamp"],
+            postgresql_using="brin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # Los índices de una sola columna quedan cubiertos por los anteriores
+        op.drop_index(
+            "ix_financial_sentiment_correlation_hour",
+            table_name="financial_sentiment_correlation",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_news_with_sentiment_published_at",
+            table_name="news_with_sentiment",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_news_with_sentiment_published_at",
+            "news_with_sentiment",
+            ["published_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_financial_sentiment_correlation_hour",
+            "financial_sentiment_correlation",
+            ["hour"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for index_name, table_name in [
+            ("ix_stock_prices_timestamp_brin", "stock_prices"),
+            ("ix_stock_prices_symbol_timestamp_hour", "stock_prices"),
+            ("ix_news_with_sentiment_published_at_brin", "news_with_sentiment"),
+            ("ix_news_with_sentiment_symbol_published_hour", "news_with_sentiment"),
+            ("ix_news_with_sentiment_symbol_published_at", "news_with_sentiment"),
+            ("ix_news_with_sentiment_published_at_recent", "news_with_sentiment"),
+            (
+                "ix_financial_sentiment_correlation_hour_brin",
+                "financial_sentiment_correlation",
+            ),
+            (
+                "ix_financial_sentiment_correlation_symbol_hour",
+                "financial_sentiment_correlation",
+            ),
+            (
+                "ix_financial_sentiment_correlation_hour_covering",
+                "financial_sentiment_correlation",
+            ),
+        ]:
+            op.drop_index(
+                index_name,
+                table_name=table_name,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
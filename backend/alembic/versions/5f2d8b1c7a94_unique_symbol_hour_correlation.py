@@ -0,0 +1,79 @@
+"""Unique (symbol, hour) key for financial_sentiment_correlation
+
+Revision ID: 5f2d8b1c7a94
+Revises: 8d41f6a2c9e3
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5f2d8b1c7a94"
+down_revision: Union[str, None] = "8d41f6a2c9e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSTRAINT = "uq_financial_sentiment_correlation_symbol_hour"
+
+
+def upgrade() -> None:
+    # Fusionar los duplicados que haya antes de crear la clave única, con los
+    # criterios de backend/correlation_compaction.py (que conviene ejecutar
+    # antes en tablas grandes; entonces esto no encuentra nada que fusionar)
+    op.execute(
+        """
+        CREATE TEMP TABLE _correlation_compaction ON COMMIT DROP AS
+        SELECT symbol,
+               DATE_TRUNC('hour', hour) AS bucket,
+               MAX(id) AS keep_id,
+               SUM(avg_close_price * COALESCE(price_points, 1))
+                   / NULLIF(SUM(CASE WHEN avg_close_price IS NOT NULL
+                                     THEN COALESCE(price_points, 1) END), 0)
+                   AS avg_close_price,
+               MAX(max_high_price) AS max_high_price,
+               MIN(min_low_price) AS min_low_price,
+               SUM(total_volume) AS total_volume,
+               SUM(COALESCE(price_points, 1)) AS price_points
+        FROM financial_sentiment_correlation
+        GROUP BY symbol, DATE_TRUNC('hour', hour)
+        HAVING COUNT(*) > 1 OR BOOL_OR(hour <> DATE_TRUNC('hour', hour))
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM financial_sentiment_correlation AS correlation
+        USING _correlation_compaction AS groups
+        WHERE correlation.symbol IS NOT DISTINCT FROM groups.symbol
+          AND DATE_TRUNC('hour', correlation.hour) = groups.bucket
+          AND correlation.id <> groups.keep_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE financial_sentiment_correlation AS correlation
+        SET hour = groups.bucket,
+            avg_close_price = groups.avg_close_price,
+            max_high_price = groups.max_high_price,
+            min_low_price = groups.min_low_price,
+            total_volume = groups.total_volume,
+            price_points = groups.price_points,
+            updated_at = NOW()
+        FROM _correlation_compaction AS groups
+        WHERE correlation.id = groups.keep_id
+          AND DATE_TRUNC('hour', correlation.hour) = groups.bucket
+        """
+    )
+    op.execute("DROP TABLE _correlation_compaction")
+
+    # Clave de los upserts de la ingestión y del DAG (ON CONFLICT (hour, symbol));
+    # incluye la columna de partición, como exige una tabla particionada
+    op.create_unique_constraint(
+        CONSTRAINT, "financial_sentiment_correlation", ["symbol", "hour"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(CONSTRAINT, "financial_sentiment_correlation", type_="unique")
@@ -0,0 +1,172 @@
+"""Partition news_with_sentiment and financial_sentiment_correlation by month
+
+Revision ID: 8d41f6a2c9e3
+Revises: 3b7e9c2d4f10
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from datetime import date
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d41f6a2c9e3"
+down_revision: Union[str, None] = "3b7e9c2d4f10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Particiones futuras creadas por la migración; después las mantiene
+# backend/partitions.py
+MONTHS_AHEAD = 3
+
+# (tabla, columna de partición, clave primaria en la tabla particionada).
+# published_at admite NULL y no puede formar parte de una clave primaria, así
+# que news_with_sentiment conserva solo el índice sobre id (valores de secuencia)
+TABLES = [
+    ("financial_sentiment_correlation", "hour", ["id", "hour"]),
+    ("news_with_sentiment", "published_at", None),
+]
+
+# Índices de la revisión 3b7e9c2d4f10 más los de id y symbol
+INDEXES = {
+    "financial_sentiment_correlation": [
+        ("ix_financial_sentiment_correlation_id", ["id"], {}),
+        ("ix_financial_sentiment_correlation_symbol", ["symbol"], {}),
+        (
+            "ix_financial_sentiment_correlation_hour_covering",
+            ["hour"],
+            {
+                "postgresql_include": [
+                    "sentiment_category",
+                    "avg_sentiment_score",
+                    "avg_sentiment_subjectivity",
+                    "avg_close_price",
+                    "total_volume",
+                ]
+            },
+        ),
+        (
+            "ix_financial_sentiment_correlation_symbol_hour",
+            ["symbol", sa.text("hour DESC")],
+            {},
+        ),
+        (
+            "ix_financial_sentiment_correlation_hour_brin",
+            ["hour"],
+            {"postgresql_using": "brin"},
+        ),
+    ],
+    "news_with_sentiment": [
+        ("ix_news_with_sentiment_id", ["id"], {}),
+        ("ix_news_with_sentiment_symbol", ["symbol"], {}),
+        (
+            "ix_news_with_sentiment_published_at_recent",
+            [sa.text("published_at DESC")],
+            {
+                "postgresql_include": [
+                    "symbol",
+                    "sentiment_score",
+                    "sentiment_subjectivity",
+                ],
+                "postgresql_where": sa.text("published_at IS NOT NULL"),
+            },
+        ),
+        (
+            "ix_news_with_sentiment_symbol_published_at",
+            ["symbol", "published_at"],
+            {"postgresql_include": ["sentiment_score", "sentiment_subjectivity"]},
+        ),
+        (
+            "ix_news_with_sentiment_symbol_published_hour",
+            ["symbol", sa.text("DATE_TRUNC('hour', published_at)")],
+            {},
+        ),
+        (
+            "ix_news_with_sentiment_published_at_brin",
+            ["published_at"],
+            {"postgresql_using": "brin"},
+        ),
+    ],
+}
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _swap_table(table: str, create_sql: str, primary_key):
+    """Reemplazar una tabla por una copia con otra definición y mismos datos"""
+    old = f"{table}_old"
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(
+        f"""
+        DO $$
+        DECLARE constraint_name text;
+        BEGIN
+            SELECT conname INTO constraint_name FROM pg_constraint
+            WHERE conrelid = '{old}'::regclass AND contype = 'p';
+            IF constraint_name IS NOT NULL THEN
+                EXECUTE format('ALTER TABLE {old} DROP CONSTRAINT %I',
+                               constraint_name);
+            END IF;
+        END $$
+        """
+    )
+    for index_name, _, _ in INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
+    for legacy_index in (f"ix_{table}_hour", f"ix_{table}_published_at"):
+        op.execute(f"DROP INDEX IF EXISTS {legacy_index}")
+
+    op.execute(create_sql.format(table=table, old=old))
+    if primary_key:
+        op.create_primary_key(f"{table}_pkey", table, primary_key)
+    return old
+
+
+def _copy_and_drop(table: str, old: str):
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    # La secuencia de id pertenece a la tabla vieja; pasarla a la nueva
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"DROP TABLE {old}")
+    for index_name, columns, kwargs in INDEXES[table]:
+        op.create_index(index_name, table, columns, **kwargs)
+    op.execute(f"ANALYZE {table}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    current = date.today().replace(day=1)
+
+    for table, column, primary_key in TABLES:
+        first = bind.execute(
+            sa.text(f"SELECT MIN(DATE_TRUNC('month', {column})) FROM {table}")
+        ).scalar()
+        month = first.date() if first else current
+
+        old = _swap_table(
+            table,
+            "CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({column})",
+            primary_key,
+        )
+        while month <= _add_months(current, MONTHS_AHEAD):
+            upper = _add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+            )
+            month = upper
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        _copy_and_drop(table, old)
+
+
+def downgrade() -> None:
+    for table, _, _ in TABLES:
+        old = _swap_table(
+            table, "CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)", ["id"]
+        )
+        _copy_and_drop(table, old)
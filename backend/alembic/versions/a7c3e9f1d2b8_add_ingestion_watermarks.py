@@ -0,0 +1,35 @@
+"""Add ingestion_watermarks for incremental news fetching
+
+Revision ID: a7c3e9f1d2b8
+Revises: 5f2d8b1c7a94
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e9f1d2b8"
+down_revision: Union[str, None] = "5f2d8b1c7a94"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Una fila por (proveedor, símbolo) con la última noticia vista; la
+    # ingestión pide solo lo publicado desde entonces
+    op.create_table(
+        "ingestion_watermarks",
+        sa.Column("provider", sa.String(length=32), nullable=False),
+        sa.Column("symbol", sa.String(length=10), nullable=False),
+        sa.Column("last_published_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("provider", "symbol"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ingestion_watermarks")
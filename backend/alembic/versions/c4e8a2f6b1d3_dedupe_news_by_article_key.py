@@ -0,0 +1,114 @@
+"""Deduplicate news_with_sentiment by article key and link extra symbols
+
+Revision ID: c4e8a2f6b1d3
+Revises: a7c3e9f1d2b8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e8a2f6b1d3"
+down_revision: Union[str, None] = "a7c3e9f1d2b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSTRAINT = "uq_news_with_sentiment_article_key_published_at"
+SYMBOLS_INDEX = "ix_news_with_sentiment_symbols"
+
+# Misma expresión que backend/article_dedup.py: URL normalizada (sin
+# fragmento, parámetros de seguimiento, esquema ni "www.") o, sin URL, título y
+# descripción en minúsculas con los espacios colapsados
+ARTICLE_KEY_SQL = r"""md5(COALESCE(
+    'url:' || NULLIF(regexp_replace(regexp_replace(regexp_replace(
+        regexp_replace(
+            regexp_replace(lower(btrim(url) COLLATE "C"), '#.*', ''),
+            '([?&])(utm_[a-z0-9_]*|fbclid|gclid|mc_cid|mc_eid)=[^&]*', '\1', 'g'
+        ),
+        '([?&])&+', '\1', 'g'),
+        '[?&/]+$', ''),
+        '^[a-z][a-z0-9+.-]*://(www\.)?', ''), ''),
+    'text:' || lower(btrim(regexp_replace(
+        (COALESCE(title, '') || ' ' || COALESCE(description, '')) COLLATE "C",
+        '[[:space:]]+', ' ', 'g')))
+))"""
+
+
+def upgrade() -> None:
+    op.add_column(
+        "news_with_sentiment",
+        sa.Column("symbols", postgresql.ARRAY(sa.String(length=10)), nullable=True),
+    )
+    op.add_column(
+        "news_with_sentiment",
+        sa.Column(
+            "article_key",
+            sa.String(length=32),
+            sa.Computed(ARTICLE_KEY_SQL, persisted=True),
+        ),
+    )
+
+    # Las copias de un artículo (mismo article_key y published_at) se fusionan
+    # en la primera fila guardada, que recibe los símbolos de todas
+    op.execute(
+        """
+        CREATE TEMP TABLE _news_dedup ON COMMIT DROP AS
+        SELECT article_key,
+               published_at,
+               MIN(id) AS keep_id,
+               ARRAY(
+                   SELECT DISTINCT linked FROM unnest(ARRAY_AGG(symbol)) AS linked
+                   WHERE linked IS NOT NULL ORDER BY linked
+               ) AS symbols
+        FROM news_with_sentiment
+        WHERE published_at IS NOT NULL
+        GROUP BY article_key, published_at
+        HAVING COUNT(*) > 1
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM news_with_sentiment AS news
+        USING _news_dedup AS copies
+        WHERE news.article_key = copies.article_key
+          AND news.published_at = copies.published_at
+          AND news.id <> copies.keep_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE news_with_sentiment AS news
+        SET symbols = copies.symbols
+        FROM _news_dedup AS copies
+        WHERE news.id = copies.keep_id
+          AND news.published_at = copies.published_at
+        """
+    )
+    op.execute("DROP TABLE _news_dedup")
+    op.execute(
+        """
+        UPDATE news_with_sentiment SET symbols = ARRAY[symbol]
+        WHERE symbols IS NULL AND symbol IS NOT NULL
+        """
+    )
+
+    # Clave del upsert de la ingestión y del DAG; incluye la columna de
+    # partición, como exige una tabla particionada
+    op.create_unique_constraint(
+        CONSTRAINT, "news_with_sentiment", ["article_key", "published_at"]
+    )
+    op.create_index(
+        SYMBOLS_INDEX, "news_with_sentiment", ["symbols"], postgresql_using="gin"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(SYMBOLS_INDEX, table_name="news_with_sentiment")
+    op.drop_constraint(CONSTRAINT, "news_with_sentiment", type_="unique")
+    op.drop_column("news_with_sentiment", "article_key")
+    op.drop_column("news_with_sentiment", "symbols")
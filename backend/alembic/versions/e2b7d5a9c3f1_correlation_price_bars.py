@@ -0,0 +1,45 @@
+"""Keep the price bars of each financial_sentiment_correlation row
+
+Revision ID: e2b7d5a9c3f1
+Revises: c4e8a2f6b1d3
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b7d5a9c3f1"
+down_revision: Union[str, None] = "c4e8a2f6b1d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Barras de precio de la hora por timestamp ({ts: [close, high, low,
+    # volume, points]}): el upsert de ingestion_main sustituye las ya guardadas
+    # en lugar de volver a sumarlas
+    op.add_column(
+        "financial_sentiment_correlation",
+        sa.Column("price_bars", postgresql.JSONB(), nullable=True),
+    )
+    # Los agregados ya acumulados pasan a ser una sola barra "legacy", como
+    # hace el upsert con las filas sin price_bars
+    op.execute(
+        """
+        UPDATE financial_sentiment_correlation
+        SET price_bars = jsonb_build_object('legacy', jsonb_build_array(
+            avg_close_price, max_high_price, min_low_price, total_volume,
+            price_points
+        ))
+        WHERE price_points > 0
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("financial_sentiment_correlation", "price_bars")
@@ -0,0 +1,57 @@
+"""Add sentiment_memo and the last use of each analyzer version
+
+Revision ID: f3c8a1d6e9b4
+Revises: e2b7d5a9c3f1
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c8a1d6e9b4"
+down_revision: Union[str, None] = "e2b7d5a9c3f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Puntuaciones de sentimiento por versión del analizador y hash del texto
+    # (ingestion/sentiment_memo.py). Las bases creadas con init-db.sql o por
+    # el propio memo antes de esta migración ya tienen la tabla
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sentiment_memo (
+            version TEXT NOT NULL,
+            text_key TEXT NOT NULL,
+            polarity DOUBLE PRECISION NOT NULL,
+            subjectivity DOUBLE PRECISION NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version, text_key)
+        )
+        """
+    )
+    # Última vez que un proceso usó cada versión; el mantenimiento borra las
+    # que llevan SENTIMENT_MEMO_RETENTION_DAYS sin uso
+    op.create_table(
+        "sentiment_memo_versions",
+        sa.Column("version", sa.Text(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("version"),
+    )
+    op.execute(
+        """
+        INSERT INTO sentiment_memo_versions (version, last_used_at)
+        SELECT version, COALESCE(MAX(created_at), NOW())
+        FROM sentiment_memo
+        GROUP BY version
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sentiment_memo_versions")
+    op.drop_table("sentiment_memo")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Backfill histórico reanudable y en paralelo
+Divide la carga histórica en tareas (tipo, símbolo, rango de fechas) que se
+ejecutan en paralelo dentro de las cuotas de cada proveedor y guarda el
+progreso en un fichero de estado tras cada tarea. Con --resume se continúa la
+última ejecución sin repetir las tareas completadas.
+
+Los precios diarios se piden con outputsize=compact cuando el checkpoint del
+símbolo es reciente y con outputsize=full solo cuando el rango lo necesita.
+
+Uso (desde backend/):
+    python backfill.py --months 6
+    python backfill.py --resume
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from dateutil.relativedelta import relativedelta
+from ingestion_main import (
+    ALPHA_VANTAGE_API_KEY,
+    ALPHA_VANTAGE_URL,
+    STOCK_SYMBOLS,
+    DataIngestionManager,
+    alpha_vantage_news_item,
+    daily_prices_params,
+    insert_historic_news,
+    insert_historic_prices,
+    news_params,
+    parse_daily_prices,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fichero con el progreso de la última ejecución
+BACKFILL_STATE_FILE = os.getenv("BACKFILL_STATE_FILE", "backfill_state.json")
+
+# Tareas en curso a la vez (las cuotas de cada proveedor siguen aplicándose)
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
+# Días de noticias por tarea y noticias por petición (máximo de Alpha Vantage)
+BACKFILL_NEWS_CHUNK_DAYS = int(os.getenv("BACKFILL_NEWS_CHUNK_DAYS", "30"))
+BACKFILL_NEWS_LIMIT = 1000
+
+# Espera máxima por un token de cuota; un backfill prefiere esperar a saltarse
+# la tarea
+BACKFILL_MAX_WAIT_SECONDS = float(os.getenv("BACKFILL_MAX_WAIT_SECONDS", "600"))
+
+
+class BackfillTask(NamedTuple):
+    """Unidad de trabajo: un tipo de dato de un símbolo en un rango de fechas"""
+
+    kind: str  # "prices" o "news"
+    symbol: str
+    start: date
+    end: date
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.symbol}:{self.start}:{self.end}"
+
+
+class BackfillState:
+    """
+    Progreso persistente del backfill
+
+    Guarda los parámetros de la ejecución en curso, las tareas completadas y,
+    por símbolo, la última fecha de precios cargada (checkpoint que decide
+    entre outputsize=compact y full y que se conserva entre ejecuciones).
+    """
+
+    def __init__(self, path: str = BACKFILL_STATE_FILE):
+        self.path = path
+        self.run: Optional[Dict] = None
+        self.completed: set = set()
+        self.prices_until: Dict[str, date] = {}
+
+    @classmethod
+    def load(cls, path: str = BACKFILL_STATE_FILE) -> "BackfillState":
+        state = cls(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            state.run = data.get("run")
+            state.completed = set(data.get("completed", []))
+            state.prices_until = {
+                symbol: date.fromisoformat(value)
+                for symbol, value in data.get("prices_until", {}).items()
+            }
+        return state
+
+    def save(self):
+        """Escribir el estado de forma atómica (fichero temporal + rename)"""
+        data = {
+            "run": self.run,
+            "completed": sorted(self.completed),
+            "prices_until": {
+                symbol: value.isoformat()
+                for symbol, value in sorted(self.prices_until.items())
+            },
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def start_run(self, start: date, end: date, symbols: Sequence[str]):
+        """Empezar una ejecución nueva (se conservan los checkpoints de precios)"""
+        self.run = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "symbols": list(symbols),
+            "started_at": datetime.utcnow().isoformat(),
+        }
+        self.completed = set()
+
+    def is_done(self, task: BackfillTask) -> bool:
+        return task.key in self.completed
+
+    def mark_done(self, task: BackfillTask, last_price_date: Optional[date] = None):
+        self.completed.add(task.key)
+        if last_price_date is not None:
+            previous = self.prices_until.get(task.symbol)
+            if previous is None or last_price_date > previous:
+                self.prices_until[task.symbol] = last_price_date
+
+
+def plan_tasks(
+    symbols: Sequence[str],
+    start: date,
+    end: date,
+    state: BackfillState,
+    news_chunk_days: int = BACKFILL_NEWS_CHUNK_DAYS,
+) -> List[BackfillTask]:
+    """
+    Dividir el backfill en tareas pendientes
+
+    Los precios se piden en una tarea por símbolo desde el día siguiente a su
+    checkpoint (la serie diaria no admite rangos, solo compact/full); las
+    noticias en tramos de `news_chunk_days`, de los más recientes a los más
+    antiguos y alternando símbolos para que todos avancen a la vez.
+    """
+    tasks = []
+    for symbol in symbols:
+        since = start
+        checkpoint = state.prices_until.get(symbol)
+        if checkpoint is not None and checkpoint >= since:
+            since = checkpoint + timedelta(days=1)
+        if since <= end:
+            tasks.append(BackfillTask("prices", symbol, since, end))
+
+    chunk_end = end
+    while chunk_end >= start:
+        chunk_start = max(start, chunk_end - timedelta(days=news_chunk_days - 1))
+        for symbol in symbols:
+            tasks.append(BackfillTask("news", symbol, chunk_start, chunk_end))
+        chunk_end = chunk_start - timedelta(days=1)
+
+    return [task for task in tasks if not state.is_done(task)]
+
+
+class BackfillEngine:
+    """Ejecuta tareas de backfill en paralelo y registra su progreso"""
+
+    def __init__(
+        self,
+        manager: DataIngestionManager,
+        state: BackfillState,
+        concurrency: int = BACKFILL_CONCURRENCY,
+        max_wait: float = BACKFILL_MAX_WAIT_SECONDS,
+    ):
+        self.manager = manager
+        self.state = state
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+
+    async def _fetch(self, params: Dict, symbol: str) -> Dict:
+        data = await self.manager.get_json(
+            "alpha_vantage",
+            ALPHA_VANTAGE_URL,
+            params,
+            timeout=30,
+            max_wait=self.max_wait,
+        )
+        if data is None:
+            raise RuntimeError("quota exhausted or request throttled")
+        if "Error Message" in data:
+            raise RuntimeError(data["Error Message"])
+        self.manager.scheduler.record_result("alpha_vantage", symbol)
+        return data
+
+    async def run_task(self, task: BackfillTask) -> int:
+        """
+        Descargar y guardar una tarea
+
+        Las filas de la tarea se escriben en su propio lote, así que solo se
+        marca como hecha si se escribieron las suyas. Repetirla (--resume tras
+        caer antes de guardar el estado) no cambia nada: noticias y barras de
+        precio se guardan con upserts idempotentes.
+
+        Returns:
+            Filas escritas
+        """
+        last_price_date = None
+        if task.kind == "prices":
+            data = await self._fetch(
+                daily_prices_params(task.symbol, task.start), task.symbol
+            )
+            if "Time Series (Daily)" not in data:
+                raise RuntimeError("no daily time series in the response")
+            rows = parse_daily_prices(task.symbol, data, task.start, task.end)
+            written = await asyncio.to_thread(insert_historic_prices, rows)
+            if rows:
+                last_price_date = max(
+                    date.fromisoformat(row["timestamp"]) for row in rows
+                )
+        else:
+            params = news_params(
+                task.symbol,
+                datetime.combine(task.start, time.min),
+                datetime.combine(task.end, time.max),
+                limit=BACKFILL_NEWS_LIMIT,
+            )
+            data = await self._fetch(params, task.symbol)
+            rows = [
+                alpha_vantage_news_item(task.symbol, article)
+                for article in data.get("feed", [])
+            ]
+            written = await asyncio.to_thread(insert_historic_news, rows)
+        if not written:
+            raise RuntimeError("database write failed")
+
+        self.state.mark_done(task, last_price_date)
+        self.state.save()
+        return len(rows)
+
+    async def run(self, tasks: Sequence[BackfillTask]) -> Dict[str, int]:
+        """Ejecutar las tareas con `concurrency` trabajadores"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in tasks:
+            queue.put_nowait(task)
+        summary = {"tasks": len(tasks), "completed": 0, "failed": 0, "rows": 0}
+
+        async def worker():
+            while True:
+                try:
+                    task = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    rows = await self.run_task(task)
+                    summary["rows"] += rows
+                    summary["completed"] += 1
+                    logger.info(
+                        f"Backfill {task.key} done "
+                        f"({summary['completed']}/{summary['tasks']})"
+                    )
+                except Exception as e:
+                    summary["failed"] += 1
+                    logger.error(f"Backfill {task.key} failed: {e}")
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        return summary
+
+
+async def run_backfill(
+    manager: DataIngestionManager,
+    months: int = 6,
+    symbols: Optional[Sequence[str]] = None,
+    resume: bool = False,
+    state_file: str = BACKFILL_STATE_FILE,
+    concurrency: int = BACKFILL_CONCURRENCY,
+) -> Dict[str, int]:
+    """
+    Ejecutar (o reanudar) un backfill de los últimos `months` meses
+
+    Al reanudar se reutilizan el rango y los símbolos guardados para que las
+    tareas coincidan con las ya completadas.
+    """
+    state = BackfillState.load(state_file)
+    if resume and state.run:
+        start = date.fromisoformat(state.run["start"])
+        end = date.fromisoformat(state.run["end"])
+        symbols = state.run["symbols"]
+        logger.info(
+            f"Resuming backfill {start}..{end}: {len(state.completed)} tasks done"
+        )
+    else:
+        if resume:
+            logger.info("No backfill to resume, starting a new one")
+        end = datetime.utcnow().date()
+        start = end - relativedelta(months=months)
+        symbols = list(symbols or STOCK_SYMBOLS)
+        state.start_run(start, end, symbols)
+        state.save()
+
+    tasks = plan_tasks(symbols, start, end, state)
+    summary = await BackfillEngine(manager, state, concurrency).run(tasks)
+    logger.info(f"Backfill finished: {summary}")
+    if summary["failed"]:
+        logger.warning(
+            f"{summary['failed']} tasks failed; run again with --resume to retry them"
+        )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumable historical backfill")
+    parser.add_argument("--months", type=int, default=6, help="months of history")
+    parser.add_argument(
+        "--symbols",
+        type=lambda value: value.split(","),
+        help="comma-separated symbols (default: STOCK_SYMBOLS)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the last backfill, skipping its completed tasks",
+    )
+    parser.add_argument("--state-file", default=BACKFILL_STATE_FILE)
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] %(levelname)-8s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if not ALPHA_VANTAGE_API_KEY:
+        logger.error("ALPHA_VANTAGE_API_KEY not configured")
+        return
+
+    async def run():
+        manager = DataIngestionManager()
+        try:
+            await run_backfill(
+                manager,
+                months=args.months,
+                symbols=args.symbols,
+                resume=args.resume,
+                state_file=args.state_file,
+                concurrency=args.concurrency,
+            )
+        finally:
+            await manager.aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark del escritor por lotes
+Crea una base temporal migrada con alembic y mide filas/segundo al escribir
+noticias sintéticas con COPY, con execute_values y fila a fila
+
+Uso (desde backend/, con PostgreSQL accesible vía DB_*):
+    python -m benchmarks.bulk_writer --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+from alembic import command
+from alembic.config import Config
+from bulk_writer import BulkWriter
+from db_pool import DB_CONFIG
+
+BENCH_DATABASE = f"{DB_CONFIG['database']}_bench"
+
+NEWS_COLUMNS = [
+    "title",
+    "description",
+    "url",
+    "published_at",
+    "source_name",
+    "sentiment_score",
+    "sentiment_subjectivity",
+    "symbol",
+]
+
+
+def _connect(database: str, autocommit: bool = False):
+    conn = psycopg2.connect(**{**DB_CONFIG, "database": database})
+    conn.autocommit = autocommit
+    return conn
+
+
+@contextmanager
+def scratch_database():
+    """Base de datos temporal con el esquema de alembic"""
+    admin = _connect(DB_CONFIG["database"], autocommit=True)
+    cursor = admin.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+    cursor.execute(f"CREATE DATABASE {BENCH_DATABASE}")
+    previous = os.environ.get("DB_NAME")
+    os.environ["DB_NAME"] = BENCH_DATABASE
+    try:
+        config = Config()
+        config.set_main_option(
+            "script_location", str(Path(__file__).parent.parent / "alembic")
+        )
+        command.upgrade(config, "head")
+    finally:
+        if previous is None:
+            os.environ.pop("DB_NAME", None)
+        else:
+            os.environ["DB_NAME"] = previous
+    try:
+        yield
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+        admin.close()
+
+
+def synthetic_news(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=60)
+    symbols = [f"SYM{i:02d}" for i in range(18)]
+    for i in range(count):
+        yield (
+            f"Synthetic headline {i}",
+            "Synthetic description with\ttabs and \\ backslashes",
+            f"https://example.com/news/{i}",
+            start + timedelta(seconds=i * 5),
+            "Bench",
+            rng.uniform(-1, 1),
+            rng.random(),
+            symbols[i % len(symbols)],
+        )
+
+
+def bench_writer(method: str, rows: int, batch_size: int) -> float:
+    conn = _connect(BENCH_DATABASE)
+
+    @contextmanager
+    def single_connection():
+        yield conn
+
+    writer = BulkWriter(
+        "news_with_sentiment",
+        NEWS_COLUMNS,
+        batch_size=batch_size,
+        flush_interval=3600,
+        method=method,
+        connection_factory=single_connection,
+    )
+    start = time.perf_counter()
+    writer.extend(synthetic_news(rows))
+    writer.flush()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return rows / elapsed
+
+
+def bench_row_by_row(rows: int) -> float:
+    """Línea base: un INSERT por fila, como el antiguo insert_news_pg"""
+    conn = _connect(BENCH_DATABASE)
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(NEWS_COLUMNS))
+    statement = (
+        f"INSERT INTO news_with_sentiment ({', '.join(NEWS_COLUMNS)}) "
+        f"VALUES ({placeholders})"
+    )
+    start = time.perf_counter()
+    for row in synthetic_news(rows):
+        cursor.execute(statement, row)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return rows / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk writer benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--baseline-rows", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    with scratch_database():
+        print(f"rows={args.rows} batch_size={args.batch_size}")
+        print(f"{'method':>12} {'rows/s':>10}")
+        for method in ("copy", "values"):
+            rate = bench_writer(method, args.rows, args.batch_size)
+            print(f"{method:>12} {rate:10.0f}")
+        rate = bench_row_by_row(args.baseline_rows)
+        print(f"{'row-by-row':>12} {rate:10.0f}  ({args.baseline_rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark del ciclo de ingestión contra un servidor HTTP simulado
+Levanta un servidor local que imita Alpha Vantage y Yahoo con una latencia
+fija y mide la duración del ciclo a medida que crece el número de símbolos
+
+Uso (desde backend/):
+    python -m benchmarks.ingestion_cycle --latency-ms 50 --symbols 10,100,500
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+import threading
+import time
+
+import ingestion_main
+import uvicorn
+from fastapi import FastAPI
+from ingestion_main import DataIngestionManager
+from kinesis_producer import MemoryKinesis
+from quota_scheduler import PROVIDER_LIMITS, QuotaScheduler
+from watermarks import WatermarkStore
+
+
+def build_mock_app(latency_seconds: float) -> FastAPI:
+    """Aplicación que responde como las APIs reales tras `latency_seconds`"""
+    app = FastAPI()
+
+    @app.get("/query")
+    async def alpha_vantage(tickers: str = ""):
+        await asyncio.sleep(latency_seconds)
+        return {
+            "feed": [
+                {
+                    "title": f"{tickers} headline {i}",
+                    "summary": "summary",
+                    "url": f"https://example.com/{tickers}/{i}",
+                    "source": "Mock",
+                    "time_published": "20240101T000000",
+                    "overall_sentiment_score": 0.1,
+                    "overall_sentiment_label": "Neutral",
+                }
+                for i in range(3)
+            ]
+        }
+
+    @app.get("/v8/finance/chart/{symbol}")
+    async def yahoo_chart(symbol: str):
+        await asyncio.sleep(latency_seconds)
+        return {
+            "chart": {
+                "result": [
+                    {
+                        "meta": {"symbol": symbol},
+                        "timestamp": [1700000000],
+                        "indicators": {
+                            "quote": [
+                                {
+                                    "close": [100.0],
+                                    "high": [101.0],
+                                    "low": [99.0],
+                                    "volume": [1000],
+                                }
+                            ]
+                        },
+                    }
+                ]
+            }
+        }
+
+    return app
+
+
+class _MemoryWatermarks(WatermarkStore):
+    """Marcas de agua solo en memoria: el benchmark no usa la base de datos"""
+
+    def refresh(self):
+        self._loaded = True
+
+    def flush(self) -> int:
+        self._pending.clear()
+        return 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(latency_seconds: float) -> str:
+    """Arrancar el servidor simulado en un hilo y devolver su URL base"""
+    port = _free_port()
+    config = uvicorn.Config(
+        build_mock_app(latency_seconds),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=4096,
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def measure_cycle(symbol_count: int, per_host: int) -> float:
+    # Sin cuotas: se mide solo la concurrencia HTTP
+    unlimited = {name: {"per_minute": 0, "per_day": 0} for name in PROVIDER_LIMITS}
+    manager = DataIngestionManager(
+        kinesis_client=MemoryKinesis(),
+        max_concurrency_per_host=per_host,
+        scheduler=QuotaScheduler(limits=unlimited),
+        watermark_store=_MemoryWatermarks(),
+    )
+    symbols = [f"SYM{i:04d}" for i in range(symbol_count)]
+    try:
+        return await manager.run_ingestion_cycle(symbols)
+    finally:
+        await manager.aclose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion cycle benchmark")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--symbols", default="10,50,100,250,500")
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=ingestion_main.INGESTION_MAX_CONCURRENCY_PER_HOST,
+    )
+    parser.add_argument(
+        "--sequential-up-to",
+        type=int,
+        default=100,
+        help="also measure per-host limit 1 (old sequential loop) up to N symbols",
+    )
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    base_url = start_mock_server(args.latency_ms / 1000)
+    ingestion_main.ALPHA_VANTAGE_API_KEY = ingestion_main.ALPHA_VANTAGE_API_KEY or "x"
+    ingestion_main.ALPHA_VANTAGE_URL = f"{base_url}/query"
+    ingestion_main.YAHOO_CHART_URL = f"{base_url}/v8/finance/chart"
+
+    print(
+        f"latency={args.latency_ms:.0f}ms per_host={args.per_host} "
+        f"http2={ingestion_main.INGESTION_HTTP2}"
+    )
+    print(f"{'symbols':>8} {'concurrent_s':>13} {'sequential_s':>13} {'sym/s':>8}")
+    for count in [int(value) for value in args.symbols.split(",")]:
+        concurrent = asyncio.run(measure_cycle(count, args.per_host))
+        sequential = (
+            f"{asyncio.run(measure_cycle(count, 1)):13.2f}"
+            if count <= args.sequential_up_to
+            else f"{'-':>13}"
+        )
+        print(f"{count:>8} {concurrent:13.2f} {sequential} {count / concurrent:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark del productor de Kinesis
+Envía registros sintéticos a un stream en memoria con latencia por llamada y
+fallos parciales simulados, y compara un put_record por registro (el envío
+anterior) con PutRecords por lotes, con y sin agregación
+
+Uso (desde backend/):
+    python -m benchmarks.kinesis_producer --records 20000 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from kinesis_producer import KinesisProducer, MemoryKinesis
+
+SYMBOLS = 50
+
+
+def synthetic_record(i: int) -> dict:
+    return {
+        "type": "news",
+        "symbol": f"SYM{i % SYMBOLS:03d}",
+        "title": f"Headline {i}",
+        "description": "Synthetic description " * 5,
+        "url": f"https://example.com/news/{i}",
+        "published_at": "20240101T000000",
+        "sentiment_score": 0.1,
+    }
+
+
+async def per_record(records: int, stream: MemoryKinesis) -> float:
+    """Línea base: un put_record en un hilo por registro"""
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                stream.put_record,
+                StreamName="bench",
+                Data=str(synthetic_record(i)),
+                PartitionKey=f"SYM{i % SYMBOLS:03d}",
+            )
+            for i in range(records)
+        )
+    )
+    return time.perf_counter() - start
+
+
+async def batched(records: int, stream: MemoryKinesis, aggregate: bool):
+    producer = KinesisProducer(stream, "bench", aggregate=aggregate)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            producer.put(synthetic_record(i), f"SYM{i % SYMBOLS:03d}")
+            for i in range(records)
+        )
+    )
+    await producer.flush()
+    return time.perf_counter() - start, sum(results), producer.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kinesis producer benchmark")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    latency = args.latency_ms / 1000
+    print(
+        f"records={args.records} latency={args.latency_ms:.0f}ms "
+        f"failure_rate={args.failure_rate}"
+    )
+    print(
+        f"{'mode':>12} {'seconds':>8} {'rec/s':>9} {'calls':>6} "
+        f"{'retries':>8} {'p50_ms':>8} {'p99_ms':>8}"
+    )
+
+    stream = MemoryKinesis(shards=args.shards, latency=latency)
+    elapsed = asyncio.run(per_record(args.records, stream))
+    print(
+        f"{'put_record':>12} {elapsed:8.2f} {args.records / elapsed:9.0f} "
+        f"{stream.calls:6d} {'-':>8} {'-':>8} {'-':>8}"
+    )
+
+    for aggregate in (False, True):
+        stream = MemoryKinesis(
+            shards=args.shards, latency=latency, failure_rate=args.failure_rate, seed=1
+        )
+        elapsed, sent, stats = asyncio.run(batched(args.records, stream, aggregate))
+        assert sent == args.records, f"only {sent} records delivered"
+        mode = "aggregated" if aggregate else "put_records"
+        print(
+            f"{mode:>12} {elapsed:8.2f} {sent / elapsed:9.0f} {stream.calls:6d} "
+            f"{stats['retries']:8d} {stats['latency_ms_p50']:8.1f} "
+            f"{stats['latency_ms_p99']:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
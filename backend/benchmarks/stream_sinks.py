@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los destinos de streaming locales
+Publica registros sintéticos de noticias en la cola en memoria, en los
+segmentos locales y en Kinesis en memoria (MemoryKinesis), sin y con gzip, y
+compara registros por segundo, lotes, bytes escritos y latencias de entrega
+
+Uso (desde backend/):
+    python -m benchmarks.stream_sinks --records 50000
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+from benchmarks.kinesis_producer import SYMBOLS, synthetic_record
+from kinesis_producer import KinesisProducer, MemoryKinesis
+from stream_sinks import MemorySink, SegmentFileSink, read_segments
+
+
+async def publish(sink, records: int):
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            sink.put(synthetic_record(i), f"SYM{i % SYMBOLS:03d}")
+            for i in range(records)
+        )
+    )
+    await sink.flush()
+    return time.perf_counter() - start, sum(results), sink.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream sink benchmark")
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--fsync", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"records={args.records} partitions={args.partitions} fsync={args.fsync}")
+    print(
+        f"{'sink':>8} {'codec':>5} {'seconds':>8} {'rec/s':>9} {'batches':>8} "
+        f"{'MiB':>7} {'p50_ms':>8} {'p99_ms':>8}"
+    )
+
+    for compression in ("none", "gzip"):
+        with tempfile.TemporaryDirectory() as directory:
+            sinks = [
+                MemorySink(partitions=args.partitions, compression=compression),
+                SegmentFileSink(
+                    directory=directory,
+                    partitions=args.partitions,
+                    fsync=args.fsync,
+                    compression=compression,
+                ),
+                KinesisProducer(
+                    MemoryKinesis(shards=args.partitions),
+                    "bench",
+                    compression=compression,
+                ),
+            ]
+            for sink in sinks:
+                elapsed, sent, stats = asyncio.run(publish(sink, args.records))
+                sink.close()
+                assert sent == args.records, f"only {sent} records delivered"
+                print(
+                    f"{sink.name:>8} {compression:>5} {elapsed:8.2f} "
+                    f"{sent / elapsed:9.0f} {stats['batches']:8d} "
+                    f"{stats['bytes_sent'] / 2**20:7.1f} "
+                    f"{stats['latency_ms_p50']:8.1f} {stats['latency_ms_p99']:8.1f}"
+                )
+            read_back = sum(1 for _ in read_segments(directory))
+            assert read_back == args.records, f"read {read_back} records back"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Escritor por lotes para PostgreSQL
+Acumula filas y las escribe en bloque con COPY FROM STDIN a una tabla temporal
+(o con execute_values) y un único INSERT ... ON CONFLICT, usando una sola
+conexión del pool por lote en lugar de una conexión y un round trip por fila
+
+Un escritor se comparte entre hilos: write() escribe las filas de quien llama
+en su propia transacción, sin pasar por el buffer, y extend()/flush() usan el
+buffer común, que conserva las filas de un lote fallido para el siguiente flush.
+Un temporizador escribe el buffer cuando su fila más antigua cumple
+flush_interval, aunque no lleguen más filas
+"""
+
+import io
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+from db_pool import pooled_connection
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+
+logger = logging.getLogger(__name__)
+
+# Filas por lote y antigüedad máxima del buffer antes de escribir
+BULK_WRITE_BATCH_SIZE = int(os.getenv("BULK_WRITE_BATCH_SIZE", "5000"))
+BULK_WRITE_FLUSH_SECONDS = float(os.getenv("BULK_WRITE_FLUSH_SECONDS", "5"))
+
+# "copy" (COPY a tabla temporal + INSERT ... SELECT) o "values" (execute_values)
+BULK_WRITE_METHOD = os.getenv("BULK_WRITE_METHOD", "copy")
+
+
+def _array_literal(values) -> str:
+    """Literal de array de PostgreSQL ({"a","b"}) para columnas ARRAY"""
+    elements = (
+        "NULL"
+        if value is None
+        else '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for value in values
+    )
+    return "{" + ",".join(elements) + "}"
+
+
+def _copy_value(value) -> str:
+    """Serializar un valor al formato text de COPY"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        return _copy_value(_array_literal(value))
+    if isinstance(value, dict):
+        # Columnas JSON/JSONB
+        return _copy_value(json.dumps(value, default=str))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class BulkWriter:
+    """
+    Buffer de filas para una tabla con escritura por lotes y upsert
+
+    Args:
+        table: Tabla destino
+        columns: Columnas que se escriben (en el orden de cada fila)
+        conflict_columns: Columnas del índice único para ON CONFLICT; si se
+            omite se usa ON CONFLICT DO NOTHING
+        update_columns: Columnas que se actualizan al haber conflicto; si se
+            omite el conflicto no modifica la fila existente
+        update_expressions: Expresiones SQL por columna para el DO UPDATE, que
+            pueden referirse a la fila existente como `target` y a la nueva como
+            `EXCLUDED` (p.ej. para acumular agregados); tienen prioridad sobre
+            `update_columns`
+        update_where: Condición SQL del DO UPDATE; si no se cumple la fila
+            existente no se reescribe
+        combine: Función (fila anterior, fila nueva) -> fila que fusiona dos
+            filas con la misma clave dentro de un lote; por defecto gana la
+            última. Debe ser coherente con `update_expressions`
+        row_key: Función fila -> clave de conflicto, necesaria cuando la clave
+            incluye columnas que no se escriben (p.ej. columnas generadas)
+        batch_size: Filas por lote
+        flush_interval: Segundos máximos que una fila espera en el buffer; un
+            temporizador en segundo plano escribe el buffer al cumplirse (si
+            falla, lo reintenta pasado otro intervalo)
+        method: "copy" o "values"
+        connection_factory: Context manager que presta una conexión
+    """
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        conflict_columns: Optional[Sequence[str]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        update_expressions: Optional[Dict[str, str]] = None,
+        update_where: Optional[str] = None,
+        combine: Optional[Callable[[tuple, tuple], tuple]] = None,
+        row_key: Optional[Callable[[tuple], Hashable]] = None,
+        batch_size: int = BULK_WRITE_BATCH_SIZE,
+        flush_interval: float = BULK_WRITE_FLUSH_SECONDS,
+        method: str = BULK_WRITE_METHOD,
+        connection_factory=pooled_connection,
+    ):
+        if method not in ("copy", "values"):
+            raise ValueError(f"Unknown bulk write method: {method}")
+        self.table = table
+        self.columns = list(columns)
+        self.conflict_columns = list(conflict_columns or [])
+        self.update_columns = list(update_columns or [])
+        self.update_expressions = dict(update_expressions or {})
+        self.update_where = update_where
+        self.combine = combine
+        self.row_key = row_key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.method = method
+        self.connection_factory = connection_factory
+        self._buffer: List[tuple] = []
+        self._oldest: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        # Reentrante: _write actualiza las estadísticas también desde flush()
+        self._lock = threading.RLock()
+        self.rows_written = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+
+        self._stage = f"_stage_{table}"
+        self._insert_sql = self._build_insert()
+
+    def _conflict_clause(self) -> sql.Composable:
+        if not self.conflict_columns:
+            return sql.SQL("ON CONFLICT DO NOTHING")
+        target = sql.SQL(", ").join(map(sql.Identifier, self.conflict_columns))
+        expressions = {
+            column: sql.SQL("EXCLUDED.{}").format(sql.Identifier(column))
+            for column in self.update_columns
+        }
+        expressions.update(
+            (column, sql.SQL(expression))
+            for column, expression in self.update_expressions.items()
+        )
+        if not expressions:
+            return sql.SQL("ON CONFLICT ({}) DO NOTHING").format(target)
+        assignments = sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.Identifier(column), expression)
+            for column, expression in expressions.items()
+        )
+        clause = sql.SQL("ON CONFLICT ({}) DO UPDATE SET {}").format(
+            target, assignments
+        )
+        if self.update_where:
+            clause = sql.SQL("{} WHERE {}").format(clause, sql.SQL(self.update_where))
+        return clause
+
+    def _build_insert(self) -> sql.Composable:
+        columns = sql.SQL(", ").join(map(sql.Identifier, self.columns))
+        if self.method == "values":
+            source = sql.SQL("VALUES %s")
+        else:
+            source = sql.SQL("SELECT {} FROM {}").format(
+                columns, sql.Identifier(self._stage)
+            )
+        return sql.SQL("INSERT INTO {} AS target ({}) {} {}").format(
+            sql.Identifier(self.table), columns, source, self._conflict_clause()
+        )
+
+    def add(self, row: Sequence):
+        """Añadir una fila (tupla en el orden de `columns`)"""
+        self.extend([row])
+
+    def add_dict(self, record: Dict):
+        """Añadir una fila a partir de un diccionario columna -> valor"""
+        self.extend([tuple(record.get(column) for column in self.columns)])
+
+    def extend(self, rows: Iterable[Sequence]):
+        """Añadir filas y escribir los lotes que se completen"""
+        with self._lock:
+            for row in rows:
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                self._buffer.append(tuple(row))
+                if len(self._buffer) >= self.batch_size:
+                    self._flush_locked()
+            if self._oldest is not None and (
+                time.monotonic() - self._oldest >= self.flush_interval
+            ):
+                self._flush_locked()
+            self._schedule_flush()
+
+    def _schedule_flush(self, delay: Optional[float] = None):
+        """Programar la escritura del buffer para cuando venza su fila más antigua"""
+        if self._timer is not None or not self._buffer or self.flush_interval <= 0:
+            return
+        if delay is None:
+            delay = self._oldest + self.flush_interval - time.monotonic()
+        self._timer = threading.Timer(max(delay, 0.0), self._timed_flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _timed_flush(self):
+        with self._lock:
+            # Un flush posterior lo canceló o lo sustituyó por otro
+            if self._timer is not threading.current_thread():
+                return
+            try:
+                self._flush_locked()
+            except Exception as e:
+                logger.error(f"Timed flush of {self.table} failed: {e}")
+
+    def write(self, rows: Iterable[Sequence]) -> int:
+        """
+        Escribir estas filas ahora, en una transacción propia
+
+        No pasan por el buffer compartido: el resultado o la excepción es el de
+        las filas de quien llama aunque otros hilos usen el mismo escritor, y
+        si falla no se escribe ninguna.
+
+        Returns:
+            Número de filas enviadas
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return 0
+        return self._write(rows)
+
+    def flush(self) -> int:
+        """
+        Escribir todo lo pendiente
+
+        Returns:
+            Número de filas enviadas
+        """
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self) -> int:
+        self._cancel_timer()
+        rows, oldest = self._buffer, self._oldest
+        if not rows:
+            return 0
+        self._buffer, self._oldest = [], None
+        try:
+            return self._write(rows)
+        except Exception:
+            # Las filas vuelven al buffer por delante de las nuevas: el próximo
+            # flush las reintenta y quien las añadió no las da por escritas
+            self._buffer[:0] = rows
+            self._oldest = oldest
+            self._schedule_flush(self.flush_interval)
+            raise
+
+    def _write(self, rows: List[tuple]) -> int:
+        if self.conflict_columns and (self.update_columns or self.update_expressions):
+            rows = self._dedupe(rows)
+        start = time.perf_counter()
+        with self.connection_factory() as conn:
+            try:
+                cursor = conn.cursor()
+                if self.method == "copy":
+                    self._write_copy(cursor, rows)
+                else:
+                    execute_values(
+                        cursor,
+                        self._insert_sql.as_string(conn),
+                        [
+                            tuple(
+                                Json(value) if isinstance(value, dict) else value
+                                for value in row
+                            )
+                            for row in rows
+                        ],
+                        page_size=len(rows),
+                    )
+                cursor.close()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.rows_written += len(rows)
+            self.flushes += 1
+            self.flush_seconds += elapsed
+        logger.debug(f"Flushed {len(rows)} rows into {self.table} in {elapsed:.3f}s")
+        return len(rows)
+
+    def _dedupe(self, rows: List[tuple]) -> List[tuple]:
+        # ON CONFLICT DO UPDATE no admite dos filas con la misma clave en un
+        # mismo comando: se fusionan con `combine` o gana la última
+        row_key = self.row_key
+        if row_key is None:
+            positions = [self.columns.index(column) for column in self.conflict_columns]
+
+            def row_key(row):
+                return tuple(row[position] for position in positions)
+
+        merged = {}
+        for row in rows:
+            key = row_key(row)
+            if key in merged and self.combine:
+                row = self.combine(merged[key], row)
+            merged[key] = row
+        return list(merged.values())
+
+    def _write_copy(self, cursor, rows: List[tuple]):
+        columns = sql.SQL(", ").join(map(sql.Identifier, self.columns))
+        stage = sql.Identifier(self._stage)
+        # Tabla temporal por sesión con los tipos de la tabla destino; se vacía
+        # al terminar cada transacción
+        cursor.execute(
+            sql.SQL(
+                "CREATE TEMP TABLE IF NOT EXISTS {} ON COMMIT DELETE ROWS AS "
+                "SELECT {} FROM {} WITH NO DATA"
+            ).format(stage, columns, sql.Identifier(self.table))
+        )
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(
+            sql.SQL("COPY {} ({}) FROM STDIN").format(stage, columns), buffer
+        )
+        cursor.execute(self._insert_sql)
+
+    def close(self):
+        """Escribir lo pendiente (y parar el temporizador)"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self) -> Dict:
+        """Filas escritas, lotes y filas por segundo"""
+        return {
+            "table": self.table,
+            "method": self.method,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "pending": len(self._buffer),
+            "rows_per_second": (
+                round(self.rows_written / self.flush_seconds)
+                if self.flush_seconds
+                else None
+            ),
+        }
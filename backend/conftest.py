@@ -0,0 +1,46 @@
+"""
+Configuración de pytest del backend
+Los tests de los módulos de ingestion/ se ejecutan junto a los del backend. Su
+directorio se añade al final de sys.path, así que los módulos del backend con
+el mismo nombre (main) siguen teniendo prioridad. Los de lambda_function/ se
+cargan desde su ruta con load_lambda_module
+"""
+
+import importlib.util
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for directory in ("ingestion",):
+    path = os.path.join(ROOT_DIR, directory)
+    if path not in sys.path:
+        sys.path.append(path)
+
+LAMBDA_DIR = os.path.join(ROOT_DIR, "lambda_function")
+
+
+def load_lambda_module(name, module_name=None):
+    """
+    Cargar un módulo o un paquete de lambda_function/ desde su ruta
+
+    El directorio no se añade a sys.path: contiene las copias para Windows de
+    los paquetes de la Lambda (regex sin _regex) y un main.py que taparía el
+    del backend. El módulo se registra con su nombre para que los demás
+    módulos de la Lambda lo importen, o con module_name si choca con uno del
+    backend (main, benchmarks); los submódulos de un paquete se importan luego
+    desde su directorio.
+    """
+    path = os.path.join(LAMBDA_DIR, name)
+    if os.path.isdir(path):
+        spec = importlib.util.spec_from_file_location(
+            module_name or name,
+            os.path.join(path, "__init__.py"),
+            submodule_search_locations=[path],
+        )
+    else:
+        spec = importlib.util.spec_from_file_location(module_name or name, path + ".py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name or name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Compactación de financial_sentiment_correlation
+Fusiona las filas duplicadas de cada (symbol, hora) que dejaron los ciclos de
+ingestión anteriores a la clave única (symbol, hour), con los mismos criterios
+que el upsert de ingestion_main: media de cierre ponderada por price_points,
+máximo, mínimo y suma de volumen y puntos; el resto de columnas de la fila más
+reciente. Las horas se truncan a la hora exacta.
+
+Se procesa partición a partición para acotar la duración de cada transacción.
+Ejecutarlo antes de la migración que crea la clave única evita que la
+migración tenga que compactar toda la tabla en una sola transacción.
+
+Uso:
+    python correlation_compaction.py            # compactar
+    python correlation_compaction.py --dry-run  # solo contar
+"""
+
+import argparse
+import logging
+from typing import Dict, List
+
+from db_pool import pooled_connection
+from partitions import default_partition_name, list_partitions
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+TABLE = "financial_sentiment_correlation"
+
+# Grupos (symbol, hora) con más de una fila o con la hora sin truncar; se
+# conserva la fila más reciente (mayor id)
+_GROUPS_SQL = """
+    CREATE TEMP TABLE _correlation_compaction ON COMMIT DROP AS
+    SELECT symbol,
+           DATE_TRUNC('hour', hour) AS bucket,
+           MAX(id) AS keep_id,
+           COUNT(*) AS row_count,
+           SUM(avg_close_price * COALESCE(price_points, 1))
+               / NULLIF(SUM(CASE WHEN avg_close_price IS NOT NULL
+                                 THEN COALESCE(price_points, 1) END), 0)
+               AS avg_close_price,
+           MAX(max_high_price) AS max_high_price,
+           MIN(min_low_price) AS min_low_price,
+           SUM(total_volume) AS total_volume,
+           SUM(COALESCE(price_points, 1)) AS price_points
+    FROM {relation}
+    GROUP BY symbol, DATE_TRUNC('hour', hour)
+    HAVING COUNT(*) > 1 OR BOOL_OR(hour <> DATE_TRUNC('hour', hour))
+"""
+
+_DELETE_SQL = """
+    DELETE FROM {relation} AS correlation
+    USING _correlation_compaction AS groups
+    WHERE correlation.symbol IS NOT DISTINCT FROM groups.symbol
+      AND DATE_TRUNC('hour', correlation.hour) = groups.bucket
+      AND correlation.id <> groups.keep_id
+"""
+
+_UPDATE_SQL = """
+    UPDATE {relation} AS correlation
+    SET hour = groups.bucket,
+        avg_close_price = groups.avg_close_price,
+        max_high_price = groups.max_high_price,
+        min_low_price = groups.min_low_price,
+        total_volume = groups.total_volume,
+        price_points = groups.price_points,
+        updated_at = NOW()
+    FROM _correlation_compaction AS groups
+    WHERE correlation.id = groups.keep_id
+      AND DATE_TRUNC('hour', correlation.hour) = groups.bucket
+"""
+
+
+def _relations(conn) -> List[str]:
+    """Particiones de la tabla (o la propia tabla si no está particionada)"""
+    relations = [name for _, name in sorted(list_partitions(conn, TABLE).items())]
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass(%s)", (default_partition_name(TABLE),))
+    if cursor.fetchone()[0] is not None:
+        relations.append(default_partition_name(TABLE))
+    cursor.close()
+    return relations or [TABLE]
+
+
+def compact_relation(conn, relation: str, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Compactar una partición (o tabla) en una transacción
+
+    Returns:
+        Diccionario con los grupos fusionados y las filas eliminadas
+    """
+    ident = sql.Identifier(relation)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql.SQL(_GROUPS_SQL).format(relation=ident))
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(row_count - 1), 0) "
+            "FROM _correlation_compaction"
+        )
+        groups, duplicates = cursor.fetchone()
+        if groups and not dry_run:
+            cursor.execute(sql.SQL(_DELETE_SQL).format(relation=ident))
+            deleted = cursor.rowcount
+            cursor.execute(sql.SQL(_UPDATE_SQL).format(relation=ident))
+        else:
+            deleted = 0
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return {"groups": groups, "duplicates": int(duplicates), "deleted": deleted}
+
+
+def compact(conn, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """Compactar todas las particiones de financial_sentiment_correlation"""
+    result = {}
+    for relation in _relations(conn):
+        result[relation] = compact_relation(conn, relation, dry_run=dry_run)
+        if result[relation]["groups"]:
+            logger.info(f"{relation}: {result[relation]}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge duplicate (symbol, hour) rows of " + TABLE
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only count the groups and duplicate rows that would be merged",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] %(levelname)-8s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    with pooled_connection() as conn:
+        result = compact(conn, dry_run=args.dry_run)
+    groups = sum(changes["groups"] for changes in result.values())
+    duplicates = sum(changes["duplicates"] for changes in result.values())
+    action = "Would merge" if args.dry_run else "Merged"
+    logger.info(
+        f"{action} {groups} (symbol, hour) groups, "
+        f"{duplicates} duplicate rows in {len(result)} relations"
+    )
+
+
+if __name__ == "__main__":
+    main()
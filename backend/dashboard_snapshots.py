@@ -0,0 +1,190 @@
+"""
+Snapshots precalculados del dashboard
+Calcula en segundo plano las respuestas para los rangos de horas fijos que usa
+el frontend y las sirve desde memoria; el resto de rangos usan consultas en vivo
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from db_pool import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# Rangos (en horas) que pide el frontend: 24/168/720 y timeRange * 30 del
+# Dashboard, más el valor por defecto de /api/dashboard/stats
+DASHBOARD_SNAPSHOT_PRESETS = [
+    int(hours)
+    for hours in os.getenv(
+        "DASHBOARD_SNAPSHOT_PRESETS", "24,168,720,5040,8760,21600"
+    ).split(",")
+    if hours.strip()
+]
+
+# Cada cuánto se comprueba si hubo una nueva ingesta
+DASHBOARD_SNAPSHOT_POLL_SECONDS = float(
+    os.getenv("DASHBOARD_SNAPSHOT_POLL_SECONDS", "60")
+)
+
+# Antigüedad máxima de un snapshot: aunque no haya datos nuevos, la ventana
+# "últimas N horas" se desplaza con el tiempo y hay que recalcular
+DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS = float(
+    os.getenv("DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS", "900")
+)
+
+# Marca de agua barata (usa los índices de las PK) para detectar nuevas ingestas
+WATERMARK_QUERY = """
+SELECT
+    (SELECT MAX(id) FROM financial_sentiment_correlation),
+    (SELECT MAX(id) FROM news_with_sentiment)
+"""
+
+SnapshotBuilder = Callable[[object, int], Dict]
+
+
+class DashboardSnapshots:
+    """
+    Cache en memoria de respuestas del dashboard para rangos predefinidos
+
+    Los builders reciben (conexión, horas) y devuelven el payload del endpoint.
+    Se recalculan todos tras cada ciclo de ingestión (detectado por la marca de
+    agua) o cuando superan la antigüedad máxima.
+    """
+
+    def __init__(
+        self,
+        builders: Dict[str, SnapshotBuilder],
+        presets: Iterable[int] = DASHBOARD_SNAPSHOT_PRESETS,
+        poll_interval_seconds: float = DASHBOARD_SNAPSHOT_POLL_SECONDS,
+        max_age_seconds: float = DASHBOARD_SNAPSHOT_MAX_AGE_SECONDS,
+        connection_factory=pooled_connection,
+    ):
+        self.builders = builders
+        self.presets = sorted(set(presets))
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self.connection_factory = connection_factory
+        self._snapshots: Dict[Tuple[str, int], Dict] = {}
+        self._refreshed_monotonic: Optional[float] = None
+        self.last_refreshed_at: Optional[datetime] = None
+        self.last_refresh_duration_ms: Optional[float] = None
+        self.watermark = None
+        self.hits = 0
+        self.misses = 0
+        self.refresh_count = 0
+
+    def get(self, kind: str, hours: int) -> Optional[Dict]:
+        """
+        Obtener un snapshot en O(1)
+
+        Returns:
+            El payload precalculado, o None si el rango no es un preset o el
+            snapshot está obsoleto (el endpoint debe consultar en vivo)
+        """
+        payload = self._snapshots.get((kind, hours))
+        if payload is None or self._is_expired():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload
+
+    def _is_expired(self) -> bool:
+        # Si el refresher deja de funcionar, volver a las consultas en vivo
+        if self._refreshed_monotonic is None:
+            return True
+        age = time.monotonic() - self._refreshed_monotonic
+        return age > self.max_age_seconds * 2
+
+    def _read_watermark(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(WATERMARK_QUERY)
+        watermark = cursor.fetchone()
+        cursor.close()
+        return watermark
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Recalcular todos los snapshots si hubo una nueva ingesta
+
+        Args:
+            force: Recalcular aunque la marca de agua no haya cambiado
+
+        Returns:
+            True si se recalcularon los snapshots
+        """
+        with self.connection_factory() as conn:
+            watermark = self._read_watermark(conn)
+            age = (
+                time.monotonic() - self._refreshed_monotonic
+                if self._refreshed_monotonic is not None
+                else None
+            )
+            if (
+                not force
+                and watermark == self.watermark
+                and age is not None
+                and age < self.max_age_seconds
+            ):
+                return False
+
+            start = time.perf_counter()
+            snapshots = {}
+            for kind, builder in self.builders.items():
+                for hours in self.presets:
+                    try:
+                        snapshots[(kind, hours)] = builder(conn, hours)
+                    except Exception as e:
+                        logger.error(
+                            f"Error building {kind} snapshot for {hours}h: {e}"
+                        )
+                        conn.rollback()
+
+        # Reemplazo atómico: los lectores ven el conjunto anterior o el nuevo
+        self._snapshots = snapshots
+        self._refreshed_monotonic = time.monotonic()
+        self.last_refreshed_at = datetime.now()
+        self.last_refresh_duration_ms = (time.perf_counter() - start) * 1000
+        self.watermark = watermark
+        self.refresh_count += 1
+        logger.info(
+            f"Dashboard snapshots refreshed: {len(snapshots)} payloads in "
+            f"{self.last_refresh_duration_ms:.1f}ms"
+        )
+        return True
+
+    async def run(self):
+        """Bucle de refresco (se ejecuta como tarea de fondo)"""
+        logger.info(
+            f"Dashboard snapshot refresher started (presets: {self.presets}, "
+            f"poll: {self.poll_interval_seconds}s)"
+        )
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.warning(f"Dashboard snapshot refresh failed: {e}")
+            await asyncio.sleep(self.poll_interval_seconds)
+
+    def stats(self) -> Dict:
+        """Métricas del cache de snapshots"""
+        lookups = self.hits + self.misses
+        return {
+            "presets": self.presets,
+            "snapshots": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "refresh_count": self.refresh_count,
+            "last_refreshed_at": (
+                self.last_refreshed_at.isoformat() if self.last_refreshed_at else None
+            ),
+            "last_refresh_duration_ms": (
+                round(self.last_refresh_duration_ms, 2)
+                if self.last_refresh_duration_ms is not None
+                else None
+            ),
+        }
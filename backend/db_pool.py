@@ -0,0 +1,103 @@
+"""
+Pool de conexiones a PostgreSQL compartido por la API
+Evita abrir una conexión nueva por cada request o verificación de salud
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+logger = logging.getLogger(__name__)
+
+# Configuración de la base de datos desde variables de entorno
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "postgres"),
+    "database": os.getenv("DB_NAME", "financial_sentiment"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": os.getenv("DB_PASSWORD", "password"),
+    "port": int(os.getenv("DB_PORT", "5432")),
+}
+
+# Tamaño del pool (por proceso de uvicorn). psycopg2 solo conserva abiertas
+# DB_POOL_MIN_CONNECTIONS conexiones ociosas; el resto se cierran al devolverse
+DB_POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", "4"))
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "10"))
+# Segundos que la API pide esperar (Retry-After del 503) cuando el pool no
+# tiene conexiones libres
+DB_POOL_RETRY_AFTER_SECONDS = int(os.getenv("DB_POOL_RETRY_AFTER_SECONDS", "1"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> pool.ThreadedConnectionPool:
+    """
+    Obtener el pool de conexiones, creándolo la primera vez que se usa
+
+    Returns:
+        Pool de conexiones compartido por el proceso
+
+    Raises:
+        psycopg2.OperationalError: Si no se puede conectar a la base de datos
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(
+                    DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, **DB_CONFIG
+                )
+                logger.info(
+                    f"Database pool created ({DB_POOL_MIN_CONNECTIONS}-"
+                    f"{DB_POOL_MAX_CONNECTIONS} connections)"
+                )
+    return _pool
+
+
+def release_connection(conn, close: bool = False):
+    """
+    Devolver una conexión al pool
+
+    Las conexiones que no pertenecen al pool (o si el pool ya se cerró)
+    simplemente se cierran.
+    """
+    if _pool is not None and not _pool.closed:
+        try:
+            _pool.putconn(conn, close=close or bool(conn.closed))
+            return
+        except pool.PoolError:
+            pass
+    conn.close()
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Prestar una conexión del pool y devolverla al terminar
+
+    Si la conexión falla durante su uso se descarta en lugar de devolverla,
+    para que el pool no reparta conexiones rotas tras un reinicio de la base.
+    """
+    conn = get_pool().getconn()
+    discard = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        discard = True
+        raise
+    finally:
+        release_connection(conn, close=discard)
+
+
+def close_pool():
+    """Cerrar todas las conexiones del pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            logger.info("Database pool closed")
@@ -0,0 +1,123 @@
+"""
+Verificación de salud en segundo plano
+Un prober periódico consulta la base de datos y guarda el último resultado,
+de modo que los endpoints de salud nunca tocan la base directamente
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from db_pool import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre verificaciones de la base de datos
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "15"))
+
+# Un resultado más viejo que este múltiplo del intervalo se considera obsoleto
+HEALTH_STALE_AFTER_INTERVALS = 3
+
+
+def check_database():
+    """Ejecutar SELECT 1 sobre una conexión del pool"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+
+
+class HealthProber:
+    """
+    Prober que verifica la base de datos cada cierto intervalo y cachea el
+    resultado (estado, latencia y momento de la última verificación)
+    """
+
+    def __init__(
+        self,
+        check: Callable[[], None] = check_database,
+        interval_seconds: float = HEALTH_CHECK_INTERVAL_SECONDS,
+    ):
+        self.check = check
+        self.interval_seconds = interval_seconds
+        self.database_connected = False
+        self.last_error: Optional[str] = None
+        self.last_latency_ms: Optional[float] = None
+        self.last_checked_at: Optional[datetime] = None
+        self._last_checked_monotonic: Optional[float] = None
+        self.checks_total = 0
+        self.failures_total = 0
+
+    def probe_once(self) -> bool:
+        """
+        Ejecutar una verificación y guardar el resultado
+
+        Returns:
+            True si la base de datos respondió, False en caso contrario
+        """
+        start = time.perf_counter()
+        try:
+            self.check()
+            connected, error = True, None
+        except Exception as e:
+            connected, error = False, str(e)
+            self.failures_total += 1
+            logger.warning(f"Health probe failed: {error}")
+
+        self.last_latency_ms = (time.perf_counter() - start) * 1000
+        self.database_connected = connected
+        self.last_error = error
+        self.last_checked_at = datetime.now()
+        self._last_checked_monotonic = time.monotonic()
+        self.checks_total += 1
+        return connected
+
+    async def run(self):
+        """Bucle de verificación periódica (se ejecuta como tarea de fondo)"""
+        logger.info(f"Health prober started (interval: {self.interval_seconds}s)")
+        while True:
+            # La verificación es bloqueante (psycopg2), ejecutarla fuera del loop
+            await asyncio.to_thread(self.probe_once)
+            await asyncio.sleep(self.interval_seconds)
+
+    def age_seconds(self) -> Optional[float]:
+        """Segundos transcurridos desde la última verificación"""
+        if self._last_checked_monotonic is None:
+            return None
+        return time.monotonic() - self._last_checked_monotonic
+
+    def is_stale(self) -> bool:
+        """Verificar si no hay resultado o si el último es demasiado viejo"""
+        age = self.age_seconds()
+        return age is None or age > self.interval_seconds * HEALTH_STALE_AFTER_INTERVALS
+
+    def is_ready(self) -> bool:
+        """La API está lista si la última verificación reciente fue exitosa"""
+        return self.database_connected and not self.is_stale()
+
+    def snapshot(self) -> Dict:
+        """
+        Obtener el último resultado cacheado
+
+        Returns:
+            Diccionario con estado de la base, latencia y antigüedad del check
+        """
+        age = self.age_seconds()
+        return {
+            "database": "connected" if self.database_connected else "disconnected",
+            "last_check_latency_ms": (
+                round(self.last_latency_ms, 2)
+                if self.last_latency_ms is not None
+                else None
+            ),
+            "last_check_age_seconds": round(age, 2) if age is not None else None,
+            "last_checked_at": (
+                self.last_checked_at.isoformat() if self.last_checked_at else None
+            ),
+            "check_interval_seconds": self.interval_seconds,
+            "stale": self.is_stale(),
+        }
@@ -1,29 +1,59 @@
 #!/usr/bin/env python3
 """
 Main ingestion script for financial data pipeline.
-Fetches news and stock data from APIs and sends to Kinesis streams.
+Fetches news and stock data from APIs and sends them to the configured stream
+sink (Kinesis by default; Kafka, local segment files or memory via STREAM_SINK).
 """
 
 import asyncio
-import json
 import logging
 import os
 import sys
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
 
-import boto3
+import httpx
 import psycopg2
 import requests
 import yfinance as yf
+from article_dedup import ArticleDeduplicator, article_dedup, article_key
+from bulk_writer import BulkWriter
 from dateutil.relativedelta import relativedelta
+from db_pool import pooled_connection
+from quota_scheduler import QuotaScheduler, is_throttled, retry_after_seconds
+from stream_sinks import STREAM_SINK, StreamSink, create_sink
+from watermarks import WatermarkStore, parse_published_at, watermarks
 
 # Configuración
 ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 KINESIS_STREAM_NAME = os.getenv("KINESIS_STREAM_NAME", "financial-sentiment-stream")
 
+# Endpoints de las APIs (configurables para apuntar a un servidor de pruebas)
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+YAHOO_CHART_URL = os.getenv(
+    "YAHOO_CHART_URL", "https://query1.finance.yahoo.com/v8/finance/chart"
+)
+
+# Cliente HTTP compartido por el ciclo de ingestión
+INGESTION_MAX_CONCURRENCY_PER_HOST = int(
+    os.getenv("INGESTION_MAX_CONCURRENCY_PER_HOST", "8")
+)
+INGESTION_MAX_CONNECTIONS = int(os.getenv("INGESTION_MAX_CONNECTIONS", "32"))
+INGESTION_KEEPALIVE_SECONDS = float(os.getenv("INGESTION_KEEPALIVE_SECONDS", "30"))
+INGESTION_HTTP2 = os.getenv("INGESTION_HTTP2", "true").lower() == "true"
+
+# Días naturales que cubre outputsize=compact (100 sesiones) en las series
+# diarias de Alpha Vantage; rangos más antiguos necesitan outputsize=full
+ALPHA_VANTAGE_COMPACT_DAYS = int(os.getenv("ALPHA_VANTAGE_COMPACT_DAYS", "140"))
+ALPHA_VANTAGE_TIME_FORMAT = "%Y%m%dT%H%M"
+
+# Horas de noticias (terminando en la hora de cada barra) que se promedian al
+# enriquecer los precios con sentimiento
+SENTIMENT_WINDOW_HOURS = int(os.getenv("SENTIMENT_WINDOW_HOURS", "24"))
+
 # Configuración de PostgreSQL
 PG_HOST = os.getenv("DB_HOST", "postgres")
 PG_PORT = int(os.getenv("DB_PORT", "5432"))
@@ -39,155 +69,513 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def insert_news_pg(news_items):
+# Planificador de cuotas compartido por el ciclo en tiempo real y los backfills
+quota_scheduler = QuotaScheduler()
+
+
+def _http2_available() -> bool:
+    """HTTP/2 en httpx requiere el paquete opcional h2 (httpx[http2])"""
     try:
-        logger.info(
-            f"Attempting to connect to PostgreSQL at {PG_HOST}:{PG_PORT}, "
-            f"database: {PG_DB}, user: {PG_USER}"
-        )
-        conn = psycopg2.connect(
-            host=PG_HOST,
-            database=PG_DB,
-            user=PG_USER,
-            password=PG_PASSWORD,
-            port=PG_PORT,
-        )
-        cur = conn.cursor()
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Columnas escritas por los escritores por lotes
+NEWS_COLUMNS = [
+    "title",
+    "description",
+    "url",
+    "published_at",
+    "source_name",
+    "sentiment_score",
+    "sentiment_subjectivity",
+    "symbol",
+    "symbols",  # última columna (ver _merge_news_rows)
+]
+CORRELATION_COLUMNS = [
+    "hour",
+    "symbol",
+    "sentiment_category",
+    "avg_sentiment_score",
+    "avg_sentiment_subjectivity",
+    "avg_close_price",
+    "max_high_price",
+    "min_low_price",
+    "total_volume",
+    "price_points",
+    "price_change_percent",
+    "sentiment_change",
+    "news_count",
+    "price_bars",  # {timestamp: [close, high, low, volume, points]}
+]
+
+# Una fila por artículo (article_key, published_at): una copia para otro
+# símbolo solo añade ese símbolo a symbols, sin reescribir el resto de la fila
+NEWS_LINK_EXPRESSIONS = {
+    "symbols": (
+        "ARRAY(SELECT DISTINCT linked FROM unnest("
+        "COALESCE(target.symbols, ARRAY[target.symbol]) || EXCLUDED.symbols"
+        ") AS linked WHERE linked IS NOT NULL ORDER BY linked)"
+    ),
+    "updated_at": "NOW()",
+}
+NEWS_LINK_WHERE = (
+    "NOT (EXCLUDED.symbols <@ COALESCE(target.symbols, ARRAY[target.symbol]))"
+)
+_NEWS_SYMBOLS = NEWS_COLUMNS.index("symbols")
+
+
+def _news_row_key(row: tuple) -> tuple:
+    """Conflict key of a news row (article_key is a generated column)."""
+    record = dict(zip(NEWS_COLUMNS, row))
+    return article_key(record), parse_published_at(record["published_at"])
+
+
+def _merge_news_rows(previous: tuple, row: tuple) -> tuple:
+    """Merge two copies of an article like NEWS_LINK_EXPRESSIONS."""
+    symbols = set(previous[_NEWS_SYMBOLS] or []) | set(row[_NEWS_SYMBOLS] or [])
+    return previous[:_NEWS_SYMBOLS] + (sorted(symbols),)
+
+
+news_writer = BulkWriter(
+    "news_with_sentiment",
+    NEWS_COLUMNS,
+    conflict_columns=["article_key", "published_at"],
+    update_expressions=NEWS_LINK_EXPRESSIONS,
+    update_where=NEWS_LINK_WHERE,
+    combine=_merge_news_rows,
+    row_key=_news_row_key,
+)
+
+# Una fila por (symbol, hour) con las barras de precio de la hora en price_bars,
+# por timestamp: una barra ya guardada se sustituye (reenvíos, reanudaciones,
+# dos proveedores con el mismo día) y solo las nuevas se añaden, así que el
+# upsert es idempotente. Los agregados de precio se recalculan a partir de las
+# barras (media de cierre ponderada por price_points, máximo, mínimo, suma) y
+# el sentimiento refleja la ventana calculada en la última escritura. Una fila
+# sin price_bars (anterior a la columna o escrita por el DAG) cuenta como una
+# barra "legacy" con sus agregados
+_STORED_BARS = (
+    "COALESCE(target.price_bars, CASE WHEN target.price_points > 0"
+    " THEN jsonb_build_object('legacy', jsonb_build_array("
+    "target.avg_close_price, target.max_high_price, target.min_low_price,"
+    " target.total_volume, target.price_points))"
+    " ELSE '{}'::jsonb END)"
+)
+_MERGED_BARS = f"({_STORED_BARS} || COALESCE(EXCLUDED.price_bars, '{{}}'::jsonb))"
+
+
+def _bars_aggregate(expression: str) -> str:
+    """SQL aggregate over the merged bars of an upserted correlation row."""
+    return f"(SELECT {expression} FROM jsonb_each({_MERGED_BARS}) AS bars(ts, bar))"
+
+
+CORRELATION_MERGE_EXPRESSIONS = {
+    "avg_close_price": _bars_aggregate(
+        "SUM((bar->>0)::numeric * (bar->>4)::numeric)"
+        " / NULLIF(SUM(CASE WHEN bar->>0 IS NOT NULL"
+        " THEN (bar->>4)::numeric END), 0)"
+    ),
+    "max_high_price": _bars_aggregate("MAX((bar->>1)::numeric)"),
+    "min_low_price": _bars_aggregate("MIN((bar->>2)::numeric)"),
+    "total_volume": _bars_aggregate("COALESCE(SUM((bar->>3)::bigint), 0)"),
+    "price_points": _bars_aggregate("COALESCE(SUM((bar->>4)::integer), 0)"),
+    "price_bars": _MERGED_BARS,
+    "updated_at": "NOW()",
+}
+CORRELATION_LATEST_COLUMNS = [
+    "sentiment_category",
+    "avg_sentiment_score",
+    "avg_sentiment_subjectivity",
+    "price_change_percent",
+    "sentiment_change",
+    "news_count",
+]
+_CORRELATION_BARS = CORRELATION_COLUMNS.index("price_bars")
+
+
+def _bar_aggregates(bars: Dict[str, list]) -> Dict:
+    """Price aggregates of a row's bars, like CORRELATION_MERGE_EXPRESSIONS."""
+    bars = list(bars.values())
+    closes = [(bar[0], bar[4]) for bar in bars if bar[0] is not None]
+    weight = sum(points for _, points in closes)
+    highs = [bar[1] for bar in bars if bar[1] is not None]
+    lows = [bar[2] for bar in bars if bar[2] is not None]
+    return {
+        "avg_close_price": (
+            sum(close * points for close, points in closes) / weight if weight else None
+        ),
+        "max_high_price": max(highs) if highs else None,
+        "min_low_price": min(lows) if lows else None,
+        "total_volume": sum(bar[3] or 0 for bar in bars),
+        "price_points": sum(bar[4] or 0 for bar in bars),
+    }
 
-        logger.info(
-            f"Successfully connected to PostgreSQL. "
-            f"Inserting {len(news_items)} news items..."
-        )
 
-        for item in news_items:
-            cur.execute(
-                """
-                INSERT INTO news_with_sentiment (
-                    title, description, url, published_at, source_name,
-                    sentiment_score, sentiment_subjectivity, symbol
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-                (
-                    item.get("title"),
-                    item.get("description"),
-                    item.get("url"),
-                    item.get("published_at"),
-                    item.get("source"),
-                    item.get("sentiment_score", 0),
-                    item.get("sentiment_subjectivity", 0),
-                    item.get("symbol"),
-                ),
-            )
-        conn.commit()
-        cur.close()
-        conn.close()
-        logger.info(
-            f"Successfully inserted {len(news_items)} news items into PostgreSQL"
-        )
-    except psycopg2.OperationalError as e:
-        logger.error(f"PostgreSQL connection error: {e}")
+def _merge_correlation_rows(previous: tuple, row: tuple) -> tuple:
+    """Merge two rows of the same (symbol, hour) like CORRELATION_MERGE_EXPRESSIONS."""
+    merged = dict(zip(CORRELATION_COLUMNS, row))
+    bars = {**(previous[_CORRELATION_BARS] or {}), **(row[_CORRELATION_BARS] or {})}
+    merged.update(_bar_aggregates(bars), price_bars=bars)
+    return tuple(merged[column] for column in CORRELATION_COLUMNS)
+
+
+correlation_writer = BulkWriter(
+    "financial_sentiment_correlation",
+    CORRELATION_COLUMNS,
+    conflict_columns=["symbol", "hour"],
+    update_columns=CORRELATION_LATEST_COLUMNS,
+    update_expressions=CORRELATION_MERGE_EXPRESSIONS,
+    combine=_merge_correlation_rows,
+)
+
+
+def _log_pg_error(e: Exception, what: str):
+    if isinstance(e, psycopg2.OperationalError):
+        logger.error(f"PostgreSQL connection error for {what}: {e}")
         logger.error(
             f"Connection details - Host: {PG_HOST}, Port: {PG_PORT}, "
             f"Database: {PG_DB}, User: {PG_USER}"
         )
-    except psycopg2.Error as e:
-        logger.error(f"PostgreSQL error: {e}")
+    elif isinstance(e, psycopg2.Error):
+        logger.error(f"PostgreSQL error for {what}: {e}")
         logger.error(f"Error code: {e.pgcode}, Error message: {e.pgerror}")
-    except Exception as e:
-        logger.error(f"Unexpected error inserting news into PostgreSQL: {e}")
+    else:
+        logger.error(f"Unexpected error inserting {what} into PostgreSQL: {e}")
         import traceback
 
         logger.error(f"Traceback: {traceback.format_exc()}")
 
 
-def insert_stock_pg(stock_item):
+def insert_news_pg(news_items):
+    """
+    Insert news items in bulk (one pooled connection per batch).
+
+    Copies of an already stored article (same normalized URL or text) are not
+    stored again: a copy for another symbol only links that symbol to the
+    existing row and a copy for the same symbol is dropped.
+
+    Returns:
+        True if the items were written, False if the write failed (logged)
+    """
+    new, links = article_dedup.split(news_items)
+    rows = new + links
     try:
-        logger.info(
-            f"Attempting to connect to PostgreSQL for stock data at "
-            f"{PG_HOST}:{PG_PORT}"
+        # Lote propio: con hilos concurrentes (backfill) el resultado es solo
+        # el de estas filas
+        news_writer.write(
+            (
+                item.get("title"),
+                item.get("description"),
+                item.get("url"),
+                item.get("published_at") or None,
+                item.get("source"),
+                item.get("sentiment_score", 0),
+                item.get("sentiment_subjectivity", 0),
+                item.get("symbol"),
+                item.get("symbols"),
+            )
+            for item in rows
         )
-        conn = psycopg2.connect(
-            host=PG_HOST,
-            database=PG_DB,
-            user=PG_USER,
-            password=PG_PASSWORD,
-            port=PG_PORT,
+        logger.info(
+            f"Successfully inserted {len(new)} news items into PostgreSQL "
+            f"({len(links)} linked to more symbols, "
+            f"{len(news_items) - len(rows)} duplicates dropped)"
         )
+        return True
+    except Exception as e:
+        # Que se vuelvan a intentar en lugar de descartarse como ya vistos
+        article_dedup.forget(rows)
+        _log_pg_error(e, "news")
+        return False
+
+
+def _bar_time(value) -> datetime:
+    """Timestamp of a price bar (datetime or ISO string), without time zone."""
+    if not value:
+        value = datetime.utcnow()
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=None)
+
+
+def _bar_hour(value) -> datetime:
+    """Hour bucket of a price bar timestamp (datetime or ISO string)."""
+    return _bar_time(value).replace(minute=0, second=0, microsecond=0)
+
+
+# Agregados por (símbolo enlazado, hora) de las noticias del rango que cubre el
+# lote y unión de cada barra con las SENTIMENT_WINDOW_HOURS horas que terminan
+# en la suya
+WINDOW_SENTIMENT_SQL = """
+    WITH bars AS (
+        SELECT DISTINCT symbol, hour
+        FROM unnest(%(symbols)s::text[], %(hours)s::timestamp[]) AS b(symbol, hour)
+    ),
+    hourly AS (
+        SELECT linked.symbol,
+               DATE_TRUNC('hour', news.published_at) AS hour,
+               SUM(news.sentiment_score) AS score_sum,
+               SUM(news.sentiment_subjectivity) AS subjectivity_sum,
+               COUNT(*) AS news_count
+        FROM news_with_sentiment AS news
+        CROSS JOIN LATERAL unnest(COALESCE(news.symbols, ARRAY[news.symbol]))
+            AS linked(symbol)
+        WHERE (news.symbol = ANY(%(symbol_set)s)
+               OR news.symbols && %(symbol_set)s::varchar[])
+          AND linked.symbol = ANY(%(symbol_set)s)
+          AND news.published_at >= %(since)s AND news.published_at < %(until)s
+        GROUP BY 1, 2
+    )
+    SELECT bars.symbol, bars.hour,
+           SUM(hourly.score_sum) / SUM(hourly.news_count),
+           SUM(hourly.subjectivity_sum) / SUM(hourly.news_count),
+           SUM(hourly.news_count)
+    FROM bars
+    JOIN hourly
+      ON hourly.symbol = bars.symbol
+     AND hourly.hour > bars.hour - make_interval(hours => %(window)s)
+     AND hourly.hour <= bars.hour
+    GROUP BY bars.symbol, bars.hour
+"""
+
+
+def _window_sentiment(bars, window_hours: int = SENTIMENT_WINDOW_HOURS):
+    """
+    Average sentiment and subjectivity of the news in the window ending at
+    each bar's hour, for a whole batch of (symbol, hour) bars in one query.
+
+    Returns:
+        Dict {(symbol, hour): (avg_score, avg_subjectivity, news_count)};
+        bars without news in their window are absent.
+    """
+    bars = set(bars)
+    if not bars:
+        return {}
+    symbols, hours = zip(*bars)
+    params = {
+        "symbols": list(symbols),
+        "hours": list(hours),
+        "symbol_set": list(set(symbols)),
+        "since": min(hours) - timedelta(hours=window_hours - 1),
+        "until": max(hours) + timedelta(hours=1),
+        "window": window_hours,
+    }
+    with pooled_connection() as conn:
         cur = conn.cursor()
+        cur.execute(WINDOW_SENTIMENT_SQL, params)
+        sentiment = {
+            (symbol, hour): (float(score), float(subjectivity), int(count))
+            for symbol, hour, score, subjectivity, count in cur.fetchall()
+        }
+        cur.close()
+        conn.commit()
+    return sentiment
+
 
-        # Calcular promedios reales de sentimiento y subjetividad desde la base
-        cur.execute(
-            """
-            SELECT AVG(sentiment_score), AVG(sentiment_subjectivity)
-            FROM news_with_sentiment
-            WHERE symbol = %s AND published_at >= NOW() - INTERVAL '24 hours'
-        """,
-            (stock_item.get("symbol"),),
+def insert_stocks_pg(stock_items):
+    """
+    Upsert stock items in bulk into their (symbol, hour) rows, each enriched
+    with the news sentiment of the window ending at its own timestamp (not the
+    current one).
+
+    Returns:
+        True if the items were written, False if the write failed (logged)
+    """
+    if not stock_items:
+        return True
+    try:
+        times = [_bar_time(item.get("timestamp")) for item in stock_items]
+        hours = [_bar_hour(value) for value in times]
+        sentiment = _window_sentiment(
+            (item.get("symbol"), hour) for item, hour in zip(stock_items, hours)
         )
-        avg_sentiment_score, avg_sentiment_subjectivity = cur.fetchone()
-        avg_sentiment_score = avg_sentiment_score or 0
-        avg_sentiment_subjectivity = avg_sentiment_subjectivity or 0
-
-        # Usar la fecha real del precio si está disponible
-        hour_value = stock_item.get("timestamp", datetime.utcnow())
-        cur.execute(
-            """
-            INSERT INTO financial_sentiment_correlation (
-                hour, symbol, sentiment_category, avg_sentiment_score,
-                avg_sentiment_subjectivity, avg_close_price, max_high_price,
-                min_low_price, total_volume, price_points, price_change_percent,
-                sentiment_change, news_count
+        rows = []
+        for item, bar_time, hour in zip(stock_items, times, hours):
+            avg_sentiment_score, avg_sentiment_subjectivity, news_count = sentiment.get(
+                (item.get("symbol"), hour), (0, 0, 0)
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-            (
-                hour_value,
-                stock_item.get("symbol"),
-                "Neutral",
-                avg_sentiment_score,
-                avg_sentiment_subjectivity,
-                stock_item.get("close"),
-                stock_item.get("high"),
-                stock_item.get("low"),
-                stock_item.get("volume"),
-                1,
-                0,
-                0,
-                1,
-            ),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+            # La barra va por su timestamp: reenviarla la sustituye
+            bars = {
+                bar_time.isoformat(): [
+                    item.get("close"),
+                    item.get("high"),
+                    item.get("low"),
+                    item.get("volume"),
+                    1,
+                ]
+            }
+            values = {
+                # Hora de la fecha real del precio: clave (symbol, hour)
+                "hour": hour,
+                "symbol": item.get("symbol"),
+                "sentiment_category": "Neutral",
+                "avg_sentiment_score": avg_sentiment_score,
+                "avg_sentiment_subjectivity": avg_sentiment_subjectivity,
+                "price_change_percent": 0,
+                "sentiment_change": 0,
+                "news_count": news_count,
+                "price_bars": bars,
+                **_bar_aggregates(bars),
+            }
+            rows.append(tuple(values[column] for column in CORRELATION_COLUMNS))
+        # Lote propio, como en insert_news_pg
+        correlation_writer.write(rows)
         logger.info(
-            f"Successfully inserted stock item for {stock_item.get('symbol')} "
-            f"into PostgreSQL"
-        )
-    except psycopg2.OperationalError as e:
-        logger.error(f"PostgreSQL connection error for stock data: {e}")
-        logger.error(
-            f"Connection details - Host: {PG_HOST}, Port: {PG_PORT}, "
-            f"Database: {PG_DB}, User: {PG_USER}"
+            f"Successfully inserted {len(stock_items)} stock items into PostgreSQL"
         )
-    except psycopg2.Error as e:
-        logger.error(f"PostgreSQL error for stock data: {e}")
-        logger.error(f"Error code: {e.pgcode}, Error message: {e.pgerror}")
+        return True
     except Exception as e:
-        logger.error(f"Unexpected error inserting stock into PostgreSQL: {e}")
-        import traceback
+        _log_pg_error(e, "stock data")
+        return False
 
-        logger.error(f"Traceback: {traceback.format_exc()}")
+
+def insert_stock_pg(stock_item):
+    insert_stocks_pg([stock_item])
+
+
+def alpha_vantage_news_item(symbol: str, article: Dict) -> Dict:
+    """Convert an Alpha Vantage NEWS_SENTIMENT article into a news item."""
+    # Alpha Vantage ya proporciona análisis de sentimiento
+    sentiment_score = float(article.get("overall_sentiment_score", 0))
+    sentiment_label = article.get("overall_sentiment_label", "neutral")
+
+    # Convertir label a score si no hay score numérico
+    if sentiment_score == 0 and sentiment_label:
+        if sentiment_label.lower() == "positive":
+            sentiment_score = 0.5
+        elif sentiment_label.lower() == "negative":
+            sentiment_score = -0.5
+        else:
+            sentiment_score = 0.0
+
+    return {
+        "type": "news",
+        "symbol": symbol,
+        "company_name": article.get("source", ""),
+        "title": article.get("title", ""),
+        "description": article.get("summary", ""),
+        "content": article.get("summary", ""),
+        "url": article.get("url", ""),
+        "source": article.get("source", ""),
+        "published_at": article.get("time_published", ""),
+        "ingested_at": datetime.utcnow().isoformat(),
+        "sentiment_score": sentiment_score,
+        "sentiment_subjectivity": 0.5,
+    }
 
 
 class DataIngestionManager:
     """Manages data ingestion from multiple sources."""
 
-    def __init__(self):
-        """Initialize the data ingestion manager."""
-        self.kinesis_client = boto3.client("kinesis", region_name=AWS_REGION)
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": "Financial-Sentiment-Pipeline/1.0"})
+    def __init__(
+        self,
+        kinesis_client=None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_concurrency_per_host: int = INGESTION_MAX_CONCURRENCY_PER_HOST,
+        scheduler: Optional[QuotaScheduler] = None,
+        watermark_store: Optional[WatermarkStore] = None,
+        deduplicator: Optional[ArticleDeduplicator] = None,
+        sink: Optional[StreamSink] = None,
+    ):
+        """
+        Initialize the data ingestion manager.
+
+        Args:
+            kinesis_client: Kinesis client for the default Kinesis sink (a boto3
+                client is created by default)
+            http_client: Shared async HTTP client (created by default with
+                keep-alive and HTTP/2 when ``h2`` is installed)
+            max_concurrency_per_host: Maximum in-flight requests per API host
+            scheduler: Quota scheduler (the module-wide one by default)
+            watermark_store: Per-(provider, symbol) news watermarks (the
+                module-wide one by default)
+            deduplicator: Seen-set of articles already sent to the stream (a new
+                one by default; separate from the one in front of the database)
+            sink: Stream sink the records are published to (by default the
+                one selected by STREAM_SINK; Kinesis over ``kinesis_client``)
+        """
+        if sink is None:
+            sink = create_sink(
+                STREAM_SINK if kinesis_client is None else "kinesis",
+                kinesis_client=kinesis_client,
+                stream_name=KINESIS_STREAM_NAME,
+                region_name=AWS_REGION,
+            )
+        self.sink = sink
+        self.http = http_client or httpx.AsyncClient(
+            headers={"User-Agent": "Financial-Sentiment-Pipeline/1.0"},
+            http2=INGESTION_HTTP2 and _http2_available(),
+            limits=httpx.Limits(
+                max_connections=INGESTION_MAX_CONNECTIONS,
+                max_keepalive_connections=INGESTION_MAX_CONNECTIONS,
+                keepalive_expiry=INGESTION_KEEPALIVE_SECONDS,
+            ),
+            timeout=15,
+        )
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.scheduler = scheduler or quota_scheduler
+        self.watermarks = watermark_store or watermarks
+        self.dedup = deduplicator or ArticleDeduplicator()
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Artículos del ciclo: nuevos, repetidos (no posteriores a la marca o
+        # ya enviados) y enlazados (ya enviados para otro símbolo)
+        self.news_counts = {"new": 0, "duplicate": 0, "linked": 0}
+        self.last_cycle: Dict = {}
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and the stream sink."""
+        await self.http.aclose()
+        await self.sink.flush()
+        self.sink.close()
+
+    async def get_json(
+        self,
+        provider: str,
+        url: str,
+        params: Dict,
+        timeout: float = 15,
+        max_wait: Optional[float] = None,
+    ) -> Optional[Dict]:
+        """
+        GET a JSON document within the provider quota and per-host limit.
+
+        Args:
+            max_wait: Maximum seconds to wait for a quota token (the
+                scheduler's default when None)
+
+        Returns:
+            The decoded payload, or None if the quota is exhausted or the
+            provider throttled the request
+        """
+        if not await self.scheduler.acquire(provider, max_wait):
+            logger.warning(f"{provider} quota exhausted, skipping request")
+            return None
+
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores.setdefault(
+                host, asyncio.Semaphore(self.max_concurrency_per_host)
+            )
+        async with semaphore:
+            response = await self.http.get(url, params=params, timeout=timeout)
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if is_throttled(response.status_code, data):
+            self.scheduler.record_result(
+                provider,
+                throttled=True,
+                retry_after=retry_after_seconds(response.headers),
+            )
+            logger.warning(f"{provider} throttled the request")
+            return None
+        response.raise_for_status()
+        return data
 
     async def fetch_news_data(self, symbol: str) -> List[Dict]:
         """Fetch news data for a given stock symbol using Alpha Vantage News API."""
@@ -201,7 +589,6 @@ class DataIngestionManager:
 
         try:
             # Fetch news from Alpha Vantage News API
-            url = "https://www.alphavantage.co/query"
             params = {
                 "function": "NEWS_SENTIMENT",
                 "tickers": symbol,
@@ -210,50 +597,44 @@ class DataIngestionManager:
                 # Máximo 10 noticias por símbolo para el modo en tiempo real
                 "apikey": ALPHA_VANTAGE_API_KEY,
             }
+            # Solo lo publicado desde la última noticia ingerida, empezando por
+            # lo más antiguo: lo que no quepa en la página llega en el siguiente
+            # ciclo
+            params.update(self.watermarks.request_params("alpha_vantage", symbol))
 
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-
-            data = response.json()
+            data = await self.get_json("alpha_vantage", ALPHA_VANTAGE_URL, params)
+            if data is None:
+                return []
 
             if "feed" in data:
                 articles = data["feed"]
+                unseen, _ = self.watermarks.split_new(
+                    "alpha_vantage",
+                    symbol,
+                    (alpha_vantage_news_item(symbol, article) for article in articles),
+                )
+                # El mismo artículo para otro símbolo se envía como enlace, sin
+                # texto que volver a puntuar
+                new, links = self.dedup.split(unseen)
+                all_news = new + [
+                    {**link, "type": "news_link", "symbol": symbol} for link in links
+                ]
+                duplicates = len(articles) - len(all_news)
+                self.news_counts["new"] += len(new)
+                self.news_counts["linked"] += len(links)
+                self.news_counts["duplicate"] += duplicates
+                self.scheduler.record_result(
+                    "alpha_vantage", symbol, new_items=len(new)
+                )
 
-                for article in articles:
-                    # Alpha Vantage ya proporciona análisis de sentimiento
-                    sentiment_score = float(article.get("overall_sentiment_score", 0))
-                    sentiment_label = article.get("overall_sentiment_label", "neutral")
-
-                    # Convertir label a score si no hay score numérico
-                    if sentiment_score == 0 and sentiment_label:
-                        if sentiment_label.lower() == "positive":
-                            sentiment_score = 0.5
-                        elif sentiment_label.lower() == "negative":
-                            sentiment_score = -0.5
-                        else:
-                            sentiment_score = 0.0
-
-                    news_item = {
-                        "type": "news",
-                        "symbol": symbol,
-                        "company_name": article.get("source", ""),
-                        "title": article.get("title", ""),
-                        "description": article.get("summary", ""),
-                        "content": article.get("summary", ""),
-                        "url": article.get("url", ""),
-                        "source": article.get("source", ""),
-                        "published_at": article.get("time_published", ""),
-                        "ingested_at": datetime.utcnow().isoformat(),
-                        "sentiment_score": sentiment_score,
-                        "sentiment_subjectivity": 0.5,
-                    }
-                    all_news.append(news_item)
-
-                logger.info(f"Fetched {len(articles)} news articles for {symbol}")
+                logger.info(
+                    f"Fetched {len(articles)} news articles for {symbol} "
+                    f"({len(new)} new, {len(links)} linked, {duplicates} duplicate)"
+                )
             else:
                 logger.warning(f"No news data found for {symbol}")
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Request error fetching news for {symbol}: {e}")
         except Exception as e:
             logger.error(f"Unexpected error fetching news for {symbol}: {e}")
@@ -264,17 +645,16 @@ class DataIngestionManager:
         """Fetch stock data for a given symbol using Yahoo Finance."""
         try:
             # Fetch stock data from Yahoo Finance
-            url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
             params = {
                 "interval": "1m",
                 "range": "1d",
                 "includePrePost": "false",
             }
 
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-
-            data = response.json()
+            data = await self.get_json("yahoo", f"{YAHOO_CHART_URL}/{symbol}", params)
+            if data is None:
+                return None
+            self.scheduler.record_result("yahoo", symbol)
 
             if "chart" in data and "result" in data["chart"]:
                 result = data["chart"]["result"][0]
@@ -321,62 +701,130 @@ class DataIngestionManager:
             logger.warning(f"No stock data found for {symbol}")
             return None
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Request error fetching stock data for {symbol}: {e}")
         except Exception as e:
             logger.error(f"Unexpected error fetching stock data for {symbol}: {e}")
 
         return None
 
-    async def send_to_kinesis(self, data: Dict, partition_key: str) -> bool:
-        """Send data to Kinesis Data Stream."""
+    async def send_to_stream(self, data: Dict, partition_key: str) -> bool:
+        """
+        Send a record to the stream sink, partitioned by symbol.
+
+        Records from every symbol are batched by the sink; this waits until
+        the record is accepted (retrying only the records the sink rejected).
+        """
         try:
-            self.kinesis_client.put_record(
-                StreamName=KINESIS_STREAM_NAME,
-                Data=json.dumps(data),
-                PartitionKey=partition_key,
-            )
-            return True
+            return await self.sink.put(data, partition_key)
         except Exception as e:
-            logger.error(f"Error sending to Kinesis: {e}")
+            logger.error(f"Error sending to {self.sink.name}: {e}")
             return False
 
-    async def ingest_data_for_symbol(self, symbol: str) -> None:
+    async def _no_news(self) -> List[Dict]:
+        return []
+
+    async def ingest_data_for_symbol(
+        self, symbol: str, fetch_news: bool = True
+    ) -> None:
         """Ingest data for a specific symbol."""
         logger.info(f"Starting data ingestion for {symbol}")
 
-        # Fetch news data
-        news_items = await self.fetch_news_data(symbol)
-        if news_items:
-            # Send to Kinesis
-            for item in news_items:
-                await self.send_to_kinesis(item, symbol)
+        # News (Alpha Vantage) and prices (Yahoo) come from different hosts
+        news_items, stock_data = await asyncio.gather(
+            self.fetch_news_data(symbol) if fetch_news else self._no_news(),
+            self.fetch_stock_data(symbol),
+        )
 
-        # Fetch stock data
-        stock_data = await self.fetch_stock_data(symbol)
+        # Noticias en orden de publicación: la marca avanza hasta la última
+        # entregada antes del primer envío fallido, para no dejar huecos
+        news_items = sorted(
+            news_items,
+            key=lambda item: parse_published_at(item.get("published_at"))
+            or datetime.min,
+        )
+        records = list(news_items)
         if stock_data:
-            # Send to Kinesis
-            await self.send_to_kinesis(stock_data, symbol)
+            records.append(stock_data)
+        # Send to the stream sink
+        sent = await asyncio.gather(
+            *(self.send_to_stream(record, symbol) for record in records)
+        )
+        delivered = []
+        for item, ok in zip(news_items, sent):
+            if not ok:
+                break
+            delivered.append(item)
+        self.watermarks.advance("alpha_vantage", symbol, delivered)
+        self.dedup.forget(item for item, ok in zip(news_items, sent) if not ok)
 
         logger.info(f"Completed data ingestion for {symbol}")
 
-    async def run_ingestion_cycle(self) -> None:
-        """Run a single ingestion cycle for all symbols."""
-        logger.info("Starting ingestion cycle")
+    async def run_ingestion_cycle(
+        self, symbols: Optional[Sequence[str]] = None
+    ) -> float:
+        """
+        Run a single ingestion cycle for all symbols concurrently.
 
-        start_time = time.time()
+        Concurrency is bounded per API host by ``max_concurrency_per_host``,
+        so the cycle takes roughly ``symbols / limit`` request latencies
+        instead of the sum of every latency.
+
+        Returns:
+            Cycle duration in seconds
+        """
+        symbols = STOCK_SYMBOLS if symbols is None else symbols
+        logger.info(f"Starting ingestion cycle for {len(symbols)} symbols")
 
-        for symbol in STOCK_SYMBOLS:
-            await self.ingest_data_for_symbol(symbol)
+        start_time = time.time()
+        self.news_counts = {"new": 0, "duplicate": 0, "linked": 0}
+        await asyncio.to_thread(self.watermarks.refresh)
+
+        # El presupuesto diario de noticias se reparte entre los símbolos más
+        # desactualizados o con más noticias recientes
+        symbols = self.scheduler.prioritize("yahoo", symbols)
+        news_symbols = set(
+            self.scheduler.prioritize(
+                "alpha_vantage",
+                symbols,
+                limit=self.scheduler.remaining_today("alpha_vantage"),
+            )
+        )
 
-        elapsed_time = time.time() - start_time  # noqa: F841
-        # The original code had a sleep_time variable here, but it's not defined.
-        # Assuming it was intended to be a placeholder or removed.
-        # For now, removing the line as it's not defined.
-        # logger.info(
-        #     f"Ingestion cycle completed in {elapsed_time:.2f}s. "
-        #     f"Sleeping for {sleep_time:.2f}s"
-        # )
+        results = await asyncio.gather(
+            *(
+                self.ingest_data_for_symbol(symbol, symbol in news_symbols)
+                for symbol in symbols
+            ),
+            return_exceptions=True,
+        )
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error ingesting {symbol}: {result}")
+
+        await self.sink.flush()
+        await asyncio.to_thread(self.watermarks.flush)
+
+        elapsed_time = time.time() - start_time
+        self.last_cycle = {
+            "duration_seconds": round(elapsed_time, 3),
+            "symbols": len(symbols),
+            "new_articles": self.news_counts["new"],
+            "duplicate_articles": self.news_counts["duplicate"],
+            "linked_articles": self.news_counts["linked"],
+            "stream": self.sink.stats(),
+        }
+        logger.info(
+            f"Ingestion cycle completed in {elapsed_time:.2f}s "
+            f"for {len(symbols)} symbols; news: {self.news_counts['new']} new, "
+            f"{self.news_counts['linked']} linked, "
+            f"{self.news_counts['duplicate']} duplicate; "
+            f"{self.sink.name} totals: "
+            f"{self.last_cycle['stream'].get('records_sent')} records "
+            f"in {self.last_cycle['stream'].get('batches')} batches; "
+            f"quota usage: {self.scheduler.report()}"
+        )
+        return elapsed_time
 
     async def run_continuous_ingestion(self, interval_minutes: int = 5) -> None:
         """Run continuous data ingestion."""
@@ -396,31 +844,47 @@ class DataIngestionManager:
                 await asyncio.sleep(60)  # Wait 1 minute before retrying
 
 
-def fetch_historic_prices(symbol, months=6):
-    if not ALPHA_VANTAGE_API_KEY:
-        logger.warning(
-            "ALPHA_VANTAGE_API_KEY not configured, skipping stock data ingestion"
+def _get_with_quota(provider: str, url: str, params: Dict, timeout: float):
+    """Blocking GET for the backfill scripts, within the provider quota."""
+    if not quota_scheduler.acquire_blocking(provider):
+        logger.warning(f"{provider} quota exhausted, skipping request")
+        return None
+    response = requests.get(url, params=params, timeout=timeout)
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    if is_throttled(response.status_code, data):
+        quota_scheduler.record_result(
+            provider, throttled=True, retry_after=retry_after_seconds(response.headers)
         )
-        return []
-    url = "https://www.alphavantage.co/query"
-    params = {
-        "function": "TIME_SERIES_DAILY_ADJUSTED",
-        "symbol": symbol,
-        "outputsize": "full",
-        "apikey": ALPHA_VANTAGE_API_KEY,
-    }
-    response = requests.get(url, params=params, timeout=20)
+        logger.warning(f"{provider} throttled the request")
+        return None
     response.raise_for_status()
-    data = response.json()
-    time_series = data.get("Time Series (Daily)", {})
-    if not time_series:
-        logger.warning(f"No price data for {symbol}")
-        return []
-    # Filtrar solo los últimos 'months' meses
-    end_date = datetime.utcnow().date()
-    start_date = end_date - relativedelta(months=months)
+    quota_scheduler.record_result(
+        provider, params.get("symbol") or params.get("tickers")
+    )
+    return data
+
+
+def daily_outputsize(start_date: date, today: Optional[date] = None) -> str:
+    """
+    TIME_SERIES_DAILY_ADJUSTED output size needed to cover ``start_date``.
+
+    ``compact`` returns only the latest 100 trading days; ``full`` returns the
+    whole multi-decade history and is only requested when the range needs it.
+    """
+    today = today or datetime.utcnow().date()
+    compact_from = today - timedelta(days=ALPHA_VANTAGE_COMPACT_DAYS)
+    return "compact" if start_date >= compact_from else "full"
+
+
+def parse_daily_prices(
+    symbol: str, data: Dict, start_date: date, end_date: date
+) -> List[Dict]:
+    """Daily bars of a TIME_SERIES_DAILY_ADJUSTED payload within a date range."""
     prices = []
-    for date_str, values in time_series.items():
+    for date_str, values in data.get("Time Series (Daily)", {}).items():
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
         if start_date <= date_obj <= end_date:
             prices.append(
@@ -434,12 +898,65 @@ def fetch_historic_prices(symbol, months=6):
                     "volume": int(values.get("6. volume", 0)),
                 }
             )
+    return prices
+
+
+def daily_prices_params(symbol: str, start_date: date) -> Dict:
+    """Request parameters for the daily prices of ``symbol`` since a date."""
+    return {
+        "function": "TIME_SERIES_DAILY_ADJUSTED",
+        "symbol": symbol,
+        "outputsize": daily_outputsize(start_date),
+        "apikey": ALPHA_VANTAGE_API_KEY,
+    }
+
+
+def fetch_historic_prices(symbol, months=6):
+    if not ALPHA_VANTAGE_API_KEY:
+        logger.warning(
+            "ALPHA_VANTAGE_API_KEY not configured, skipping stock data ingestion"
+        )
+        return []
+    # Filtrar solo los últimos 'months' meses
+    end_date = datetime.utcnow().date()
+    start_date = end_date - relativedelta(months=months)
+    params = daily_prices_params(symbol, start_date)
+    data = _get_with_quota("alpha_vantage", ALPHA_VANTAGE_URL, params, timeout=20)
+    if data is None:
+        return []
+    if not data.get("Time Series (Daily)"):
+        logger.warning(f"No price data for {symbol}")
+        return []
+    prices = parse_daily_prices(symbol, data, start_date, end_date)
     logger.info(
         f"Fetched {len(prices)} daily prices for {symbol} (last {months} months)"
     )
     return prices
 
 
+def news_params(
+    symbol: str, time_from: datetime, time_to: Optional[datetime] = None, limit=50
+) -> Dict:
+    """
+    NEWS_SENTIMENT request parameters for a time window, oldest first.
+
+    With the default order (LATEST) a full page would skip the older articles
+    of the window, and the watermark would then move past them.
+    """
+    params = {
+        "function": "NEWS_SENTIMENT",
+        "tickers": symbol,
+        "topics": "technology,earnings,ipo,mearnings",
+        "time_from": time_from.strftime(ALPHA_VANTAGE_TIME_FORMAT),
+        "sort": "EARLIEST",
+        "limit": limit,
+        "apikey": ALPHA_VANTAGE_API_KEY,
+    }
+    if time_to is not None:
+        params["time_to"] = time_to.strftime(ALPHA_VANTAGE_TIME_FORMAT)
+    return params
+
+
 def fetch_historic_news(symbol, months=6):
     """Descargar noticias históricas usando Alpha Vantage News API."""
     if not ALPHA_VANTAGE_API_KEY:
@@ -448,56 +965,29 @@ def fetch_historic_news(symbol, months=6):
 
     all_news = []
 
-    # Alpha Vantage News API endpoint
-    url = "https://www.alphavantage.co/query"
-    params = {
-        "function": "NEWS_SENTIMENT",
-        "tickers": symbol,
-        "topics": "technology,earnings,ipo,mearnings",
-        "time_from": "20240101T0000",  # Desde enero 2024
-        "limit": 50,  # Máximo 50 noticias por símbolo
-        "apikey": ALPHA_VANTAGE_API_KEY,
-    }
+    # Alpha Vantage News API endpoint: últimos 'months' meses, máximo 50
+    # noticias por símbolo (las más antiguas), desde la última noticia
+    # ingerida si es posterior; la siguiente ejecución sigue desde ahí
+    time_from = datetime.utcnow() - relativedelta(months=months)
+    mark = watermarks.get("alpha_vantage", symbol)
+    params = news_params(symbol, max(time_from, mark) if mark else time_from)
 
     try:
         logger.info(f"Fetching news for {symbol} using Alpha Vantage...")
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        data = _get_with_quota("alpha_vantage", ALPHA_VANTAGE_URL, params, timeout=30)
+        if data is None:
+            return []
 
         if "feed" in data:
             articles = data["feed"]
             logger.info(f"Found {len(articles)} news articles for {symbol}")
 
-            for article in articles:
-                # Alpha Vantage ya proporciona análisis de sentimiento
-                sentiment_score = float(article.get("overall_sentiment_score", 0))
-                sentiment_label = article.get("overall_sentiment_label", "neutral")
-
-                # Convertir label a score si no hay score numérico
-                if sentiment_score == 0 and sentiment_label:
-                    if sentiment_label.lower() == "positive":
-                        sentiment_score = 0.5
-                    elif sentiment_label.lower() == "negative":
-                        sentiment_score = -0.5
-                    else:
-                        sentiment_score = 0.0
-
-                news_item = {
-                    "type": "news",
-                    "symbol": symbol,
-                    "company_name": article.get("source", ""),
-                    "title": article.get("title", ""),
-                    "description": article.get("summary", ""),
-                    "content": article.get("summary", ""),
-                    "url": article.get("url", ""),
-                    "source": article.get("source", ""),
-                    "published_at": article.get("time_published", ""),
-                    "ingested_at": datetime.utcnow().isoformat(),
-                    "sentiment_score": sentiment_score,
-                    "sentiment_subjectivity": 0.5,
-                }
-                all_news.append(news_item)
+            all_news, duplicates = watermarks.split_new(
+                "alpha_vantage",
+                symbol,
+                (alpha_vantage_news_item(symbol, article) for article in articles),
+            )
+            logger.info(f"Dropped {len(duplicates)} already ingested news for {symbol}")
         else:
             logger.warning(f"No news data found for {symbol}")
 
@@ -511,35 +1001,50 @@ def fetch_historic_news(symbol, months=6):
 
 
 def insert_historic_prices(prices):
-    for item in prices:
-        stock_item = {
-            "symbol": item.get("symbol"),
-            "close": item.get("close"),
-            "high": item.get("high"),
-            "low": item.get("low"),
-            "volume": item.get("volume"),
-            "timestamp": item.get("timestamp"),  # Usar la fecha real del precio
-        }
-        insert_stock_pg(stock_item)
+    return insert_stocks_pg(
+        [
+            {
+                "symbol": item.get("symbol"),
+                "close": item.get("close"),
+                "high": item.get("high"),
+                "low": item.get("low"),
+                "volume": item.get("volume"),
+                "timestamp": item.get("timestamp"),  # Usar la fecha real del precio
+            }
+            for item in prices
+        ]
+    )
 
 
 def insert_historic_news(news):
-    # news: lista de dicts
-    insert_news_pg(news)
+    # news: lista de dicts; una vez escritas, las marcas de agua avanzan
+    if not insert_news_pg(news):
+        return False
+    by_symbol: Dict[str, List[Dict]] = {}
+    for item in news:
+        if item.get("symbol"):
+            by_symbol.setdefault(item["symbol"], []).append(item)
+    for symbol, items in by_symbol.items():
+        watermarks.advance("alpha_vantage", symbol, items)
+    watermarks.flush()
+    return True
 
 
 def fetch_yahoo_prices(symbol, days=30):
+    if not quota_scheduler.acquire_blocking("yahoo"):
+        logger.warning("yahoo quota exhausted, skipping request")
+        return []
     end = datetime.now()
     start = end - timedelta(days=days)
     df = yf.download(
         symbol, start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d")
     )
     prices = []
-    for date, row in df.iterrows():
+    for day, row in df.iterrows():
         prices.append(
             {
                 "symbol": symbol,
-                "timestamp": date.strftime("%Y-%m-%d"),
+                "timestamp": day.strftime("%Y-%m-%d"),
                 "open": float(row["Open"]),
                 "high": float(row["High"]),
                 "low": float(row["Low"]),
@@ -558,36 +1063,29 @@ async def main():
         logger.error()
         return
 
-    if not KINESIS_STREAM_NAME:
+    if STREAM_SINK == "kinesis" and not KINESIS_STREAM_NAME:
         logger.error("[red]Error: KINESIS_STREAM_NAME not configured[/red]")
         return
 
     # Initialize ingestion manager
     ingestion_manager = DataIngestionManager()
+    try:
+        await _run(ingestion_manager)
+    finally:
+        await ingestion_manager.aclose()
 
+
+async def _run(ingestion_manager: DataIngestionManager):
     # Check if running in continuous mode
     if len(sys.argv) > 1 and sys.argv[1] == "--continuous":
         interval = int(sys.argv[2]) if len(sys.argv) > 2 else 5
         await ingestion_manager.run_continuous_ingestion(interval)
     elif len(sys.argv) > 1 and sys.argv[1] == "--historic":
-        months = 6
-        for symbol in STOCK_SYMBOLS:
-            # Precios históricos
-            try:
-                prices = fetch_historic_prices(symbol, months=months)
-                insert_historic_prices(prices)
-            except Exception as e:
-                logger.error(
-                    f"Error fetching/inserting historic prices for {symbol}: {e}"
-                )
-            # Noticias históricas
-            try:
-                news = fetch_historic_news(symbol, months=months)
-                insert_historic_news(news)
-            except Exception as e:
-                logger.error(
-                    f"Error fetching/inserting historic news for {symbol}: {e}"
-                )
+        # Backfill por tareas (símbolo, rango) en paralelo; --resume continúa
+        # la última ejecución desde su fichero de estado
+        from backfill import run_backfill
+
+        await run_backfill(ingestion_manager, months=6, resume="--resume" in sys.argv)
         logger.info("Historic data ingestion completed!")
     else:
         # Run single ingestion cycle
@@ -0,0 +1,256 @@
+"""
+Productor de Kinesis por lotes
+Acumula los registros y los envía con PutRecords (hasta 500 registros o 5 MiB
+por petición) cuando se llena el lote o pasa el tiempo de espera, en lugar de
+un put_record síncrono por registro. Solo se reintentan, con backoff
+exponencial, las entradas que Kinesis rechaza. Opcionalmente agrega registros
+pequeños con la misma clave de partición en uno solo (un sobre JSON
+{"type": "aggregate", "records": [...]}, que el consumidor expande) y comprime
+cada registro con gzip, que el consumidor reconoce por su número mágico.
+
+Es el destino "kinesis" de stream_sinks. MemoryKinesis imita PutRecords en
+memoria (con latencia y fallos parciales configurables) para las pruebas y el
+benchmark sin AWS:
+
+    python -m benchmarks.kinesis_producer --records 20000 --latency-ms 20
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from stream_sinks import (
+    STREAM_COMPRESSION,
+    BatchingSink,
+    StreamRecord,
+    compress,
+    decompress,
+)
+
+logger = logging.getLogger(__name__)
+
+# Límites de PutRecords: registros y bytes por petición, bytes por registro
+KINESIS_MAX_RECORDS_PER_REQUEST = 500
+KINESIS_MAX_BYTES_PER_REQUEST = 5 * 1024 * 1024
+KINESIS_MAX_RECORD_BYTES = 1024 * 1024
+
+KINESIS_BATCH_MAX_RECORDS = int(os.getenv("KINESIS_BATCH_MAX_RECORDS", "500"))
+KINESIS_BATCH_MAX_BYTES = int(
+    os.getenv("KINESIS_BATCH_MAX_BYTES", str(KINESIS_MAX_BYTES_PER_REQUEST))
+)
+# Espera máxima de un registro en el buffer antes de enviar un lote incompleto
+KINESIS_LINGER_SECONDS = float(os.getenv("KINESIS_LINGER_MS", "100")) / 1000
+KINESIS_MAX_RETRIES = int(os.getenv("KINESIS_MAX_RETRIES", "5"))
+KINESIS_MAX_IN_FLIGHT = int(os.getenv("KINESIS_MAX_IN_FLIGHT", "4"))
+KINESIS_AGGREGATE = os.getenv("KINESIS_AGGREGATE", "false").lower() == "true"
+# Tamaño máximo de un registro agregado (el mismo por defecto que la KPL)
+KINESIS_AGGREGATE_MAX_BYTES = int(os.getenv("KINESIS_AGGREGATE_MAX_BYTES", "51200"))
+
+
+def _pack(partition_key: str, entries: List[StreamRecord]) -> StreamRecord:
+    """Un registro agregado con los datos de varios registros"""
+    data = (
+        b'{"type": "aggregate", "records": ['
+        + b", ".join(entry.data for entry in entries)
+        + b"]}"
+    )
+    return StreamRecord(
+        data,
+        partition_key,
+        [future for entry in entries for future in entry.futures],
+        min(entry.enqueued_at for entry in entries),
+    )
+
+
+def _aggregate(entries: List[StreamRecord], max_bytes: int) -> List[StreamRecord]:
+    """Agrupar registros pequeños con la misma clave de partición"""
+    by_key: Dict[str, List[StreamRecord]] = {}
+    for entry in entries:
+        by_key.setdefault(entry.partition_key, []).append(entry)
+
+    aggregated = []
+    for key, group in by_key.items():
+        chunks, chunk, size = [], [], 0
+        for entry in group:
+            if chunk and size + len(entry.data) > max_bytes:
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(entry)
+            size += len(entry.data) + 2
+        chunks.append(chunk)
+        aggregated.extend(
+            chunk[0] if len(chunk) == 1 else _pack(key, chunk) for chunk in chunks
+        )
+    return aggregated
+
+
+class KinesisProducer(BatchingSink):
+    """
+    Envío por lotes a un stream de Kinesis
+
+    Args:
+        client: Cliente de Kinesis (boto3 o MemoryKinesis) con put_records
+        stream_name: Nombre del stream
+        max_batch_records: Registros por PutRecords (máximo 500)
+        max_batch_bytes: Bytes por PutRecords (máximo 5 MiB)
+        linger: Segundos máximos que un registro espera en el buffer
+        max_retries: Reintentos de las entradas rechazadas antes de darlas por
+            fallidas
+        max_in_flight: Peticiones PutRecords simultáneas
+        aggregate: Agregar registros con la misma clave de partición
+        aggregate_max_bytes: Tamaño máximo de un registro agregado
+        compression: Compresión de cada registro ("none" o "gzip")
+    """
+
+    name = "kinesis"
+    max_record_bytes = KINESIS_MAX_RECORD_BYTES
+
+    def __init__(
+        self,
+        client,
+        stream_name: str,
+        max_batch_records: int = KINESIS_BATCH_MAX_RECORDS,
+        max_batch_bytes: int = KINESIS_BATCH_MAX_BYTES,
+        linger: float = KINESIS_LINGER_SECONDS,
+        max_retries: int = KINESIS_MAX_RETRIES,
+        max_in_flight: int = KINESIS_MAX_IN_FLIGHT,
+        aggregate: bool = KINESIS_AGGREGATE,
+        aggregate_max_bytes: int = KINESIS_AGGREGATE_MAX_BYTES,
+        compression: str = STREAM_COMPRESSION,
+    ):
+        super().__init__(
+            max_batch_records=min(max_batch_records, KINESIS_MAX_RECORDS_PER_REQUEST),
+            max_batch_bytes=min(max_batch_bytes, KINESIS_MAX_BYTES_PER_REQUEST),
+            linger=linger,
+            max_retries=max_retries,
+            max_in_flight=max_in_flight,
+            compression=compression,
+        )
+        self.client = client
+        self.stream_name = stream_name
+        self.aggregate = aggregate
+        self.aggregate_max_bytes = aggregate_max_bytes
+        self.metrics["kinesis_records"] = 0
+
+    def _prepare(self, entries: List[StreamRecord]) -> List[StreamRecord]:
+        if self.aggregate:
+            entries = _aggregate(entries, self.aggregate_max_bytes)
+        if self.compression != "none":
+            for entry in entries:
+                entry.data = compress(entry.data, self.compression)
+        return entries
+
+    async def _write(self, entries: List[StreamRecord]) -> List[StreamRecord]:
+        """Una llamada PutRecords; devuelve las entradas rechazadas"""
+        # boto3 es bloqueante: no frenar el bucle de eventos
+        response = await asyncio.to_thread(
+            self.client.put_records,
+            StreamName=self.stream_name,
+            Records=[
+                {"Data": entry.data, "PartitionKey": entry.partition_key}
+                for entry in entries
+            ],
+        )
+        failed = [
+            entry
+            for entry, result in zip(entries, response.get("Records", []))
+            if result.get("ErrorCode")
+        ]
+        rejected = set(map(id, failed))
+        self.metrics["kinesis_records"] += len(entries) - len(failed)
+        self.metrics["bytes_sent"] += sum(
+            len(entry.data) for entry in entries if id(entry) not in rejected
+        )
+        return failed
+
+
+class MemoryKinesis:
+    """
+    Stream de Kinesis en memoria con la interfaz de boto3
+
+    Args:
+        shards: Número de shards (la clave de partición se asigna por MD5)
+        latency: Segundos que tarda cada llamada
+        failure_rate: Probabilidad de rechazar cada entrada con
+            ProvisionedThroughputExceededException
+        seed: Semilla de los fallos simulados
+    """
+
+    def __init__(
+        self,
+        shards: int = 1,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.shards: List[List[Dict]] = [[] for _ in range(shards)]
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _append(self, data, partition_key: str) -> Dict:
+        digest = int(hashlib.md5(partition_key.encode("utf-8")).hexdigest(), 16)
+        shard = digest % len(self.shards)
+        self._sequence += 1
+        self.shards[shard].append(
+            {
+                "Data": data,
+                "PartitionKey": partition_key,
+                "SequenceNumber": str(self._sequence),
+            }
+        )
+        return {
+            "ShardId": f"shardId-{shard:012d}",
+            "SequenceNumber": str(self._sequence),
+        }
+
+    def put_record(self, StreamName: str, Data, PartitionKey: str, **kwargs) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            return self._append(Data, PartitionKey)
+
+    def put_records(self, StreamName: str, Records: List[Dict], **kwargs) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        results, failed = [], 0
+        with self._lock:
+            self.calls += 1
+            for record in Records:
+                if self._random.random() < self.failure_rate:
+                    failed += 1
+                    results.append(
+                        {
+                            "ErrorCode": "ProvisionedThroughputExceededException",
+                            "ErrorMessage": "Rate exceeded for shard",
+                        }
+                    )
+                else:
+                    results.append(self._append(record["Data"], record["PartitionKey"]))
+        return {"FailedRecordCount": failed, "Records": results}
+
+    @property
+    def records(self) -> List[Dict]:
+        """Registros de todos los shards"""
+        return [record for shard in self.shards for record in shard]
+
+    def decoded(self) -> List[Dict]:
+        """Registros decodificados, con los agregados expandidos"""
+        decoded = []
+        for record in self.records:
+            data = json.loads(decompress(record["Data"]))
+            if data.get("type") == "aggregate":
+                decoded.extend(data["records"])
+            else:
+                decoded.append(data)
+        return decoded
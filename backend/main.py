@@ -7,17 +7,29 @@ from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 
 import boto3
-import pandas as pd
-import psycopg2
 from auth import (
     authenticate_user,
     create_access_token,
     get_current_active_user,
     require_role,
 )
+from dashboard_snapshots import DashboardSnapshots
+from db_pool import (
+    DB_CONFIG,
+    DB_POOL_MAX_CONNECTIONS,
+    DB_POOL_RETRY_AFTER_SECONDS,
+    close_pool,
+    get_pool,
+    release_connection,
+)
 from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from health import HealthProber
+from partitions import PARTITION_MAINTENANCE_INTERVAL_SECONDS, run_partition_maintenance
+from psycopg2.pool import PoolError
+from queries import execute_query, fetch_records, query_stats
 from rate_limiting_middleware import create_rate_limiting_middleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -47,6 +59,7 @@ class MetricsCollector:
         self.request_count = 0
         self.error_count = 0
         self.db_connection_errors = 0
+        self.db_pool_exhausted = 0
         self.api_response_times = []
 
     def increment_request(self):
@@ -58,6 +71,9 @@ class MetricsCollector:
     def increment_db_error(self):
         self.db_connection_errors += 1
 
+    def increment_db_pool_exhausted(self):
+        self.db_pool_exhausted += 1
+
     def record_response_time(self, duration):
         self.api_response_times.append(duration)
         if len(self.api_response_times) > 100:  # Mantener solo las últimas 100
@@ -91,6 +107,11 @@ class MetricsCollector:
                         "Value": self.db_connection_errors,
                         "Unit": "Count",
                     },
+                    {
+                        "MetricName": "DBPoolExhausted",
+                        "Value": self.db_pool_exhausted,
+                        "Unit": "Count",
+                    },
                     {
                         "MetricName": "AverageResponseTime",
                         "Value": self.get_avg_response_time(),
@@ -102,12 +123,16 @@ class MetricsCollector:
             self.request_count = 0
             self.error_count = 0
             self.db_connection_errors = 0
+            self.db_pool_exhausted = 0
         except Exception as e:
             logger.error(f"Error sending metrics to CloudWatch: {e}")
 
 
 metrics = MetricsCollector()
 
+# Prober de salud: verifica la base de datos en segundo plano
+health_prober = HealthProber()
+
 # Background task para enviar métricas cada 5 minutos
 
 
@@ -122,9 +147,19 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Financial Sentiment API")
     asyncio.create_task(send_metrics_periodically())
+    health_task = asyncio.create_task(health_prober.run())
+    snapshots_task = asyncio.create_task(dashboard_snapshots.run())
+    partitions_task = None
+    if PARTITION_MAINTENANCE_INTERVAL_SECONDS > 0:
+        partitions_task = asyncio.create_task(run_partition_maintenance())
     yield
     # Shutdown
     logger.info("Shutting down Financial Sentiment API")
+    health_task.cancel()
+    snapshots_task.cancel()
+    if partitions_task is not None:
+        partitions_task.cancel()
+    close_pool()
 
 
 app = FastAPI(
@@ -213,22 +248,40 @@ app.add_middleware(
 rate_limiting_middleware = create_rate_limiting_middleware(limiter)
 app.middleware("http")(rate_limiting_middleware)
 
-# Configuración de la base de datos desde variables de entorno
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "postgres"),
-    "database": os.getenv("DB_NAME", "financial_sentiment"),
-    "user": os.getenv("DB_USER", "postgres"),
-    "password": os.getenv("DB_PASSWORD", "password"),
-    "port": int(os.getenv("DB_PORT", "5432")),
-}
-
 
 def get_db_connection():
-    """Crear conexión a PostgreSQL"""
+    """
+    Obtener una conexión a PostgreSQL del pool
+
+    Returns:
+        Conexión del pool, o None si la base de datos no está disponible (los
+        endpoints sirven entonces datos de ejemplo)
+
+    Raises:
+        HTTPException: 503 si el pool no tiene conexiones libres: la base de
+            datos está disponible, así que no se sirven datos de ejemplo
+    """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        logger.debug("Database connection established successfully")
+        conn = get_pool().getconn()
+        logger.debug("Database connection acquired from pool")
         return conn
+    except PoolError as e:
+        # Todas las conexiones están prestadas: no es una caída de la base.
+        # No se espera a que se libere una, porque los endpoints son async y
+        # la espera bloquearía el event loop
+        logger.warning(
+            f"Database pool exhausted: {str(e)}",
+            extra={
+                "error_type": "database_pool_exhausted",
+                "pool_max_connections": DB_POOL_MAX_CONNECTIONS,
+            },
+        )
+        metrics.increment_db_pool_exhausted()
+        raise HTTPException(
+            status_code=503,
+            detail="Database connection pool exhausted",
+            headers={"Retry-After": str(DB_POOL_RETRY_AFTER_SECONDS)},
+        )
     except Exception as e:
         logger.error(
             f"Database connection error: {str(e)}",
@@ -243,6 +296,11 @@ def get_db_connection():
         return None
 
 
+def release_db_connection(conn):
+    """Devolver la conexión al pool"""
+    release_connection(conn)
+
+
 @app.get("/")
 async def root():
     """Endpoint raíz"""
@@ -305,40 +363,39 @@ async def admin_route(current_user=Depends(require_role("admin"))):
 
 @app.get("/health")
 async def health_check():
-    """Verificar estado de la API y base de datos"""
-    try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.close()
-            conn.close()
-            logger.info("Health check passed - database connected")
-            return {
-                "status": "healthy",
-                "database": "connected",
-                "timestamp": datetime.now().isoformat(),
-                "version": "1.0.0",
-            }
-        else:
-            logger.warning("Health check - database disconnected, using sample data")
-            return {
-                "status": "healthy",
-                "database": "disconnected",
-                "message": "Using sample data",
-                "timestamp": datetime.now().isoformat(),
-                "version": "1.0.0",
-            }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "message": "Using sample data",
-            "error": str(e),
+    """Estado de la API y de la base de datos según el último check en cache"""
+    health = health_prober.snapshot()
+    response = {
+        "status": "healthy",
+        **health,
+        "timestamp": datetime.now().isoformat(),
+        "version": "1.0.0",
+    }
+    if not health_prober.database_connected:
+        response["message"] = "Using sample data"
+        if health_prober.last_error:
+            response["error"] = health_prober.last_error
+    return response
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: el proceso responde (no toca la base de datos)"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: el último check de la base de datos es reciente y exitoso"""
+    ready = health_prober.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            **health_prober.snapshot(),
             "timestamp": datetime.now().isoformat(),
-            "version": "1.0.0",
-        }
+        },
+    )
 
 
 @app.get("/metrics")
@@ -349,8 +406,11 @@ async def get_metrics(request: Request):
         "request_count": metrics.request_count,
         "error_count": metrics.error_count,
         "db_connection_errors": metrics.db_connection_errors,
+        "db_pool_exhausted": metrics.db_pool_exhausted,
         "average_response_time_ms": round(metrics.get_avg_response_time(), 2),
         "uptime": "TODO: Implement uptime tracking",
+        "dashboard_snapshots": dashboard_snapshots.stats(),
+        "queries": query_stats(),
         "timestamp": datetime.now().isoformat(),
     }
 
@@ -374,10 +434,45 @@ async def get_rate_limit_status(request: Request):
     }
 
 
+def build_sentiment_summary(conn, hours: int):
+    """Calcular el resumen de sentimiento de las últimas N horas"""
+    cursor = execute_query(conn, "sentiment_summary", (hours,))
+    results = cursor.fetchall()
+
+    summary = []
+    total_records = 0
+
+    for row in results:
+        sentiment_category, count, avg_score, avg_subjectivity = row
+        summary.append(
+            {
+                "sentiment_category": sentiment_category,
+                "count": count,
+                "avg_score": float(avg_score) if avg_score else 0,
+                "avg_subjectivity": (
+                    float(avg_subjectivity) if avg_subjectivity else 0
+                ),
+            }
+        )
+        total_records += count
+
+    cursor.close()
+
+    return {
+        "summary": summary,
+        "total_records": total_records,
+        "time_range_hours": hours,
+    }
+
+
 @app.get("/api/sentiment/summary")
 @limiter.limit("60/minute")  # Máximo 60 requests por minuto
 async def get_sentiment_summary(request: Request, hours: int = 24):
     """Obtener resumen de sentimiento de las últimas N horas"""
+    snapshot = dashboard_snapshots.get("summary", hours)
+    if snapshot is not None:
+        return snapshot
+
     try:
         conn = get_db_connection()
         if not conn:
@@ -407,63 +502,19 @@ async def get_sentiment_summary(request: Request, hours: int = 24):
                 "time_range_hours": hours,
             }
 
-        # Query mejorada para obtener datos reales
-        query = """
-        SELECT
-            CASE
-                WHEN avg_sentiment_score > 0.1 THEN 'Positive'
-                WHEN avg_sentiment_score < -0.1 THEN 'Negative'
-                ELSE 'Neutral'
-            END as sentiment_category,
-            COUNT(*) as count,
-            AVG(avg_sentiment_score) as avg_score,
-            AVG(avg_sentiment_subjectivity) as avg_subjectivity
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL %s hours
-            AND avg_sentiment_score IS NOT NULL
-        GROUP BY
-            CASE
-                WHEN avg_sentiment_score > 0.1 THEN 'Positive'
-                WHEN avg_sentiment_score < -0.1 THEN 'Negative'
-                ELSE 'Neutral'
-            END
-        ORDER BY count DESC
-        """
-
-        cursor = conn.cursor()
-        cursor.execute(query, (hours,))
-        results = cursor.fetchall()
-
-        summary = []
-        total_records = 0
-
-        for row in results:
-            sentiment_category, count, avg_score, avg_subjectivity = row
-            summary.append(
-                {
-                    "sentiment_category": sentiment_category,
-                    "count": count,
-                    "avg_score": float(avg_score) if avg_score else 0,
-                    "avg_subjectivity": (
-                        float(avg_subjectivity) if avg_subjectivity else 0
-                    ),
-                }
-            )
-            total_records += count
-
-        cursor.close()
-        conn.close()
+        try:
+            payload = build_sentiment_summary(conn, hours)
+        finally:
+            release_db_connection(conn)
 
         logger.info(
-            f"Retrieved sentiment summary: {len(summary)} categories, "
-            f"{total_records} total records"
+            f"Retrieved sentiment summary: {len(payload['summary'])} categories, "
+            f"{payload['total_records']} total records"
         )
 
-        return {
-            "summary": summary,
-            "total_records": total_records,
-            "time_range_hours": hours,
-        }
+        return payload
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in sentiment summary: {str(e)}")
         # Datos de ejemplo en caso de error
@@ -493,12 +544,31 @@ async def get_sentiment_summary(request: Request, hours: int = 24):
         }
 
 
+def build_sentiment_timeline(conn, hours: int, interval: str = "hour"):
+    """Calcular la línea de tiempo de sentimiento de las últimas N horas"""
+    query_name = (
+        "sentiment_timeline_day" if interval == "day" else "sentiment_timeline_hour"
+    )
+    timeline = fetch_records(conn, query_name, (hours,))
+
+    return {
+        "timeline": timeline,
+        "interval": interval,
+        "time_range_hours": hours,
+    }
+
+
 @app.get("/api/sentiment/timeline")
 @limiter.limit("60/minute")  # Máximo 60 requests por minuto
 async def get_sentiment_timeline(
     request: Request, hours: int = 24, interval: str = "hour"
 ):
     """Obtener línea de tiempo de sentimiento"""
+    if interval == "hour":
+        snapshot = dashboard_snapshots.get("timeline", hours)
+        if snapshot is not None:
+            return snapshot
+
     try:
         conn = get_db_connection()
         if not conn:
@@ -531,34 +601,14 @@ async def get_sentiment_timeline(
                 "time_range_hours": hours,
             }
 
-        if interval == "hour":
-            group_by = "DATE_TRUNC('hour', hour)"
-        elif interval == "day":
-            group_by = "DATE_TRUNC('day', hour)"
-        else:
-            group_by = "DATE_TRUNC('hour', hour)"
-
-        query = f"""
-        SELECT
-            {group_by} as time_period,
-            AVG(avg_sentiment_score) as sentiment_score,
-            AVG(avg_close_price) as avg_price,
-            COUNT(*) as news_count,
-            SUM(total_volume) as total_volume
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL '{hours} hours'
-        GROUP BY {group_by}
-        ORDER BY time_period DESC
-        """
-
-        df = pd.read_sql_query(query, conn, params=[hours])
-        conn.close()
+        try:
+            payload = build_sentiment_timeline(conn, hours, interval)
+        finally:
+            release_db_connection(conn)
 
-        return {
-            "timeline": df.to_dict("records"),
-            "interval": interval,
-            "time_range_hours": hours,
-        }
+        return payload
+    except HTTPException:
+        raise
     except Exception:
         # Datos de ejemplo en caso de error
         return {
@@ -625,27 +675,17 @@ async def get_correlation_analysis(request: Request, hours: int = 24):
                 "time_range_hours": hours,
             }
 
-        query = """
-        SELECT
-            sentiment_category,
-            AVG(price_change_percent) as avg_price_change,
-            AVG(sentiment_change) as avg_sentiment_change,
-            COUNT(*) as data_points,
-            CORR(avg_sentiment_score, avg_close_price) as correlation_coefficient
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL '{hours} hours'
-            AND price_change_percent IS NOT NULL
-        GROUP BY sentiment_category
-        ORDER BY avg_price_change DESC
-        """
-
-        df = pd.read_sql_query(query, conn, params=[hours])
-        conn.close()
+        try:
+            correlation_analysis = fetch_records(conn, "correlation_analysis", (hours,))
+        finally:
+            release_db_connection(conn)
 
         return {
-            "correlation_analysis": df.to_dict("records"),
+            "correlation_analysis": correlation_analysis,
             "time_range_hours": hours,
         }
+    except HTTPException:
+        raise
     except Exception:
         # Datos de ejemplo en caso de error
         return {
@@ -714,24 +754,14 @@ async def get_stock_prices(request: Request, hours: int = 24):
                 "time_range_hours": hours,
             }
 
-        query = """
-        SELECT
-            hour,
-            avg_close_price,
-            max_high_price,
-            min_low_price,
-            total_volume,
-            price_points
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL '{hours} hours'
-            AND avg_close_price IS NOT NULL
-        ORDER BY hour DESC
-        """
-
-        df = pd.read_sql_query(query, conn, params=[hours])
-        conn.close()
-
-        return {"stock_prices": df.to_dict("records"), "time_range_hours": hours}
+        try:
+            stock_prices = fetch_records(conn, "stock_prices", (hours,))
+        finally:
+            release_db_connection(conn)
+
+        return {"stock_prices": stock_prices, "time_range_hours": hours}
+    except HTTPException:
+        raise
     except Exception:
         # Datos de ejemplo en caso de error
         return {
@@ -802,26 +832,12 @@ async def get_latest_news(request: Request, limit: int = 10):
                 "total_count": 2,
             }
 
-        # Query mejorada para obtener noticias reales
-        query = """
-        SELECT
-            title,
-            description,
-            url,
-            published_at,
-            COALESCE(source_name, 'Unknown') as source_name,
-            sentiment_score,
-            sentiment_subjectivity,
-            symbol
-        FROM news_with_sentiment
-        WHERE published_at IS NOT NULL
-        ORDER BY published_at DESC
-        LIMIT %s
-        """
-
-        cursor = conn.cursor()
-        cursor.execute(query, (limit,))
-        results = cursor.fetchall()
+        try:
+            cursor = execute_query(conn, "latest_news", (limit,))
+            results = cursor.fetchall()
+            cursor.close()
+        finally:
+            release_db_connection(conn)
 
         news = []
         for row in results:
@@ -850,12 +866,11 @@ async def get_latest_news(request: Request, limit: int = 10):
                 }
             )
 
-        cursor.close()
-        conn.close()
-
         logger.info(f"Retrieved {len(news)} latest news articles")
 
         return {"news": news, "total_count": len(news)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in latest news: {str(e)}")
         # Datos de ejemplo en caso de error
@@ -897,32 +912,84 @@ async def test_database():
         if not conn:
             return {"error": "No database connection"}
 
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM financial_sentiment_correlation")
-        total_count = cursor.fetchone()[0]
-
-        cursor.execute(
-            "SELECT COUNT(*) FROM financial_sentiment_correlation "
-            "WHERE hour >= NOW() - INTERVAL '720 HOUR'"
-        )
-        recent_count = cursor.fetchone()[0]
+        try:
+            cursor = execute_query(conn, "count_records")
+            total_count = cursor.fetchone()[0]
+            cursor.close()
 
-        cursor.close()
-        conn.close()
+            cursor = execute_query(conn, "count_recent_records", (720,))
+            recent_count = cursor.fetchone()[0]
+            cursor.close()
+        finally:
+            release_db_connection(conn)
 
         return {
             "total_records": total_count,
             "recent_records": recent_count,
             "connection": "success",
         }
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
 
+def build_dashboard_stats(conn, hours: int):
+    """Calcular estadísticas generales y distribución de sentimiento"""
+    cursor = execute_query(conn, "dashboard_general_stats", (hours,))
+    stats_row = cursor.fetchone()
+    cursor.close()
+
+    if stats_row:
+        (
+            total_records,
+            overall_sentiment,
+            avg_stock_price,
+            latest_data_time,
+        ) = stats_row
+    else:
+        total_records, overall_sentiment, avg_stock_price, latest_data_time = (
+            0,
+            0,
+            0,
+            None,
+        )
+        logger.warning("Query returned no results")
+
+    # Distribución de sentimiento
+    cursor = execute_query(conn, "dashboard_sentiment_distribution", (hours,))
+    dist_results = cursor.fetchall()
+
+    sentiment_distribution = []
+    for row in dist_results:
+        sentiment_category, count = row
+        sentiment_distribution.append(
+            {"sentiment_category": sentiment_category, "count": count}
+        )
+
+    cursor.close()
+
+    return {
+        "general_stats": {
+            "total_records": int(total_records) if total_records else 0,
+            "overall_sentiment": (float(overall_sentiment) if overall_sentiment else 0),
+            "avg_stock_price": float(avg_stock_price) if avg_stock_price else 0,
+            "latest_data_time": (
+                latest_data_time.isoformat() if latest_data_time else None
+            ),
+        },
+        "sentiment_distribution": sentiment_distribution,
+    }
+
+
 @app.get("/api/dashboard/stats")
 @limiter.limit("30/minute")  # Máximo 30 requests por minuto (más restrictivo)
 async def get_dashboard_stats(request: Request, hours: int = 8760):
     """Obtener estadísticas generales del dashboard"""
+    snapshot = dashboard_snapshots.get("stats", hours)
+    if snapshot is not None:
+        return snapshot
+
     try:
         conn = get_db_connection()
         if not conn:
@@ -940,97 +1007,21 @@ async def get_dashboard_stats(request: Request, hours: int = 8760):
                 ],
             }
 
-        # Usar cursor directo en lugar de pandas para evitar problemas con intervalos
-        cursor = conn.cursor()
-
-        # Debug: verificar la query que se está ejecutando
-        stats_query = f"""
-        SELECT
-            COUNT(*) as total_records,
-            AVG(avg_sentiment_score) as overall_sentiment,
-            AVG(avg_close_price) as avg_stock_price,
-            MAX(hour) as latest_data_time
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL '{hours} hours'
-        """
-        logger.info(f"Executing query: {stats_query}")
-        cursor.execute(stats_query)
-        stats_row = cursor.fetchone()
-
-        logger.info(f"Query result: {stats_row}")
-
-        # Debug adicional: verificar el tipo de datos
-        if stats_row:
-            (
-                total_records,
-                overall_sentiment,
-                avg_stock_price,
-                latest_data_time,
-            ) = stats_row
-            logger.info(
-                f"Parsed values - total_records: {total_records} "
-                f"(type: {type(total_records)})"
-            )
-            logger.info(
-                f"Parsed values - overall_sentiment: {overall_sentiment} "
-                f"(type: {type(overall_sentiment)})"
-            )
-            logger.info(
-                f"Parsed values - avg_stock_price: {avg_stock_price} "
-                f"(type: {type(avg_stock_price)})"
-            )
-            logger.info(
-                f"Parsed values - latest_data_time: {latest_data_time} "
-                f"(type: {type(latest_data_time)})"
-            )
-        else:
-            total_records, overall_sentiment, avg_stock_price, latest_data_time = (
-                0,
-                0,
-                0,
-                None,
-            )
-            logger.warning("Query returned no results")
-
-        # Distribución de sentimiento
-        dist_query = f"""
-        SELECT sentiment_category, COUNT(*) as count
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL '{hours} hours'
-        GROUP BY sentiment_category
-        ORDER BY count DESC
-        """
-        cursor.execute(dist_query)
-        dist_results = cursor.fetchall()
-
-        sentiment_distribution = []
-        for row in dist_results:
-            sentiment_category, count = row
-            sentiment_distribution.append(
-                {"sentiment_category": sentiment_category, "count": count}
-            )
-
-        cursor.close()
-        conn.close()
+        try:
+            payload = build_dashboard_stats(conn, hours)
+        finally:
+            release_db_connection(conn)
 
+        general_stats = payload["general_stats"]
         logger.info(
-            f"Dashboard stats: {total_records} records, "
-            f"sentiment: {overall_sentiment}, price: {avg_stock_price}"
+            f"Dashboard stats: {general_stats['total_records']} records, "
+            f"sentiment: {general_stats['overall_sentiment']}, "
+            f"price: {general_stats['avg_stock_price']}"
         )
 
-        return {
-            "general_stats": {
-                "total_records": int(total_records) if total_records else 0,
-                "overall_sentiment": (
-                    float(overall_sentiment) if overall_sentiment else 0
-                ),
-                "avg_stock_price": float(avg_stock_price) if avg_stock_price else 0,
-                "latest_data_time": (
-                    latest_data_time.isoformat() if latest_data_time else None
-                ),
-            },
-            "sentiment_distribution": sentiment_distribution,
-        }
+        return payload
+    except HTTPException:
+        raise
     except Exception:
         logger.error("Error in dashboard stats")
         return {
@@ -1070,24 +1061,17 @@ async def get_sentiment_summary_by_symbol(hours: int = 24):
                 "total_records": 13,
                 "time_range_hours": hours,
             }
-        query = """
-        SELECT
-            symbol,
-            AVG(sentiment_score) as avg_sentiment,
-            AVG(sentiment_subjectivity) as avg_subjectivity,
-            COUNT(*) as news_count
-        FROM news_with_sentiment
-        WHERE published_at >= NOW() - INTERVAL '{hours} hours'
-        GROUP BY symbol
-        ORDER BY news_count DESC
-        """
-        df = pd.read_sql_query(query, conn, params=[hours])  # type: ign
-        conn.close()
+        try:
+            summary = fetch_records(conn, "sentiment_summary_by_symbol", (hours,))
+        finally:
+            release_db_connection(conn)
         return {
-            "summary": df.to_dict("records"),
-            "total_records": len(df),
+            "summary": summary,
+            "total_records": len(summary),
             "time_range_hours": hours,
         }
+    except HTTPException:
+        raise
     except Exception:
         return {
             "summary": [
@@ -1137,22 +1121,13 @@ async def get_stock_prices_by_symbol(hours: int = 24):
                 ],
                 "time_range_hours": hours,
             }
-        query = """
-        SELECT
-            symbol,
-            hour,
-            avg_close_price as close,
-            max_high_price as high,
-            min_low_price as low,
-            total_volume as volume
-        FROM financial_sentiment_correlation
-        WHERE hour >= NOW() - INTERVAL '{hours} hours'
-            AND symbol IS NOT NULL
-        ORDER BY symbol, hour DESC
-        """
-        df = pd.read_sql_query(query, conn, params=[hours])
-        conn.close()
-        return {"stock_prices": df.to_dict("records"), "time_range_hours": hours}
+        try:
+            stock_prices = fetch_records(conn, "stock_prices_by_symbol", (hours,))
+        finally:
+            release_db_connection(conn)
+        return {"stock_prices": stock_prices, "time_range_hours": hours}
+    except HTTPException:
+        raise
     except Exception:
         return {
             "stock_prices": [
@@ -1177,6 +1152,16 @@ async def get_stock_prices_by_symbol(hours: int = 24):
         }
 
 
+# Snapshots precalculados para los rangos fijos que usa el frontend
+dashboard_snapshots = DashboardSnapshots(
+    builders={
+        "stats": build_dashboard_stats,
+        "summary": build_sentiment_summary,
+        "timeline": build_sentiment_timeline,
+    }
+)
+
+
 if __name__ == "__main__":
     import uvicorn
 
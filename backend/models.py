@@ -1,16 +1,24 @@
 import os
 from datetime import datetime
 
+from article_dedup import ARTICLE_KEY_SQL
 from sqlalchemy import (
     Boolean,
     Column,
+    Computed,
     DateTime,
     Float,
+    Index,
     Integer,
+    Sequence,
     String,
     Text,
+    UniqueConstraint,
     create_engine,
+    func,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -39,9 +47,41 @@ class FinancialSentimentCorrelation(Base):
     """Modelo para la tabla de correlación financiera-sentimiento"""
 
     __tablename__ = "financial_sentiment_correlation"
+    # Índices según los accesos de la API (migración 3b7e9c2d4f10)
+    __table_args__ = (
+        Index(
+            "ix_financial_sentiment_correlation_hour_covering",
+            "hour",
+            postgresql_include=[
+                "sentiment_category",
+                "avg_sentiment_score",
+                "avg_sentiment_subjectivity",
+                "avg_close_price",
+                "total_volume",
+            ],
+        ),
+        Index(
+            "ix_financial_sentiment_correlation_symbol_hour",
+            "symbol",
+            text("hour DESC"),
+        ),
+        Index(
+            "ix_financial_sentiment_correlation_hour_brin",
+            "hour",
+            postgresql_using="brin",
+        ),
+        # Una fila por símbolo y hora: clave de los upserts (migración
+        # 5f2d8b1c7a94)
+        UniqueConstraint(
+            "symbol", "hour", name="uq_financial_sentiment_correlation_symbol_hour"
+        ),
+        # Particiones mensuales (migración 8d41f6a2c9e3, mantenidas por
+        # partitions.py); la clave primaria debe incluir la columna de partición
+        {"postgresql_partition_by": "RANGE (hour)"},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    hour = Column(DateTime, nullable=False, index=True)
+    hour = Column(DateTime, primary_key=True)
     symbol = Column(String(10), nullable=True, index=True)
     avg_sentiment_score = Column(Float, nullable=True)
     avg_sentiment_subjectivity = Column(Float, nullable=True)
@@ -50,6 +90,9 @@ class FinancialSentimentCorrelation(Base):
     min_low_price = Column(Float, nullable=True)
     total_volume = Column(Integer, nullable=True)
     price_points = Column(Integer, nullable=True)
+    # Barras de precio de la hora por timestamp, de las que se recalculan los
+    # agregados en cada upsert (migración e2b7d5a9c3f1)
+    price_bars = Column(JSONB, nullable=True)
     news_count = Column(Integer, nullable=True)
     sentiment_category = Column(String(20), nullable=True)
     price_change_percent = Column(Float, nullable=True)
@@ -63,24 +106,82 @@ class NewsWithSentiment(Base):
     """Modelo para la tabla de noticias con sentimiento"""
 
     __tablename__ = "news_with_sentiment"
+    __table_args__ = (
+        Index(
+            "ix_news_with_sentiment_published_at_recent",
+            text("published_at DESC"),
+            postgresql_include=["symbol", "sentiment_score", "sentiment_subjectivity"],
+            postgresql_where=text("published_at IS NOT NULL"),
+        ),
+        Index(
+            "ix_news_with_sentiment_symbol_published_at",
+            "symbol",
+            "published_at",
+            postgresql_include=["sentiment_score", "sentiment_subjectivity"],
+        ),
+        Index(
+            "ix_news_with_sentiment_symbol_published_hour",
+            "symbol",
+            func.date_trunc("hour", text("published_at")),
+        ),
+        Index(
+            "ix_news_with_sentiment_published_at_brin",
+            "published_at",
+            postgresql_using="brin",
+        ),
+        Index("ix_news_with_sentiment_symbols", "symbols", postgresql_using="gin"),
+        # Un artículo por URL normalizada (o texto) y fecha; incluye la columna
+        # de partición, como exige una tabla particionada
+        UniqueConstraint(
+            "article_key",
+            "published_at",
+            name="uq_news_with_sentiment_article_key_published_at",
+        ),
+        {"postgresql_partition_by": "RANGE (published_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # published_at admite NULL y no puede ir en una clave primaria de una tabla
+    # particionada: id es clave solo a nivel del ORM (valores de secuencia)
+    id = Column(
+        Integer,
+        Sequence("news_with_sentiment_id_seq"),
+        nullable=False,
+        index=True,
+    )
     title = Column(Text, nullable=False)
     description = Column(Text, nullable=True)
     url = Column(Text, nullable=True)
-    published_at = Column(DateTime, nullable=True, index=True)
+    published_at = Column(DateTime, nullable=True)
     source_name = Column(String(100), nullable=True)
     sentiment_score = Column(Float, nullable=True)
     sentiment_subjectivity = Column(Float, nullable=True)
     symbol = Column(String(10), nullable=True, index=True)
+    # Todos los símbolos a los que se ha enlazado el artículo (symbol es el
+    # primero); NULL en filas de escritores que no lo rellenan
+    symbols = Column(ARRAY(String(10)), nullable=True)
+    article_key = Column(String(32), Computed(ARTICLE_KEY_SQL, persisted=True))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __mapper_args__ = {"primary_key": [id]}
+
 
 class StockPrices(Base):
     """Modelo para la tabla de precios de acciones"""
 
     __tablename__ = "stock_prices"
+    __table_args__ = (
+        Index(
+            "ix_stock_prices_symbol_timestamp_hour",
+            "symbol",
+            func.date_trunc("hour", text('"timestamp"')),
+        ),
+        Index(
+            "ix_stock_prices_timestamp_brin",
+            "timestamp",
+            postgresql_using="brin",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String(10), nullable=False, index=True)
@@ -109,6 +210,38 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class IngestionWatermark(Base):
+    """Última fecha de publicación vista por proveedor de noticias y símbolo"""
+
+    __tablename__ = "ingestion_watermarks"
+
+    provider = Column(String(32), primary_key=True)
+    symbol = Column(String(10), primary_key=True)
+    last_published_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SentimentMemoEntry(Base):
+    """Puntuación de sentimiento de un texto con una versión del analizador"""
+
+    __tablename__ = "sentiment_memo"
+
+    version = Column(Text, primary_key=True)
+    text_key = Column(Text, primary_key=True)
+    polarity = Column(Float, nullable=False)
+    subjectivity = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SentimentMemoVersion(Base):
+    """Último uso de cada versión del analizador en sentiment_memo"""
+
+    __tablename__ = "sentiment_memo_versions"
+
+    version = Column(Text, primary_key=True)
+    last_used_at = Column(DateTime, nullable=False)
+
+
 # Función para obtener la sesión de la base de datos
 def get_db():
     db = SessionLocal()
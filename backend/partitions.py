@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de particiones mensuales
+Crea por adelantado las particiones de los próximos meses y aplica la política
+de retención separando (DETACH) o eliminando particiones antiguas en O(1)
+
+Uso:
+    python partitions.py                      # crear particiones futuras
+    python partitions.py --retention-months 24 --drop
+    python partitions.py --since 2023-01      # particiones para un backfill
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from db_pool import pooled_connection
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+# Tablas particionadas por rango mensual y su columna de partición
+PARTITIONED_TABLES = {
+    "financial_sentiment_correlation": "hour",
+    "news_with_sentiment": "published_at",
+}
+
+# Meses futuros que deben existir siempre (las inserciones nunca caen en la
+# partición por defecto salvo filas sin fecha o muy antiguas)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+# Meses de historia que se conservan; 0 desactiva la retención
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+
+# Cada cuánto la API crea particiones futuras; 0 lo desactiva
+PARTITION_MAINTENANCE_INTERVAL_SECONDS = float(
+    os.getenv("PARTITION_MAINTENANCE_INTERVAL_SECONDS", "86400")
+)
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(value) -> date:
+    """Primer día del mes de una fecha"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """Sumar (o restar) meses a un primer día de mes"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Nombre de la partición de un mes, p.ej. news_with_sentiment_p202401"""
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    """Partición por defecto (filas sin fecha o fuera de rango)"""
+    return f"{table}_default"
+
+
+def list_partitions(conn, table: str) -> Dict[date, str]:
+    """
+    Particiones mensuales adjuntas a una tabla
+
+    Returns:
+        Diccionario {primer día del mes: nombre de la partición}
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        (table,),
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = _PARTITION_SUFFIX.search(name)
+        if match and name.startswith(table):
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    cursor.close()
+    return partitions
+
+
+def _stored_columns(conn, table: str) -> List[str]:
+    """Columnas de una tabla que admiten valores (todas salvo las generadas)"""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0
+          AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+        """,
+        (table,),
+    )
+    columns = [name for (name,) in cursor.fetchall()]
+    cursor.close()
+    return columns
+
+
+def create_partition(conn, table: str, month: date) -> str:
+    """
+    Crear la partición de un mes
+
+    Si la partición por defecto ya tiene filas de ese mes (p.ej. de un
+    backfill), se trasladan a la nueva partición antes de adjuntarla.
+    """
+    column = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    lower, upper = month, add_months(month, 1)
+    params = {"lower": lower, "upper": upper}
+    ident = {
+        "table": sql.Identifier(table),
+        "partition": sql.Identifier(name),
+        "default": sql.Identifier(default_partition_name(table)),
+        "column": sql.Identifier(column),
+    }
+
+    cursor = conn.cursor()
+    cursor.execute(
+        sql.SQL(
+            "SELECT EXISTS (SELECT 1 FROM {default} "
+            "WHERE {column} >= %(lower)s AND {column} < %(upper)s)"
+        ).format(**ident),
+        params,
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            sql.SQL(
+                "CREATE TABLE {partition} PARTITION OF {table} "
+                "FOR VALUES FROM (%(lower)s) TO (%(upper)s)"
+            ).format(**ident),
+            params,
+        )
+    else:
+        # Las columnas generadas (article_key) se recalculan al copiar
+        ident["columns"] = sql.SQL(", ").join(
+            map(sql.Identifier, _stored_columns(conn, table))
+        )
+        for statement in (
+            "CREATE TABLE {partition} "
+            "(LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED)",
+            "INSERT INTO {partition} ({columns}) SELECT {columns} FROM {default} "
+            "WHERE {column} >= %(lower)s AND {column} < %(upper)s",
+            "DELETE FROM {default} "
+            "WHERE {column} >= %(lower)s AND {column} < %(upper)s",
+            "ALTER TABLE {table} ATTACH PARTITION {partition} "
+            "FOR VALUES FROM (%(lower)s) TO (%(upper)s)",
+        ):
+            cursor.execute(sql.SQL(statement).format(**ident), params)
+        logger.info(f"Moved {month:%Y-%m} rows from default partition into {name}")
+    cursor.close()
+    return name
+
+
+def ensure_partitions(
+    conn,
+    table: str,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    since: Optional[date] = None,
+    today: Optional[date] = None,
+) -> List[str]:
+    """
+    Crear las particiones que falten desde `since` (o el mes actual) hasta
+    `months_ahead` meses en el futuro
+
+    Returns:
+        Nombres de las particiones creadas
+    """
+    current = month_start(today or date.today())
+    month = month_start(since) if since else current
+    last = add_months(current, months_ahead)
+    existing = list_partitions(conn, table)
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(conn, table, month))
+        month = add_months(month, 1)
+    conn.commit()
+    return created
+
+
+def apply_retention(
+    conn,
+    table: str,
+    retention_months: int,
+    drop: bool = False,
+    today: Optional[date] = None,
+) -> List[str]:
+    """
+    Separar (y opcionalmente eliminar) las particiones fuera de la retención
+
+    Separar una partición es una operación de catálogo: no borra filas una a
+    una ni genera trabajo de VACUUM sobre la tabla.
+
+    Returns:
+        Nombres de las particiones separadas
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    cursor = conn.cursor()
+    expired = []
+    for month, name in sorted(list_partitions(conn, table).items()):
+        if month >= cutoff:
+            continue
+        cursor.execute(
+            sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                sql.Identifier(table), sql.Identifier(name)
+            )
+        )
+        if drop:
+            cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        expired.append(name)
+    conn.commit()
+    cursor.close()
+    if expired:
+        action = "Dropped" if drop else "Detached"
+        logger.info(f"{action} {len(expired)} partitions of {table}: {expired}")
+    return expired
+
+
+def run_maintenance(
+    conn,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    retention_months: int = PARTITION_RETENTION_MONTHS,
+    drop: bool = False,
+    since: Optional[date] = None,
+) -> Dict[str, Dict[str, List[str]]]:
+    """Crear particiones futuras y aplicar la retención en todas las tablas"""
+    result = {}
+    for table in PARTITIONED_TABLES:
+        created = ensure_partitions(conn, table, months_ahead, since=since)
+        expired = (
+            apply_retention(conn, table, retention_months, drop=drop)
+            if retention_months > 0
+            else []
+        )
+        result[table] = {"created": created, "expired": expired}
+    return result
+
+
+async def run_partition_maintenance(
+    interval_seconds: float = PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+):
+    """
+    Bucle de la API que mantiene creadas las particiones futuras
+
+    La retención (que descarta datos) solo se aplica desde la línea de comandos.
+    """
+
+    def ensure_all():
+        with pooled_connection() as conn:
+            return run_maintenance(conn, retention_months=0)
+
+    while True:
+        try:
+            await asyncio.to_thread(ensure_all)
+        except Exception as e:
+            logger.warning(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly partition maintenance")
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=PARTITION_MONTHS_AHEAD,
+        help="future monthly partitions to keep created",
+    )
+    parser.add_argument(
+        "--retention-months",
+        type=int,
+        default=PARTITION_RETENTION_MONTHS,
+        help="months of history to keep attached (0 keeps everything)",
+    )
+    parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="drop expired partitions instead of only detaching them",
+    )
+    parser.add_argument(
+        "--since",
+        type=lambda value: datetime.strptime(value, "%Y-%m").date(),
+        help="also create partitions from this month (YYYY-MM), e.g. for a backfill",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] %(levelname)-8s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    with pooled_connection() as conn:
+        result = run_maintenance(
+            conn,
+            months_ahead=args.months_ahead,
+            retention_months=args.retention_months,
+            drop=args.drop,
+            since=args.since,
+        )
+    for table, changes in result.items():
+        logger.info(
+            f"{table}: created {len(changes['created'])}, "
+            f"expired {len(changes['expired'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Registro central de consultas SQL de la API
+Cada consulta tiene un nombre y parámetros posicionales; se prepara en el
+servidor (PREPARE) una sola vez por conexión del pool y luego se ejecuta con
+EXECUTE, de modo que el plan se reutiliza para cualquier valor de `hours`
+"""
+
+import logging
+import re
+import threading
+import time
+import weakref
+from typing import Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class NamedQuery:
+    """Consulta parametrizada con nombre, preparable en el servidor"""
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.param_count = len(_PLACEHOLDER.findall(sql))
+
+        # PREPARE usa $1..$n en lugar de los %s de psycopg2
+        counter = iter(range(1, self.param_count + 1))
+        self.prepare_sql = f"PREPARE {name} AS " + _PLACEHOLDER.sub(
+            lambda _: f"${next(counter)}", sql
+        )
+        self.execute_sql = f"EXECUTE {name}" + (
+            "(" + ", ".join(["%s"] * self.param_count) + ")" if self.param_count else ""
+        )
+
+
+class QueryStats:
+    """Tiempos acumulados de ejecución de una consulta"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prepares = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms: float):
+        self.calls += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prepares": self.prepares,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+QUERIES: Dict[str, NamedQuery] = {}
+QUERY_STATS: Dict[str, QueryStats] = {}
+
+# Consultas ya preparadas en cada conexión (se liberan con la conexión)
+_prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_stats_lock = threading.Lock()
+
+
+def register_query(name: str, sql: str) -> NamedQuery:
+    """
+    Registrar una consulta con nombre
+
+    Args:
+        name: Nombre único (se usa como nombre del prepared statement)
+        sql: Consulta con parámetros posicionales %s
+
+    Returns:
+        La consulta registrada
+    """
+    if name in QUERIES:
+        raise ValueError(f"Query already registered: {name}")
+    query = NamedQuery(name, sql)
+    QUERIES[name] = query
+    QUERY_STATS[name] = QueryStats()
+    return query
+
+
+def _ensure_prepared(conn, cursor, query: NamedQuery) -> bool:
+    try:
+        prepared = _prepared.setdefault(conn, set())
+    except TypeError:
+        # Objetos sin soporte de weakref (p.ej. dobles de test): no preparar
+        return False
+    if query.name not in prepared:
+        cursor.execute(query.prepare_sql)
+        prepared.add(query.name)
+        QUERY_STATS[query.name].prepares += 1
+    return True
+
+
+def execute_query(conn, name: str, params: Sequence = ()):
+    """
+    Ejecutar una consulta registrada
+
+    Args:
+        conn: Conexión de psycopg2 (idealmente del pool)
+        name: Nombre de la consulta
+        params: Parámetros posicionales
+
+    Returns:
+        Cursor con los resultados
+    """
+    query = QUERIES[name]
+    if len(params) != query.param_count:
+        raise ValueError(
+            f"Query {name} expects {query.param_count} params, got {len(params)}"
+        )
+
+    stats = QUERY_STATS[name]
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    try:
+        if _ensure_prepared(conn, cursor, query):
+            cursor.execute(query.execute_sql, tuple(params))
+        else:
+            cursor.execute(query.sql, tuple(params))
+    except Exception:
+        # PREPARE no es transaccional: si falla el EXECUTE la sentencia
+        # preparada sigue existiendo en la sesión
+        with _stats_lock:
+            stats.errors += 1
+        cursor.close()
+        raise
+    with _stats_lock:
+        stats.record((time.perf_counter() - start) * 1000)
+    return cursor
+
+
+def fetch_records(conn, name: str, params: Sequence = ()) -> List[Dict]:
+    """Ejecutar una consulta registrada y devolver las filas como diccionarios"""
+    cursor = execute_query(conn, name, params)
+    columns = [column[0] for column in cursor.description]
+    records = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    cursor.close()
+    return records
+
+
+def query_stats() -> Dict[str, Dict]:
+    """Métricas por consulta (llamadas, errores, preparaciones y tiempos)"""
+    with _stats_lock:
+        return {name: stats.to_dict() for name, stats in QUERY_STATS.items()}
+
+
+# Filtro temporal común: make_interval permite parametrizar las horas
+HOURS_WINDOW = "hour >= NOW() - make_interval(hours => %s)"
+
+register_query(
+    "sentiment_summary",
+    f"""
+    SELECT
+        CASE
+            WHEN avg_sentiment_score > 0.1 THEN 'Positive'
+            WHEN avg_sentiment_score < -0.1 THEN 'Negative'
+            ELSE 'Neutral'
+        END as sentiment_category,
+        COUNT(*) as count,
+        AVG(avg_sentiment_score) as avg_score,
+        AVG(avg_sentiment_subjectivity) as avg_subjectivity
+    FROM financial_sentiment_correlation
+    WHERE {HOURS_WINDOW}
+        AND avg_sentiment_score IS NOT NULL
+    GROUP BY 1
+    ORDER BY count DESC
+    """,
+)
+
+for _interval in ("hour", "day"):
+    register_query(
+        f"sentiment_timeline_{_interval}",
+        f"""
+        SELECT
+            DATE_TRUNC('{_interval}', hour) as time_period,
+            AVG(avg_sentiment_score) as sentiment_score,
+            AVG(avg_close_price) as avg_price,
+            COUNT(*) as news_count,
+            SUM(total_volume) as total_volume
+        FROM financial_sentiment_correlation
+        WHERE {HOURS_WINDOW}
+        GROUP BY 1
+        ORDER BY time_period DESC
+        """,
+    )
+
+register_query(
+    "correlation_analysis",
+    f"""
+    SELECT
+        sentiment_category,
+        AVG(price_change_percent) as avg_price_change,
+        AVG(sentiment_change) as avg_sentiment_change,
+        COUNT(*) as data_points,
+        CORR(avg_sentiment_score, avg_close_price) as correlation_coefficient
+    FROM financial_sentiment_correlation
+    WHERE {HOURS_WINDOW}
+        AND price_change_percent IS NOT NULL
+    GROUP BY sentiment_category
+    ORDER BY avg_price_change DESC
+    """,
+)
+
+register_query(
+    "stock_prices",
+    f"""
+    SELECT
+        hour,
+        avg_close_price,
+        max_high_price,
+        min_low_price,
+        total_volume,
+        price_points
+    FROM financial_sentiment_correlation
+    WHERE {HOURS_WINDOW}
+        AND avg_close_price IS NOT NULL
+    ORDER BY hour DESC
+    """,
+)
+
+register_query(
+    "latest_news",
+    """
+    SELECT
+        title,
+        description,
+        url,
+        published_at,
+        COALESCE(source_name, 'Unknown') as source_name,
+        sentiment_score,
+        sentiment_subjectivity,
+        symbol
+    FROM news_with_sentiment
+    WHERE published_at IS NOT NULL
+    ORDER BY published_at DESC
+    LIMIT %s
+    """,
+)
+
+register_query(
+    "dashboard_general_stats",
+    f"""
+    SELECT
+        COUNT(*) as total_records,
+        AVG(avg_sentiment_score) as overall_sentiment,
+        AVG(avg_close_price) as avg_stock_price,
+        MAX(hour) as latest_data_time
+    FROM financial_sentiment_correlation
+    WHERE {HOURS_WINDOW}
+    """,
+)
+
+register_query(
+    "dashboard_sentiment_distribution",
+    f"""
+    SELECT sentiment_category, COUNT(*) as count
+    FROM financial_sentiment_correlation
+    WHERE {HOURS_WINDOW}
+    GROUP BY sentiment_category
+    ORDER BY count DESC
+    """,
+)
+
+register_query("count_records", "SELECT COUNT(*) FROM financial_sentiment_correlation")
+
+register_query(
+    "count_recent_records",
+    f"SELECT COUNT(*) FROM financial_sentiment_correlation WHERE {HOURS_WINDOW}",
+)
+
+register_query(
+    "sentiment_summary_by_symbol",
+    """
+    SELECT
+        linked.symbol,
+        AVG(news.sentiment_score) as avg_sentiment,
+        AVG(news.sentiment_subjectivity) as avg_subjectivity,
+        COUNT(*) as news_count
+    FROM news_with_sentiment AS news
+    CROSS JOIN LATERAL unnest(COALESCE(news.symbols, ARRAY[news.symbol]))
+        AS linked(symbol)
+    WHERE news.published_at >= NOW() - make_interval(hours => %s)
+    GROUP BY linked.symbol
+    ORDER BY news_count DESC
+    """,
+)
+
+register_query(
+    "stock_prices_by_symbol",
+    f"""
+    SELECT
+        symbol,
+        hour,
+        avg_close_price as close,
+        max_high_price as high,
+        min_low_price as low,
+        total_volume as volume
+    FROM financial_sentiment_correlation
+    WHERE {HOURS_WINDOW}
+        AND symbol IS NOT NULL
+    ORDER BY symbol, hour DESC
+    """,
+)
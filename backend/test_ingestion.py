@@ -0,0 +1,349 @@
+"""
+Tests del servicio de ingestión (ingestion/)
+Memo de puntuaciones de sentimiento (LRU en memoria, almacén SQLite y
+versiones del analizador), puntuación en varios procesos, runtime de etapas
+del pipeline (contrapresión y fin ordenado con _DONE), cuota de NewsAPI del
+script de ingestión a CSV y copias de módulos compartidos con otros servicios
+"""
+
+import asyncio
+import os
+import sqlite3
+from array import array
+from unittest.mock import MagicMock, patch
+
+import ingest_and_sentiment
+import pytest
+from pipeline import Pipeline, Stage
+from quota_scheduler import QuotaScheduler, SimulatedClock
+from sentiment_engines import SentimentEngine, register_engine
+from sentiment_memo import SentimentMemo, SqliteMemoStore, prune_memo, text_key
+from sentiment_service import SentimentService
+
+
+@register_engine
+class LengthEngine(SentimentEngine):
+    """
+    Motor determinista sin TextBlob: polaridad según la longitud del texto y
+    subjetividad según sus palabras. Los procesos del pool (fork) lo heredan
+    registrado
+    """
+
+    name = "test-length"
+
+    def version(self):
+        return "test-length"
+
+    def score(self, texts, provided=None):
+        return (
+            array("d", (len(text) / 100 for text in texts)),
+            array("d", (len(text.split()) / 10 for text in texts)),
+        )
+
+
+class TestSentimentMemo:
+    @staticmethod
+    def _scorer():
+        """score_fn que puntúa por longitud y anota los textos que recibe"""
+        calls = []
+
+        def score_fn(texts):
+            calls.append(list(texts))
+            return [len(t) / 10 for t in texts], [0.5 for _ in texts]
+
+        return score_fn, calls
+
+    @staticmethod
+    def _age_version(path, version, days):
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "UPDATE sentiment_memo_versions "
+            "SET last_used_at = datetime('now', ?) WHERE version = ?",
+            (f"-{days} days", version),
+        )
+        conn.commit()
+        conn.close()
+
+    def test_repeated_texts_are_scored_once(self):
+        """Test whitespace-only variants and repeats hit the memo"""
+        score_fn, calls = self._scorer()
+        memo = SentimentMemo(version="v1")
+
+        polarity, _ = memo.score(["good news", "good  news\n", "bad"], score_fn)
+        memo.score(["bad", "good news"], score_fn)
+
+        # Una sola llamada con una variante de "good news" y "bad"
+        assert len(calls) == 1 and len(calls[0]) == 2
+        assert polarity[0] == polarity[1]
+        stats = memo.stats()
+        assert stats["texts"] == 5
+        assert stats["scored"] == 2
+        assert stats["memory_hits"] == 2
+        assert stats["hit_rate"] == 0.6
+
+    def test_lru_evicts_the_least_recently_used_text(self):
+        """Test a lookup refreshes a text and the oldest one is evicted"""
+        score_fn, calls = self._scorer()
+        memo = SentimentMemo(cache_size=2, version="v1")
+
+        memo.score(["a", "b"], score_fn)
+        memo.score(["a"], score_fn)
+        memo.score(["c"], score_fn)
+        memo.score(["a", "b"], score_fn)
+
+        assert calls == [["a", "b"], ["c"], ["b"]]
+        assert memo.stats()["cached"] == 2
+
+    def test_store_serves_a_new_process(self, tmp_path):
+        """Test a second memo on the same file reads instead of scoring"""
+        path = str(tmp_path / "memo.db")
+        score_fn, calls = self._scorer()
+        first = SentimentMemo(SqliteMemoStore(path), version="v1")
+        first.score(["a", "bb"], score_fn)
+        first.close()
+
+        second = SentimentMemo(SqliteMemoStore(path), version="v1")
+        polarity, _ = second.score(["bb", "a"], score_fn)
+        second.close()
+
+        assert list(polarity) == [0.2, 0.1]
+        assert calls == [["a", "bb"]]
+        assert second.stats()["store_hits"] == 2
+
+    def test_versions_are_isolated_and_not_deleted_at_runtime(self, tmp_path):
+        """Test another analyzer version rescoring and keeping both entries"""
+        path = str(tmp_path / "memo.db")
+        score_fn, calls = self._scorer()
+        old = SentimentMemo(SqliteMemoStore(path), version="v1")
+        new = SentimentMemo(SqliteMemoStore(path), version="v2")
+
+        old.score(["a"], score_fn)
+        new.score(["a"], score_fn)
+        old.score(["a"], score_fn)
+
+        assert calls == [["a"], ["a"]]
+        store = SqliteMemoStore(path)
+        assert store.get_many("v1", [text_key("a")]) == {text_key("a"): (0.1, 0.5)}
+        assert store.get_many("v2", [text_key("a")]) == {text_key("a"): (0.1, 0.5)}
+        for memo in (old, new, store):
+            memo.close()
+
+    def test_prune_deletes_only_versions_unused_for_the_retention(self, tmp_path):
+        """Test maintenance removes idle versions and keeps recent ones"""
+        path = str(tmp_path / "memo.db")
+        score_fn, _ = self._scorer()
+        for version in ("v1", "v2"):
+            memo = SentimentMemo(SqliteMemoStore(path), version=version)
+            memo.score(["a", "b"], score_fn)
+            memo.close()
+        self._age_version(path, "v1", 40)
+
+        assert prune_memo("sqlite", retention_days=30, path=path) == 2
+
+        store = SqliteMemoStore(path)
+        assert store.get_many("v1", [text_key("a"), text_key("b")]) == {}
+        assert len(store.get_many("v2", [text_key("a"), text_key("b")])) == 2
+        store.close()
+
+    def test_store_failure_falls_back_to_memory(self):
+        """Test a broken store is counted and scoring carries on"""
+        store = SqliteMemoStore(":memory:")
+        store.close()
+        score_fn, calls = self._scorer()
+        memo = SentimentMemo(store, version="v1")
+
+        polarity, _ = memo.score(["a"], score_fn)
+        memo.score(["a"], score_fn)
+
+        assert list(polarity) == [0.1]
+        assert calls == [["a"]]
+        assert memo.stats()["store_errors"] >= 1
+
+
+class TestSentimentService:
+    TEXTS = [f"headline {i} " + "word " * (i % 7) for i in range(50)]
+
+    @staticmethod
+    def _service(workers):
+        return SentimentService(
+            workers=workers, batch_size=4, memo=None, engine="test-length"
+        )
+
+    def test_pool_matches_in_process_scoring_in_order(self):
+        """Test pooled batches come back merged in input order"""
+        with self._service(0) as local:
+            expected = [local.score(self.TEXTS[:23]), local.score(self.TEXTS[23:])]
+        with self._service(2) as pooled:
+            got = [pooled.score(self.TEXTS[:23]), pooled.score(self.TEXTS[23:])]
+            stats = pooled.stats()
+
+        assert got == expected
+        assert list(got[0][0]) == [len(t) / 100 for t in self.TEXTS[:23]]
+        assert stats["texts"] == len(self.TEXTS)
+        # Los 13 lotes de hasta 4 textos se puntúan en los procesos del pool
+        assert stats["workers"] and os.getpid() not in stats["workers"]
+
+    def test_async_pool_matches_in_process_scoring(self):
+        """Test score_async gives the same arrays pooled and in-process"""
+
+        async def score(workers):
+            with self._service(workers) as scorer:
+                return await scorer.score_async(self.TEXTS)
+
+        assert asyncio.run(score(2)) == asyncio.run(score(0))
+
+    def test_empty_input(self):
+        """Test no texts give empty arrays without starting work"""
+        with self._service(2) as scorer:
+            assert scorer.score([]) == (array("d"), array("d"))
+
+
+class TestPipeline:
+    @staticmethod
+    def _source(count, produced):
+        """Origen que anota cuántos elementos ha entregado"""
+        for i in range(count):
+            produced.append(i)
+            yield i
+
+    def test_slow_stage_pauses_the_source(self):
+        """Test bounded queues stop the source running ahead of a slow stage"""
+        produced, ahead = [], []
+
+        async def fast(items):
+            return items
+
+        async def slow(items):
+            # Elementos entregados por el origen y aún sin terminar
+            ahead.append(len(produced) - len(ahead))
+            await asyncio.sleep(0.001)
+            return items
+
+        pipeline = Pipeline(
+            [Stage("fast", fast, queue_size=2), Stage("slow", slow, queue_size=2)]
+        )
+        stats = asyncio.run(pipeline.run(self._source(50, produced)))
+
+        # Dos colas de 2, un elemento en cada etapa y uno esperando a entrar
+        assert max(ahead) <= 7
+        assert stats["stages"]["slow"]["items_out"] == 50
+        for name in ("fast", "slow"):
+            assert stats["stages"][name]["max_queue_depth"] <= 2
+        assert stats["stages"]["fast"]["blocked_seconds"] > 0
+
+    def test_done_drains_every_stage_and_stops_the_workers(self):
+        """Test _DONE shutdown with batches, several workers and a failure"""
+        results = []
+
+        async def double(items):
+            await asyncio.sleep(0)
+            return [i * 2 for i in items]
+
+        def collect(items):
+            if 14 in items:
+                raise ValueError("bad batch")
+            results.extend(items)
+            return items
+
+        async def run():
+            pipeline = Pipeline(
+                [
+                    Stage("double", double, concurrency=3, batch_size=4),
+                    Stage("collect", collect, kind="thread", concurrency=2),
+                ]
+            )
+            stats = await pipeline.run(range(20))
+            # Ningún trabajador sigue vivo tras run()
+            pending = asyncio.all_tasks() - {asyncio.current_task()}
+            return stats, pending
+
+        stats, pending = asyncio.run(run())
+
+        assert not pending
+        assert sorted(results) == [i * 2 for i in range(20) if i != 7]
+        assert stats["stages"]["double"]["items_in"] == 20
+        assert stats["stages"]["collect"]["items_in"] == 20
+        assert stats["stages"]["collect"]["errors"] == 1
+        for stage in stats["stages"].values():
+            assert stage["queue_depth"] == 0
+
+    def test_unknown_stage_kind_is_rejected(self):
+        """Test stage kinds are validated up front"""
+        with pytest.raises(ValueError):
+            Stage("bad", lambda items: items, kind="fiber")
+
+
+class TestNewsApiQuota:
+    class _Scorer:
+        def score(self, texts):
+            return [0.0] * len(texts), [0.0] * len(texts)
+
+    @staticmethod
+    def _response(status_code=200, payload=None, headers=None):
+        response = MagicMock(status_code=status_code, headers=headers or {})
+        response.json.return_value = payload or {"status": "ok", "articles": []}
+        return response
+
+    @staticmethod
+    def _scheduler(per_day):
+        limits = {"newsapi": {"per_minute": 30, "per_day": per_day}}
+        return QuotaScheduler(limits=limits, clock=SimulatedClock())
+
+    def test_news_requests_stop_at_the_daily_budget(self):
+        """Test each company alias takes a NewsAPI token until none are left"""
+        scheduler = self._scheduler(per_day=2)
+        article = {"title": "Alphabet up", "url": "https://example.com/a"}
+        response = self._response(payload={"status": "ok", "articles": [article]})
+
+        with patch.object(ingest_and_sentiment, "NEWS_API_KEY", "key"), patch.object(
+            ingest_and_sentiment, "quota_scheduler", scheduler
+        ), patch.object(
+            ingest_and_sentiment.requests, "get", return_value=response
+        ) as get:
+            # GOOGL tiene tres alias; el presupuesto solo cubre dos
+            news = ingest_and_sentiment.fetch_news("GOOGL", self._Scorer())
+
+        assert get.call_count == 2
+        assert len(news) == 2
+        report = scheduler.report()["newsapi"]
+        assert report["used_today"] == 2
+        assert report["skipped_total"] == 1
+
+    def test_throttled_news_request_backs_off(self):
+        """Test a NewsAPI 429 is reported to the scheduler and yields no news"""
+        scheduler = self._scheduler(per_day=0)
+        response = self._response(
+            429, {"status": "error", "code": "rateLimited"}, {"Retry-After": "120"}
+        )
+
+        with patch.object(ingest_and_sentiment, "NEWS_API_KEY", "key"), patch.object(
+            ingest_and_sentiment, "quota_scheduler", scheduler
+        ), patch.object(ingest_and_sentiment.requests, "get", return_value=response):
+            assert ingest_and_sentiment.fetch_news("AAPL", self._Scorer()) == []
+
+        report = scheduler.report()["newsapi"]
+        assert report["throttled_total"] == 1
+        assert report["rate_factor"] == 0.5
+        assert not scheduler.acquire_blocking("newsapi", max_wait=60)
+
+
+class TestSharedModules:
+    """Test modules copied into several services stay identical"""
+
+    @pytest.mark.parametrize(
+        "original, copy",
+        [
+            ("backend/quota_scheduler.py", "ingestion/quota_scheduler.py"),
+            ("backend/article_dedup.py", "lambda_function/article_dedup.py"),
+            ("ingestion/sentiment_engines.py", "lambda_function/sentiment_engines.py"),
+            ("ingestion/sentiment_memo.py", "lambda_function/sentiment_memo.py"),
+        ],
+    )
+    def test_copy_matches_original(self, original, copy):
+        # Cada imagen de Docker solo ve su directorio: los módulos compartidos
+        # se copian en lugar de enlazarse, y se cambian a la vez
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(root, original), "rb") as f:
+            expected = f.read()
+        with open(os.path.join(root, copy), "rb") as f:
+            assert f.read() == expected, f"{copy} differs from {original}"
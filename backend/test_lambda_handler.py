@@ -0,0 +1,293 @@
+"""
+Tests del handler por lotes de la Lambda (lambda_function/)
+Decodificación de registros de Kinesis, batchItemFailures con registros
+dañados o con fallos del destino, y fusión de las copias de un artículo antes
+del upsert. El motor de sentimiento se sustituye por uno fijo: el de la Lambda
+carga TextBlob, que solo está en el paquete de la Lambda
+"""
+
+import base64
+import gzip
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from conftest import load_lambda_module
+
+
+class FixedEngine:
+    """Motor que da a cada texto polaridad 0.5 y subjetividad 0.25"""
+
+    memoizable = False
+
+    def load(self):
+        return self
+
+    def version(self):
+        return "fixed"
+
+    def score(self, texts, provided=None):
+        return [0.5] * len(texts), [0.25] * len(texts)
+
+
+class RecordingSink:
+    name = "recording"
+
+    def __init__(self, error=None, failing_symbol=None):
+        self.error = error
+        # Con failing_symbol solo fallan las escrituras con noticias de ese símbolo
+        self.failing_symbol = failing_symbol
+        self.calls = 0
+        self.writes = []
+
+    def write(self, items):
+        self.calls += 1
+        symbols = {item["symbol"] for item in items}
+        if self.error is not None and (
+            self.failing_symbol is None or self.failing_symbol in symbols
+        ):
+            raise self.error
+        self.writes.append(list(items))
+        return len(items)
+
+
+result_sinks = load_lambda_module("result_sinks")
+with patch("sentiment_engines.create_engine", return_value=FixedEngine()):
+    handler = load_lambda_module("main", module_name="lambda_main")
+
+
+def article(symbol="AAPL", **fields):
+    return {
+        "type": "news",
+        "symbol": symbol,
+        "title": "Apple beats estimates",
+        "description": "Quarterly results",
+        "url": "https://example.com/apple",
+        "published_at": "20240115T103000",
+        "source": "example",
+        **fields,
+    }
+
+
+def encode(payload, compress=False):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    return base64.b64encode(gzip.compress(data) if compress else data).decode()
+
+
+def event(*payloads):
+    """Evento de Kinesis con un registro por payload (ya codificado si es str)"""
+    return {
+        "Records": [
+            {
+                "kinesis": {
+                    "data": p if isinstance(p, str) else encode(p),
+                    "sequenceNumber": str(i),
+                }
+            }
+            for i, p in enumerate(payloads)
+        ]
+    }
+
+
+def failures(response):
+    return [f["itemIdentifier"] for f in response["batchItemFailures"]]
+
+
+class TestDecodeRecord:
+    @staticmethod
+    def _record(data):
+        return {"kinesis": {"data": data, "sequenceNumber": "1"}}
+
+    def test_plain_gzip_and_aggregate_records(self):
+        """Test every supported encoding decodes to its items"""
+        news = article()
+        stock = {"type": "stock", "symbol": "AAPL", "close": 1.0}
+        aggregate = {"type": "aggregate", "records": [news, stock]}
+
+        assert handler.decode_record(self._record(encode(news))) == [news]
+        assert handler.decode_record(self._record(encode(news, compress=True))) == [
+            news
+        ]
+        assert handler.decode_record(self._record(encode(aggregate))) == [
+            news,
+            stock,
+        ]
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            "not base64!",
+            encode(b"\x1f\x8b not gzip"),
+            encode(b"{not json"),
+            encode(b"[1, 2]"),
+            encode({"type": "aggregate", "records": {"type": "news"}}),
+            encode({"type": "aggregate", "records": [1]}),
+            encode(article(title="")),
+        ],
+    )
+    def test_bad_records_raise_decode_errors(self, data):
+        """Test damaged payloads raise one of DECODE_ERRORS"""
+        with pytest.raises(handler.DECODE_ERRORS):
+            handler.decode_record(self._record(data))
+
+
+class TestLambdaHandler:
+    @staticmethod
+    def _run(evt, sink):
+        with patch.object(handler, "sink", sink):
+            return handler.lambda_handler(evt, None)
+
+    def test_bad_record_among_good_ones_is_the_only_failure(self, capsys):
+        """Test one undecodable record fails alone and the rest are written"""
+        sink = RecordingSink()
+        link = article("GOOG", type="news_link")
+        response = self._run(
+            event(
+                article(),
+                encode(b"{not json"),
+                {"type": "aggregate", "records": [article("MSFT"), link]},
+                {"type": "stock", "symbol": "AAPL", "close": 1.0},
+            ),
+            sink,
+        )
+
+        assert failures(response) == ["1"]
+        assert len(sink.writes) == 1
+        written = sink.writes[0]
+        assert [item["symbol"] for item in written] == ["AAPL", "MSFT", "GOOG"]
+        assert all(item["sentiment_score"] == 0.5 for item in written)
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["records"] == 4
+        assert stats["news"] == 3
+        assert stats["written"] == 3
+        assert stats["errors"] == {"decode:JSONDecodeError": 1}
+
+    def test_sink_failure_returns_every_record_with_news_once(self, capsys):
+        """Test a failed write retries news records and keeps stock ones done"""
+        sink = RecordingSink(error=ConnectionError("database unavailable"))
+        response = self._run(
+            event(
+                {"type": "aggregate", "records": [article(), article("MSFT")]},
+                {"type": "stock", "symbol": "AAPL", "close": 1.0},
+                encode(b"{not json"),
+                article("TSLA"),
+            ),
+            sink,
+        )
+
+        assert failures(response) == ["2", "0", "3"]
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["errors"] == {
+            "decode:JSONDecodeError": 1,
+            "write:ConnectionError": 2,
+        }
+        assert stats["batch_error"] == "write:ConnectionError"
+        assert stats["last_error"] == "database unavailable"
+
+    def test_failed_write_retries_each_record_and_fails_only_its_own(self, capsys):
+        """Test one unwritable record does not fail the others in the batch"""
+        sink = RecordingSink(error=ValueError("bad row"), failing_symbol="TSLA")
+        response = self._run(
+            event(
+                {"type": "aggregate", "records": [article(), article("MSFT")]},
+                article("TSLA"),
+                article("GOOG"),
+            ),
+            sink,
+        )
+
+        assert failures(response) == ["1"]
+        assert [[i["symbol"] for i in w] for w in sink.writes] == [
+            ["AAPL", "MSFT"],
+            ["GOOG"],
+        ]
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["written"] == 3
+        assert stats["batch_error"] == "write:ValueError"
+        assert stats["errors"] == {"write:ValueError": 1}
+
+    def test_failed_score_fails_only_the_record_that_cannot_be_scored(self, capsys):
+        """Test a scoring error in one record retries the rest one by one"""
+        sink = RecordingSink()
+
+        def score(texts, provided=None):
+            if any("Tesla" in text for text in texts):
+                raise RuntimeError("engine error")
+            return [0.5] * len(texts), [0.25] * len(texts)
+
+        with patch.object(handler.engine, "score", side_effect=score):
+            response = self._run(
+                event(article(), article("TSLA", title="Tesla recall")), sink
+            )
+
+        assert failures(response) == ["1"]
+        assert [[i["symbol"] for i in w] for w in sink.writes] == [["AAPL"]]
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["batch_error"] == "score:RuntimeError"
+        assert stats["errors"] == {"score:RuntimeError": 1}
+
+    def test_unavailable_sink_stops_retrying_records(self, capsys):
+        """Test retries stop after RETRY_WRITE_FAILURE_LIMIT failed writes"""
+        sink = RecordingSink(error=ConnectionError("database unavailable"))
+        limit = handler.RETRY_WRITE_FAILURE_LIMIT
+        response = self._run(event(*[article()] * (limit + 2)), sink)
+
+        assert failures(response) == [str(i) for i in range(limit + 2)]
+        # El lote y una escritura por registro hasta el límite
+        assert sink.calls == 1 + limit
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["errors"] == {
+            "write:ConnectionError": limit,
+            "write:skipped": 2,
+        }
+
+    def test_duplicate_articles_in_one_event_are_one_upsert_row(self, capsys):
+        """Test copies for several symbols reach Postgres as a single row"""
+        sink = result_sinks.PostgresResultSink()
+        sink._conn = MagicMock(closed=False)
+        tracked = article("MSFT", url="https://www.example.com/apple?utm_source=x")
+
+        with patch("psycopg2.extras.execute_values") as execute_values:
+            response = self._run(
+                event(article(), article(), tracked, article("GOOG")), sink
+            )
+
+        assert failures(response) == []
+        rows = execute_values.call_args[0][2]
+        assert len(rows) == 1
+        assert rows[0][-1] == ["AAPL", "GOOG", "MSFT"]
+        assert json.loads(capsys.readouterr().out)["written"] == 1
+        sink._conn.commit.assert_called_once()
+
+
+class TestMergeRows:
+    def test_copies_merge_symbols_per_conflict_key(self):
+        """Test rows sharing article_key and published_at merge their symbols"""
+        rows = result_sinks._merge_rows(
+            [
+                result_sinks.news_row(article("MSFT")),
+                result_sinks.news_row(article("AAPL")),
+                result_sinks.news_row(article("MSFT")),
+                result_sinks.news_row(article("AAPL", published_at="20240116T000000")),
+            ]
+        )
+
+        assert [(row[3], row[-1]) for row in rows] == [
+            ("20240115T103000", ["AAPL", "MSFT"]),
+            ("20240116T000000", ["AAPL"]),
+        ]
+
+    def test_articles_without_url_are_keyed_by_their_text(self):
+        """Test URL-less copies merge and different texts stay apart"""
+        rows = result_sinks._merge_rows(
+            [
+                result_sinks.news_row(article("A", url=None)),
+                result_sinks.news_row(
+                    article("B", url=None, title="  apple BEATS estimates ")
+                ),
+                result_sinks.news_row(article("C", url=None, title="Other story")),
+                result_sinks.news_row({}),
+            ]
+        )
+
+        assert [row[-1] for row in rows] == [["A", "B"], ["C"], []]
@@ -0,0 +1,277 @@
+"""
+Tests del TextBlob incluido en el paquete de la Lambda (lambda_function/)
+Sentiment.score (sumas acumuladas) frente a las medias de
+Sentiment.assessments, API por lotes de PatternAnalyzer y caché compilada
+del léxico (XML modificado, caché dañada o no escribible) y tabla
+memory-mapped de NaiveBayesAnalyzer. Los paquetes se
+cargan desde su ruta, sin añadir lambda_function/ a sys.path: nltk y sus
+dependencias vienen del entorno (requirements.txt), no de las copias para
+Windows del paquete de la Lambda
+"""
+
+import marshal
+import os
+import re
+import shutil
+from unittest.mock import patch
+
+import nltk
+import pytest
+from conftest import LAMBDA_DIR, load_lambda_module
+
+load_lambda_module("textblob")
+load_lambda_module("benchmarks", module_name="lambda_benchmarks")
+
+from lambda_benchmarks.pattern_batch import CORPUS, load_corpus  # noqa: E402
+from lambda_benchmarks.sentiment_score import synthetic_texts  # noqa: E402
+from textblob._text import Sentiment  # noqa: E402
+from textblob.en import sentiment  # noqa: E402
+from textblob.en import sentiments  # noqa: E402
+from textblob.en.scoring import words  # noqa: E402
+from textblob.en.sentiments import NaiveBayesAnalyzer, PatternAnalyzer  # noqa: E402
+
+
+class TestSentimentScore:
+    def test_score_matches_assessment_means(self):
+        """Test running sums give exactly the means of the assessments"""
+        texts = load_corpus(CORPUS) + synthetic_texts(20000)
+
+        mismatches = [
+            (text, expected, got)
+            for text, expected, got in (
+                (text, tuple(sentiment(text)), sentiment.score(words(text)))
+                for text in texts
+            )
+            if expected != got
+        ]
+
+        assert not mismatches, f"{len(mismatches)} mismatches: {mismatches[:3]}"
+
+    def test_score_of_empty_and_unknown_text(self):
+        """Test texts without lexicon words score (0.0, 0.0) on both paths"""
+        for text in ("", "   ", "zzzz qqqq"):
+            assert sentiment.score(words(text)) == tuple(sentiment(text)) == (0, 0)
+
+
+class TestPatternAnalyzerBatch:
+    # Textos repetidos, vacíos, sin palabras del léxico y listas de palabras
+    TEXTS = [
+        "Apple beats estimates with great results",
+        "",
+        "Shares are not good at all!",
+        ["very", "good"],
+        "Apple beats estimates with great results",
+        "zzzz qqqq",
+        ["bad", "not", "great"],
+    ]
+
+    @staticmethod
+    def _columns(batch):
+        return list(zip(batch.polarity, batch.subjectivity))
+
+    def test_list_matches_analyze(self):
+        """Test a mixed list scores like analyze() on each text"""
+        analyzer = PatternAnalyzer()
+
+        batch = analyzer.analyze_batch(self.TEXTS)
+
+        expected = [tuple(analyzer.analyze(text)) for text in self.TEXTS]
+        assert self._columns(batch) == expected
+        assert batch.assessments is None
+
+    def test_iterator_with_assessments_matches_analyze(self):
+        """Test an iterator and keep_assessments give analyze()'s results"""
+        analyzer = PatternAnalyzer()
+
+        batch = analyzer.analyze_batch(iter(self.TEXTS), keep_assessments=True)
+
+        expected = [
+            analyzer.analyze(text, keep_assessments=True) for text in self.TEXTS
+        ]
+        assert self._columns(batch) == [(e.polarity, e.subjectivity) for e in expected]
+        assert batch.assessments == [e.assessments for e in expected]
+
+    def test_empty_input(self):
+        """Test an empty list or iterator gives empty columns"""
+        analyzer = PatternAnalyzer()
+
+        for texts in ([], iter([])):
+            batch = analyzer.analyze_batch(texts)
+            assert self._columns(batch) == []
+        assert analyzer.analyze_batch([], keep_assessments=True).assessments == []
+
+
+class TestLexiconCache:
+    XML = os.path.join(LAMBDA_DIR, "textblob", "en", "en-sentiment.xml")
+
+    @classmethod
+    def _xml(cls, tmp_path):
+        path = tmp_path / "en-sentiment.xml"
+        shutil.copy(cls.XML, path)
+        return str(path)
+
+    @staticmethod
+    def _load(path, cache=None):
+        analyzer = Sentiment(path=path, synset="wordnet_id", cache=cache)
+        analyzer.load()
+        return analyzer
+
+    @staticmethod
+    def _lexicon(analyzer):
+        return dict(analyzer), analyzer.labeler, analyzer._synsets, analyzer.language
+
+    def test_cache_is_written_and_matches_the_xml(self, tmp_path):
+        """Test the first load writes the cache and the next one reads it"""
+        path = self._xml(tmp_path)
+        parsed = self._load(path)
+        cache = tmp_path / "en-sentiment.lexicon"
+        assert cache.exists()
+
+        with patch.object(Sentiment, "_parse", side_effect=AssertionError):
+            cached = self._load(path)
+
+        assert self._lexicon(cached) == self._lexicon(parsed)
+        assert self._lexicon(parsed) == self._lexicon(self._load(path, cache=False))
+
+    def test_changed_xml_invalidates_the_cache(self, tmp_path):
+        """Test a stale checksum reparses the XML and rewrites the cache"""
+        path = self._xml(tmp_path)
+        self._load(path)
+        with open(path, encoding="utf-8") as f:
+            xml = f.read()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                xml.replace(
+                    "</sentiment>",
+                    '<word form="zorgful" pos="JJ" polarity="0.9" '
+                    'subjectivity="0.3" intensity="1.0" />\n</sentiment>',
+                )
+            )
+
+        reloaded = self._load(path)
+
+        assert reloaded["zorgful"]["JJ"] == [0.9, 0.3, 1.0]
+        with patch.object(Sentiment, "_parse", side_effect=AssertionError):
+            assert "zorgful" in self._load(path)
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            b"",
+            b"not a marshal file",
+            marshal.dumps(("header only",)),
+            marshal.dumps(({"version": -1}, (None, {}, {}, {}))),
+        ],
+        ids=["empty", "garbage", "wrong-shape", "old-version"],
+    )
+    def test_corrupt_cache_falls_back_to_the_xml(self, tmp_path, content):
+        """Test an unreadable or foreign cache is ignored and rewritten"""
+        path = self._xml(tmp_path)
+        expected = self._lexicon(self._load(path, cache=False))
+        cache = tmp_path / "en-sentiment.lexicon"
+        cache.write_bytes(content)
+
+        assert self._lexicon(self._load(path)) == expected
+        assert cache.read_bytes() != content
+        with patch.object(Sentiment, "_parse", side_effect=AssertionError):
+            assert self._lexicon(self._load(path)) == expected
+
+    def test_unwritable_cache_keeps_parsing_the_xml(self, tmp_path):
+        """Test a cache that cannot be written does not break loading"""
+        path = self._xml(tmp_path)
+        cache = str(tmp_path / "missing" / "en-sentiment.lexicon")
+
+        analyzer = self._load(path, cache=cache)
+
+        assert self._lexicon(analyzer) == self._lexicon(self._load(path, cache=False))
+        assert not os.path.exists(cache)
+        assert os.listdir(tmp_path) == ["en-sentiment.xml"]
+
+
+class TestNaiveBayesTable:
+    # Corpus de entrenamiento en lugar de movie_reviews (datos de nltk)
+    REVIEWS = [
+        ("a great and wonderful film with brilliant acting", "pos"),
+        ("loved the moving story and the superb cast", "pos"),
+        ("brilliant direction, great music, a joy to watch", "pos"),
+        ("wonderful and funny, the best film this year", "pos"),
+        ("a boring and awful film with terrible acting", "neg"),
+        ("hated the dull story and the weak cast", "neg"),
+        ("awful direction, terrible music, a waste of time", "neg"),
+        ("boring and silly, the worst film this year", "neg"),
+    ]
+    TEXTS = [
+        "A great film with brilliant acting",
+        "Terrible and boring, a waste",
+        "great great awful",
+        "Unseen words only here",
+        "",
+        "A great film with brilliant acting",
+    ]
+
+    @staticmethod
+    def _tokenize(text, include_punc=True):
+        """word_tokenize sin el modelo punkt de nltk"""
+        return re.findall(r"[\w']+", text)
+
+    @pytest.fixture(autouse=True)
+    def fixture_corpus(self):
+        reviews = self.REVIEWS
+
+        def train_on_fixture(analyzer):
+            analyzer._classifier = nltk.classify.NaiveBayesClassifier.train(
+                [
+                    (analyzer.feature_extractor(text.lower().split()), label)
+                    for text, label in reviews
+                ]
+            )
+
+        with patch.object(sentiments, "word_tokenize", self._tokenize), patch.object(
+            NaiveBayesAnalyzer, "_train_classifier", train_on_fixture
+        ):
+            yield
+
+    @staticmethod
+    def _rows(batch):
+        return list(zip(batch.classification, batch.p_pos, batch.p_neg))
+
+    def test_table_classifies_like_the_trained_classifier(self, tmp_path):
+        """Test analyze and analyze_batch on the table match prob_classify"""
+        trained = NaiveBayesAnalyzer(table_path=None)
+        compiled = NaiveBayesAnalyzer(table_path=str(tmp_path / "nb.table"))
+
+        expected = [tuple(trained.analyze(text)) for text in self.TEXTS]
+        assert {label for label, _, _ in expected} == {"pos", "neg"}
+
+        assert [tuple(compiled.analyze(text)) for text in self.TEXTS] == expected
+        assert trained._table is None and compiled._table is not None
+        assert self._rows(compiled.analyze_batch(iter(self.TEXTS))) == expected
+        # Camino sin NumPy, el de la Lambda
+        compiled._table._array = None
+        assert self._rows(compiled.analyze_batch(self.TEXTS)) == expected
+
+    def test_later_instances_map_the_table_without_training(self, tmp_path):
+        """Test a saved table is reused instead of retraining"""
+        path = str(tmp_path / "nb.table")
+        first = NaiveBayesAnalyzer(table_path=path)
+        expected = [tuple(first.analyze(text)) for text in self.TEXTS]
+
+        with patch.object(
+            NaiveBayesAnalyzer, "_train_classifier", side_effect=AssertionError
+        ):
+            second = NaiveBayesAnalyzer(table_path=path)
+            assert [tuple(second.analyze(text)) for text in self.TEXTS] == expected
+
+    def test_corrupt_table_is_retrained_and_rewritten(self, tmp_path):
+        """Test an unreadable table falls back to training and is replaced"""
+        path = tmp_path / "nb.table"
+        path.write_bytes(b"not a table")
+        trained = NaiveBayesAnalyzer(table_path=None)
+
+        analyzer = NaiveBayesAnalyzer(table_path=str(path))
+
+        assert [tuple(analyzer.analyze(t)) for t in self.TEXTS] == [
+            tuple(trained.analyze(t)) for t in self.TEXTS
+        ]
+        assert analyzer._table is not None
+        assert path.read_bytes() != b"not a table"
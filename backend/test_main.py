@@ -1,43 +1,106 @@
-from datetime import datetime
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
 from unittest.mock import MagicMock, patch
 
+import ingestion_main
+import main
 import pytest
+from article_dedup import ArticleDeduplicator, article_key, normalize_url
+from backfill import BackfillEngine, BackfillState, BackfillTask, plan_tasks
+from bulk_writer import BulkWriter, _copy_value
+from dashboard_snapshots import DashboardSnapshots
 from fastapi.testclient import TestClient
+from health import HealthProber
+from kinesis_producer import KinesisProducer, MemoryKinesis
 from main import app
+from partitions import add_months, apply_retention, ensure_partitions, partition_name
+from queries import QUERIES, NamedQuery, execute_query
+from quota_scheduler import QuotaScheduler, SimulatedClock, is_throttled
+from stream_sinks import (
+    KafkaSink,
+    MemorySink,
+    SegmentFileSink,
+    create_sink,
+    partition_for,
+    read_segments,
+)
+from watermarks import WatermarkStore, parse_published_at
 
 client = TestClient(app)
 
 
 class TestHealthCheck:
     def test_health_check_success(self):
-        """Test health check endpoint when database is available"""
-        with patch("main.get_db_connection") as mock_db:
-            mock_conn = MagicMock()
-            mock_cursor = MagicMock()
-            mock_conn.cursor.return_value = mock_cursor
-            mock_db.return_value = mock_conn
+        """Test health check endpoint when the last probe reached the database"""
+        with patch.object(main.health_prober, "check") as mock_check:
+            main.health_prober.probe_once()
 
+        with patch("main.get_db_connection") as mock_db:
             response = client.get("/health")
+            mock_db.assert_not_called()
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["status"] == "healthy"
-            assert data["database"] == "connected"
-            assert "timestamp" in data
-            assert data["version"] == "1.0.0"
+        mock_check.assert_called_once()
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "healthy"
+        assert data["database"] == "connected"
+        assert data["last_check_latency_ms"] is not None
+        assert data["last_check_age_seconds"] is not None
+        assert "timestamp" in data
+        assert data["version"] == "1.0.0"
 
     def test_health_check_no_db(self):
-        """Test health check endpoint when database is not available"""
-        with patch("main.get_db_connection") as mock_db:
-            mock_db.return_value = None
+        """Test health check endpoint when the last probe failed"""
+        with patch.object(
+            main.health_prober, "check", side_effect=Exception("connection refused")
+        ):
+            main.health_prober.probe_once()
 
-            response = client.get("/health")
+        response = client.get("/health")
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["status"] == "healthy"
-            assert data["database"] == "disconnected"
-            assert "message" in data
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "healthy"
+        assert data["database"] == "disconnected"
+        assert "message" in data
+        assert data["error"] == "connection refused"
+
+    def test_liveness(self):
+        """Test liveness endpoint never depends on the database"""
+        with patch.object(main.health_prober, "check") as mock_check:
+            response = client.get("/health/live")
+            mock_check.assert_not_called()
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+
+    def test_readiness(self):
+        """Test readiness follows the cached probe result"""
+        with patch.object(main.health_prober, "check"):
+            main.health_prober.probe_once()
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+        with patch.object(main.health_prober, "check", side_effect=Exception("down")):
+            main.health_prober.probe_once()
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "not_ready"
+
+    def test_readiness_stale_result(self):
+        """Test readiness fails when the prober has stopped reporting"""
+        prober = HealthProber(check=MagicMock(), interval_seconds=10)
+        assert not prober.is_ready()
+
+        prober.probe_once()
+        assert prober.is_ready()
+
+        with patch("health.time.monotonic", return_value=time.monotonic() + 31):
+            assert prober.is_stale()
+            assert not prober.is_ready()
 
 
 class TestMetrics:
@@ -134,6 +197,98 @@ class TestDashboardStats:
             assert data["general_stats"]["total_records"] == 1250
 
 
+class TestDashboardSnapshots:
+    @staticmethod
+    def _make_store(watermark=(10, 20)):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchone.return_value = watermark
+        factory = MagicMock()
+        factory.return_value.__enter__.return_value = mock_conn
+        builder = MagicMock(side_effect=lambda conn, hours: {"hours": hours})
+        store = DashboardSnapshots(
+            builders={"stats": builder},
+            presets=[24, 720],
+            connection_factory=factory,
+        )
+        return store, builder, mock_conn
+
+    def test_refresh_builds_every_preset(self):
+        """Test refresh computes one payload per builder and preset"""
+        store, builder, _ = self._make_store()
+
+        assert store.refresh() is True
+        assert builder.call_count == 2
+        assert store.get("stats", 24) == {"hours": 24}
+        assert store.get("stats", 720) == {"hours": 720}
+        # Rangos fuera de los presets deben ir a la base en vivo
+        assert store.get("stats", 48) is None
+
+    def test_refresh_skipped_without_new_ingestion(self):
+        """Test snapshots are only rebuilt when the watermark changes"""
+        store, builder, mock_conn = self._make_store()
+        store.refresh()
+
+        assert store.refresh() is False
+        assert builder.call_count == 2
+
+        mock_conn.cursor.return_value.fetchone.return_value = (11, 20)
+        assert store.refresh() is True
+        assert builder.call_count == 4
+
+    def test_endpoint_serves_snapshot(self):
+        """Test dashboard stats for a preset is served from memory"""
+        store, _, _ = self._make_store()
+        store.refresh()
+
+        with patch.object(main, "dashboard_snapshots", store), patch(
+            "main.get_db_connection"
+        ) as mock_db:
+            response = client.get("/api/dashboard/stats?hours=720")
+            mock_db.assert_not_called()
+
+        assert response.status_code == 200
+        assert response.json() == {"hours": 720}
+
+
+class TestQueryRegistry:
+    def test_placeholders_become_positional_parameters(self):
+        """Test registered queries are converted to PREPARE/EXECUTE form"""
+        query = NamedQuery("example", "SELECT * FROM t WHERE a = %s AND b = %s")
+
+        assert query.param_count == 2
+        assert query.prepare_sql == (
+            "PREPARE example AS SELECT * FROM t WHERE a = $1 AND b = $2"
+        )
+        assert query.execute_sql == "EXECUTE example(%s, %s)"
+
+    def test_hours_are_parameters_not_interpolated(self):
+        """Test time-window queries use make_interval instead of f-strings"""
+        query = QUERIES["dashboard_general_stats"]
+
+        assert "make_interval(hours => $1)" in query.prepare_sql
+        assert "INTERVAL '" not in query.sql
+
+    def test_prepared_once_per_connection(self):
+        """Test a query is prepared once and then only executed"""
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value
+
+        execute_query(mock_conn, "stock_prices", (24,))
+        execute_query(mock_conn, "stock_prices", (720,))
+
+        executed = [call.args for call in mock_cursor.execute.call_args_list]
+        assert executed == [
+            (QUERIES["stock_prices"].prepare_sql,),
+            ("EXECUTE stock_prices(%s)", (24,)),
+            ("EXECUTE stock_prices(%s)", (720,)),
+        ]
+
+    def test_wrong_parameter_count(self):
+        """Test queries reject the wrong number of parameters"""
+        with pytest.raises(ValueError):
+            execute_query(MagicMock(), "stock_prices", ())
+
+
 class TestStockPrices:
     def test_stock_prices_endpoint(self):
         """Test stock prices endpoint"""
@@ -270,6 +425,751 @@ class TestCORS:
         assert response.status_code in [200, 405]  # OPTIONS might return 405
 
 
+class TestPartitions:
+    def test_month_arithmetic_and_names(self):
+        """Test month arithmetic across year boundaries and partition names"""
+        assert (
+            add_months(datetime(2024, 11, 1).date(), 3) == datetime(2025, 2, 1).date()
+        )
+        assert (
+            add_months(datetime(2024, 1, 1).date(), -1) == datetime(2023, 12, 1).date()
+        )
+        month = datetime(2024, 3, 1).date()
+        assert partition_name("news_with_sentiment", month) == (
+            "news_with_sentiment_p202403"
+        )
+
+    def test_ensure_partitions_creates_missing_months(self):
+        """Test that only missing future months are created"""
+        conn = MagicMock()
+        today = datetime(2024, 1, 20).date()
+        existing = {datetime(2024, 1, 1).date(): "news_with_sentiment_p202401"}
+        with patch("partitions.list_partitions", return_value=existing), patch(
+            "partitions.create_partition",
+            side_effect=lambda conn, table, month: partition_name(table, month),
+        ) as mock_create:
+            created = ensure_partitions(
+                conn, "news_with_sentiment", months_ahead=2, today=today
+            )
+
+        assert created == ["news_with_sentiment_p202402", "news_with_sentiment_p202403"]
+        assert mock_create.call_count == 2
+        conn.commit.assert_called_once()
+
+    def test_retention_detaches_only_expired_partitions(self):
+        """Test that retention detaches partitions older than the cutoff"""
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        partitions = {
+            datetime(2023, 12, 1).date(): "news_with_sentiment_p202312",
+            datetime(2024, 1, 1).date(): "news_with_sentiment_p202401",
+            datetime(2024, 2, 1).date(): "news_with_sentiment_p202402",
+        }
+        with patch("partitions.list_partitions", return_value=partitions):
+            expired = apply_retention(
+                conn,
+                "news_with_sentiment",
+                retention_months=1,
+                today=datetime(2024, 2, 10).date(),
+            )
+
+        assert expired == ["news_with_sentiment_p202312"]
+        assert cursor.execute.call_count == 1  # DETACH sin DROP
+
+
+class TestQuotaScheduler:
+    def _scheduler(self, per_minute=5, per_day=25):
+        clock = SimulatedClock()
+        limits = {"alpha_vantage": {"per_minute": per_minute, "per_day": per_day}}
+        return QuotaScheduler(limits=limits, clock=clock, max_wait_seconds=600), clock
+
+    def test_token_bucket_paces_requests(self):
+        """Test that requests beyond the per-minute burst wait for tokens"""
+        scheduler, clock = self._scheduler(per_minute=5, per_day=0)
+
+        async def burst():
+            for _ in range(10):
+                assert await scheduler.acquire("alpha_vantage")
+
+        asyncio.run(burst())
+
+        # 5 en ráfaga y 5 más a razón de uno cada 12 segundos
+        assert clock.now == pytest.approx(60)
+
+    def test_daily_budget_is_enforced_and_reset(self):
+        """Test that the daily budget stops requests until the next day"""
+        scheduler, clock = self._scheduler(per_minute=0, per_day=3)
+
+        assert all(scheduler.acquire_blocking("alpha_vantage") for _ in range(3))
+        assert not scheduler.acquire_blocking("alpha_vantage")
+        assert scheduler.remaining_today("alpha_vantage") == 0
+
+        clock.advance(86400)
+        assert scheduler.acquire_blocking("alpha_vantage")
+        report = scheduler.report()["alpha_vantage"]
+        assert report["used_today"] == 1
+        assert report["skipped_total"] == 1
+
+    def test_throttling_backs_off(self):
+        """Test 429 / API call frequency detection and adaptive backoff"""
+        assert is_throttled(429, None)
+        assert is_throttled(200, {"Note": "Thank you... API call frequency is 5"})
+        assert not is_throttled(200, {"feed": []})
+
+        scheduler, clock = self._scheduler(per_minute=5, per_day=0)
+        scheduler.record_result("alpha_vantage", throttled=True, retry_after=30)
+
+        assert not scheduler.acquire_blocking("alpha_vantage", max_wait=10)
+        assert scheduler.acquire_blocking("alpha_vantage", max_wait=60)
+        assert clock.now >= 30
+        assert scheduler.report()["alpha_vantage"]["rate_factor"] == 0.5
+
+    def test_prioritizes_stale_and_fast_moving_symbols(self):
+        """Test that never-fetched, stale and high-velocity symbols go first"""
+        scheduler, clock = self._scheduler()
+        for symbol in ("AAPL", "MSFT", "TSLA"):
+            scheduler.record_result("alpha_vantage", symbol)
+        clock.advance(3600)
+        scheduler.record_result("alpha_vantage", "TSLA", new_items=30)
+        scheduler.record_result("alpha_vantage", "MSFT", new_items=0)
+        clock.advance(3600)
+
+        order = scheduler.prioritize("alpha_vantage", ["MSFT", "TSLA", "AAPL", "NEW"])
+        assert order[:2] == ["NEW", "TSLA"]
+        assert scheduler.prioritize(
+            "alpha_vantage", ["MSFT", "TSLA", "AAPL"], limit=1
+        ) == ["TSLA"]
+
+
+class TestBulkWriter:
+    def _writer(self, **kwargs):
+        conn = MagicMock()
+
+        @contextmanager
+        def connection_factory():
+            yield conn
+
+        kwargs.setdefault("flush_interval", 3600)
+        writer = BulkWriter(
+            "news_with_sentiment",
+            ["url", "sentiment_score"],
+            connection_factory=connection_factory,
+            **kwargs,
+        )
+        return writer, conn
+
+    def test_flushes_full_batches_on_one_connection(self):
+        """Test that rows are written per batch with a single COPY each"""
+        writer, conn = self._writer(batch_size=3)
+        cursor = conn.cursor.return_value
+
+        writer.extend((f"https://example.com/{i}", 0.1) for i in range(7))
+        assert writer.stats()["pending"] == 1
+        assert cursor.copy_expert.call_count == 2
+        assert conn.commit.call_count == 2
+
+        assert writer.flush() == 1
+        assert writer.stats()["rows_written"] == 7
+
+    def test_upsert_keeps_last_row_per_key(self):
+        """Test that ON CONFLICT DO UPDATE batches carry one row per key"""
+        writer, conn = self._writer(
+            conflict_columns=["url"], update_columns=["sentiment_score"]
+        )
+        writer.extend([("a", 0.1), ("b", 0.2), ("a", 0.3)])
+
+        assert writer.flush() == 2
+        buffer = conn.cursor.return_value.copy_expert.call_args[0][1]
+        assert buffer.getvalue() == "a\t0.3\nb\t0.2\n"
+
+    def test_combine_merges_duplicate_keys(self):
+        """Test that a combine function folds same-key rows instead of dropping"""
+        writer, conn = self._writer(
+            conflict_columns=["url"],
+            update_expressions={
+                "sentiment_score": "target.sentiment_score + EXCLUDED.sentiment_score"
+            },
+            combine=lambda old, new: (new[0], old[1] + new[1]),
+        )
+        writer.extend([("a", 1), ("a", 2), ("b", 5)])
+
+        assert writer.flush() == 2
+        buffer = conn.cursor.return_value.copy_expert.call_args[0][1]
+        assert buffer.getvalue() == "a\t3\nb\t5\n"
+        statement = repr(writer._insert_sql)
+        assert "AS target" in statement
+        assert "target.sentiment_score + EXCLUDED.sentiment_score" in statement
+
+    def test_write_is_independent_of_the_shared_buffer(self):
+        """Test that write() reports only its own rows and leaves the buffer"""
+        writer, conn = self._writer()
+        writer.extend([("buffered", 0.1)])
+        conn.commit.side_effect = [RuntimeError("db down"), None]
+
+        with pytest.raises(RuntimeError):
+            writer.write([("mine", 0.2)])
+        assert writer.write([("mine", 0.2)]) == 1
+        assert writer.stats()["pending"] == 1
+        buffer = conn.cursor.return_value.copy_expert.call_args[0][1]
+        assert buffer.getvalue() == "mine\t0.2\n"
+
+    def test_failed_flush_keeps_rows_for_the_next_one(self):
+        """Test that rows of a failed flush are retried, not dropped"""
+        writer, conn = self._writer()
+        writer.extend([("a", 0.1)])
+        conn.commit.side_effect = [RuntimeError("db down"), None]
+
+        with pytest.raises(RuntimeError):
+            writer.flush()
+        writer.extend([("b", 0.2)])
+
+        assert writer.flush() == 2
+        buffer = conn.cursor.return_value.copy_expert.call_args[0][1]
+        assert buffer.getvalue() == "a\t0.1\nb\t0.2\n"
+        assert writer.stats()["rows_written"] == 2
+
+    @staticmethod
+    def _wait_until(condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_flush_interval_writes_an_idle_buffer(self):
+        """Test that buffered rows are written once flush_interval passes"""
+        writer, conn = self._writer(flush_interval=0.05)
+        writer.extend([("a", 0.1), ("b", 0.2)])
+
+        assert self._wait_until(lambda: writer.stats()["rows_written"] == 2)
+        assert writer.stats()["pending"] == 0
+        assert conn.cursor.return_value.copy_expert.call_count == 1
+
+    def test_timed_flush_retries_a_failed_write(self):
+        """Test that a failed timed flush keeps its rows and tries again"""
+        writer, conn = self._writer(flush_interval=0.05)
+        conn.commit.side_effect = [RuntimeError("db down"), None]
+        writer.extend([("a", 0.1)])
+
+        assert self._wait_until(lambda: writer.stats()["rows_written"] == 1)
+        assert conn.commit.call_count == 2
+
+    def test_flush_cancels_the_timer(self):
+        """Test that an explicit flush leaves nothing for the timer to write"""
+        writer, conn = self._writer(flush_interval=0.05)
+        writer.extend([("a", 0.1)])
+
+        assert writer.flush() == 1
+        time.sleep(0.15)
+        assert writer._timer is None
+        assert conn.cursor.return_value.copy_expert.call_count == 1
+
+    def test_copy_value_escaping(self):
+        """Test COPY text serialization of special values"""
+        assert _copy_value(None) == "\\N"
+        assert _copy_value("a\tb\\c\nd") == "a\\tb\\\\c\\nd"
+        assert _copy_value(datetime(2024, 1, 1, 5)) == "2024-01-01T05:00:00"
+        assert _copy_value(["AAPL", 'a"b', None]) == '{"AAPL","a\\\\"b",NULL}'
+        assert _copy_value({"t": [1.5, None]}) == '{"t": [1.5, null]}'
+
+
+class TestSentimentEnrichment:
+    def test_batch_is_enriched_with_one_windowed_query(self):
+        """Test that each bar gets the sentiment of its own window, in one query"""
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [
+            ("AAPL", datetime(2024, 1, 2, 10), 0.5, 0.4, 3),
+        ]
+
+        @contextmanager
+        def pooled_connection():
+            yield conn
+
+        bars = [
+            {"symbol": "AAPL", "close": 1.0, "timestamp": datetime(2024, 1, 2, 10, 30)},
+            {"symbol": "AAPL", "close": 2.0, "timestamp": "2024-01-01"},
+            {"symbol": "MSFT", "close": 3.0, "timestamp": "2024-01-02T10:00:00"},
+        ]
+        with patch.object(
+            ingestion_main, "pooled_connection", pooled_connection
+        ), patch.object(ingestion_main, "correlation_writer") as writer:
+            ingestion_main.insert_stocks_pg(bars)
+
+        assert cursor.execute.call_count == 1
+        params = cursor.execute.call_args[0][1]
+        assert params["since"] == datetime(2023, 12, 31, 1)
+        assert params["until"] == datetime(2024, 1, 2, 11)
+        writer.write.assert_called_once()
+        rows = writer.write.call_args[0][0]
+        assert [row[3:5] for row in rows] == [(0.5, 0.4), (0, 0), (0, 0)]
+
+
+class TestCorrelationUpsert:
+    @staticmethod
+    def _rows(bars):
+        """Rows written by insert_stocks_pg for a list of price bars"""
+        with patch.object(
+            ingestion_main, "_window_sentiment", return_value={}
+        ), patch.object(ingestion_main, "correlation_writer") as writer:
+            assert ingestion_main.insert_stocks_pg(bars)
+        return writer.write.call_args[0][0]
+
+    @staticmethod
+    def _merge(rows):
+        merged = rows[0]
+        for row in rows[1:]:
+            merged = ingestion_main._merge_correlation_rows(merged, row)
+        return dict(zip(ingestion_main.CORRELATION_COLUMNS, merged))
+
+    def test_merge_accumulates_price_aggregates(self):
+        """Test the in-batch merge of two price bars of the same hour"""
+        rows = self._rows(
+            [
+                {
+                    "symbol": "AAPL",
+                    "timestamp": "2024-01-02T10:05:00",
+                    "close": 100.0,
+                    "high": 101.0,
+                    "low": 99.0,
+                    "volume": 10,
+                },
+                {
+                    "symbol": "AAPL",
+                    "timestamp": "2024-01-02T10:35:00",
+                    "close": 110.0,
+                    "high": 115.0,
+                    "low": 98.0,
+                    "volume": None,
+                },
+            ]
+        )
+        merged = self._merge(rows)
+
+        assert merged["hour"] == datetime(2024, 1, 2, 10)
+        assert merged["avg_close_price"] == pytest.approx(105.0)
+        assert merged["max_high_price"] == 115.0
+        assert merged["min_low_price"] == 98.0
+        assert merged["total_volume"] == 10
+        assert merged["price_points"] == 2
+        assert sorted(merged["price_bars"]) == [
+            "2024-01-02T10:05:00",
+            "2024-01-02T10:35:00",
+        ]
+        assert ingestion_main.correlation_writer.conflict_columns == ["symbol", "hour"]
+
+    def test_same_batch_twice_leaves_the_row_unchanged(self):
+        """Test that re-sending bars replaces them instead of adding them again"""
+        bars = [
+            {"symbol": "AAPL", "timestamp": "2024-01-02", "close": 100.0, "volume": 5},
+            {"symbol": "AAPL", "timestamp": "2024-01-02T00:30:00", "close": 90.0},
+        ]
+        once = self._merge(self._rows(bars))
+        twice = self._merge(self._rows(bars) + self._rows(bars))
+        # Otro proveedor con la misma barra la sustituye
+        other = self._merge(
+            self._rows(bars) + self._rows([{**bars[0], "close": 102.0, "volume": 5}])
+        )
+
+        assert twice == once
+        assert once["price_points"] == 2 and once["total_volume"] == 5
+        assert other["price_points"] == 2
+        assert other["avg_close_price"] == pytest.approx(96.0)
+        # El upsert recalcula los agregados de las barras fusionadas, no suma
+        statement = repr(ingestion_main.correlation_writer._insert_sql)
+        assert "|| COALESCE(EXCLUDED.price_bars" in statement
+        assert "target.total_volume, 0) +" not in statement
+
+
+class TestBackfill:
+    @staticmethod
+    def _price_table(fail_symbols=()):
+        """Correlation writer that upserts into a dict like the database"""
+        table = {}
+
+        def write(rows):
+            if any(row[1] in fail_symbols for row in rows):
+                raise RuntimeError("db down")
+            for row in rows:
+                key = (row[1], row[0])
+                if key in table:
+                    row = ingestion_main._merge_correlation_rows(table[key], row)
+                table[key] = row
+            return len(rows)
+
+        writer = MagicMock()
+        writer.write.side_effect = write
+        return table, writer
+
+    @staticmethod
+    async def _daily_prices(provider, url, params, timeout, max_wait):
+        series = {
+            day: {"4. close": "100", "2. high": "101", "3. low": "99", "6. volume": "7"}
+            for day in ("2024-01-02", "2024-01-03")
+        }
+        return {"Time Series (Daily)": series}
+
+    def test_plan_splits_news_and_resumes_prices_from_checkpoint(self, tmp_path):
+        """Test task planning with a price checkpoint and completed tasks"""
+        state = BackfillState(str(tmp_path / "state.json"))
+        state.prices_until["AAPL"] = date(2024, 3, 10)
+        start, end = date(2024, 1, 1), date(2024, 3, 31)
+        state.completed.add(BackfillTask("news", "MSFT", date(2024, 3, 2), end).key)
+
+        tasks = plan_tasks(["AAPL", "MSFT"], start, end, state, news_chunk_days=30)
+
+        prices = [task for task in tasks if task.kind == "prices"]
+        assert prices == [
+            BackfillTask("prices", "AAPL", date(2024, 3, 11), end),
+            BackfillTask("prices", "MSFT", start, end),
+        ]
+        news = [task for task in tasks if task.kind == "news"]
+        assert news[0] == BackfillTask("news", "AAPL", date(2024, 3, 2), end)
+        assert len(news) == 2 * 4 - 1
+        assert min(task.start for task in news) == start
+
+    def test_outputsize_depends_on_range(self):
+        """Test that compact is used for recent ranges and full for old ones"""
+        today = date(2024, 6, 30)
+        assert ingestion_main.daily_outputsize(date(2024, 6, 1), today) == "compact"
+        assert ingestion_main.daily_outputsize(date(2023, 6, 1), today) == "full"
+
+    def test_failed_tasks_stay_pending_for_resume(self, tmp_path):
+        """Test that only successful tasks are checkpointed to the state file"""
+        path = str(tmp_path / "state.json")
+        state = BackfillState(path)
+        manager = MagicMock()
+
+        async def get_json(provider, url, params, timeout, max_wait):
+            if params["tickers"] == "MSFT":
+                return None
+            return {"feed": [{"title": "t", "url": "u", "time_published": "x"}]}
+
+        manager.get_json.side_effect = get_json
+        tasks = [
+            BackfillTask("news", symbol, date(2024, 1, 1), date(2024, 1, 31))
+            for symbol in ("AAPL", "MSFT")
+        ]
+        with patch("backfill.insert_historic_news", return_value=True) as insert:
+            summary = asyncio.run(BackfillEngine(manager, state, 2).run(tasks))
+
+        assert summary == {"tasks": 2, "completed": 1, "failed": 1, "rows": 1}
+        assert insert.call_count == 1
+        resumed = BackfillState.load(path)
+        assert resumed.is_done(tasks[0])
+        assert not resumed.is_done(tasks[1])
+
+    def test_replayed_task_leaves_rows_unchanged(self, tmp_path):
+        """Test that a task replayed after a crash before save() is a no-op"""
+        table, writer = self._price_table()
+        manager = MagicMock()
+        manager.get_json.side_effect = self._daily_prices
+        task = BackfillTask("prices", "AAPL", date(2024, 1, 1), date(2024, 1, 31))
+
+        def run():
+            # Estado sin la tarea: como un --resume tras caer antes de save()
+            state = BackfillState(str(tmp_path / "state.json"))
+            assert asyncio.run(BackfillEngine(manager, state).run_task(task)) == 2
+            return dict(table)
+
+        with patch.object(ingestion_main, "correlation_writer", writer), patch.object(
+            ingestion_main, "_window_sentiment", return_value={}
+        ):
+            first = run()
+            assert run() == first
+        assert [row[9] for row in table.values()] == [1, 1]
+
+    def test_task_is_only_done_when_its_own_rows_are_written(self, tmp_path):
+        """Test that a failed write only fails the task whose rows it held"""
+        table, writer = self._price_table(fail_symbols={"MSFT"})
+        manager = MagicMock()
+        manager.get_json.side_effect = self._daily_prices
+        state = BackfillState(str(tmp_path / "state.json"))
+        tasks = [
+            BackfillTask("prices", symbol, date(2024, 1, 1), date(2024, 1, 31))
+            for symbol in ("AAPL", "MSFT")
+        ]
+
+        with patch.object(ingestion_main, "correlation_writer", writer), patch.object(
+            ingestion_main, "_window_sentiment", return_value={}
+        ):
+            summary = asyncio.run(BackfillEngine(manager, state, 2).run(tasks))
+
+        assert summary["completed"] == 1 and summary["failed"] == 1
+        assert state.is_done(tasks[0]) and not state.is_done(tasks[1])
+        assert {symbol for symbol, _ in table} == {"AAPL"}
+
+
+class TestWatermarks:
+    @staticmethod
+    def _store(rows=()):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = list(rows)
+
+        @contextmanager
+        def connection_factory():
+            yield conn
+
+        return WatermarkStore(connection_factory=connection_factory), conn
+
+    def test_parse_published_at_formats(self):
+        """Test Alpha Vantage and NewsAPI timestamps normalise to naive UTC"""
+        assert parse_published_at("20240115T103000") == datetime(2024, 1, 15, 10, 30)
+        assert parse_published_at("2024-01-15T12:30:00+02:00") == datetime(
+            2024, 1, 15, 10, 30
+        )
+        assert parse_published_at("not a date") is None
+
+    def test_cycle_fetches_since_watermark_and_counts_duplicates(self):
+        """Test time_from, oldest-first order, duplicates and watermark advance"""
+        store, _ = self._store(
+            [("alpha_vantage", "AAPL", datetime(2024, 1, 15, 10, 30))]
+        )
+        manager = ingestion_main.DataIngestionManager(
+            kinesis_client=MemoryKinesis(),
+            http_client=MagicMock(),
+            scheduler=QuotaScheduler(clock=SimulatedClock()),
+            watermark_store=store,
+        )
+        feed = [
+            {"title": "old", "time_published": "20240115T102959"},
+            {"title": "same second", "time_published": "20240115T103000"},
+            {"title": "new", "time_published": "20240115T120000"},
+        ]
+
+        async def get_json(provider, url, params, timeout=15, max_wait=None):
+            if provider == "yahoo":
+                return None
+            assert params["time_from"] == "20240115T1030"
+            assert params["sort"] == "EARLIEST"
+            return {"feed": feed}
+
+        with patch.object(ingestion_main, "ALPHA_VANTAGE_API_KEY", "key"), patch.object(
+            manager, "get_json", side_effect=get_json
+        ), patch("watermarks.execute_values") as upsert:
+            asyncio.run(manager.run_ingestion_cycle(["AAPL"]))
+
+        assert manager.last_cycle["new_articles"] == 2
+        assert manager.last_cycle["duplicate_articles"] == 1
+        assert len(manager.sink.client.records) == 2
+        assert store.get("alpha_vantage", "AAPL") == datetime(2024, 1, 15, 12)
+        saved = upsert.call_args[0][2]
+        assert [row[:3] for row in saved] == [
+            ("alpha_vantage", "AAPL", datetime(2024, 1, 15, 12))
+        ]
+
+    def test_historic_news_params_are_oldest_first(self):
+        """Test backfill and historic requests never default to LATEST"""
+        params = ingestion_main.news_params(
+            "AAPL", datetime(2024, 1, 15, 10, 30), datetime(2024, 1, 16)
+        )
+        assert params["time_from"] == "20240115T1030"
+        assert params["sort"] == "EARLIEST"
+
+
+class TestKinesisProducer:
+    def test_batches_and_retries_only_failed_entries(self):
+        """Test PutRecords batching with retries of the rejected entries"""
+        stream = MemoryKinesis(shards=2, failure_rate=0.3, seed=7)
+        producer = KinesisProducer(
+            stream, "stream", max_batch_records=100, linger=0.01, max_retries=20
+        )
+
+        async def send():
+            results = await asyncio.gather(
+                *(producer.put({"i": i}, f"SYM{i % 3}") for i in range(250))
+            )
+            await producer.flush()
+            return results
+
+        with patch("stream_sinks.RETRY_BASE_SECONDS", 0.001):
+            results = asyncio.run(send())
+
+        assert all(results)
+        assert sorted(record["i"] for record in stream.decoded()) == list(range(250))
+        stats = producer.stats()
+        assert stats["records_sent"] == 250
+        assert stats["retries"] > 0
+        # Tres lotes completos más los reintentos, nunca una llamada por registro
+        assert 3 <= stats["batches"] < 50
+
+    def test_aggregates_records_per_partition_key(self):
+        """Test that small records sharing a partition key are packed together"""
+        stream = MemoryKinesis()
+        producer = KinesisProducer(stream, "stream", linger=0.01, aggregate=True)
+
+        async def send():
+            return await asyncio.gather(
+                *(producer.put({"i": i}, f"SYM{i % 2}") for i in range(10))
+            )
+
+        assert all(asyncio.run(send()))
+        assert len(stream.records) == 2
+        assert sorted(record["i"] for record in stream.decoded()) == list(range(10))
+
+    def test_compresses_records(self):
+        """Test gzip records that the consumers recognise by their magic number"""
+        stream = MemoryKinesis()
+        producer = KinesisProducer(stream, "stream", linger=0.01, compression="gzip")
+        assert asyncio.run(producer.put({"i": 1, "text": "x" * 500}, "SYM"))
+        assert stream.records[0]["Data"][:2] == b"\x1f\x8b"
+        assert stream.decoded() == [{"i": 1, "text": "x" * 500}]
+        assert producer.stats()["bytes_sent"] < producer.stats()["bytes_raw"]
+
+    def test_gives_up_after_max_retries(self):
+        """Test that permanently rejected records are reported as failed"""
+        producer = KinesisProducer(
+            MemoryKinesis(failure_rate=1.0), "stream", linger=0, max_retries=2
+        )
+        with patch("stream_sinks.RETRY_BASE_SECONDS", 0.001):
+            assert asyncio.run(producer.put({"i": 1}, "SYM")) is False
+        assert producer.stats()["records_failed"] == 1
+        assert producer.stats()["batches"] == 3
+
+
+class TestStreamSinks:
+    @staticmethod
+    def _send(sink, count, symbols=3):
+        async def send():
+            results = await asyncio.gather(
+                *(sink.put({"i": i}, f"SYM{i % symbols}") for i in range(count))
+            )
+            await sink.flush()
+            return results
+
+        return asyncio.run(send())
+
+    def test_memory_sink_partitions_by_symbol_and_compresses(self):
+        """Test that each symbol lands in one partition, in order"""
+        sink = MemorySink(partitions=4, linger=0.01, compression="gzip")
+        assert all(self._send(sink, 300))
+        by_partition = [sink.records(partition) for partition in range(4)]
+        for symbol in ("SYM0", "SYM1", "SYM2"):
+            partition = partition_for(symbol, 4)
+            values = [
+                r["i"] for r in by_partition[partition] if r["i"] % 3 == int(symbol[-1])
+            ]
+            assert values == sorted(values) and len(values) == 100
+        stats = sink.stats()
+        assert stats["records_sent"] == 300
+        assert stats["bytes_sent"] < stats["bytes_raw"]
+
+    def test_segment_file_sink_appends_and_rolls_segments(self, tmp_path):
+        """Test segment rollover, reopening and reading back the records"""
+        sink = SegmentFileSink(
+            directory=str(tmp_path),
+            partitions=2,
+            segment_bytes=200,
+            max_batch_records=5,
+            linger=0.01,
+        )
+        assert all(self._send(sink, 50))
+        sink.close()
+        sink = SegmentFileSink(directory=str(tmp_path), partitions=2, linger=0.01)
+        assert all(self._send(sink, 10))
+        sink.close()
+        assert len(list(tmp_path.glob("*/*.seg"))) > 2
+        values = sorted(record["i"] for record in read_segments(str(tmp_path)))
+        assert values == sorted(list(range(50)) + list(range(10)))
+
+    def test_kafka_sink_retries_undelivered_messages(self):
+        """Test that messages without a delivery report are produced again"""
+        producer = MagicMock()
+        produced = []
+
+        def produce(topic, value, key, on_delivery):
+            produced.append(value)
+            # El primer intento de cada mensaje falla
+            error = None if produced.count(value) > 1 else "timed out"
+            on_delivery(error, None)
+
+        producer.produce.side_effect = produce
+        sink = KafkaSink(topic="news", producer=producer, linger=0.01)
+        with patch("stream_sinks.RETRY_BASE_SECONDS", 0.001):
+            assert all(self._send(sink, 5))
+        assert len(produced) == 10
+        assert producer.produce.call_args.kwargs["key"] in (b"SYM0", b"SYM1")
+        assert sink.stats()["retries"] == 5
+
+    def test_create_sink_selects_backend(self, tmp_path):
+        """Test sink selection by name and rejection of unknown settings"""
+        assert isinstance(create_sink("memory"), MemorySink)
+        assert isinstance(create_sink("file", directory=str(tmp_path)), SegmentFileSink)
+        kinesis = create_sink(
+            "kinesis", kinesis_client=MemoryKinesis(), stream_name="s"
+        )
+        assert isinstance(kinesis, KinesisProducer)
+        with pytest.raises(ValueError):
+            create_sink("carrier-pigeon")
+        with pytest.raises(ValueError):
+            MemorySink(compression="lz4")
+
+
+class TestArticleDedup:
+    def test_url_normalization(self):
+        """Test that tracking params, scheme, www and fragments are ignored"""
+        assert normalize_url("https://www.Example.com/a/?utm_source=x&id=5#top") == (
+            "example.com/a/?id=5"
+        )
+        assert normalize_url("http://example.com/a?fbclid=1&utm_medium=y") == (
+            "example.com/a"
+        )
+        assert article_key({"url": "https://example.com/a?utm_source=x"}) == (
+            article_key({"url": "http://www.example.com/a/"})
+        )
+        assert article_key({"url": None, "title": "A  B", "description": None}) == (
+            article_key({"url": "", "title": " a b", "description": ""})
+        )
+
+    def test_copies_are_dropped_or_linked(self):
+        """Test alias copies are dropped and other symbols become links"""
+        dedup = ArticleDeduplicator()
+        article = {"url": "https://example.com/a", "title": "T", "description": "D"}
+        new, links = dedup.split(
+            [
+                {**article, "symbol": "GOOGL"},
+                {**article, "url": article["url"] + "?utm_source=x", "symbol": "GOOGL"},
+                {**article, "url": "https://mirror.example.org/a", "symbol": "MSFT"},
+                {**article, "symbol": "MSFT"},
+            ]
+        )
+
+        assert [item["symbol"] for item in new] == ["GOOGL"]
+        assert new[0]["symbols"] == ["GOOGL"]
+        assert [(link["url"], link["symbols"]) for link in links] == [
+            (article["url"], ["GOOGL", "MSFT"])
+        ]
+        assert dedup.stats == {"new": 1, "linked": 1, "dropped": 2}
+
+        dedup.forget(new)
+        assert dedup.split([{**article, "symbol": "GOOGL"}])[0]
+
+    def test_insert_writes_links_as_symbol_upserts(self):
+        """Test that a stored copy for another symbol only extends symbols"""
+        item = {
+            "title": "T",
+            "url": "https://example.com/a",
+            "published_at": "20240115T103000",
+            "symbol": "AAPL",
+        }
+        with patch.object(
+            ingestion_main, "article_dedup", ArticleDeduplicator()
+        ), patch.object(ingestion_main, "news_writer") as writer:
+            assert ingestion_main.insert_news_pg([item, {**item, "symbol": "MSFT"}])
+
+        rows = [row for call in writer.write.call_args_list for row in call.args[0]]
+        assert [row[-2:] for row in rows] == [
+            ("AAPL", ["AAPL"]),
+            ("AAPL", ["AAPL", "MSFT"]),
+        ]
+        merged = ingestion_main._merge_news_rows(rows[0], rows[1][:-1] + (["TSLA"],))
+        assert merged[-1] == ["AAPL", "TSLA"]
+        assert ingestion_main._news_row_key(rows[0]) == (
+            ingestion_main._news_row_key(rows[1])
+        )
+        statement = repr(ingestion_main.news_writer._insert_sql)
+        assert "EXCLUDED.symbols <@" in statement
+
+
 class TestRequestLogging:
     def test_request_has_request_id(self):
         """Test that requests include request ID in headers"""
@@ -288,6 +1188,25 @@ class TestDatabaseConnection:
         # Permite pasar si hay error de conexión en CI
         assert "total_records" in data or "error" in data
 
+    @pytest.mark.parametrize(
+        "path", ["/api/sentiment/summary?hours=3", "/api/news/latest?limit=3"]
+    )
+    def test_exhausted_pool_returns_503_instead_of_sample_data(self, path):
+        """Test a busy pool is not mistaken for a database outage"""
+        busy_pool = MagicMock()
+        busy_pool.getconn.side_effect = main.PoolError("connection pool exhausted")
+        exhausted = main.metrics.db_pool_exhausted
+        db_errors = main.metrics.db_connection_errors
+
+        with patch("main.get_pool", return_value=busy_pool):
+            response = client.get(path)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.json()["detail"] == "Database connection pool exhausted"
+        assert main.metrics.db_pool_exhausted == exhausted + 1
+        assert main.metrics.db_connection_errors == db_errors
+
 
 class TestRootEndpoint:
     def test_root_endpoint(self):
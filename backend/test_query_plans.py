@@ -0,0 +1,264 @@
+"""
+Tests de regresión de planes de consulta
+Aplica las migraciones sobre una base temporal con datos sembrados y verifica
+que cada consulta de la API se resuelve con índices y no con un Seq Scan
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+import pytest
+from alembic import command
+from alembic.config import Config
+from db_pool import DB_CONFIG
+from partitions import PARTITIONED_TABLES, month_start, partition_name
+from queries import QUERIES
+
+PLAN_TEST_DATABASE = f"{DB_CONFIG['database']}_plan_test"
+
+# Dos años de datos horarios para 20 símbolos (~350k filas por tabla)
+SEED_SYMBOLS = 20
+SEED_HOURS = 24 * 365 * 2
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+# Consultas de los endpoints y los parámetros con los que se verifican
+ENDPOINT_QUERIES = {
+    "sentiment_summary": (24,),
+    "sentiment_timeline_hour": (24,),
+    "sentiment_timeline_day": (24,),
+    "correlation_analysis": (24,),
+    "stock_prices": (24,),
+    "latest_news": (10,),
+    "dashboard_general_stats": (24,),
+    "dashboard_sentiment_distribution": (24,),
+    "count_recent_records": (24,),
+    "sentiment_summary_by_symbol": (24,),
+    "stock_prices_by_symbol": (24,),
+}
+
+SEED_SQL = """
+INSERT INTO financial_sentiment_correlation (
+    hour, symbol, avg_sentiment_score, avg_sentiment_subjectivity,
+    avg_close_price, max_high_price, min_low_price, total_volume, price_points,
+    news_count, sentiment_category, price_change_percent, sentiment_change
+)
+SELECT
+    date_trunc('hour', NOW()) - make_interval(hours => h),
+    'SYM' || s,
+    sin(h + s) / 2,
+    0.5,
+    100 + s + cos(h),
+    101 + s,
+    99 + s,
+    1000 + h,
+    4,
+    3,
+    (ARRAY['Positive', 'Negative', 'Neutral'])[1 + (h + s) %% 3],
+    sin(h) / 10,
+    cos(h) / 10
+FROM generate_series(0, %(hours)s - 1) AS h, generate_series(1, %(symbols)s) AS s;
+
+INSERT INTO news_with_sentiment (
+    title, description, url, published_at, source_name,
+    sentiment_score, sentiment_subjectivity, symbol
+)
+SELECT
+    'Title ' || h || '-' || s,
+    'Description',
+    'https://example.com/' || h || '/' || s,
+    CASE WHEN h %% 50 = 0 THEN NULL ELSE NOW() - make_interval(hours => h) END,
+    'Source',
+    sin(h * s) / 2,
+    0.5,
+    'SYM' || s
+FROM generate_series(0, %(hours)s - 1) AS h, generate_series(1, %(symbols)s) AS s;
+
+INSERT INTO stock_prices (
+    symbol, timestamp, open_price, high_price, low_price, close_price, volume
+)
+SELECT
+    'SYM' || s,
+    NOW() - make_interval(hours => h),
+    100, 101, 99, 100 + cos(h), 1000
+FROM generate_series(0, %(hours)s - 1) AS h, generate_series(1, %(symbols)s) AS s;
+"""
+
+# Join del DAG entre noticias y precios por (symbol, hora)
+DAG_JOIN_SQL = """
+SELECT n.symbol, DATE_TRUNC('hour', n.published_at), AVG(s.close_price)
+FROM news_with_sentiment n
+JOIN stock_prices s
+    ON s.symbol = n.symbol
+    AND DATE_TRUNC('hour', s.timestamp) = DATE_TRUNC('hour', n.published_at)
+WHERE n.published_at >= NOW() - INTERVAL '24 hours'
+GROUP BY 1, 2
+"""
+
+
+def _connect(database: str):
+    config = {**DB_CONFIG, "database": database, "connect_timeout": 3}
+    conn = psycopg2.connect(**config)
+    conn.autocommit = True
+    return conn
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _scanned_tables(cursor, plan: dict, node_type: str) -> dict:
+    """Filas (según el catálogo) de cada relación leída con un tipo de nodo"""
+    tables = [
+        node["Relation Name"]
+        for node in _plan_nodes(plan)
+        if node["Node Type"] == node_type
+    ]
+    if not tables:
+        return {}
+    cursor.execute(
+        "SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)",
+        (tables,),
+    )
+    return dict(cursor.fetchall())
+
+
+def _explain(cursor, sql: str, params=()) -> dict:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+@pytest.fixture(scope="module")
+def seeded_db():
+    """Base temporal migrada con alembic y con datos sembrados"""
+    try:
+        admin = _connect(DB_CONFIG["database"])
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+
+    admin_cursor = admin.cursor()
+    admin_cursor.execute(f"DROP DATABASE IF EXISTS {PLAN_TEST_DATABASE}")
+    admin_cursor.execute(f"CREATE DATABASE {PLAN_TEST_DATABASE}")
+
+    previous_db_name = os.environ.get("DB_NAME")
+    os.environ["DB_NAME"] = PLAN_TEST_DATABASE
+    try:
+        alembic_config = Config()
+        alembic_config.set_main_option(
+            "script_location", str(Path(__file__).parent / "alembic")
+        )
+        command.upgrade(alembic_config, "head")
+    finally:
+        if previous_db_name is None:
+            os.environ.pop("DB_NAME", None)
+        else:
+            os.environ["DB_NAME"] = previous_db_name
+
+    conn = _connect(PLAN_TEST_DATABASE)
+    cursor = conn.cursor()
+    cursor.execute(SEED_SQL, {"hours": SEED_HOURS, "symbols": SEED_SYMBOLS})
+    cursor.execute("VACUUM ANALYZE")
+    cursor.close()
+
+    try:
+        yield conn
+    finally:
+        conn.close()
+        admin_cursor.execute(f"DROP DATABASE IF EXISTS {PLAN_TEST_DATABASE}")
+        admin.close()
+
+
+def _window_partitions(hours: int) -> set:
+    """Particiones mensuales que solapan la ventana de las últimas `hours` horas"""
+    now = datetime.now()
+    months = {month_start(now - timedelta(hours=hours)), month_start(now)}
+    return {
+        partition_name(table, month) for table in PARTITIONED_TABLES for month in months
+    }
+
+
+class TestQueryPlans:
+    """Cada endpoint debe usar un índice o particiones podadas a su ventana"""
+
+    @pytest.mark.parametrize("name", sorted(ENDPOINT_QUERIES))
+    def test_endpoint_query_uses_index(self, seeded_db, name):
+        query = QUERIES[name]
+        cursor = seeded_db.cursor()
+        cursor.execute(f"DEALLOCATE ALL; {query.prepare_sql}")
+        plan = _explain(cursor, query.execute_sql, ENDPOINT_QUERIES[name])
+        seq_scanned = _scanned_tables(cursor, plan, "Seq Scan")
+        cursor.close()
+
+        # Se admiten Seq Scan sobre particiones vacías (meses futuros) y sobre
+        # las particiones de la propia ventana, que ya acotan la lectura
+        allowed = set()
+        if name != "latest_news":
+            allowed = _window_partitions(ENDPOINT_QUERIES[name][0])
+        populated = {
+            table
+            for table, rows in seq_scanned.items()
+            if rows > 0 and table not in allowed
+        }
+        assert not populated, f"{name}: Seq Scan on {sorted(populated)}"
+
+    @pytest.mark.parametrize(
+        "name", ["sentiment_summary", "latest_news", "sentiment_summary_by_symbol"]
+    )
+    def test_time_window_prunes_partitions(self, seeded_db, name):
+        query = QUERIES[name]
+        cursor = seeded_db.cursor()
+        cursor.execute(f"DEALLOCATE ALL; {query.prepare_sql}")
+        cursor.execute(
+            f"EXPLAIN (ANALYZE, FORMAT JSON) {query.execute_sql}",
+            ENDPOINT_QUERIES[name],
+        )
+        plan = cursor.fetchone()[0][0]["Plan"]
+        cursor.close()
+
+        scanned = {
+            node["Relation Name"]
+            for node in _plan_nodes(plan)
+            if "Relation Name" in node and node.get("Actual Loops", 0) > 0
+        }
+        # Dos años de datos: una ventana corta no debe leer meses antiguos
+        assert 0 < len(scanned) <= 6, f"{name}: {sorted(scanned)}"
+
+    def test_dag_join_uses_expression_indexes(self, seeded_db):
+        cursor = seeded_db.cursor()
+        plan = _explain(cursor, DAG_JOIN_SQL)
+
+        indexes = {
+            node.get("Index Name")
+            for node in _plan_nodes(plan)
+            if node["Node Type"] in INDEX_SCANS
+        }
+        seq_scanned = _scanned_tables(cursor, plan, "Seq Scan")
+        cursor.close()
+
+        assert "ix_stock_prices_symbol_timestamp_hour" in indexes
+        assert not [table for table, rows in seq_scanned.items() if rows > 0]
+
+    def test_single_column_indexes_replaced(self, seeded_db):
+        cursor = seeded_db.cursor()
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'public'")
+        indexes = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+
+        assert "ix_financial_sentiment_correlation_hour" not in indexes
+        assert "ix_news_with_sentiment_published_at" not in indexes
+        assert {
+            "ix_financial_sentiment_correlation_symbol_hour",
+            "ix_financial_sentiment_correlation_hour_covering",
+            "ix_financial_sentiment_correlation_hour_brin",
+            "ix_news_with_sentiment_published_at_recent",
+            "ix_news_with_sentiment_published_at_brin",
+            "ix_stock_prices_timestamp_brin",
+        } <= indexes
@@ -0,0 +1,195 @@
+"""
+Marcas de agua de la ingestión de noticias
+Guarda por (proveedor, símbolo) la fecha de publicación más reciente ya
+ingerida. Las peticiones piden solo lo publicado desde entonces (time_from en
+Alpha Vantage, from en NewsAPI), de lo más antiguo a lo más reciente, y los
+artículos anteriores a la marca se descartan antes de puntuarlos, enviarlos o
+escribirlos.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db_pool import pooled_connection
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Parámetro y formato de fecha de cada proveedor en las peticiones, más los
+# parámetros que ordenan de lo más antiguo a lo más reciente: Alpha Vantage
+# devuelve por defecto lo último (sort=LATEST) y, con una página llena, la
+# marca saltaría por encima de lo publicado antes que lo devuelto
+_REQUEST_PARAMS = {
+    "alpha_vantage": ("time_from", "%Y%m%dT%H%M", {"sort": "EARLIEST"}),
+    "newsapi": ("from", "%Y-%m-%dT%H:%M:%S", {}),
+}
+
+_UPSERT_SQL = """
+    INSERT INTO ingestion_watermarks AS target
+        (provider, symbol, last_published_at, updated_at)
+    VALUES %s
+    ON CONFLICT (provider, symbol) DO UPDATE SET
+        last_published_at = GREATEST(
+            target.last_published_at, EXCLUDED.last_published_at
+        ),
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def parse_published_at(value) -> Optional[datetime]:
+    """
+    Fecha de publicación de un artículo como datetime UTC sin zona
+
+    Admite el formato de Alpha Vantage (20240115T103000) y el ISO 8601 de
+    NewsAPI (2024-01-15T10:30:00Z). Devuelve None si no se puede interpretar.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    elif not value:
+        return None
+    else:
+        text = str(value).replace("Z", "+00:00")
+        parsed = None
+        for fmt in ("%Y%m%dT%H%M%S", "%Y%m%dT%H%M"):
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                pass
+        if parsed is None:
+            try:
+                parsed = datetime.fromisoformat(text)
+            except ValueError:
+                return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class WatermarkStore:
+    """
+    Marcas de agua persistidas en la tabla ingestion_watermarks
+
+    Se cargan todas de una vez y los avances se acumulan en memoria hasta
+    flush(), que los escribe en una sola sentencia. Un avance solo debe
+    registrarse cuando los artículos ya se han entregado, así que un fallo
+    antes del flush produce como mucho duplicados, nunca huecos.
+    """
+
+    def __init__(self, connection_factory=pooled_connection):
+        self.connection_factory = connection_factory
+        self._marks: Dict[Tuple[str, str], datetime] = {}
+        self._pending: Dict[Tuple[str, str], datetime] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Recargar todas las marcas desde la base de datos"""
+        try:
+            with self.connection_factory() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT provider, symbol, last_published_at "
+                    "FROM ingestion_watermarks"
+                )
+                rows = cursor.fetchall()
+                cursor.close()
+                conn.commit()
+        except Exception as e:
+            # Sin marcas se piden las últimas noticias, como antes
+            logger.warning(f"Could not load ingestion watermarks: {e}")
+            rows = []
+        with self._lock:
+            for provider, symbol, published_at in rows:
+                key = (provider, symbol)
+                if key not in self._marks or published_at > self._marks[key]:
+                    self._marks[key] = published_at
+            self._loaded = True
+
+    def get(self, provider: str, symbol: str) -> Optional[datetime]:
+        """Última fecha de publicación ingerida (None si no hay)"""
+        if not self._loaded:
+            self.refresh()
+        return self._marks.get((provider, symbol))
+
+    def request_params(self, provider: str, symbol: str) -> Dict[str, str]:
+        """Parámetro de la petición que limita los resultados a la marca"""
+        mark = self.get(provider, symbol)
+        if mark is None or provider not in _REQUEST_PARAMS:
+            return {}
+        name, fmt, order = _REQUEST_PARAMS[provider]
+        return {name: mark.strftime(fmt), **order}
+
+    def split_new(
+        self, provider: str, symbol: str, items: Iterable[Dict]
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Separar los artículos desde la marca de los anteriores
+
+        Los publicados en el mismo segundo que la marca se consideran nuevos:
+        pueden no haber llegado en la página anterior, y los que sí llegaron
+        los descartan después los deduplicadores y el upsert por article_key.
+        Los artículos sin fecha interpretable también se consideran nuevos.
+
+        Returns:
+            (nuevos, duplicados)
+        """
+        mark = self.get(provider, symbol)
+        new, duplicates = [], []
+        for item in items:
+            published_at = parse_published_at(item.get("published_at"))
+            if mark is not None and published_at is not None and published_at < mark:
+                duplicates.append(item)
+            else:
+                new.append(item)
+        return new, duplicates
+
+    def advance(self, provider: str, symbol: str, items: Iterable[Dict]):
+        """Mover la marca a la fecha más reciente de los artículos entregados"""
+        dates = [parse_published_at(item.get("published_at")) for item in items]
+        dates = [value for value in dates if value is not None]
+        if not dates:
+            return
+        latest = max(dates)
+        key = (provider, symbol)
+        with self._lock:
+            if key not in self._marks or latest > self._marks[key]:
+                self._marks[key] = latest
+                self._pending[key] = latest
+
+    def flush(self) -> int:
+        """
+        Escribir los avances pendientes
+
+        Returns:
+            Número de marcas escritas
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        now = datetime.utcnow()
+        rows = [
+            (provider, symbol, published_at, now)
+            for (provider, symbol), published_at in pending.items()
+        ]
+        try:
+            with self.connection_factory() as conn:
+                cursor = conn.cursor()
+                execute_values(cursor, _UPSERT_SQL, rows)
+                cursor.close()
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not save ingestion watermarks: {e}")
+            with self._lock:
+                for key, published_at in pending.items():
+                    if key not in self._pending or published_at > self._pending[key]:
+                        self._pending[key] = published_at
+            return 0
+        return len(rows)
+
+
+# Marcas compartidas por el ciclo en tiempo real y los scripts históricos
+watermarks = WatermarkStore()
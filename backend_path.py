@@ -0,0 +1,16 @@
+"""
+Añade backend/ al path de los scripts de la raíz
+Los módulos de backend se importan entre sí sin prefijo de paquete
+(from bulk_writer import ...), así que backend.ingestion_main solo se puede
+importar con backend/ en sys.path. Se importa antes que backend.*:
+
+    import backend_path  # noqa: F401
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
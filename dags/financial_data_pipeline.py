@@ -156,9 +156,30 @@ def ingest_financial_data(**context):
         for news in all_news:
             cursor.execute(
                 """
-                INSERT INTO news_with_sentiment (title, description, url, published_at, source_name, symbol)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (url) DO NOTHING
+                INSERT INTO news_with_sentiment AS target (
+                    title,
+                    description,
+                    url,
+                    published_at,
+                    source_name,
+                    symbol,
+                    symbols
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, ARRAY[%s]::varchar[])
+                ON CONFLICT (article_key, published_at) DO UPDATE SET
+                    symbols = ARRAY(
+                        SELECT DISTINCT linked
+                        FROM unnest(
+                            COALESCE(target.symbols, ARRAY[target.symbol])
+                            || EXCLUDED.symbols
+                        ) AS linked
+                        WHERE linked IS NOT NULL ORDER BY linked
+                    ),
+                    updated_at = NOW()
+                WHERE NOT (
+                    EXCLUDED.symbols
+                    <@ COALESCE(target.symbols, ARRAY[target.symbol])
+                )
             """,
                 (
                     news.get("title", ""),
@@ -167,6 +188,7 @@ def ingest_financial_data(**context):
                     datetime.fromisoformat(news["publishedAt"].replace("Z", "+00:00")),
                     news.get("source", {}).get("name", "Unknown"),
                     news.get("symbol", "UNKNOWN"),
+                    news.get("symbol", "UNKNOWN"),
                 ),
             )
 
@@ -207,14 +229,22 @@ def ingest_financial_data(**context):
 def process_sentiment(**context):
     """
     Función para procesar análisis de sentimiento usando TextBlob
+
+    Los textos se puntúan en lote con el servicio de la ingestión
+    (ingestion/sentiment_service.py), repartidos entre varios procesos
     """
     import psycopg2
+    from psycopg2.extras import execute_values
     import pandas as pd
-    from textblob import TextBlob
     from datetime import datetime
     import os
+    import sys
     import logging
 
+    # El servicio de puntuación vive en ingestion/, montado junto a los DAGs
+    sys.path.append(os.getenv("INGESTION_DIR", "/opt/airflow/ingestion"))
+    from sentiment_service import SentimentService
+
     # Configurar logging
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
@@ -247,24 +277,39 @@ def process_sentiment(**context):
         news_to_process = cursor.fetchall()
         logger.info(f"Procesando sentimiento para {len(news_to_process)} noticias")
 
-        for news_id, title, description in news_to_process:
-            # Combinar título y descripción para análisis
-            text = f"{title} {description}"
-
-            # Análisis de sentimiento con TextBlob
-            blob = TextBlob(text)
-            sentiment_score = blob.sentiment.polarity
-            sentiment_subjectivity = blob.sentiment.subjectivity
+        # Combinar título y descripción para análisis
+        texts = [f"{title} {description}" for _, title, description in news_to_process]
 
-            # Actualizar la base de datos
-            cursor.execute(
-                """
-                UPDATE news_with_sentiment 
-                SET sentiment_score = %s, sentiment_subjectivity = %s
-                WHERE id = %s
-            """,
-                (sentiment_score, sentiment_subjectivity, news_id),
+        # Análisis de sentimiento con TextBlob, en lote y en varios procesos
+        with SentimentService() as scorer:
+            polarity, subjectivity = scorer.score(texts)
+            stats = scorer.stats()
+        logger.info(
+            f"Sentimiento: {stats['texts']} textos; "
+            f"aciertos de la memo: {(stats['memo'] or {}).get('hit_rate')}; "
+            "textos/s por proceso: "
+            + ", ".join(
+                str(worker["texts_per_second"]) for worker in stats["workers"].values()
             )
+        )
+
+        # Actualizar la base de datos en una sola sentencia
+        execute_values(
+            cursor,
+            """
+            UPDATE news_with_sentiment AS news
+            SET sentiment_score = scored.score,
+                sentiment_subjectivity = scored.subjectivity
+            FROM (VALUES %s) AS scored (id, score, subjectivity)
+            WHERE news.id = scored.id
+        """,
+            [
+                (news_id, score, subject)
+                for (news_id, _, _), score, subject in zip(
+                    news_to_process, polarity, subjectivity
+                )
+            ],
+        )
 
         conn.commit()
         cursor.close()
@@ -344,7 +389,10 @@ def update_correlation_table(**context):
                 min_low_price = EXCLUDED.min_low_price,
                 total_volume = EXCLUDED.total_volume,
                 news_count = EXCLUDED.news_count,
-                price_points = EXCLUDED.price_points
+                price_points = EXCLUDED.price_points,
+                -- Los agregados del DAG son la base de los siguientes upserts
+                -- de la ingestión (una barra "legacy", ver ingestion_main)
+                price_bars = NULL
         """,
             (start_time, end_time),
         )
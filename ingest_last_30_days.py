@@ -3,6 +3,7 @@
 Ingesta de precios históricos de los últimos 30 días para todos los símbolos.
 """
 
+import backend_path  # noqa: F401
 from backend.ingestion_main import (
     fetch_historic_prices,
     insert_historic_prices,
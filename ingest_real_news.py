@@ -2,6 +2,7 @@
 """
 Ingesta de noticias reales usando NewsAPI para todos los símbolos.
 """
+import backend_path  # noqa: F401
 from backend.ingestion_main import (
     fetch_historic_news,
     insert_historic_news,
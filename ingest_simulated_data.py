@@ -5,6 +5,7 @@ Script para ingestar datos simulados de precios y noticias para probar el sistem
 
 import random
 from datetime import datetime, timedelta
+import backend_path  # noqa: F401
 from backend.ingestion_main import insert_news_pg, insert_stock_pg, STOCK_SYMBOLS
 import time
 
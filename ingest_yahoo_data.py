@@ -2,6 +2,7 @@
 """
 Ingesta de precios históricos reales usando Yahoo Finance para todos los símbolos.
 """
+import backend_path  # noqa: F401
 from backend.ingestion_main import (
     fetch_yahoo_prices,
     insert_historic_prices,
@@ -1,11 +1,11 @@
 import os
 import csv
-import time
 from datetime import datetime
 from typing import List, Dict, Optional
 import requests
-from textblob import TextBlob
 from dotenv import load_dotenv
+from quota_scheduler import QuotaScheduler, is_throttled, retry_after_seconds
+from sentiment_service import SentimentService
 
 # Cargar variables de entorno desde .env o config.env
 load_dotenv()
@@ -72,12 +72,36 @@ COMPANY_NAMES = {
 NEWS_CSV = "news_with_sentiment.csv"
 PRICES_CSV = "stock_prices.csv"
 
+# Cuotas de NewsAPI y Alpha Vantage (límites QUOTA_*)
+quota_scheduler = QuotaScheduler()
 
-def fetch_news(symbol: str) -> List[Dict]:
+
+def get_with_quota(provider: str, url: str, params: Dict) -> Optional[Dict]:
+    """GET dentro de la cuota del proveedor; None si se agotó o hubo throttling"""
+    if not quota_scheduler.acquire_blocking(provider):
+        print(f"Cuota de {provider} agotada, se omite la petición")
+        return None
+    r = requests.get(url, params=params, timeout=10)
+    try:
+        data = r.json()
+    except ValueError:
+        data = None
+    if is_throttled(r.status_code, data):
+        quota_scheduler.record_result(
+            provider, throttled=True, retry_after=retry_after_seconds(r.headers)
+        )
+        print(f"{provider} limitó la petición (throttling)")
+        return None
+    r.raise_for_status()
+    return data
+
+
+def fetch_news(symbol: str, scorer: SentimentService) -> List[Dict]:
     if not NEWS_API_KEY:
         print("NEWS_API_KEY not set.")
         return []
     all_news = []
+    fetched = False
     for company in COMPANY_NAMES.get(symbol, [symbol]):
         url = "https://newsapi.org/v2/everything"
         params = {
@@ -88,16 +112,11 @@ def fetch_news(symbol: str) -> List[Dict]:
             "apiKey": NEWS_API_KEY,
         }
         try:
-            r = requests.get(url, params=params, timeout=10)
-            r.raise_for_status()
-            data = r.json()
+            data = get_with_quota("newsapi", url, params)
+            if data is None:
+                continue
+            fetched = True
             for article in data.get("articles", []):
-                text = (
-                    article.get("title", "")
-                    + " "
-                    + (article.get("description", "") or "")
-                )
-                sentiment = TextBlob(text).sentiment.polarity if text else 0.0
                 all_news.append(
                     {
                         "symbol": symbol,
@@ -106,12 +125,20 @@ def fetch_news(symbol: str) -> List[Dict]:
                         "description": article.get("description", ""),
                         "published_at": article.get("publishedAt", ""),
                         "url": article.get("url", ""),
-                        "sentiment": sentiment,
+                        "sentiment": 0.0,
                         "ingested_at": datetime.now().isoformat(),
                     }
                 )
         except Exception as e:
             print(f"Error fetching news for {company}: {e}")
+    if fetched:
+        quota_scheduler.record_result("newsapi", symbol, new_items=len(all_news))
+    # Todas las noticias del símbolo se puntúan en un lote, en paralelo
+    polarity, _ = scorer.score(
+        [(item["title"] or "") + " " + (item["description"] or "") for item in all_news]
+    )
+    for item, sentiment in zip(all_news, polarity):
+        item["sentiment"] = sentiment
     return all_news
 
 
@@ -127,9 +154,10 @@ def fetch_stock_price(symbol: str) -> Optional[Dict]:
         "apikey": ALPHA_VANTAGE_API_KEY,
     }
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
+        data = get_with_quota("alpha_vantage", url, params)
+        if data is None:
+            return None
+        quota_scheduler.record_result("alpha_vantage", symbol)
         ts = data.get("Time Series (1min)", {})
         if ts:
             latest_time = max(ts.keys())
@@ -162,18 +190,28 @@ def save_to_csv(filename: str, rows: List[Dict], fieldnames: List[str]):
 def main():
     all_news = []
     all_prices = []
-    for symbol in STOCK_SYMBOLS:
-        print(f"Fetching for {symbol}...")
-        news = fetch_news(symbol)
-        if news:
-            save_to_csv(NEWS_CSV, news, list(news[0].keys()))
-            all_news.extend(news)
-        price = fetch_stock_price(symbol)
-        if price:
-            save_to_csv(PRICES_CSV, [price], list(price.keys()))
-            all_prices.append(price)
-        time.sleep(1)  # Avoid API rate limits
+    with SentimentService() as scorer:
+        for symbol in STOCK_SYMBOLS:
+            print(f"Fetching for {symbol}...")
+            news = fetch_news(symbol, scorer)
+            if news:
+                save_to_csv(NEWS_CSV, news, list(news[0].keys()))
+                all_news.extend(news)
+            price = fetch_stock_price(symbol)
+            if price:
+                save_to_csv(PRICES_CSV, [price], list(price.keys()))
+                all_prices.append(price)
+        stats = scorer.stats()
     print(f"Guardado {len(all_news)} noticias y {len(all_prices)} precios.")
+    print(f"Uso de cuota: {quota_scheduler.report()}")
+    print(
+        f"Sentimiento: {stats['texts']} textos; "
+        f"aciertos de la memo: {(stats['memo'] or {}).get('hit_rate')}; "
+        "textos/s por proceso: "
+        + ", ".join(
+            str(worker["texts_per_second"]) for worker in stats["workers"].values()
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Main ingestion script for financial data pipeline.
-Fetches news and stock data from APIs and sends to Kinesis streams.
+Fetches news and stock data from APIs, scores news sentiment and stores both
+in PostgreSQL through a staged pipeline: fetch -> score -> dedupe -> write.
 """
 
 import asyncio
@@ -9,17 +10,22 @@ import json
 import logging
 import os
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 
 import boto3
 import requests
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.logging import RichHandler
-from rich.progress import Progress, SpinnerColumn, TextColumn
 import psycopg2
-from textblob import TextBlob
+from psycopg2.extras import execute_values
+
+from pipeline import Pipeline, Stage
+from quota_scheduler import QuotaScheduler, is_throttled, retry_after_seconds
+from sentiment_engines import provider_score
+from sentiment_service import SentimentService
 
 # Load environment variables
 load_dotenv()
@@ -94,6 +100,26 @@ PG_USER = os.getenv("DB_USER", "postgres")
 PG_PASSWORD = os.getenv("DB_PASSWORD", "password")
 PG_PORT = int(os.getenv("DB_PORT", "5432"))
 
+# Etapas del pipeline: trabajadores por etapa, tamaño de lote y capacidad de
+# las colas entre etapas
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "200"))
+PIPELINE_FETCH_CONCURRENCY = int(os.getenv("PIPELINE_FETCH_CONCURRENCY", "4"))
+PIPELINE_SCORE_BATCH = int(os.getenv("PIPELINE_SCORE_BATCH", "32"))
+PIPELINE_WRITE_CONCURRENCY = int(os.getenv("PIPELINE_WRITE_CONCURRENCY", "2"))
+PIPELINE_WRITE_BATCH = int(os.getenv("PIPELINE_WRITE_BATCH", "100"))
+PIPELINE_REPORT_SECONDS = float(os.getenv("PIPELINE_REPORT_SECONDS", "10"))
+# Artículos ya guardados que se recuerdan entre ciclos
+NEWS_DEDUP_CACHE_SIZE = int(os.getenv("NEWS_DEDUP_CACHE_SIZE", "50000"))
+
+
+def _article_key(article: Dict) -> str:
+    """URL sin esquema, fragmento ni barra final (o el título si no hay URL)"""
+    url = (article.get("url") or "").split("#")[0].rstrip("/").lower()
+    url = url.split("://", 1)[-1]
+    if url.startswith("www."):
+        url = url[4:]
+    return url or (article.get("title") or "").strip().lower()
+
 
 def insert_news_pg(news_items):
     try:
@@ -105,12 +131,25 @@ def insert_news_pg(news_items):
             port=PG_PORT,
         )
         cur = conn.cursor()
-        for item in news_items:
-            cur.execute(
-                """
-                INSERT INTO news_with_sentiment (title, description, url, published_at, source_name, sentiment_score, sentiment_subjectivity, symbol)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """,
+        # Todo el lote en una sentencia en lugar de un INSERT por noticia
+        execute_values(
+            cur,
+            """
+            INSERT INTO news_with_sentiment (
+                title,
+                description,
+                url,
+                published_at,
+                source_name,
+                sentiment_score,
+                sentiment_subjectivity,
+                symbol,
+                symbols
+            )
+            VALUES %s
+            ON CONFLICT DO NOTHING
+        """,
+            [
                 (
                     item.get("title"),
                     item.get("description"),
@@ -120,8 +159,12 @@ def insert_news_pg(news_items):
                     item.get("sentiment_score", 0),
                     item.get("sentiment_subjectivity", 0),
                     item.get("symbol"),
-                ),
-            )
+                    [item.get("symbol")],
+                )
+                for item in news_items
+            ],
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::varchar[])",
+        )
         conn.commit()
         cur.close()
         conn.close()
@@ -182,14 +225,73 @@ def insert_stock_pg(stock_item):
         logger.error(f"Error inserting stock into PostgreSQL: {e}")
 
 
+def write_items(items: List[Dict]) -> List[Dict]:
+    """Store a batch of scored news and stock items."""
+    news = [item for item in items if item.get("type") == "news"]
+    if news:
+        insert_news_pg(news)
+    for item in items:
+        if item.get("type") == "stock_price":
+            insert_stock_pg(item)
+    return items
+
+
 class DataIngestionManager:
     """Manages data ingestion from multiple sources."""
 
-    def __init__(self):
-        """Initialize the data ingestion manager."""
+    def __init__(
+        self,
+        scorer: Optional[SentimentService] = None,
+        scheduler: Optional[QuotaScheduler] = None,
+    ):
+        """
+        Initialize the data ingestion manager.
+
+        Args:
+            scorer: Process-pool sentiment scorer (one with SENTIMENT_WORKERS
+                processes by default)
+            scheduler: Quota scheduler for NewsAPI and Alpha Vantage (one with
+                the QUOTA_* limits by default)
+        """
         self.kinesis_client = boto3.client("kinesis", region_name=AWS_REGION)
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": "Financial-Sentiment-Pipeline/1.0"})
+        # Claves de los artículos ya enviados a la etapa de escritura
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        self.scorer = scorer or SentimentService()
+        self.scheduler = scheduler or QuotaScheduler()
+        self.last_cycle: Dict = {}
+
+    async def get_json(self, provider: str, url: str, params: Dict) -> Optional[Dict]:
+        """
+        GET a JSON document within the provider quota.
+
+        Returns:
+            The decoded payload, or None if the quota is exhausted or the
+            provider throttled the request
+        """
+        if not await self.scheduler.acquire(provider):
+            logger.warning(f"{provider} quota exhausted, skipping request")
+            return None
+
+        # requests es bloqueante: no frenar a las demás descargas
+        response = await asyncio.to_thread(
+            self.session.get, url, params=params, timeout=10
+        )
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if is_throttled(response.status_code, data):
+            self.scheduler.record_result(
+                provider,
+                throttled=True,
+                retry_after=retry_after_seconds(response.headers),
+            )
+            logger.warning(f"{provider} throttled the request")
+            return None
+        response.raise_for_status()
+        return data
 
     async def fetch_news_data(self, symbol: str) -> List[Dict]:
         """Fetch news data for a given stock symbol."""
@@ -199,6 +301,10 @@ class DataIngestionManager:
 
         company_names = COMPANY_NAMES.get(symbol, [symbol])
         all_news = []
+        # Los alias de una empresa devuelven los mismos artículos: cada uno se
+        # puntúa y se guarda una sola vez
+        seen = set()
+        fetched = False
 
         for company_name in company_names:
             try:
@@ -212,24 +318,20 @@ class DataIngestionManager:
                     "apiKey": NEWS_API_KEY,
                 }
 
-                response = self.session.get(url, params=params, timeout=10)
-                response.raise_for_status()
-
-                data = response.json()
+                data = await self.get_json("newsapi", url, params)
+                if data is None:
+                    continue
+                fetched = True
 
                 if data.get("status") == "ok":
                     articles = data.get("articles", [])
 
                     for article in articles:
-                        # Calcular sentimiento y subjetividad
-                        text = (
-                            (article.get("title", "") or "")
-                            + " "
-                            + (article.get("description", "") or "")
-                        )
-                        blob = TextBlob(text)
-                        sentiment_score = blob.sentiment.polarity
-                        sentiment_subjectivity = blob.sentiment.subjectivity
+                        key = _article_key(article)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        # El sentimiento se calcula en la etapa de puntuación
                         news_item = {
                             "type": "news",
                             "symbol": symbol,
@@ -241,8 +343,6 @@ class DataIngestionManager:
                             "source": article.get("source", {}).get("name", ""),
                             "published_at": article.get("publishedAt", ""),
                             "ingested_at": datetime.utcnow().isoformat(),
-                            "sentiment_score": sentiment_score,
-                            "sentiment_subjectivity": sentiment_subjectivity,
                         }
                         all_news.append(news_item)
 
@@ -253,6 +353,8 @@ class DataIngestionManager:
             except Exception as e:
                 logger.error(f"Unexpected error fetching news for {company_name}: {e}")
 
+        if fetched:
+            self.scheduler.record_result("newsapi", symbol, new_items=len(all_news))
         return all_news
 
     async def fetch_stock_data(self, symbol: str) -> Optional[Dict]:
@@ -273,10 +375,10 @@ class DataIngestionManager:
                 "apikey": ALPHA_VANTAGE_API_KEY,
             }
 
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
+            data = await self.get_json("alpha_vantage", url, params)
+            if data is None:
+                return None
+            self.scheduler.record_result("alpha_vantage", symbol)
 
             # Get the latest price data
             time_series = data.get("Time Series (1min)", {})
@@ -322,30 +424,122 @@ class DataIngestionManager:
             logger.error(f"Error sending data to Kinesis: {e}")
             return False
 
+    async def fetch_symbol(self, symbol: str) -> List[Dict]:
+        """Fetch the news (unscored) and latest stock price for a symbol."""
+        news, stock = await asyncio.gather(
+            self.fetch_news_data(symbol), self.fetch_stock_data(symbol)
+        )
+        return news + ([stock] if stock else [])
+
+    async def _fetch_stage(self, symbols: List[str]) -> List[Dict]:
+        items = []
+        for symbol in symbols:
+            items.extend(await self.fetch_symbol(symbol))
+        return items
+
+    async def _score_stage(self, items: List[Dict]) -> List[Dict]:
+        """Add TextBlob polarity and subjectivity to the news items."""
+        news = [item for item in items if item.get("type") == "news"]
+        texts = [
+            (item.get("title", "") or "") + " " + (item.get("description", "") or "")
+            for item in news
+        ]
+        polarity, subjectivity = await self.scorer.score_async(
+            texts, [provider_score(item) for item in news]
+        )
+        for item, score, subject in zip(news, polarity, subjectivity):
+            item["sentiment_score"] = score
+            item["sentiment_subjectivity"] = subject
+        return items
+
+    async def _dedupe_stage(self, items: List[Dict]) -> List[Dict]:
+        """Drop articles already stored by this process (any symbol or cycle)."""
+        unique = []
+        for item in items:
+            if item.get("type") == "news":
+                key = _article_key(item)
+                if key in self.seen:
+                    self.seen.move_to_end(key)
+                    continue
+                self.seen[key] = None
+                if len(self.seen) > NEWS_DEDUP_CACHE_SIZE:
+                    self.seen.popitem(last=False)
+            unique.append(item)
+        return unique
+
+    def build_pipeline(self) -> Pipeline:
+        """fetch -> score -> dedupe -> write, each stage with its own workers."""
+        return Pipeline(
+            [
+                Stage(
+                    "fetch",
+                    self._fetch_stage,
+                    kind="async",
+                    concurrency=PIPELINE_FETCH_CONCURRENCY,
+                    queue_size=PIPELINE_QUEUE_SIZE,
+                ),
+                Stage(
+                    "score",
+                    self._score_stage,
+                    kind="async",
+                    # Un lote en curso por proceso del servicio de puntuación
+                    concurrency=max(1, self.scorer.workers),
+                    batch_size=PIPELINE_SCORE_BATCH,
+                    queue_size=PIPELINE_QUEUE_SIZE,
+                ),
+                Stage(
+                    "dedupe",
+                    self._dedupe_stage,
+                    kind="async",
+                    batch_size=PIPELINE_WRITE_BATCH,
+                    queue_size=PIPELINE_QUEUE_SIZE,
+                ),
+                Stage(
+                    "write",
+                    write_items,
+                    kind="thread",
+                    concurrency=PIPELINE_WRITE_CONCURRENCY,
+                    batch_size=PIPELINE_WRITE_BATCH,
+                    queue_size=PIPELINE_QUEUE_SIZE,
+                ),
+            ],
+            report_interval=PIPELINE_REPORT_SECONDS,
+        )
+
     async def ingest_data_for_symbol(self, symbol: str) -> None:
         """Ingest both news and stock data for a given symbol."""
-        news = await self.fetch_news_data(symbol)
-        if news:
-            insert_news_pg(news)
-        stock = await self.fetch_stock_data(symbol)
-        if stock:
-            stock["symbol"] = symbol
-            insert_stock_pg(stock)
-
-    async def run_ingestion_cycle(self) -> None:
-        """Run a complete ingestion cycle for solo un símbolo (AAPL)."""
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            symbols = ["AAPL"]  # Solo procesar AAPL
-            task = progress.add_task("Ingesting data...", total=len(symbols))
-            for symbol in symbols:
-                progress.update(task, description=f"Ingesting data for {symbol}...")
-                await self.ingest_data_for_symbol(symbol)
-                progress.advance(task)
-                await asyncio.sleep(1)
+        await self.build_pipeline().run([symbol])
+
+    async def run_ingestion_cycle(
+        self, symbols: Optional[Sequence[str]] = None
+    ) -> None:
+        """Run a complete ingestion cycle for solo un símbolo (AAPL) by default."""
+        symbols = ["AAPL"] if symbols is None else list(symbols)  # Solo procesar AAPL
+        self.last_cycle = await self.build_pipeline().run(symbols)
+        self.last_cycle["sentiment"] = self.scorer.stats()
+        self.last_cycle["quota"] = self.scheduler.report()
+        stages = self.last_cycle["stages"]
+        logger.info(
+            f"Pipeline finished in {self.last_cycle['elapsed_seconds']}s: "
+            + ", ".join(
+                f"{name} {stage['items_out']} items "
+                f"({stage['items_per_second']}/s, "
+                f"utilization {stage['utilization']}, "
+                f"blocked {stage['blocked_seconds']}s)"
+                for name, stage in stages.items()
+            )
+        )
+        sentiment = self.last_cycle["sentiment"]
+        memo = sentiment["memo"] or {}
+        logger.info(
+            f"Sentiment: {sentiment['texts']} texts scored, "
+            f"memo hit rate {memo.get('hit_rate')}, texts/s per worker: "
+            + ", ".join(
+                f"{pid}={worker['texts_per_second']}"
+                for pid, worker in sentiment["workers"].items()
+            )
+        )
+        logger.info(f"Quota usage: {self.last_cycle['quota']}")
 
     async def run_continuous_ingestion(self, interval_minutes: int = 5) -> None:
         """Run continuous ingestion with specified interval."""
@@ -397,13 +591,16 @@ async def main():
     # Check if running in continuous mode
     import sys
 
-    if len(sys.argv) > 1 and sys.argv[1] == "--continuous":
-        interval = int(sys.argv[2]) if len(sys.argv) > 2 else 5
-        await ingestion_manager.run_continuous_ingestion(interval)
-    else:
-        # Run single ingestion cycle
-        await ingestion_manager.run_ingestion_cycle()
-        console.print("[green]Ingestion completed successfully![/green]")
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "--continuous":
+            interval = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+            await ingestion_manager.run_continuous_ingestion(interval)
+        else:
+            # Run single ingestion cycle
+            await ingestion_manager.run_ingestion_cycle()
+            console.print("[green]Ingestion completed successfully![/green]")
+    finally:
+        ingestion_manager.scorer.close()
 
 
 if __name__ == "__main__":
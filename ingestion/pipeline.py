@@ -0,0 +1,239 @@
+"""
+Staged pipeline runtime for the ingestion service.
+
+A pipeline is a chain of stages joined by bounded queues. Each stage has its
+own number of workers and runs its function in one of three ways:
+
+- ``async``: a coroutine on the event loop (network I/O)
+- ``thread``: a blocking function in a thread (database drivers)
+- ``process``: a picklable function in a process pool (CPU-bound scoring)
+
+Workers take up to ``batch_size`` items at a time and emit any number of
+items downstream. When a downstream queue is full the worker waits, so a slow
+stage fills the queues in front of it and eventually pauses the source
+instead of buffering without limit. ``stats()`` reports, per stage, the queue
+depth, items in and out, throughput, how busy the workers are and how long
+they waited on the next stage.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGE_KINDS = ("async", "thread", "process")
+
+# End-of-stream marker of a worker
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name: Stage name used in the metrics
+        fn: Function taking a list of items and returning the items to pass
+            downstream (a coroutine function for ``async`` stages)
+        kind: ``async``, ``thread`` or ``process``
+        concurrency: Number of workers
+        batch_size: Maximum items handed to ``fn`` at once
+        queue_size: Capacity of the stage's input queue
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[List], Iterable],
+        kind: str = "async",
+        concurrency: int = 1,
+        batch_size: int = 1,
+        queue_size: int = 100,
+    ):
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"Unknown stage kind {kind!r}")
+        self.name = name
+        self.fn = fn
+        self.kind = kind
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.metrics: Dict = {}
+
+    def reset(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.metrics = {
+            "items_in": 0,
+            "items_out": 0,
+            "batches": 0,
+            "errors": 0,
+            "busy_seconds": 0.0,
+            "blocked_seconds": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    async def _take(self) -> List:
+        """Wait for one item and take whatever else is queued, up to a batch."""
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _DONE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+
+class Pipeline:
+    """
+    Run items through a chain of stages.
+
+    Args:
+        stages: Stages in order; the output of the last one is discarded
+        executor: Process pool for ``process`` stages (one sized to the
+            largest ``process`` stage is created per run by default)
+        report_interval: Seconds between progress log lines (0 disables them)
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        executor: Optional[Executor] = None,
+        report_interval: float = 0,
+    ):
+        self.stages = stages
+        self.executor = executor
+        self.report_interval = report_interval
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    async def _call(self, stage: Stage, batch: List, executor) -> List:
+        if stage.kind == "async":
+            result = await stage.fn(batch)
+        elif stage.kind == "thread":
+            result = await asyncio.to_thread(stage.fn, batch)
+        else:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, stage.fn, batch)
+        return list(result or [])
+
+    async def _worker(self, index: int, executor):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            batch = await stage._take()
+            done = batch[-1] is _DONE
+            items = batch[:-1] if done else batch
+            if items:
+                stage.metrics["items_in"] += len(items)
+                stage.metrics["batches"] += 1
+                started = time.monotonic()
+                try:
+                    outputs = await self._call(stage, items, executor)
+                except Exception as e:
+                    stage.metrics["errors"] += 1
+                    logger.error(
+                        f"Stage {stage.name} failed on {len(items)} items: {e}"
+                    )
+                    outputs = []
+                stage.metrics["busy_seconds"] += time.monotonic() - started
+                stage.metrics["items_out"] += len(outputs)
+                if downstream is not None:
+                    # With the next queue full the worker waits here: the
+                    # pressure propagates back to the source
+                    started = time.monotonic()
+                    for output in outputs:
+                        await downstream.queue.put(output)
+                        depth = downstream.queue.qsize()
+                        if depth > downstream.metrics["max_queue_depth"]:
+                            downstream.metrics["max_queue_depth"] = depth
+                    stage.metrics["blocked_seconds"] += time.monotonic() - started
+            if done:
+                return
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(
+                "Pipeline: "
+                + "; ".join(
+                    f"{name} queue={s['queue_depth']} out={s['items_out']} "
+                    f"rate={s['items_per_second']}/s"
+                    for name, s in self.stats()["stages"].items()
+                )
+            )
+
+    async def run(self, items: Iterable) -> Dict:
+        """
+        Feed ``items`` to the first stage and wait until every stage drains.
+
+        Returns:
+            The pipeline stats
+        """
+        for stage in self.stages:
+            stage.reset()
+        executor = self.executor
+        owns_executor = False
+        process_workers = [s.concurrency for s in self.stages if s.kind == "process"]
+        if executor is None and process_workers:
+            executor = ProcessPoolExecutor(max_workers=max(process_workers))
+            owns_executor = True
+
+        self._started_at, self._finished_at = time.monotonic(), None
+        workers = [
+            [
+                asyncio.create_task(self._worker(index, executor))
+                for _ in range(stage.concurrency)
+            ]
+            for index, stage in enumerate(self.stages)
+        ]
+        reporter = asyncio.create_task(self._report()) if self.report_interval else None
+        try:
+            first = self.stages[0]
+            for item in items:
+                await first.queue.put(item)
+                depth = first.queue.qsize()
+                if depth > first.metrics["max_queue_depth"]:
+                    first.metrics["max_queue_depth"] = depth
+            # Each stage ends once the previous one has ended and its queue is empty
+            for stage, stage_workers in zip(self.stages, workers):
+                for _ in stage_workers:
+                    await stage.queue.put(_DONE)
+                await asyncio.gather(*stage_workers)
+        finally:
+            for task in (t for stage_workers in workers for t in stage_workers):
+                task.cancel()
+            if reporter is not None:
+                reporter.cancel()
+            if owns_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._finished_at = time.monotonic()
+        return self.stats()
+
+    def stats(self) -> Dict:
+        """Per-stage queue depth, counters, throughput and utilization."""
+        if self._started_at is None:
+            return {"elapsed_seconds": 0, "stages": {}}
+        elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        stages = {}
+        for stage in self.stages:
+            metrics = stage.metrics
+            stages[stage.name] = {
+                **metrics,
+                "busy_seconds": round(metrics["busy_seconds"], 3),
+                "blocked_seconds": round(metrics["blocked_seconds"], 3),
+                "queue_depth": max(0, stage.queue.qsize()) if stage.queue else 0,
+                "items_per_second": (
+                    round(metrics["items_out"] / elapsed, 1) if elapsed else None
+                ),
+                # Share of the time the workers were busy
+                "utilization": (
+                    round(metrics["busy_seconds"] / (elapsed * stage.concurrency), 3)
+                    if elapsed
+                    else None
+                ),
+            }
+        return {"elapsed_seconds": round(elapsed, 3), "stages": stages}
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Planificador de peticiones con cuotas por proveedor
+Cada proveedor (Alpha Vantage, NewsAPI, Yahoo) tiene un token bucket por minuto
+y un presupuesto diario; los símbolos se atienden por prioridad (antigüedad del
+último dato y velocidad de noticias) y el ritmo se adapta a los 429 y avisos
+de "API call frequency". backend/ e ingestion/ tienen una copia idéntica de
+este módulo, porque cada imagen se construye solo con su directorio (el test
+de test_ingestion.py comprueba que no se separan). Con un reloj simulado se
+puede ejecutar sin esperas:
+
+    python quota_scheduler.py --symbols 500 --hours 24
+"""
+
+import argparse
+import asyncio
+import heapq
+import logging
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+
+def _limit(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+# Límites por defecto de los planes gratuitos; 0 significa sin límite
+PROVIDER_LIMITS = {
+    "alpha_vantage": {
+        "per_minute": _limit("QUOTA_ALPHA_VANTAGE_PER_MINUTE", "5"),
+        "per_day": _limit("QUOTA_ALPHA_VANTAGE_PER_DAY", "25"),
+    },
+    "newsapi": {
+        "per_minute": _limit("QUOTA_NEWSAPI_PER_MINUTE", "30"),
+        "per_day": _limit("QUOTA_NEWSAPI_PER_DAY", "100"),
+    },
+    "yahoo": {
+        "per_minute": _limit("QUOTA_YAHOO_PER_MINUTE", "60"),
+        "per_day": _limit("QUOTA_YAHOO_PER_DAY", "0"),
+    },
+}
+
+# Espera máxima por un token antes de saltar el símbolo en este ciclo
+QUOTA_MAX_WAIT_SECONDS = _limit("QUOTA_MAX_WAIT_SECONDS", "60")
+
+# Tras un throttling el ritmo (y la ráfaga permitida) se reduce a la mitad y
+# se recupera un 1% por petición correcta (incremento aditivo)
+THROTTLE_BACKOFF_FACTOR = 0.5
+THROTTLE_RECOVERY_STEP = 0.01
+THROTTLE_MIN_RATE_FACTOR = 0.1
+THROTTLE_DEFAULT_PENALTY_SECONDS = 60
+
+# Tolerancia de coma flotante al comprobar si hay un token entero
+_TOKEN_EPSILON = 1e-9
+
+
+class RealClock:
+    """Reloj del sistema"""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    def sleep_blocking(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """Reloj simulado: dormir solo avanza el tiempo, sin esperas reales"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += max(seconds, 0.0)
+
+    async def sleep(self, seconds: float):
+        self.advance(seconds)
+        await asyncio.sleep(0)
+
+    def sleep_blocking(self, seconds: float):
+        self.advance(seconds)
+
+
+def is_throttled(status_code: int, payload) -> bool:
+    """
+    Detectar una respuesta de throttling
+
+    Alpha Vantage responde 200 con un "Note" (API call frequency) o un
+    "Information" sobre el límite; NewsAPI y Yahoo responden 429.
+    """
+    if status_code == 429:
+        return True
+    if isinstance(payload, dict):
+        if payload.get("code") == "rateLimited":
+            return True
+        for key in ("Note", "Information"):
+            message = str(payload.get(key, "")).lower()
+            if "call frequency" in message or "rate limit" in message:
+                return True
+    return False
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Segundos de la cabecera Retry-After (None si falta o no es numérica)"""
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderQuota:
+    """Token bucket por minuto más presupuesto diario de un proveedor"""
+
+    def __init__(self, name: str, per_minute: float, per_day: float, clock):
+        self.name = name
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.clock = clock
+        self.rate_factor = 1.0
+        self.capacity = max(per_minute, 1.0)
+        self.tokens = self.capacity
+        self._refilled_at = clock.monotonic()
+        self.blocked_until = 0.0
+        self.day = self._current_day()
+        self.used_today = 0
+        self.requests_total = 0
+        self.throttled_total = 0
+        self.skipped_total = 0
+        self.wasted_tokens = 0.0
+        self.unused_daily_budget = 0.0
+
+    def _current_day(self) -> int:
+        return int(self.clock.time() // SECONDS_PER_DAY)
+
+    def _roll_day(self):
+        day = self._current_day()
+        if day != self.day:
+            if self.per_day:
+                self.unused_daily_budget += max(self.per_day - self.used_today, 0)
+            self.day = day
+            self.used_today = 0
+
+    def _refill(self):
+        now = self.clock.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if not self.per_minute:
+            self.tokens = self.capacity
+            return
+        refill = elapsed * self.per_minute * self.rate_factor / 60
+        capacity = max(self.capacity * self.rate_factor, 1.0)
+        overflow = self.tokens + refill - capacity
+        if overflow > 0 and not self.per_day:
+            # Cuota por minuto que nadie usó; con presupuesto diario lo que se
+            # desperdicia es el presupuesto sin usar al cambiar de día
+            self.wasted_tokens += overflow
+        self.tokens = min(capacity, self.tokens + refill)
+
+    def daily_exhausted(self) -> bool:
+        self._roll_day()
+        return bool(self.per_day) and self.used_today >= self.per_day
+
+    def wait_time(self) -> float:
+        """Segundos hasta poder hacer la siguiente petición (0 si ya se puede)"""
+        self._refill()
+        now = self.clock.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1 - _TOKEN_EPSILON:
+            return 0.0
+        return (1 - self.tokens) * 60 / (self.per_minute * self.rate_factor)
+
+    def consume(self):
+        self._refill()
+        if self.per_minute:
+            self.tokens -= 1
+        self.used_today += 1
+        self.requests_total += 1
+
+    def on_success(self):
+        self.rate_factor = min(1.0, self.rate_factor + THROTTLE_RECOVERY_STEP)
+
+    def on_throttled(self, retry_after: Optional[float] = None):
+        self._refill()
+        self.throttled_total += 1
+        self.rate_factor = max(
+            THROTTLE_MIN_RATE_FACTOR, self.rate_factor * THROTTLE_BACKOFF_FACTOR
+        )
+        self.tokens = min(self.tokens, 0.0)
+        penalty = retry_after if retry_after else THROTTLE_DEFAULT_PENALTY_SECONDS
+        self.blocked_until = max(self.blocked_until, self.clock.monotonic() + penalty)
+
+    def stats(self) -> Dict:
+        self._roll_day()
+        self._refill()
+        return {
+            "per_minute": self.per_minute,
+            "per_day": self.per_day,
+            "used_today": self.used_today,
+            "remaining_today": (
+                max(self.per_day - self.used_today, 0) if self.per_day else None
+            ),
+            "requests_total": self.requests_total,
+            "throttled_total": self.throttled_total,
+            "skipped_total": self.skipped_total,
+            "rate_factor": round(self.rate_factor, 3),
+            "wasted_minute_tokens": round(self.wasted_tokens, 1),
+            "unused_daily_budget": self.unused_daily_budget,
+        }
+
+
+class SymbolStats:
+    """Estado de un símbolo para priorizar: último dato y velocidad de noticias"""
+
+    __slots__ = ("last_fetched", "velocity")
+
+    def __init__(self):
+        self.last_fetched: Optional[float] = None
+        self.velocity = 0.0  # noticias nuevas por hora (media móvil)
+
+
+class QuotaScheduler:
+    """
+    Planificador central de peticiones a las APIs externas
+
+    Uso típico:
+        if await scheduler.acquire("alpha_vantage"):
+            ... petición ...
+            scheduler.record_result("alpha_vantage", symbol, throttled=..., ...)
+    """
+
+    VELOCITY_SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        clock=None,
+        max_wait_seconds: float = QUOTA_MAX_WAIT_SECONDS,
+    ):
+        self.clock = clock or RealClock()
+        self.max_wait_seconds = max_wait_seconds
+        self.providers = {
+            name: ProviderQuota(name, limit["per_minute"], limit["per_day"], self.clock)
+            for name, limit in (limits or PROVIDER_LIMITS).items()
+        }
+        self._symbols: Dict[str, Dict[str, SymbolStats]] = {
+            name: {} for name in self.providers
+        }
+
+    def _symbol(self, provider: str, symbol: str) -> SymbolStats:
+        return self._symbols[provider].setdefault(symbol, SymbolStats())
+
+    def _plan_wait(self, provider: str, max_wait: Optional[float]) -> Optional[float]:
+        """Espera necesaria, o None si hay que saltar la petición"""
+        quota = self.providers[provider]
+        if quota.daily_exhausted():
+            quota.skipped_total += 1
+            return None
+        wait = quota.wait_time()
+        limit = self.max_wait_seconds if max_wait is None else max_wait
+        if wait > limit:
+            quota.skipped_total += 1
+            return None
+        return wait
+
+    async def acquire(self, provider: str, max_wait: Optional[float] = None) -> bool:
+        """
+        Esperar un token del proveedor
+
+        Returns:
+            False si se agotó el presupuesto diario o la espera supera max_wait
+        """
+        quota = self.providers[provider]
+        while True:
+            wait = self._plan_wait(provider, max_wait)
+            if wait is None:
+                return False
+            if wait <= 0:
+                quota.consume()
+                return True
+            await self.clock.sleep(wait)
+
+    def acquire_blocking(self, provider: str, max_wait: Optional[float] = None) -> bool:
+        """Versión síncrona de acquire() para los scripts de backfill"""
+        quota = self.providers[provider]
+        while True:
+            wait = self._plan_wait(provider, max_wait)
+            if wait is None:
+                return False
+            if wait <= 0:
+                quota.consume()
+                return True
+            self.clock.sleep_blocking(wait)
+
+    def record_result(
+        self,
+        provider: str,
+        symbol: Optional[str] = None,
+        throttled: bool = False,
+        retry_after: Optional[float] = None,
+        new_items: Optional[int] = None,
+    ):
+        """Registrar el resultado de una petición para adaptar ritmo y prioridad"""
+        quota = self.providers[provider]
+        if throttled:
+            quota.on_throttled(retry_after)
+            logger.info(
+                f"{provider} throttled; rate reduced to "
+                f"{quota.rate_factor:.0%} of quota"
+            )
+            return
+        quota.on_success()
+        if symbol is None:
+            return
+
+        stats = self._symbol(provider, symbol)
+        now = self.clock.monotonic()
+        if new_items is not None and stats.last_fetched is not None:
+            hours = max((now - stats.last_fetched) / 3600, 1 / 60)
+            stats.velocity += self.VELOCITY_SMOOTHING * (
+                new_items / hours - stats.velocity
+            )
+        stats.last_fetched = now
+
+    def priority(self, provider: str, symbol: str) -> float:
+        """Prioridad: horas sin actualizar ponderadas por la velocidad de noticias"""
+        stats = self._symbol(provider, symbol)
+        if stats.last_fetched is None:
+            return math.inf
+        staleness_hours = (self.clock.monotonic() - stats.last_fetched) / 3600
+        return staleness_hours * (1 + stats.velocity)
+
+    def prioritize(
+        self, provider: str, symbols: Iterable[str], limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        Ordenar símbolos por prioridad (los nunca consultados primero)
+
+        Args:
+            limit: Devolver solo los N más prioritarios (p.ej. lo que queda
+                del presupuesto diario)
+        """
+        symbols = list(symbols)
+        key = lambda symbol: self.priority(provider, symbol)  # noqa: E731
+        if limit is not None:
+            return heapq.nlargest(limit, symbols, key=key)
+        return sorted(symbols, key=key, reverse=True)
+
+    def remaining_today(self, provider: str) -> Optional[int]:
+        """Peticiones que quedan hoy (None si el proveedor no tiene límite diario)"""
+        quota = self.providers[provider]
+        if quota.daily_exhausted() or not quota.per_day:
+            return 0 if quota.per_day else None
+        return int(quota.per_day - quota.used_today)
+
+    def report(self) -> Dict[str, Dict]:
+        """Uso de cuota por proveedor: usada, restante, desperdiciada y throttling"""
+        return {name: quota.stats() for name, quota in self.providers.items()}
+
+
+async def simulate(
+    symbols: int = 500, hours: float = 24, cycle_minutes: float = 5, seed: int = 7
+) -> Dict[str, Dict]:
+    """
+    Simular ciclos de ingestión con reloj simulado
+
+    Las APIs simuladas aplican sus propios límites (ligeramente más estrictos
+    que los configurados) para ejercitar la adaptación al throttling.
+    """
+    import random
+
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    scheduler = QuotaScheduler(clock=clock, max_wait_seconds=cycle_minutes * 60)
+    names = [f"SYM{i:04d}" for i in range(symbols)]
+    # Unos pocos símbolos concentran la mayoría de noticias
+    hot = {name: rng.random() ** 4 * 20 for name in names}
+    server_calls: Dict[str, List[float]] = {name: [] for name in scheduler.providers}
+
+    def server_throttles(provider: str) -> bool:
+        limit = scheduler.providers[provider].per_minute * 0.9
+        calls = [t for t in server_calls[provider] if clock.now - t < 60]
+        server_calls[provider] = calls + [clock.now]
+        return bool(limit) and len(calls) >= limit
+
+    end = clock.now + hours * 3600
+    while clock.now < end:
+        cycle_end = clock.now + cycle_minutes * 60
+        for provider in ("alpha_vantage", "newsapi", "yahoo"):
+            budget = scheduler.remaining_today(provider)
+            for symbol in scheduler.prioritize(provider, names, limit=budget):
+                if clock.now >= cycle_end:
+                    break
+                max_wait = cycle_end - clock.now
+                if not await scheduler.acquire(provider, max_wait=max_wait):
+                    break
+                throttled = server_throttles(provider)
+                scheduler.record_result(
+                    provider,
+                    symbol,
+                    throttled=throttled,
+                    new_items=None if throttled else rng.randint(0, int(hot[symbol])),
+                )
+        if clock.now < cycle_end:
+            await clock.sleep(cycle_end - clock.now)
+    return scheduler.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quota scheduler simulation")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--cycle-minutes", type=float, default=5)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(simulate(args.symbols, args.hours, args.cycle_minutes))
+    for provider, stats in report.items():
+        print(provider)
+        for key, value in stats.items():
+            print(f"  {key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
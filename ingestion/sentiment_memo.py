@@ -0,0 +1,522 @@
+"""
+Persistent, content-addressed memo of sentiment scores.
+
+The same title and description are scored again and again: articles fetched
+in every cycle, one article found under several company aliases, retried
+batches, the DAG re-scoring rows the ingestion already scored. ``SentimentMemo``
+remembers (polarity, subjectivity) per text, keyed by a hash of the text with
+its whitespace collapsed (the analyzer ignores it), in an in-process LRU in
+front of a store shared by every scorer:
+
+- ``sqlite``: a local file (one host, or one warm Lambda container in /tmp)
+- ``postgres``: the ``sentiment_memo`` table of the application database
+  (created by the Alembic migrations in backend/alembic)
+
+Every entry carries the analyzer version (the engine, its library release and
+a checksum of its lexicon, see sentiment_engines.py) and lookups only read the
+entries of their own version, so switching engines, upgrading TextBlob or
+editing the lexicon invalidates the memo by itself. Scorers of several
+versions can share a store during a rolling deploy: each one records when it
+last used its version, and a separate maintenance step deletes the versions
+no scorer has used for ``SENTIMENT_MEMO_RETENTION_DAYS``. lambda_function/
+carries an identical copy of this module, since its bundle only ships that
+directory (backend/test_ingestion.py keeps them in sync).
+
+    memo = create_memo("sqlite")
+    polarity, subjectivity = memo.score(texts, score_fn)
+    print(memo.stats())
+
+Benchmark (hit rate and texts/s with repeated texts) and maintenance:
+
+    python sentiment_memo.py --texts 20000 --distinct 2000
+    python sentiment_memo.py --prune postgres --retention-days 30
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sentiment_engines import create_engine
+
+logger = logging.getLogger(__name__)
+
+# Persistent store (none, memory, sqlite or postgres), SQLite file, texts
+# remembered in memory per process, and days without use after which
+# maintenance deletes an analyzer version
+SENTIMENT_MEMO = os.getenv("SENTIMENT_MEMO", "sqlite")
+SENTIMENT_MEMO_PATH = os.getenv(
+    "SENTIMENT_MEMO_PATH", os.path.join(tempfile.gettempdir(), "sentiment_memo.db")
+)
+SENTIMENT_MEMO_CACHE_SIZE = int(os.getenv("SENTIMENT_MEMO_CACHE_SIZE", "100000"))
+SENTIMENT_MEMO_RETENTION_DAYS = int(os.getenv("SENTIMENT_MEMO_RETENTION_DAYS", "30"))
+MEMO_KINDS = ("none", "memory", "sqlite", "postgres")
+
+# How often a process refreshes the last-used date of its version
+TOUCH_INTERVAL_SECONDS = 3600
+
+Scores = Tuple[float, float]
+
+
+def normalize(text: Optional[str]) -> str:
+    """Collapse whitespace, which the analyzer's tokenizer ignores."""
+    return " ".join((text or "").split())
+
+
+def text_key(text: Optional[str]) -> str:
+    """Content address of a text: BLAKE2b-128 of its normalized form."""
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def analyzer_version() -> str:
+    """Version of the configured sentiment engine (``SENTIMENT_ENGINE``)."""
+    return create_engine().version()
+
+
+class SqliteMemoStore:
+    """Memo entries in a local SQLite file, shared by the processes of a host."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SENTIMENT_MEMO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL: readers and one writer at a time from several processes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sentiment_memo (
+                version TEXT NOT NULL,
+                text_key TEXT NOT NULL,
+                polarity REAL NOT NULL,
+                subjectivity REAL NOT NULL,
+                PRIMARY KEY (version, text_key)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sentiment_memo_versions (
+                version TEXT PRIMARY KEY,
+                last_used_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, version: str, keys: Sequence[str]) -> Dict[str, Scores]:
+        found = {}
+        with self._lock:
+            # SQLite allows at most 999 parameters per statement
+            for i in range(0, len(keys), 900):
+                chunk = keys[i : i + 900]  # noqa: E203
+                rows = self._conn.execute(
+                    "SELECT text_key, polarity, subjectivity FROM sentiment_memo "
+                    f"WHERE version = ? AND text_key IN ({','.join('?' * len(chunk))})",
+                    [version, *chunk],
+                )
+                found.update((key, (p, s)) for key, p, s in rows)
+        return found
+
+    def put_many(self, version: str, entries: Dict[str, Scores]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sentiment_memo VALUES (?, ?, ?, ?)",
+                [(version, key, p, s) for key, (p, s) in entries.items()],
+            )
+            self._conn.commit()
+
+    def touch(self, version: str):
+        """Record that a scorer of this analyzer version is using the store."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sentiment_memo_versions VALUES (?, CURRENT_TIMESTAMP) "
+                "ON CONFLICT (version) DO UPDATE SET last_used_at = CURRENT_TIMESTAMP",
+                (version,),
+            )
+            self._conn.commit()
+
+    def prune(self, retention_days: int) -> int:
+        """Delete the entries of the versions unused for ``retention_days``."""
+        with self._lock:
+            # Entries without a version row also count as unused
+            deleted = self._conn.execute(
+                "DELETE FROM sentiment_memo WHERE version NOT IN ("
+                "SELECT version FROM sentiment_memo_versions "
+                "WHERE last_used_at >= datetime('now', ?))",
+                (f"-{retention_days} days",),
+            ).rowcount
+            self._conn.execute(
+                "DELETE FROM sentiment_memo_versions "
+                "WHERE last_used_at < datetime('now', ?)",
+                (f"-{retention_days} days",),
+            )
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresMemoStore:
+    """Memo entries in the application database, shared by every scorer."""
+
+    name = "postgres"
+
+    def __init__(self, **connect_kwargs):
+        import psycopg2
+
+        self._lock = threading.Lock()
+        self._conn = psycopg2.connect(
+            **(
+                connect_kwargs
+                or {
+                    "host": os.getenv("DB_HOST", "postgres"),
+                    "database": os.getenv("DB_NAME", "financial_sentiment"),
+                    "user": os.getenv("DB_USER", "postgres"),
+                    "password": os.getenv("DB_PASSWORD", "password"),
+                    "port": int(os.getenv("DB_PORT", "5432")),
+                }
+            )
+        )
+        self._conn.autocommit = True
+
+    def get_many(self, version: str, keys: Sequence[str]) -> Dict[str, Scores]:
+        with self._lock, self._conn.cursor() as cur:
+            cur.execute(
+                "SELECT text_key, polarity, subjectivity FROM sentiment_memo "
+                "WHERE version = %s AND text_key = ANY(%s)",
+                (version, list(keys)),
+            )
+            return {key: (p, s) for key, p, s in cur.fetchall()}
+
+    def put_many(self, version: str, entries: Dict[str, Scores]):
+        from psycopg2.extras import execute_values
+
+        with self._lock, self._conn.cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO sentiment_memo "
+                "(version, text_key, polarity, subjectivity) "
+                "VALUES %s ON CONFLICT DO NOTHING",
+                [(version, key, p, s) for key, (p, s) in entries.items()],
+            )
+
+    def touch(self, version: str):
+        """Record that a scorer of this analyzer version is using the store."""
+        with self._lock, self._conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO sentiment_memo_versions (version, last_used_at) "
+                "VALUES (%s, NOW()) "
+                "ON CONFLICT (version) DO UPDATE SET last_used_at = NOW()",
+                (version,),
+            )
+
+    def prune(self, retention_days: int) -> int:
+        """Delete the entries of the versions unused for ``retention_days``."""
+        cutoff = "NOW() - make_interval(days => %s)"
+        with self._lock, self._conn.cursor() as cur:
+            # Entries without a version row also count as unused
+            cur.execute(
+                "DELETE FROM sentiment_memo WHERE version NOT IN ("
+                "SELECT version FROM sentiment_memo_versions "
+                f"WHERE last_used_at >= {cutoff})",
+                (retention_days,),
+            )
+            deleted = cur.rowcount
+            cur.execute(
+                f"DELETE FROM sentiment_memo_versions WHERE last_used_at < {cutoff}",
+                (retention_days,),
+            )
+            return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SentimentMemo:
+    """
+    In-process LRU of sentiment scores in front of an optional shared store.
+
+    Args:
+        store: ``SqliteMemoStore``, ``PostgresMemoStore`` or None (memory only)
+        cache_size: Texts remembered in this process
+        version: Analyzer version the scores belong to (the configured
+            engine's by default)
+    """
+
+    def __init__(
+        self,
+        store=None,
+        cache_size: int = SENTIMENT_MEMO_CACHE_SIZE,
+        version: Optional[str] = None,
+    ):
+        self.store = store
+        self.cache_size = max(0, cache_size)
+        self.version = version or analyzer_version()
+        self._cache: "OrderedDict[str, Scores]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._touched_at: Optional[float] = None
+        self._metrics = {
+            "texts": 0,
+            "scored": 0,
+            "lookups": 0,
+            "memory_hits": 0,
+            "store_hits": 0,
+            "misses": 0,
+            "store_errors": 0,
+        }
+
+    def _remember(self, entries: Dict[str, Scores]):
+        with self._lock:
+            for key, scores in entries.items():
+                self._cache[key] = scores
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _store_call(self, method: str, *args):
+        """Call the store, logging failures: the memo is only an optimization."""
+        try:
+            # Maintenance never deletes the version in use
+            now = time.monotonic()
+            if (
+                self._touched_at is None
+                or now - self._touched_at >= TOUCH_INTERVAL_SECONDS
+            ):
+                self.store.touch(self.version)
+                self._touched_at = now
+            return getattr(self.store, method)(self.version, *args)
+        except Exception as e:
+            with self._lock:
+                self._metrics["store_errors"] += 1
+            logger.warning(f"Sentiment memo {self.store.name} {method} failed: {e}")
+            return None
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, Scores]:
+        """Scores known for the given text keys, from memory or the store."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            self._metrics["lookups"] += len(keys)
+            for key in keys:
+                scores = self._cache.get(key)
+                if scores is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = scores
+            self._metrics["memory_hits"] += len(found)
+        missing = [key for key in keys if key not in found]
+        stored = {}
+        if missing and self.store is not None:
+            stored = self._store_call("get_many", missing) or {}
+            self._remember(stored)
+            found.update(stored)
+        with self._lock:
+            self._metrics["store_hits"] += len(stored)
+            self._metrics["misses"] += len(keys) - len(found)
+        return found
+
+    def save(self, entries: Dict[str, Scores]):
+        """Remember newly computed scores in memory and in the store."""
+        self._remember(entries)
+        if entries and self.store is not None:
+            self._store_call("put_many", entries)
+
+    def _plan(self, texts: Sequence[str]) -> Tuple[List[str], Dict, List[str]]:
+        keys = [text_key(text) for text in texts]
+        found = self.lookup(keys)
+        # Each unknown text is scored once even if it repeats
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        with self._lock:
+            self._metrics["texts"] += len(texts)
+            self._metrics["scored"] += len(pending)
+        return keys, found, list(pending)
+
+    def _merge(self, keys, found, pending, polarity, subjectivity):
+        scored = dict(zip(pending, zip(polarity, subjectivity)))
+        self.save(scored)
+        found.update(scored)
+        return (
+            array("d", (found[key][0] for key in keys)),
+            array("d", (found[key][1] for key in keys)),
+        )
+
+    def score(
+        self, texts: Sequence[str], score_fn: Callable[[List[str]], Tuple]
+    ) -> Tuple[array, array]:
+        """
+        Score texts, in order, calling ``score_fn`` only for unknown ones.
+
+        Args:
+            texts: Texts to score
+            score_fn: Function taking a list of texts and returning
+                (polarity, subjectivity) sequences
+
+        Returns:
+            (polarity array, subjectivity array), one value per text
+        """
+        texts = list(texts)
+        keys, found, pending = self._plan(texts)
+        by_key = dict(zip(keys, texts))
+        polarity, subjectivity = (
+            score_fn([by_key[key] for key in pending]) if pending else ([], [])
+        )
+        return self._merge(keys, found, pending, polarity, subjectivity)
+
+    async def score_async(self, texts: Sequence[str], score_fn) -> Tuple[array, array]:
+        """Like ``score`` with an async ``score_fn``; store I/O runs in a thread."""
+        # asyncio takes tens of ms to import: only callers that use it pay for it
+        import asyncio
+
+        texts = list(texts)
+        keys, found, pending = await asyncio.to_thread(self._plan, texts)
+        by_key = dict(zip(keys, texts))
+        polarity, subjectivity = (
+            await score_fn([by_key[key] for key in pending]) if pending else ([], [])
+        )
+        return await asyncio.to_thread(
+            self._merge, keys, found, pending, polarity, subjectivity
+        )
+
+    def stats(self) -> Dict:
+        """
+        Texts seen and scored, distinct keys looked up, hits per level and
+        misses. ``hit_rate`` is the share of texts that did not reach the
+        analyzer (repeats within a batch count as hits).
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        texts = metrics["texts"]
+        return {
+            **metrics,
+            "store": self.store.name if self.store is not None else None,
+            "version": self.version,
+            "cached": len(self._cache),
+            "hit_rate": round(1 - metrics["scored"] / texts, 4) if texts else None,
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+def create_memo(kind: str = SENTIMENT_MEMO, **kwargs) -> Optional[SentimentMemo]:
+    """
+    Build a memo with the given store.
+
+    Args:
+        kind: ``none`` (no memo), ``memory``, ``sqlite`` or ``postgres``
+        **kwargs: ``cache_size``, ``version`` and ``path`` (sqlite)
+    """
+    if kind not in MEMO_KINDS:
+        raise ValueError(f"Unknown sentiment memo {kind!r}")
+    if kind == "none":
+        return None
+    path = kwargs.pop("path", SENTIMENT_MEMO_PATH)
+    store = None
+    try:
+        if kind == "sqlite":
+            store = SqliteMemoStore(path)
+        elif kind == "postgres":
+            store = PostgresMemoStore()
+    except Exception as e:
+        # Without a shared store the process memory still serves
+        logger.warning(f"Sentiment memo {kind} unavailable, memory only: {e}")
+    return SentimentMemo(store, **kwargs)
+
+
+def prune_memo(
+    kind: str = SENTIMENT_MEMO,
+    retention_days: int = SENTIMENT_MEMO_RETENTION_DAYS,
+    path: str = SENTIMENT_MEMO_PATH,
+) -> int:
+    """
+    Delete the entries of the analyzer versions unused for ``retention_days``.
+
+    Returns:
+        Deleted entries
+    """
+    store = SqliteMemoStore(path) if kind == "sqlite" else PostgresMemoStore()
+    try:
+        deleted = store.prune(retention_days)
+    finally:
+        store.close()
+    logger.info(
+        f"Sentiment memo {kind}: deleted {deleted} entries of versions unused "
+        f"for {retention_days} days"
+    )
+    return deleted
+
+
+def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentiment memo benchmark")
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=2000)
+    parser.add_argument(
+        "--prune",
+        choices=("sqlite", "postgres"),
+        help="instead of the benchmark, delete the versions unused in this store",
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=SENTIMENT_MEMO_RETENTION_DAYS,
+        help="days without use after which --prune deletes a version",
+    )
+    args = parser.parse_args(argv)
+
+    if args.prune:
+        logging.basicConfig(level=logging.INFO)
+        prune_memo(args.prune, args.retention_days)
+        return
+
+    from sentiment_service import SentimentService
+
+    texts = [
+        f"Company {i % args.distinct} shares surge after strong quarterly earnings "
+        f"beat expectations, but analysts warn of weak guidance and rising costs"
+        for i in range(args.texts)
+    ]
+    print(f"texts={args.texts} distinct={args.distinct}")
+    print(f"{'memo':>8} {'run':>5} {'seconds':>8} {'texts/s':>9} {'hit_rate':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memo.db")
+        for kind in ("none", "memory", "sqlite"):
+            # Second pass with a fresh process: only the store persists
+            for run in ("cold", "warm"):
+                memo = create_memo(kind, path=path)
+                with SentimentService(workers=0, memo=memo) as scorer:
+                    # Load the lexicon outside the measurement
+                    scorer._score(["warm up"])
+                    started = time.perf_counter()
+                    polarity, _ = scorer.score(texts)
+                    elapsed = time.perf_counter() - started
+                    assert len(polarity) == args.texts
+                hit_rate = memo.stats()["hit_rate"] if memo else None
+                if memo:
+                    memo.close()
+                print(
+                    f"{kind:>8} {run:>5} {elapsed:8.2f} "
+                    f"{args.texts / elapsed:9.0f} {str(hit_rate):>9}"
+                )
+
+
+if __name__ == "__main__":
+    _main()
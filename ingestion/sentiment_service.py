@@ -0,0 +1,271 @@
+"""
+Process-pool sentiment scoring service.
+
+TextBlob's pattern analyzer is pure Python and CPU-bound, so scoring on the
+thread that also runs the network and database code uses a single core and
+stalls everything else. ``SentimentService`` scores batches of texts in a
+pool of worker processes instead. Each worker builds the analyzer of the
+configured engine (sentiment_engines.py) and loads its lexicon once, when it
+starts, and returns the polarity and subjectivity of a whole batch as two
+float arrays. Texts already scored are answered from
+a ``SentimentMemo`` (sentiment_memo.py) and never reach the workers.
+
+    with SentimentService() as scorer:
+        polarity, subjectivity = scorer.score(texts)
+        print(scorer.stats())
+
+Benchmark (throughput per number of workers):
+
+    python sentiment_service.py --texts 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from sentiment_engines import SENTIMENT_ENGINE, create_engine
+from sentiment_memo import SENTIMENT_MEMO, SentimentMemo, create_memo
+
+logger = logging.getLogger(__name__)
+
+# Scoring processes (0 or 1: in this process, without a pool) and texts per
+# batch sent to a process
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "64"))
+
+# Engine of the current process, created once per worker
+_engine = None
+
+
+def _init_worker(engine: str = SENTIMENT_ENGINE):
+    """Build the engine and load its lexicon once per worker process."""
+    global _engine
+    _engine = create_engine(engine).load()
+
+
+def score_batch(
+    texts: Sequence[str],
+    provided: Optional[Sequence] = None,
+    engine: str = SENTIMENT_ENGINE,
+) -> Tuple[int, array, array, float]:
+    """
+    Score a batch of texts in the current process.
+
+    Returns:
+        (pid, polarity array, subjectivity array, seconds spent)
+    """
+    if _engine is None or _engine.name != engine:
+        _init_worker(engine)
+    started = time.perf_counter()
+    polarity, subjectivity = _engine.score(texts, provided)
+    return os.getpid(), polarity, subjectivity, time.perf_counter() - started
+
+
+class SentimentService:
+    """
+    Score texts with TextBlob's pattern analyzer in a pool of processes.
+
+    Args:
+        workers: Worker processes (0 or 1 scores in the calling process)
+        batch_size: Texts per batch sent to a worker
+        memo: Memo of known scores, or the kind of memo to create and own
+            (``none``, ``memory``, ``sqlite`` or ``postgres``); engines whose
+            scores do not depend only on the text are never memoized
+        engine: Registered sentiment engine (``pattern``, ``vader``,
+            ``alphavantage``)
+    """
+
+    def __init__(
+        self,
+        workers: int = SENTIMENT_WORKERS,
+        batch_size: int = SENTIMENT_BATCH_SIZE,
+        memo: Union[str, SentimentMemo, None] = SENTIMENT_MEMO,
+        engine: str = SENTIMENT_ENGINE,
+    ):
+        self.workers = max(0, workers)
+        self.batch_size = max(1, batch_size)
+        self.engine = create_engine(engine)
+        if not self.engine.memoizable:
+            memo = None
+        self._owns_memo = isinstance(memo, str)
+        self.memo: Optional[SentimentMemo] = (
+            create_memo(memo, version=self.engine.version())
+            if self._owns_memo
+            else memo
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._per_worker: Dict[int, Dict] = {}
+
+    @property
+    def pooled(self) -> bool:
+        return self.workers > 1
+
+    def start(self) -> "SentimentService":
+        """Start the worker processes (each loads the lexicon once)."""
+        if self.pooled and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.engine.name,),
+            )
+        self._started_at = self._started_at or time.monotonic()
+        return self
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._owns_memo and self.memo is not None:
+            self.memo.close()
+
+    def __enter__(self) -> "SentimentService":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _batches(self, values: Sequence) -> List[Sequence]:
+        return [
+            values[i : i + self.batch_size]  # noqa: E203
+            for i in range(0, len(values), self.batch_size)
+        ]
+
+    def _record(self, pid: int, count: int, seconds: float):
+        with self._lock:
+            worker = self._per_worker.setdefault(pid, {"texts": 0, "seconds": 0.0})
+            worker["texts"] += count
+            worker["seconds"] += seconds
+
+    def _merge(self, results) -> Tuple[array, array]:
+        polarity, subjectivity = array("d"), array("d")
+        for pid, batch_polarity, batch_subjectivity, seconds in results:
+            self._record(pid, len(batch_polarity), seconds)
+            polarity.extend(batch_polarity)
+            subjectivity.extend(batch_subjectivity)
+        return polarity, subjectivity
+
+    def score(
+        self, texts: Sequence[str], provided: Optional[Sequence] = None
+    ) -> Tuple[array, array]:
+        """
+        Score texts, in order.
+
+        Args:
+            texts: Texts to score
+            provided: Scores supplied by the news provider, one per text (or
+                None), for provider engines such as ``alphavantage``
+
+        Returns:
+            (polarity array, subjectivity array), one value per text
+        """
+        self.start()
+        if self.memo is not None:
+            return self.memo.score(texts, self._score)
+        return self._score(texts, provided)
+
+    async def score_async(
+        self, texts: Sequence[str], provided: Optional[Sequence] = None
+    ) -> Tuple[array, array]:
+        """Like ``score`` without blocking the event loop."""
+        self.start()
+        if self.memo is not None:
+            return await self.memo.score_async(texts, self._score_async)
+        return await self._score_async(texts, provided)
+
+    def _jobs(self, texts: Sequence[str], provided: Optional[Sequence]):
+        texts = list(texts)
+        provided = list(provided) if provided is not None else [None] * len(texts)
+        return partial(score_batch, engine=self.engine.name), texts, provided
+
+    def _score(self, texts, provided=None) -> Tuple[array, array]:
+        job, texts, provided = self._jobs(texts, provided)
+        if not self.pooled:
+            return self._merge([job(texts, provided)])
+        return self._merge(
+            self._executor.map(job, self._batches(texts), self._batches(provided))
+        )
+
+    async def _score_async(self, texts, provided=None) -> Tuple[array, array]:
+        job, texts, provided = self._jobs(texts, provided)
+        if not self.pooled:
+            return self._merge([await asyncio.to_thread(job, texts, provided)])
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(self._executor, job, batch, batch_provided)
+                for batch, batch_provided in zip(
+                    self._batches(texts), self._batches(provided)
+                )
+            )
+        )
+        return self._merge(results)
+
+    def stats(self) -> Dict:
+        """Texts scored and texts/sec, in total and per worker process, and
+        the memo's hit rate."""
+        with self._lock:
+            workers = {
+                pid: {
+                    "texts": worker["texts"],
+                    "busy_seconds": round(worker["seconds"], 3),
+                    "texts_per_second": (
+                        round(worker["texts"] / worker["seconds"])
+                        if worker["seconds"]
+                        else None
+                    ),
+                }
+                for pid, worker in self._per_worker.items()
+            }
+        texts = sum(worker["texts"] for worker in workers.values())
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        return {
+            "workers": workers,
+            "texts": texts,
+            "texts_per_second": round(texts / elapsed) if elapsed else None,
+            "engine": self.engine.name,
+            "memo": self.memo.stats() if self.memo is not None else None,
+        }
+
+
+def _benchmark(argv=None):
+    parser = argparse.ArgumentParser(description="Sentiment scoring benchmark")
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=SENTIMENT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    texts = [
+        f"Company {i} shares surge after strong quarterly earnings beat "
+        f"expectations, but analysts warn of weak guidance and rising costs"
+        for i in range(args.texts)
+    ]
+    counts = sorted({1, *(n for n in (2, 4, 8) if n <= (os.cpu_count() or 1))})
+    print(f"texts={args.texts} batch_size={args.batch_size} cpus={os.cpu_count()}")
+    print(f"{'workers':>7} {'seconds':>8} {'texts/s':>9} {'per worker texts/s':>20}")
+    for workers in counts:
+        with SentimentService(workers, args.batch_size, memo=None) as scorer:
+            # Start the processes and load the lexicon outside the measurement
+            scorer.score(texts[: args.batch_size * max(1, workers)])
+            started = time.perf_counter()
+            polarity, _ = scorer.score(texts)
+            elapsed = time.perf_counter() - started
+            assert len(polarity) == args.texts
+            per_worker = ", ".join(
+                str(worker["texts_per_second"])
+                for worker in scorer.stats()["workers"].values()
+            )
+        print(
+            f"{workers:>7} {elapsed:8.2f} {args.texts / elapsed:9.0f} {per_worker:>20}"
+        )
+
+
+if __name__ == "__main__":
+    _benchmark()
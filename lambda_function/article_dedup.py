@@ -0,0 +1,159 @@
+"""
+Deduplicación de artículos de noticias
+Cada artículo se identifica por su URL normalizada (o, si no tiene URL, por su
+título y descripción) con la misma expresión que la columna generada
+article_key de news_with_sentiment, que junto con published_at forma su clave
+única. Un conjunto LRU en memoria de artículos vistos descarta las copias
+(alias de una misma empresa, el mismo artículo para varios símbolos o con otra
+URL y el mismo texto) antes de puntuarlas, enviarlas o escribirlas; la copia de
+otro símbolo no se vuelve a guardar, se enlaza añadiendo el símbolo a la
+columna symbols del artículo original. lambda_function/ tiene una copia
+idéntica, porque su paquete solo incluye ese directorio (test_ingestion.py
+comprueba que no se separan).
+"""
+
+import hashlib
+import os
+import re
+import string
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Claves (de URL y de contenido) que recuerda el conjunto de artículos vistos
+NEWS_DEDUP_CACHE_SIZE = int(os.getenv("NEWS_DEDUP_CACHE_SIZE", "50000"))
+
+# Expresión de la columna generada news_with_sentiment.article_key. La
+# normalización en Python de este módulo debe dar exactamente el mismo
+# resultado: solo minúsculas y espacios ASCII (COLLATE "C"), la URL sin
+# fragmento, sin parámetros de seguimiento, sin esquema ni "www." y sin
+# separadores finales
+ARTICLE_KEY_SQL = r"""md5(COALESCE(
+    'url:' || NULLIF(regexp_replace(regexp_replace(regexp_replace(
+        regexp_replace(
+            regexp_replace(lower(btrim(url) COLLATE "C"), '#.*', ''),
+            '([?&])(utm_[a-z0-9_]*|fbclid|gclid|mc_cid|mc_eid)=[^&]*', '\1', 'g'
+        ),
+        '([?&])&+', '\1', 'g'),
+        '[?&/]+$', ''),
+        '^[a-z][a-z0-9+.-]*://(www\.)?', ''), ''),
+    'text:' || lower(btrim(regexp_replace(
+        (COALESCE(title, '') || ' ' || COALESCE(description, '')) COLLATE "C",
+        '[[:space:]]+', ' ', 'g')))
+))"""
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_FRAGMENT_RE = re.compile(r"#.*", re.S)
+_TRACKING_PARAM_RE = re.compile(
+    r"([?&])(utm_[a-z0-9_]*|fbclid|gclid|mc_cid|mc_eid)=[^&]*"
+)
+_EMPTY_PARAM_RE = re.compile(r"([?&])&+")
+_TRAILING_RE = re.compile(r"[?&/]+\Z")
+_SCHEME_RE = re.compile(r"^[a-z][a-z0-9+.-]*://(www\.)?")
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f\v]+")
+
+
+def normalize_url(url: Optional[str]) -> str:
+    """URL normalizada de un artículo ("" si no tiene)"""
+    text = (url or "").strip(" ").translate(_ASCII_LOWER)
+    text = _FRAGMENT_RE.sub("", text)
+    text = _TRACKING_PARAM_RE.sub(r"\1", text)
+    text = _EMPTY_PARAM_RE.sub(r"\1", text)
+    text = _TRAILING_RE.sub("", text)
+    return _SCHEME_RE.sub("", text)
+
+
+def normalize_text(title: Optional[str], description: Optional[str]) -> str:
+    """Título y descripción en minúsculas y con los espacios colapsados"""
+    text = _WHITESPACE_RE.sub(" ", f"{title or ''} {description or ''}")
+    return text.strip(" ").translate(_ASCII_LOWER)
+
+
+def _md5(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def content_hash(item: Dict) -> Optional[str]:
+    """Hash del texto del artículo, independiente de su URL (None sin texto)"""
+    text = normalize_text(item.get("title"), item.get("description"))
+    return _md5("text:" + text) if text else None
+
+
+def article_key(item: Dict) -> str:
+    """Valor de la columna article_key para un artículo"""
+    url = normalize_url(item.get("url"))
+    if url:
+        return _md5("url:" + url)
+    return _md5("text:" + normalize_text(item.get("title"), item.get("description")))
+
+
+class ArticleDeduplicator:
+    """
+    Conjunto LRU de artículos vistos por clave de URL y por hash de contenido
+
+    Un artículo cuya URL o texto ya se ha visto no se vuelve a procesar. Si
+    llega para un símbolo nuevo se devuelve como enlace: una fila con los datos
+    del artículo original y la lista de sus símbolos, que el upsert de
+    news_with_sentiment fusiona en la fila existente.
+    """
+
+    def __init__(self, capacity: int = NEWS_DEDUP_CACHE_SIZE):
+        self.capacity = capacity
+        self._seen: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"new": 0, "linked": 0, "dropped": 0}
+
+    @staticmethod
+    def _keys(item: Dict) -> List[str]:
+        return [key for key in (article_key(item), content_hash(item)) if key]
+
+    def _remember(self, key: str, entry: Dict):
+        self._seen[key] = entry
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+
+    def split(self, items: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Separar los artículos nuevos de las copias
+
+        A los nuevos se les añaden `article_key` y `symbols`; las copias del
+        mismo símbolo se descartan.
+
+        Returns:
+            (nuevos, enlaces a símbolos adicionales)
+        """
+        new, links = [], []
+        with self._lock:
+            for item in items:
+                keys = self._keys(item)
+                entry = next(
+                    (self._seen[key] for key in keys if key in self._seen), None
+                )
+                symbol = item.get("symbol")
+                if entry is None:
+                    item["article_key"] = keys[0]
+                    item["symbols"] = [symbol] if symbol else []
+                    entry = {"item": item, "symbols": set(item["symbols"])}
+                    new.append(item)
+                    self.stats["new"] += 1
+                elif symbol and symbol not in entry["symbols"]:
+                    entry["symbols"].add(symbol)
+                    links.append({**entry["item"], "symbols": sorted(entry["symbols"])})
+                    self.stats["linked"] += 1
+                else:
+                    self.stats["dropped"] += 1
+                for key in keys:
+                    self._remember(key, entry)
+        return new, links
+
+    def forget(self, items: Iterable[Dict]):
+        """Olvidar artículos no entregados para que no se descarten al volver"""
+        with self._lock:
+            for item in items:
+                for key in self._keys(item):
+                    self._seen.pop(key, None)
+
+
+# Conjunto compartido por el ciclo en tiempo real y los scripts históricos
+article_dedup = ArticleDeduplicator()
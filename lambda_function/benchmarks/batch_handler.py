@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Comprobación y benchmark del handler por lotes de la Lambda
+Genera eventos de Kinesis con noticias, noticias comprimidas, agregados (con
+news_link y precios) y registros dañados (base64, gzip o JSON inválidos y
+noticias sin título), y comprueba que lambda_handler devuelve en
+batchItemFailures exactamente los dañados, que el destino file recibe todas
+las noticias en una escritura por evento y que, si el destino falla, se
+devuelven todos los registros con noticias. Mide registros/s y los bytes de
+log por evento frente a imprimir todos los registros, como antes
+
+Uso (desde lambda_function/):
+    python -m benchmarks.batch_handler --events 50 --records 500
+"""
+
+import argparse
+import base64
+import gzip
+import importlib.util
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from .sentiment_score import synthetic_texts
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_handler(result_path):
+    """main.py con el destino file en result_path y la memo en memoria"""
+    os.environ.update(
+        RESULT_SINK="file", RESULT_FILE_PATH=result_path, SENTIMENT_MEMO="memory"
+    )
+    spec = importlib.util.spec_from_file_location(
+        "main", os.path.join(LAMBDA_DIR, "main.py")
+    )
+    main = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main)
+    return main
+
+
+def encode(payload, compress=False):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    return base64.b64encode(gzip.compress(data) if compress else data).decode()
+
+
+def make_event(rng, records, texts, start):
+    """(evento, secuencias dañadas, noticias válidas)"""
+    entries, bad, news = [], set(), 0
+    for i in range(records):
+        sequence = str(start + i)
+        article = {
+            "type": "news",
+            "symbol": rng.choice(["AAPL", "MSFT", "TSLA"]),
+            "title": rng.choice(texts) or "flat",
+            "description": rng.choice(texts),
+            "url": f"https://example.com/{start + i}",
+            "published_at": "20240115T103000",
+            "source": "example",
+        }
+        kind = rng.random()
+        if kind < 0.05:
+            bad.add(sequence)
+            data = rng.choice(
+                [
+                    "not base64!",
+                    encode(b"\x1f\x8b not gzip"),
+                    encode(b"{not json"),
+                    encode({**article, "title": ""}),
+                ]
+            )
+        elif kind < 0.3:
+            link = {**article, "type": "news_link", "symbol": "GOOG"}
+            stock = {"type": "stock", "symbol": "AAPL", "close": 1.0}
+            data = encode({"type": "aggregate", "records": [article, link, stock]})
+            news += 2
+        else:
+            data = encode(article, compress=kind < 0.5)
+            news += 1
+        entries.append({"kinesis": {"data": data, "sequenceNumber": sequence}})
+    return {"Records": entries}, bad, news
+
+
+class FailingSink:
+    def write(self, items):
+        raise ConnectionError("sink unavailable")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lambda batch handler check")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--records", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    texts = synthetic_texts(2000)
+    events = [
+        make_event(rng, args.records, texts, i * args.records)
+        for i in range(args.events)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        result_path = os.path.join(directory, "results.jsonl")
+        handler = load_handler(result_path)
+
+        log_bytes, elapsed, expected_rows = 0, 0.0, 0
+        for event, bad, news in events:
+            log = StringIO()
+            start = time.perf_counter()
+            with redirect_stdout(log):
+                response = handler.lambda_handler(event, None)
+            elapsed += time.perf_counter() - start
+            log_bytes += len(log.getvalue())
+            failures = {f["itemIdentifier"] for f in response["batchItemFailures"]}
+            assert failures == bad, (sorted(failures), sorted(bad))
+            expected_rows += news
+        with open(result_path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert len(rows) == expected_rows, (len(rows), expected_rows)
+        assert all(-1 <= row["sentiment_score"] <= 1 for row in rows)
+
+        # Antes: print de todos los registros decodificados
+        old_log_bytes = 0
+        for event, _, _ in events:
+            decoded = []
+            for record in event["Records"]:
+                try:
+                    decoded.extend(handler.decode_record(record))
+                except handler.DECODE_ERRORS:
+                    pass
+            old_log_bytes += len(f"Processed records: {decoded}\n")
+
+        handler.sink = FailingSink()
+        event, bad, _ = events[0]
+        with redirect_stdout(StringIO()):
+            response = handler.lambda_handler(event, None)
+        failures = [f["itemIdentifier"] for f in response["batchItemFailures"]]
+        assert set(failures) == {
+            r["kinesis"]["sequenceNumber"] for r in event["Records"]
+        }
+        assert len(failures) == len(set(failures))
+
+    # Upsert de postgres: las copias de un artículo quedan en una fila
+    from result_sinks import _merge_rows, news_row
+
+    article = {"title": "Same story", "url": "https://example.com/a", "symbol": "B"}
+    rows = _merge_rows(
+        [news_row(article), news_row({**article, "symbol": "A"}), news_row({})]
+    )
+    assert [row[-1] for row in rows] == [["A", "B"], []], rows
+
+    total = args.events * args.records
+    print(
+        f"events={args.events} records/event={args.records} rows={expected_rows}: "
+        "batchItemFailures and sink writes match"
+    )
+    print(
+        f"{total / elapsed:9.0f} records/s "
+        f"({elapsed * 1000 / args.events:.1f} ms/event)"
+    )
+    print(
+        f"log bytes/event: {log_bytes / args.events:9.0f} "
+        f"(printing every record: {old_log_bytes / args.events:.0f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark del arranque en frío del handler de la Lambda
+Cada medida es un proceso nuevo que importa main.py y procesa un evento de
+Kinesis con una noticia: tiempo de importación, latencia del primer registro,
+RSS máximo, módulos cargados y paquetes vendorizados pesados importados.
+Compara el handler tal cual (puntúa con textblob.en.scoring, sin nltk) con
+el mismo handler tras importar textblob.blob, que es lo que cargaba antes
+todo análisis de sentimiento; con bytecode en caché y compilando desde el
+fuente, como en una Lambda sin __pycache__ en el bundle. --graph N muestra
+los N módulos que más tardan en importarse en el camino ligero
+
+Uso (desde lambda_function/):
+    python -m benchmarks.cold_start --repeat 5 --graph 15
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDORED = ("nltk", "regex", "click", "tqdm", "joblib", "colorama", "numpy")
+
+# Proceso hijo: sys.argv = [modo, directorio de la Lambda, evento JSON]
+CHILD = """
+import importlib.util, json, os, resource, sys, time
+
+start = time.perf_counter()
+mode, lambda_dir, event = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+# Al final del path: los paquetes instalados ganan a los vendorizados, como
+# con el runtime de la Lambda
+sys.path.append(lambda_dir)
+if mode == "textblob":
+    import textblob.blob
+spec = importlib.util.spec_from_file_location(
+    "main", os.path.join(lambda_dir, "main.py")
+)
+main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(main)
+imported = time.perf_counter()
+sys.stdout = open(os.devnull, "w")
+main.lambda_handler(event, None)
+handled = time.perf_counter()
+sys.stdout = sys.__stdout__
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_record_ms": (handled - imported) * 1000,
+    "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "vendored": sorted({m.split(".")[0] for m in sys.modules} & set(%r)),
+}))
+""" % (
+    VENDORED,
+)
+
+
+def kinesis_event():
+    """Evento con una noticia, como lo envía la ingestión"""
+    news = {
+        "type": "news",
+        "symbol": "AAPL",
+        "title": "Apple shares surge after strong quarterly earnings",
+        "description": "Analysts warn of weak guidance and rising costs",
+    }
+    data = base64.b64encode(json.dumps(news).encode("utf-8")).decode("ascii")
+    return {"Records": [{"kinesis": {"data": data}}]}
+
+
+def cold_start(mode, bytecode, cache_dir, flags=()):
+    """Un arranque en frío en un proceso nuevo"""
+    command = [sys.executable, "-I", *flags]
+    if bytecode:
+        command += ["-X", f"pycache_prefix={cache_dir}"]
+    else:
+        # Sin leer ni escribir .pyc: se compila todo el fuente
+        command += ["-B", "-X", f"pycache_prefix={os.path.join(cache_dir, 'none')}"]
+    command += ["-c", CHILD, mode, LAMBDA_DIR, json.dumps(kinesis_event())]
+    # Memo en memoria: el primer registro siempre se puntúa; sin destino
+    env = dict(os.environ, SENTIMENT_MEMO="memory", RESULT_SINK="none")
+    result = subprocess.run(
+        command, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+
+def import_graph(cache_dir, top):
+    """Los módulos con más tiempo de importación acumulado (-X importtime)"""
+    # Sin site: el camino ligero solo usa la biblioteca estándar y lo
+    # vendorizado, y así no aparecen los .pth del entorno
+    _, stderr = cold_start("lean", True, cache_dir, ("-S", "-X", "importtime"))
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lambda cold start benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--graph", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"repeat={args.repeat} python={sys.version.split()[0]}")
+    print(
+        f"{'mode':>9} {'bytecode':>8} {'import_ms':>10} {'first_ms':>9} "
+        f"{'rss_mib':>8} {'modules':>8}  vendored"
+    )
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in ("lean", "textblob"):
+            for bytecode in (True, False):
+                if bytecode:
+                    # Llena la caché de bytecode
+                    cold_start(mode, True, cache_dir)
+                runs = [
+                    cold_start(mode, bytecode, cache_dir)[0] for _ in range(args.repeat)
+                ]
+                median = {
+                    key: statistics.median(run[key] for run in runs)
+                    for key in ("import_ms", "first_record_ms", "rss_mib", "modules")
+                }
+                print(
+                    f"{mode:>9} {'pyc' if bytecode else 'source':>8} "
+                    f"{median['import_ms']:10.1f} {median['first_record_ms']:9.1f} "
+                    f"{median['rss_mib']:8.1f} {median['modules']:8.0f}  "
+                    f"{','.join(runs[-1]['vendored']) or '-'}"
+                )
+        if args.graph:
+            print(f"\n{'cumulative_ms':>13}  module (lean, pyc)")
+            for cumulative, name in import_graph(cache_dir, args.graph):
+                print(f"{cumulative / 1000:13.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
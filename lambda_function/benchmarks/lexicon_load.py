@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la carga del léxico de sentimiento
+Compara la carga de en-sentiment.xml (ElementTree y medias por categoría y
+synset, lo que paga cada arranque en frío) con la del léxico compilado
+en-sentiment.lexicon, y comprueba que ambos dan el mismo léxico
+
+Uso (desde lambda_function/):
+    python -m benchmarks.lexicon_load --repeat 20
+"""
+
+import argparse
+import statistics
+import time
+
+from textblob.en import Sentiment, sentiment
+
+
+def fresh(cache):
+    """Un analizador como textblob.en.sentiment, sin cargar"""
+    return Sentiment(
+        path=sentiment.path,
+        synset="wordnet_id",
+        tokenizer=sentiment.tokenizer,
+        cache=cache,
+    )
+
+
+def timed_load(cache):
+    analyzer = fresh(cache)
+    start = time.perf_counter()
+    analyzer.load()
+    return time.perf_counter() - start, analyzer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentiment lexicon load benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    cache = fresh(None).compile()
+    results = {}
+    for mode, path in (("xml", False), ("compiled", cache)):
+        runs = [timed_load(path) for _ in range(args.repeat)]
+        results[mode] = [seconds for seconds, _ in runs]
+        loaded = runs[-1][1]
+        results[mode + "_lexicon"] = (
+            dict(loaded),
+            loaded.labeler,
+            loaded._synsets,
+            loaded.language,
+        )
+    assert results["xml_lexicon"] == results["compiled_lexicon"]
+
+    print(f"cache={cache} repeat={args.repeat}")
+    print(f"{'mode':>9} {'p50_ms':>8} {'min_ms':>8} {'speedup':>8}")
+    baseline = statistics.median(results["xml"])
+    for mode in ("xml", "compiled"):
+        median = statistics.median(results[mode])
+        print(
+            f"{mode:>9} {median * 1000:8.1f} {min(results[mode]) * 1000:8.1f} "
+            f"{baseline / median:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
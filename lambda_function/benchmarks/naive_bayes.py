@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Equivalencia y benchmark del modelo compilado de NaiveBayesAnalyzer
+Entrena un NaiveBayesClassifier de nltk con rasgos de presencia de palabras
+(el extractor por defecto) sobre movie_reviews o, si el corpus no está
+instalado, sobre reseñas sintéticas con palabras del léxico de sentimiento;
+lo compila a una NaiveBayesTable y comprueba que classify y classify_many
+(con y sin NumPy) dan exactamente la misma clase y probabilidades que
+prob_classify. Compara el tiempo de entrenar con el de abrir la tabla y el de
+clasificar con cada camino
+
+Uso (desde lambda_function/):
+    python -m benchmarks.naive_bayes --documents 5000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import nltk
+from textblob.en import sentiment
+from textblob.en.sentiments import NaiveBayesTable
+
+
+def training_data(seed: int = 0):
+    """Rasgos y clase de movie_reviews, o de 2000 reseñas sintéticas"""
+    try:
+        reviews = nltk.corpus.movie_reviews
+        return [
+            (dict.fromkeys(reviews.words(fileids=[f]), True), label)
+            for label in ("neg", "pos")
+            for f in reviews.fileids(label)
+        ], "movie_reviews"
+    except LookupError:
+        pass
+    rng = random.Random(seed)
+    words = sorted(w for w in sentiment.keys() if isinstance(w, str))
+    polarity = {w: sentiment(w)[0] for w in words}
+    data = []
+    for i in range(2000):
+        label = ("neg", "pos")[i % 2]
+        sign = 1 if label == "pos" else -1
+        review = [
+            w
+            for w in rng.choices(words, k=300)
+            if sign * polarity[w] >= 0 or rng.random() < 0.3
+        ]
+        data.append((dict.fromkeys(review, True), label))
+    return data, "synthetic"
+
+
+def documents(vocabulary, count: int, seed: int = 1):
+    """Listas de palabras con repeticiones, palabras desconocidas y vacías"""
+    rng = random.Random(seed)
+    unknown = [f"unseen{i}" for i in range(50)]
+    return [
+        [
+            rng.choice(unknown) if rng.random() < 0.1 else rng.choice(vocabulary)
+            for _ in range(rng.randint(0, 60))
+        ]
+        for _ in range(count)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NaiveBayesTable equivalence")
+    parser.add_argument("--documents", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    data, corpus = training_data()
+    start = time.perf_counter()
+    classifier = nltk.classify.NaiveBayesClassifier.train(data)
+    train_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "en-naive-bayes.table")
+        NaiveBayesTable.save(classifier, path)
+        start = time.perf_counter()
+        table = NaiveBayesTable(path)
+        load_seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        docs = documents(sorted(table.index), args.documents)
+        timings = {}
+
+        start = time.perf_counter()
+        reference = []
+        for words in docs:
+            dist = classifier.prob_classify(dict.fromkeys(words, True))
+            reference.append(
+                (dist.max(), {label: dist.prob(label) for label in table.labels})
+            )
+        timings["prob_classify"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        single = [table.classify(words) for words in docs]
+        timings["classify"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = table.classify_many(docs)
+        timings["classify_many"] = time.perf_counter() - start
+
+        # Camino sin NumPy, el de la Lambda
+        table._array = None
+        stdlib = table.classify_many(docs)
+
+        for mode, results in (
+            ("classify", single),
+            ("classify_many", batch),
+            ("classify_many (stdlib)", stdlib),
+        ):
+            mismatches = [
+                (words, expected, got)
+                for words, expected, got in zip(docs, reference, results)
+                if expected != got
+            ]
+            assert (
+                not mismatches
+            ), f"{mode}: {len(mismatches)} mismatches, first: {mismatches[0]}"
+
+    print(
+        f"corpus={corpus} words={len(table.index)} table={size / 1024:.0f} KiB "
+        f"documents={len(docs)}: the table matches prob_classify"
+    )
+    print(f"train {train_seconds * 1000:8.1f} ms   load {load_seconds * 1000:6.2f} ms")
+    print(f"{'mode':>14} {'seconds':>8} {'docs/s':>9} {'speedup':>8}")
+    baseline = timings["prob_classify"]
+    for mode, seconds in timings.items():
+        print(
+            f"{mode:>14} {seconds:8.3f} {len(docs) / seconds:9.0f} "
+            f"{baseline / seconds:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la API por lotes de PatternAnalyzer
+Puntúa los titulares y descripciones de news_with_sentiment.csv, repetidos
+hasta --texts textos, con TextBlob(text).sentiment en un bucle y con
+PatternAnalyzer().analyze_batch, y comprueba que dan los mismos resultados
+
+Uso (desde lambda_function/):
+    python -m benchmarks.pattern_batch --texts 1000000
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+
+from textblob import TextBlob
+from textblob.en.sentiments import PatternAnalyzer
+
+CORPUS = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "news_with_sentiment.csv"
+)
+
+
+def load_corpus(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            f"{row['title'] or ''} {row['description'] or ''}"
+            for row in csv.DictReader(f)
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PatternAnalyzer batch benchmark")
+    parser.add_argument("--texts", type=int, default=1_000_000)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    texts = list(itertools.islice(itertools.cycle(corpus), args.texts))
+    # Carga del léxico fuera de la medida
+    TextBlob("warm up").sentiment
+
+    start = time.perf_counter()
+    loop = [TextBlob(text).sentiment for text in texts]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = PatternAnalyzer().analyze_batch(texts)
+    batch_seconds = time.perf_counter() - start
+
+    assert list(batch.polarity) == [score.polarity for score in loop]
+    assert list(batch.subjectivity) == [score.subjectivity for score in loop]
+
+    # Sin textos repetidos: solo cuenta el ahorro por texto
+    unique = [f"{text} #{i}" for i, text in enumerate(texts[: len(corpus) * 20])]
+    start = time.perf_counter()
+    [TextBlob(text).sentiment for text in unique]
+    unique_loop = time.perf_counter() - start
+    start = time.perf_counter()
+    PatternAnalyzer().analyze_batch(unique)
+    unique_batch = time.perf_counter() - start
+
+    print(f"corpus={len(corpus)} distinct texts, repeated to {args.texts}")
+    print(f"{'mode':>22} {'seconds':>9} {'texts/s':>10} {'speedup':>8}")
+    for mode, count, seconds, baseline in (
+        ("TextBlob loop", len(texts), loop_seconds, loop_seconds),
+        ("analyze_batch", len(texts), batch_seconds, loop_seconds),
+        ("TextBlob loop, unique", len(unique), unique_loop, unique_loop),
+        ("analyze_batch, unique", len(unique), unique_batch, unique_loop),
+    ):
+        print(
+            f"{mode:>22} {seconds:9.2f} {count / seconds:10.0f} "
+            f"{baseline / seconds:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Equivalencia y benchmark de Sentiment.score
+Genera textos aleatorios con palabras del léxico, negaciones, modificadores,
+palabras cortas, "!", "(!)" y emoticonos, les añade los de
+news_with_sentiment.csv, comprueba que Sentiment.score devuelve exactamente
+la misma (polaridad, subjetividad) que Sentiment.__call__ (las medias de
+Sentiment.assessments) y compara el tiempo de ambos caminos
+
+Uso (desde lambda_function/):
+    python -m benchmarks.sentiment_score --texts 200000
+"""
+
+import argparse
+import random
+import time
+
+from textblob._text import EMOTICONS
+from textblob.en import sentiment
+from textblob.en.sentiments import PatternAnalyzer, _words
+
+from .pattern_batch import CORPUS, load_corpus
+
+FILLERS = ["a", "an", "is", "it", "the", "of", "to", "'s", "and", "movie", "stock"]
+NEGATIONS = ["no", "not", "n't", "never"]
+MARKS = ["!", "(!)", ".", ",", "?", "!!"]
+
+
+def synthetic_texts(count: int, seed: int = 0):
+    """Textos que cubren todas las reglas de Sentiment.assessments"""
+    rng = random.Random(seed)
+    lexicon = sorted(w for w in sentiment.keys() if isinstance(w, str))
+    modifiers = sorted(w for w in lexicon if "RB" in sentiment[w] or w.endswith("ly"))
+    emoticons = sorted(e for group in EMOTICONS.values() for e in group)
+    pools = [
+        (lexicon, 5),
+        (modifiers, 3),
+        (FILLERS, 4),
+        (NEGATIONS, 2),
+        (MARKS, 1),
+        (emoticons, 1),
+    ]
+    choices = [pool for pool, weight in pools for _ in range(weight)]
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(rng.choice(choices)) for _ in range(rng.randint(0, 30))]
+        text = " ".join(words)
+        texts.append(text.upper() if rng.random() < 0.05 else text)
+    return texts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentiment.score equivalence")
+    parser.add_argument("--texts", type=int, default=200_000)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args(argv)
+
+    texts = load_corpus(args.corpus) + synthetic_texts(args.texts)
+
+    start = time.perf_counter()
+    reference = [tuple(sentiment(text)) for text in texts]
+    call_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = [sentiment.score(_words(text)) for text in texts]
+    score_seconds = time.perf_counter() - start
+
+    mismatches = [
+        (text, expected, got)
+        for text, expected, got in zip(texts, reference, fast)
+        if expected != got
+    ]
+    assert not mismatches, f"{len(mismatches)} mismatches, first: {mismatches[0]}"
+
+    analyzer = PatternAnalyzer()
+    batch = analyzer.analyze_batch(texts)
+    assert list(zip(batch.polarity, batch.subjectivity)) == reference
+    assert [tuple(analyzer.analyze(text)) for text in texts[:1000]] == reference[:1000]
+
+    print(f"texts={len(texts)}: Sentiment.score matches Sentiment.__call__")
+    print(f"{'mode':>18} {'seconds':>8} {'texts/s':>9} {'speedup':>8}")
+    for mode, seconds in (
+        ("Sentiment.__call__", call_seconds),
+        ("Sentiment.score", score_seconds),
+    ):
+        print(
+            f"{mode:>18} {seconds:8.2f} {len(texts) / seconds:9.0f} "
+            f"{call_seconds / seconds:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Construye el ZIP de la Lambda solo con lo que usa el handler
+Ejecuta main.py con un evento de Kinesis en un proceso nuevo (con el
+SENTIMENT_ENGINE del entorno) y empaqueta los módulos y paquetes
+vendorizados que llegó a importar, con su .dist-info y las librerías que
+este declara, más los que el destino de RESULT_SINK importa al escribir
+(psycopg2 con postgres), que deben estar instalados aquí; el resto (nltk,
+regex, click, tqdm, joblib... si el motor no los usa), bin/, benchmarks/ y
+este script se quedan fuera. Antes compila el léxico de sentimiento
+(en-sentiment.lexicon) y añade el bytecode de cada módulo (.pyc sin
+comprobación de fuente): el sistema de ficheros de la Lambda es de solo
+lectura y, sin __pycache__ en el bundle, cada arranque en frío compila el
+fuente. El bytecode solo vale para la misma versión de Python que el runtime
+
+Uso (desde lambda_function/):
+    pip install -r requirements.txt --target . \\
+        --platform manylinux2014_x86_64 --only-binary=:all:
+    python build_bundle.py --output ../dist/lambda_function.zip
+"""
+
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import py_compile
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+LAMBDA_DIR = os.path.dirname(os.path.abspath(__file__))
+# Nunca en el bundle: scripts de consola de los paquetes, benchmarks y este script
+EXCLUDED = {"bin", "benchmarks", "__pycache__", os.path.basename(__file__)}
+# Fecha fija de las entradas: el mismo árbol da el mismo ZIP (source_code_hash)
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+# Proceso hijo: importa main.py con el RESULT_SINK del entorno, procesa un
+# evento sin guardarlo y lista los módulos de nivel superior cargados desde el
+# directorio de la Lambda y los que el destino necesita para escribir
+DISCOVER = """
+import importlib.util, json, os, sys
+
+lambda_dir, event = sys.argv[1], json.loads(sys.argv[2])
+sys.path.append(lambda_dir)
+spec = importlib.util.spec_from_file_location(
+    "main", os.path.join(lambda_dir, "main.py")
+)
+main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(main)
+requires = list(main.sink.requires)
+main.sink = main.create_sink("none")
+sys.stdout = open(os.devnull, "w")
+main.lambda_handler(event, None)
+sys.stdout = sys.__stdout__
+used = set()
+for module in list(sys.modules.values()):
+    path = os.path.abspath(getattr(module, "__file__", None) or "")
+    if path.startswith(lambda_dir + os.sep):
+        used.add(os.path.relpath(path, lambda_dir).split(os.sep)[0])
+print(json.dumps({"used": sorted(used), "requires": requires}))
+"""
+
+
+def sample_event():
+    news = {
+        "type": "news",
+        "symbol": "AAPL",
+        "title": "Apple shares surge after strong quarterly earnings",
+        "description": "Analysts warn of weak guidance and rising costs",
+    }
+    data = base64.b64encode(json.dumps(news).encode("utf-8")).decode("ascii")
+    return {"Records": [{"kinesis": {"data": data}}]}
+
+
+def used_entries():
+    """Ficheros y paquetes de nivel superior que importa el handler"""
+    result = subprocess.run(
+        [sys.executable, "-I", "-c", DISCOVER, LAMBDA_DIR, json.dumps(sample_event())],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    found = json.loads(result.stdout.splitlines()[-1])
+    missing = [
+        name
+        for name in found["requires"]
+        if not os.path.exists(os.path.join(LAMBDA_DIR, name))
+        and not os.path.exists(os.path.join(LAMBDA_DIR, name + ".py"))
+    ]
+    if missing:
+        # Sin ellos cada escritura fallaría en la Lambda
+        sys.exit(
+            f"{', '.join(missing)} not installed in {LAMBDA_DIR}: run "
+            "pip install -r requirements.txt --target . "
+            "--platform manylinux2014_x86_64 --only-binary=:all:"
+        )
+    return set(found["used"]) | set(found["requires"]) | {"main.py"}
+
+
+def dist_info_package(name):
+    """Paquetes de nivel superior que declara un .dist-info"""
+    top_level = os.path.join(LAMBDA_DIR, name, "top_level.txt")
+    if os.path.exists(top_level):
+        with open(top_level, encoding="utf-8") as f:
+            packages = {line.strip() for line in f if line.strip()}
+        if packages:
+            return packages
+    return {name.split("-")[0].lower()}
+
+
+def dist_info_entries(name):
+    """Entradas de nivel superior que instala un .dist-info (RECORD)"""
+    record = os.path.join(LAMBDA_DIR, name, "RECORD")
+    if not os.path.exists(record):
+        return set()
+    with open(record, encoding="utf-8") as f:
+        return {line.split("/")[0] for line in f if "/" in line.split(",")[0]}
+
+
+def bundle_files(keep):
+    """(incluidos, descartados): entradas de nivel superior del directorio"""
+    names = sorted(os.listdir(LAMBDA_DIR))
+    # Las librerías compartidas de un paquete (psycopg2_binary.libs/) van con él
+    keep = set(keep)
+    for name in names:
+        if name.endswith(".dist-info") and dist_info_package(name) & keep:
+            keep.update(dist_info_entries(name))
+    included, dropped = [], []
+    for name in names:
+        if name in EXCLUDED or name.startswith("."):
+            continue
+        if name.endswith(".dist-info"):
+            (included if dist_info_package(name) & keep else dropped).append(name)
+        elif name in keep or name.endswith(".py") and name[:-3] in keep:
+            included.append(name)
+        elif os.path.isdir(os.path.join(LAMBDA_DIR, name)) or name.endswith(".py"):
+            dropped.append(name)
+    return included, dropped
+
+
+def walk(name):
+    """Ficheros de una entrada de nivel superior (rutas relativas)"""
+    path = os.path.join(LAMBDA_DIR, name)
+    if not os.path.isdir(path):
+        yield name
+        return
+    for root, dirs, files in os.walk(path, followlinks=True):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for file in sorted(files):
+            if not file.endswith((".pyc", ".tmp")):
+                yield os.path.relpath(os.path.join(root, file), LAMBDA_DIR)
+
+
+def write_entry(archive, arcname, data):
+    info = zipfile.ZipInfo(arcname.replace(os.sep, "/"), ZIP_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    archive.writestr(info, data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Lambda bundle")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(LAMBDA_DIR, os.pardir, "dist", "lambda_function.zip"),
+    )
+    parser.add_argument(
+        "--keep", action="append", default=[], help="Package to include anyway"
+    )
+    parser.add_argument("--runtime", default="3.11", help="Lambda Python version")
+    parser.add_argument("--no-bytecode", action="store_true")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, LAMBDA_DIR)
+    from textblob.en import sentiment
+
+    lexicon = sentiment.compile()
+    keep = {name[:-3] if name.endswith(".py") else name for name in used_entries()}
+    keep.update(args.keep)
+    included, dropped = bundle_files(keep)
+
+    bytecode = not args.no_bytecode
+    if bytecode and "%d.%d" % sys.version_info[:2] != args.runtime:
+        print(
+            f"Python {sys.version.split()[0]} != runtime {args.runtime}: "
+            "bundle without bytecode"
+        )
+        bytecode = False
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    files = 0
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(
+        args.output, "w"
+    ) as archive:
+        for name in included:
+            for relpath in walk(name):
+                with open(os.path.join(LAMBDA_DIR, relpath), "rb") as f:
+                    write_entry(archive, relpath, f.read())
+                files += 1
+                if bytecode and relpath.endswith(".py"):
+                    pyc = os.path.join(tmp, "module.pyc")
+                    py_compile.compile(
+                        os.path.join(LAMBDA_DIR, relpath),
+                        cfile=pyc,
+                        dfile=relpath,
+                        doraise=True,
+                        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+                    )
+                    with open(pyc, "rb") as f:
+                        write_entry(
+                            archive, importlib.util.cache_from_source(relpath), f.read()
+                        )
+                    files += 1
+
+    print(f"lexicon={os.path.relpath(lexicon, LAMBDA_DIR)} bytecode={bytecode}")
+    print(f"included: {', '.join(included)}")
+    print(f"dropped:  {', '.join(dropped) or '-'}")
+    print(
+        f"{args.output}: {files} files, "
+        f"{os.path.getsize(args.output) / 1024 / 1024:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
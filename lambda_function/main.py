@@ -1,19 +1,175 @@
-import json
 import base64
-from textblob import TextBlob
+import gzip
+import json
+import time
+import zlib
+
+from result_sinks import create_sink
+from sentiment_engines import create_engine, provider_score
+from sentiment_memo import create_memo
+
+# Motor de sentimiento (SENTIMENT_ENGINE) y memo de puntuaciones: en memoria y
+# en /tmp, que se conserva mientras el contenedor sigue caliente
+# (SENTIMENT_MEMO=none la desactiva)
+engine = create_engine().load()
+memo = create_memo(version=engine.version()) if engine.memoizable else None
+# Destino de las noticias puntuadas (RESULT_SINK)
+sink = create_sink()
+
+# Elementos con texto que puntuar y guardar: noticias y copias de una noticia
+# para otro símbolo (el upsert solo añade el símbolo a la fila existente)
+NEWS_TYPES = ("news", "news_link")
+
+# Escrituras seguidas que pueden fallar al repetir registro a registro, sin
+# ninguna correcta, antes de dar el destino por caído y no intentar el resto
+RETRY_WRITE_FAILURE_LIMIT = 3
+
+# Errores de un registro que no se puede decodificar (base64, gzip, JSON)
+DECODE_ERRORS = (ValueError, TypeError, KeyError, OSError, EOFError, zlib.error)
+
+
+def decode_record(record):
+    """Elementos de un registro de Kinesis, con los agregados expandidos"""
+    raw = base64.b64decode(record["kinesis"]["data"], validate=True)
+    # STREAM_COMPRESSION=gzip comprime cada registro en la ingestión
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    data = json.loads(raw.decode("utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("record is not a JSON object")
+    # El productor de la ingestión puede agregar varios registros en uno
+    items = data.get("records") if data.get("type") == "aggregate" else [data]
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        raise ValueError("aggregate record without a list of objects")
+    if any(i.get("type") in NEWS_TYPES and not i.get("title") for i in items):
+        # title es NOT NULL: la fila haría fallar la escritura de todo el lote
+        raise ValueError("news item without title")
+    return items
+
+
+def score_news(news):
+    """Añadir sentiment_score y sentiment_subjectivity a las noticias"""
+    if not news:
+        return
+    # Todas las noticias del evento se puntúan en un lote; las ya vistas salen
+    # de la memo
+    texts = [
+        (item.get("title") or "") + " " + (item.get("description") or "")
+        for item in news
+    ]
+    if memo is not None:
+        polarity, subjectivity = memo.score(texts, engine.score)
+    else:
+        polarity, subjectivity = engine.score(
+            texts, [provider_score(item) for item in news]
+        )
+    for item, p, s in zip(news, polarity, subjectivity):
+        item["sentiment_score"] = p
+        item["sentiment_subjectivity"] = s
+
+
+def _count(errors, key, count=1):
+    errors[key] = errors.get(key, 0) + count
+
+
+def score_and_write(news):
+    """
+    Puntuar y guardar unas noticias
+
+    Returns:
+        (filas escritas, None) o (0, (etapa, excepción)) si algo falla
+    """
+    try:
+        score_news(news)
+    except Exception as e:
+        return 0, ("score", e)
+    try:
+        return sink.write(news), None
+    except Exception as e:
+        return 0, ("write", e)
 
 
 def lambda_handler(event, context):
-    results = []
+    """
+    Puntuar y guardar las noticias de un lote de registros de Kinesis
+
+    Decodifica todos los registros, puntúa todas las noticias en un lote y las
+    escribe en una operación. Si el lote falla al puntuar o al escribir, se
+    repite registro a registro. Devuelve en batchItemFailures los registros
+    que no se pudieron decodificar y aquellos cuyas noticias no se pudieron
+    puntuar o guardar: con ReportBatchItemFailures en el event source
+    mapping, Kinesis solo reintenta desde el primero de ellos en lugar de
+    todo el lote.
+    """
+    started = time.perf_counter()
+    stats = {"records": 0, "items": 0, "news": 0, "written": 0, "errors": {}}
+    # Números de secuencia fallidos, sin repetir y en orden
+    failed = {}
+    # Noticias de cada registro decodificado, en orden
+    news, by_record = [], {}
     for record in event.get("Records", []):
-        # Kinesis data is base64 encoded, decode here
-        payload = record["kinesis"]["data"]
-        data = json.loads(base64.b64decode(payload).decode("utf-8"))
-        if data.get("type") == "news":
-            text = data.get("title", "") + " " + (data.get("description", "") or "")
-            sentiment = TextBlob(text).sentiment.polarity if text else 0.0
-            data["sentiment"] = sentiment
-        results.append(data)
-    # Aquí podrías guardar en S3, Redshift, etc.
-    print("Processed records:", results)
-    return {"statusCode": 200, "body": json.dumps("Processed")}
+        stats["records"] += 1
+        sequence = record.get("kinesis", {}).get("sequenceNumber")
+        try:
+            items = decode_record(record)
+        except DECODE_ERRORS as e:
+            failed[sequence] = None
+            _count(stats["errors"], f"decode:{type(e).__name__}")
+            continue
+        stats["items"] += len(items)
+        for item in items:
+            if item.get("type") in NEWS_TYPES:
+                news.append(item)
+                by_record.setdefault(sequence, []).append(item)
+    stats["news"] = len(news)
+    decoded = time.perf_counter()
+
+    error = None
+    try:
+        score_news(news)
+    except Exception as e:
+        error = ("score", e)
+    scored = time.perf_counter()
+    if error is None:
+        try:
+            stats["written"] = sink.write(news)
+        except Exception as e:
+            error = ("write", e)
+    finished = time.perf_counter()
+    if error is not None:
+        # Un registro que no se puede puntuar o guardar no arrastra a los
+        # demás: se repite cada registro por separado y solo se reintentan
+        # los que vuelvan a fallar
+        stats["batch_error"] = f"{error[0]}:{type(error[1]).__name__}"
+        write_failures, sink_up = 0, False
+        for sequence, items in by_record.items():
+            if not sink_up and write_failures >= RETRY_WRITE_FAILURE_LIMIT:
+                # El destino no responde: no se espera a cada conexión
+                failed[sequence] = None
+                _count(stats["errors"], "write:skipped")
+                continue
+            written, record_error = score_and_write(items)
+            stats["written"] += written
+            if record_error is None:
+                sink_up = True
+                continue
+            stage, e = record_error
+            if stage == "write":
+                write_failures += 1
+            failed[sequence] = None
+            _count(stats["errors"], f"{stage}:{type(e).__name__}")
+            stats["last_error"] = str(e)[:200]
+    retried = time.perf_counter()
+
+    stats["failed_records"] = len(failed)
+    stats["ms"] = {
+        "decode": round((decoded - started) * 1000, 1),
+        "score": round((scored - decoded) * 1000, 1),
+        "write": round((finished - scored) * 1000, 1),
+        "retry": round((retried - finished) * 1000, 1),
+    }
+    if memo is not None:
+        stats["memo_hit_rate"] = memo.stats()["hit_rate"]
+    # Una línea de contadores por invocación en lugar de los datos
+    print(json.dumps(stats))
+    return {"batchItemFailures": [{"itemIdentifier": sequence} for sequence in failed]}
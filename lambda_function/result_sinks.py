@@ -0,0 +1,244 @@
+"""
+Destinos de las noticias puntuadas por la Lambda
+El handler escribe todas las noticias de un evento de Kinesis en una sola
+operación en un destino intercambiable que se elige con RESULT_SINK:
+
+- postgres (por defecto): un único INSERT ... ON CONFLICT (execute_values) en
+  news_with_sentiment, con el mismo upsert que el BulkWriter del backend: una
+  fila por artículo (article_key, published_at) y las copias del artículo
+  para otro símbolo (news_link) solo añaden ese símbolo a symbols. Necesita
+  psycopg2-binary (requirements.txt) instalado en este directorio:
+  build_bundle.py lo empaqueta aunque solo se importe en la primera escritura
+- file: líneas JSON anexadas a un fichero local (RESULT_FILE_PATH), sustituto
+  sin servicios externos para pruebas y benchmarks. Al pasar de
+  RESULT_FILE_MAX_BYTES se rota a RESULT_FILE_PATH.1, así que ocupa como mucho
+  el doble de ese tamaño en el /tmp del contenedor
+- none: no guarda nada
+
+Si la escritura falla se propaga la excepción: el handler informa entonces
+como fallidos los registros de Kinesis de esas noticias.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Sequence
+
+# Importado aquí y no en PostgresResultSink: así build_bundle.py lo ve al
+# recorrer los imports del handler con cualquier destino
+from article_dedup import article_key
+
+RESULT_SINK = os.getenv("RESULT_SINK", "postgres").lower()
+RESULT_FILE_PATH = os.getenv(
+    "RESULT_FILE_PATH", os.path.join(tempfile.gettempdir(), "lambda_results.jsonl")
+)
+# Tamaño a partir del cual el destino file rota el fichero (0: sin límite)
+RESULT_FILE_MAX_BYTES = int(os.getenv("RESULT_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+RESULT_SINKS = ("none", "file", "postgres")
+
+NEWS_COLUMNS = [
+    "title",
+    "description",
+    "url",
+    "published_at",
+    "source_name",
+    "sentiment_score",
+    "sentiment_subjectivity",
+    "symbol",
+    "symbols",  # última columna (ver _merge_rows)
+]
+
+# Mismo upsert que NEWS_LINK_EXPRESSIONS y NEWS_LINK_WHERE del backend: una
+# copia para otro símbolo solo añade el símbolo, sin reescribir la fila
+NEWS_UPSERT_SQL = """
+    INSERT INTO news_with_sentiment AS target ({columns})
+    VALUES %s
+    ON CONFLICT (article_key, published_at) DO UPDATE SET
+        symbols = ARRAY(SELECT DISTINCT linked FROM unnest(
+            COALESCE(target.symbols, ARRAY[target.symbol]) || EXCLUDED.symbols
+        ) AS linked WHERE linked IS NOT NULL ORDER BY linked),
+        updated_at = NOW()
+    WHERE NOT (EXCLUDED.symbols <@ COALESCE(target.symbols, ARRAY[target.symbol]))
+""".format(
+    columns=", ".join(NEWS_COLUMNS)
+)
+NEWS_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s::varchar[])"
+
+
+def news_row(item: Dict) -> tuple:
+    """Fila de news_with_sentiment (en el orden de NEWS_COLUMNS) de una noticia"""
+    symbol = item.get("symbol")
+    return (
+        item.get("title"),
+        item.get("description"),
+        item.get("url"),
+        item.get("published_at") or None,
+        item.get("source"),
+        item.get("sentiment_score", 0),
+        item.get("sentiment_subjectivity", 0),
+        symbol,
+        item.get("symbols") or ([symbol] if symbol else []),
+    )
+
+
+def _merge_rows(rows: Sequence[tuple]) -> List[tuple]:
+    """
+    Una fila por clave de conflicto, con la unión de sus símbolos
+
+    ON CONFLICT DO UPDATE no admite dos filas con la misma clave en una
+    sentencia. La clave es la columna generada article_key con published_at
+    tal como llega (las copias de un artículo vienen del mismo proveedor)
+    """
+    merged: Dict[tuple, tuple] = {}
+    for row in rows:
+        record = dict(zip(NEWS_COLUMNS, row))
+        key = (article_key(record), row[3])
+        previous = merged.get(key)
+        if previous is not None:
+            symbols = set(previous[-1]) | set(row[-1])
+            row = previous[:-1] + (sorted(symbols),)
+        merged[key] = row
+    return list(merged.values())
+
+
+class ResultSink:
+    """Destino de las noticias puntuadas de un evento"""
+
+    name = ""
+    # Módulos que el destino importa al escribir: build_bundle.py los incluye
+    # aunque el evento de prueba no llegue a escribir
+    requires: Sequence[str] = ()
+
+    def write(self, items: Sequence[Dict]) -> int:
+        """
+        Guardar las noticias en una operación
+
+        Returns:
+            Filas escritas
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NullResultSink(ResultSink):
+    name = "none"
+
+    def write(self, items: Sequence[Dict]) -> int:
+        return 0
+
+
+class FileResultSink(ResultSink):
+    """
+    Filas de news_with_sentiment como líneas JSON anexadas a un fichero
+
+    Cuando una escritura haría pasar el fichero de ``max_bytes`` se mueve a
+    ``path + ".1"`` (sustituyendo la rotación anterior) y se empieza otro.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str = RESULT_FILE_PATH, max_bytes=RESULT_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _rotate(self, incoming: int):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size and size + incoming > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+
+    def write(self, items: Sequence[Dict]) -> int:
+        if not items:
+            return 0
+        data = "".join(
+            json.dumps(dict(zip(NEWS_COLUMNS, news_row(item))), default=str) + "\n"
+            for item in items
+        ).encode("utf-8")
+        with self._lock:
+            if self.max_bytes > 0:
+                self._rotate(len(data))
+            # Un solo write por evento
+            with open(self.path, "ab") as f:
+                f.write(data)
+        return len(items)
+
+
+class PostgresResultSink(ResultSink):
+    """Upsert por lotes en news_with_sentiment"""
+
+    name = "postgres"
+    requires = ("psycopg2",)
+
+    def __init__(self, **connect_kwargs):
+        self.connect_kwargs = connect_kwargs or {
+            "host": os.getenv("DB_HOST", "postgres"),
+            "database": os.getenv("DB_NAME", "financial_sentiment"),
+            "user": os.getenv("DB_USER", "postgres"),
+            "password": os.getenv("DB_PASSWORD", "password"),
+            "port": int(os.getenv("DB_PORT", "5432")),
+        }
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # La conexión se abre en la primera escritura y se conserva mientras
+        # el contenedor sigue caliente
+        if self._conn is None or self._conn.closed:
+            import psycopg2
+
+            self._conn = psycopg2.connect(**self.connect_kwargs)
+        return self._conn
+
+    def write(self, items: Sequence[Dict]) -> int:
+        if not items:
+            return 0
+        from psycopg2.extras import execute_values
+
+        rows = _merge_rows([news_row(item) for item in items])
+        with self._lock:
+            conn = self._connection()
+            try:
+                with conn.cursor() as cur:
+                    execute_values(
+                        cur,
+                        NEWS_UPSERT_SQL,
+                        rows,
+                        template=NEWS_TEMPLATE,
+                        page_size=len(rows),
+                    )
+                conn.commit()
+            except Exception:
+                # Una conexión rota se vuelve a abrir en la siguiente escritura
+                if not conn.closed:
+                    conn.rollback()
+                raise
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and not self._conn.closed:
+                self._conn.close()
+
+
+def create_sink(kind: str = RESULT_SINK, **kwargs) -> ResultSink:
+    """
+    Crear el destino de resultados
+
+    Args:
+        kind: "none", "file" o "postgres"
+        **kwargs: `path` y `max_bytes` (file) o parámetros de conexión (postgres)
+    """
+    if kind not in RESULT_SINKS:
+        raise ValueError(f"Unknown result sink {kind!r}")
+    if kind == "file":
+        return FileResultSink(**kwargs)
+    if kind == "postgres":
+        return PostgresResultSink(**kwargs)
+    return NullResultSink()
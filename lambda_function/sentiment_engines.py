@@ -0,0 +1,341 @@
+"""
+Sentiment engines behind one batch interface.
+
+Every engine turns a batch of texts into two float arrays, polarity in
+[-1, 1] and subjectivity in [0, 1]:
+
+- ``pattern``: TextBlob's pattern analyzer (the default)
+- ``vader``: NLTK's VADER; compound score as polarity and the share of
+  non-neutral text as subjectivity. Needs the ``vader_lexicon`` NLTK data
+  (or ``VADER_LEXICON`` pointing at it)
+- ``alphavantage``: the score Alpha Vantage's NEWS_SENTIMENT supplies with
+  each article (``provided``), falling back to another engine for texts that
+  came without one
+
+lambda_function/ carries an identical copy of this module, since its bundle
+only ships that directory (backend/test_ingestion.py keeps them in sync).
+
+The deployment picks one with ``SENTIMENT_ENGINE``:
+
+    engine = create_engine().load()
+    polarity, subjectivity = engine.score(texts)
+
+Benchmark (throughput and agreement on a labeled sample):
+
+    python sentiment_engines.py --sample ../news_with_sentiment.csv
+"""
+
+import argparse
+import hashlib
+import itertools
+import os
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Scoring engine, engine for articles without a provider score, and the VADER
+# lexicon (an nltk.data resource or "file:/path")
+SENTIMENT_ENGINE = os.getenv("SENTIMENT_ENGINE", "pattern")
+SENTIMENT_FALLBACK_ENGINE = os.getenv("SENTIMENT_FALLBACK_ENGINE", "pattern")
+VADER_LEXICON = os.getenv(
+    "VADER_LEXICON", "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+)
+
+ENGINES: Dict[str, type] = {}
+
+
+def _version(module) -> str:
+    """``module.__version__``, or the version of its installed distribution."""
+    version = getattr(module, "__version__", None)
+    if version is None:
+        # importlib.metadata takes tens of ms to import (the Lambda cold
+        # start): only when the package does not declare its version
+        from importlib import metadata
+
+        version = metadata.version(module.__name__)
+    return version
+
+
+def register_engine(cls):
+    """Class decorator adding an engine to the registry under ``cls.name``."""
+    ENGINES[cls.name] = cls
+    return cls
+
+
+class SentimentEngine:
+    """
+    Base class of the engines.
+
+    Subclasses set ``name``, import their analyzer in ``load`` (once per
+    process) and implement ``version`` and ``score``.
+    """
+
+    name = ""
+    # Scores depend on the text only: they can be memoized
+    memoizable = True
+
+    def load(self) -> "SentimentEngine":
+        return self
+
+    def version(self) -> str:
+        """Identifies the engine and its data, for memoized scores."""
+        raise NotImplementedError
+
+    def score(
+        self, texts: Sequence[str], provided: Optional[Sequence] = None
+    ) -> Tuple[array, array]:
+        """
+        Score texts, in order.
+
+        Args:
+            texts: Texts to score
+            provided: Scores supplied by the news provider, one per text (or
+                None); only provider engines use them
+
+        Returns:
+            (polarity array, subjectivity array), one value per text
+        """
+        raise NotImplementedError
+
+
+@register_engine
+class PatternEngine(SentimentEngine):
+    """TextBlob's pattern analyzer."""
+
+    name = "pattern"
+
+    def __init__(self):
+        self._score_batch = None
+
+    def load(self) -> "PatternEngine":
+        if self._score_batch is None:
+            try:
+                # lambda_function's TextBlob: lexicon and tokenizer only, no nltk
+                from textblob.en.scoring import score_batch
+            except ImportError:
+                score_batch = self._analyze_each
+            # The lexicon loads on the first analysis
+            score_batch(["warm up"])
+            self._score_batch = score_batch
+        return self
+
+    @staticmethod
+    def _analyze_each(texts) -> Tuple[array, array]:
+        from textblob.en.sentiments import PatternAnalyzer
+
+        analyzer = PatternAnalyzer()
+        polarity, subjectivity = array("d"), array("d")
+        for text in texts:
+            sentiment = analyzer.analyze(text)
+            polarity.append(sentiment.polarity)
+            subjectivity.append(sentiment.subjectivity)
+        return polarity, subjectivity
+
+    def version(self) -> str:
+        import textblob
+        import textblob.en
+
+        lexicon = os.path.join(
+            os.path.dirname(textblob.en.__file__), "en-sentiment.xml"
+        )
+        with open(lexicon, "rb") as f:
+            checksum = hashlib.sha1(f.read()).hexdigest()[:12]
+        return f"pattern-textblob-{_version(textblob)}-{checksum}"
+
+    def score(self, texts, provided=None) -> Tuple[array, array]:
+        self.load()
+        return self._score_batch([text or "" for text in texts])
+
+
+@register_engine
+class VaderEngine(SentimentEngine):
+    """NLTK's VADER: compound score and share of non-neutral text."""
+
+    name = "vader"
+
+    def __init__(self, lexicon: str = VADER_LEXICON):
+        self.lexicon = lexicon
+        self._analyzer = None
+
+    def load(self) -> "VaderEngine":
+        if self._analyzer is None:
+            from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+            self._analyzer = SentimentIntensityAnalyzer(lexicon_file=self.lexicon)
+        return self
+
+    def version(self) -> str:
+        import nltk
+
+        self.load()
+        checksum = hashlib.sha1(self._analyzer.lexicon_file.encode()).hexdigest()
+        return f"vader-nltk-{_version(nltk)}-{checksum[:12]}"
+
+    def score(self, texts, provided=None) -> Tuple[array, array]:
+        self.load()
+        polarity, subjectivity = array("d"), array("d")
+        for text in texts:
+            scores = self._analyzer.polarity_scores(text or "")
+            polarity.append(scores["compound"])
+            subjectivity.append(1.0 - scores["neu"])
+        return polarity, subjectivity
+
+
+@register_engine
+class AlphaVantageEngine(SentimentEngine):
+    """
+    Alpha Vantage's own article score, with no subjectivity (0.0).
+
+    Args:
+        fallback: Engine for texts without a provider score (``none``
+            leaves them at 0.0)
+    """
+
+    name = "alphavantage"
+    # The score comes from the article, not from the text
+    memoizable = False
+
+    def __init__(self, fallback: str = SENTIMENT_FALLBACK_ENGINE):
+        if fallback == self.name:
+            raise ValueError("alphavantage cannot be its own fallback engine")
+        self.fallback = None if fallback == "none" else create_engine(fallback)
+
+    def load(self) -> "AlphaVantageEngine":
+        if self.fallback is not None:
+            self.fallback.load()
+        return self
+
+    def version(self) -> str:
+        fallback = self.fallback.version() if self.fallback is not None else "none"
+        return f"alphavantage+{fallback}"
+
+    def score(self, texts, provided=None) -> Tuple[array, array]:
+        provided = list(provided) if provided is not None else [None] * len(texts)
+        polarity = array("d", (float(p or 0.0) for p in provided))
+        subjectivity = array("d", [0.0]) * len(texts)
+        missing = [i for i, p in enumerate(provided) if p is None]
+        if missing and self.fallback is not None:
+            scored = self.fallback.score([texts[i] for i in missing])
+            for i, p, s in zip(missing, *scored):
+                polarity[i] = p
+                subjectivity[i] = s
+        return polarity, subjectivity
+
+
+def provider_score(article: Dict) -> Optional[float]:
+    """The Alpha Vantage ``overall_sentiment_score`` of an article, if any."""
+    try:
+        return float(article["overall_sentiment_score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def create_engine(name: str = SENTIMENT_ENGINE, **kwargs) -> SentimentEngine:
+    """Build a registered engine (not loaded yet)."""
+    if name not in ENGINES:
+        raise ValueError(
+            f"Unknown sentiment engine {name!r} (available: {', '.join(ENGINES)})"
+        )
+    return ENGINES[name](**kwargs)
+
+
+def _sign(value: float, neutral: float) -> int:
+    return 0 if abs(value) <= neutral else (1 if value > 0 else -1)
+
+
+def _label(value: str, neutral: float) -> Optional[int]:
+    """Numeric or positive/negative/neutral (bullish/bearish) label."""
+    value = (value or "").strip().lower()
+    try:
+        return _sign(float(value), neutral)
+    except ValueError:
+        pass
+    if "bull" in value or value.startswith("pos"):
+        return 1
+    if "bear" in value or value.startswith("neg"):
+        return -1
+    return 0 if value.startswith("neu") else None
+
+
+def _benchmark(argv=None):
+    # Benchmark only: kept out of the Lambda cold start
+    import csv
+    import statistics
+
+    parser = argparse.ArgumentParser(description="Sentiment engine benchmark")
+    parser.add_argument(
+        "--sample",
+        default=os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            os.pardir,
+            "news_with_sentiment.csv",
+        ),
+    )
+    parser.add_argument("--text-columns", default="title,description")
+    parser.add_argument("--label-column", default="sentiment")
+    parser.add_argument("--provider-column", default="overall_sentiment_score")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--neutral", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    with open(args.sample, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    columns = args.text_columns.split(",")
+    texts = [" ".join(row.get(c) or "" for c in columns) for row in rows]
+    labels = [_label(row.get(args.label_column), args.neutral) for row in rows]
+    provided = [
+        provider_score({"overall_sentiment_score": row.get(args.provider_column)})
+        for row in rows
+    ]
+    # Throughput over the repeated sample (distinct texts, so that no engine
+    # benefits from repeats), agreement over the sample
+    repeated = [
+        f"{text} #{i}"
+        for i, text in enumerate(itertools.islice(itertools.cycle(texts), args.texts))
+    ]
+    repeated_provided = list(itertools.islice(itertools.cycle(provided), args.texts))
+
+    print(f"sample={len(rows)} rows, throughput over {args.texts} texts")
+    print(f"{'engine':>12} {'seconds':>8} {'texts/s':>9} {'accuracy':>9}")
+    polarity: Dict[str, List[float]] = {}
+    for name in args.engines.split(","):
+        try:
+            engine = create_engine(name).load()
+        except (ImportError, LookupError, OSError) as e:
+            reason = next(
+                (line.strip() for line in str(e).splitlines() if line.strip(" *")), ""
+            )
+            print(f"{name:>12} unavailable: {type(e).__name__}: {reason}")
+            continue
+        started = time.perf_counter()
+        engine.score(repeated, repeated_provided)
+        elapsed = time.perf_counter() - started
+        polarity[name] = list(engine.score(texts, provided)[0])
+        labeled = [
+            (_sign(p, args.neutral), label)
+            for p, label in zip(polarity[name], labels)
+            if label is not None
+        ]
+        accuracy = (
+            f"{sum(s == label for s, label in labeled) / len(labeled):9.3f}"
+            if labeled
+            else f"{'-':>9}"
+        )
+        print(f"{name:>12} {elapsed:8.2f} {args.texts / elapsed:9.0f} {accuracy}")
+
+    print(f"\n{'engines':>25} {'agreement':>10} {'pearson':>8}")
+    for a, b in itertools.combinations(polarity, 2):
+        agreement = statistics.mean(
+            _sign(x, args.neutral) == _sign(y, args.neutral)
+            for x, y in zip(polarity[a], polarity[b])
+        )
+        try:
+            pearson = f"{statistics.correlation(polarity[a], polarity[b]):8.3f}"
+        except statistics.StatisticsError:
+            pearson = f"{'-':>8}"
+        print(f"{a + ' vs ' + b:>25} {agreement:10.3f} {pearson}")
+
+
+if __name__ == "__main__":
+    _benchmark()
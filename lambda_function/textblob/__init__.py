@@ -1,4 +1,4 @@
-from .blob import Blobber, Sentence, TextBlob, Word, WordList
+__version__ = "0.19.0"
 
 __all__ = [
     "TextBlob",
@@ -7,3 +7,13 @@ __all__ = [
     "Blobber",
     "WordList",
 ]
+
+
+def __getattr__(name):
+    # textblob.blob pulls in all of nltk; import it on first use so that
+    # textblob.en (lexicons and sentiment scoring) loads without it.
+    if name in __all__:
+        from textblob import blob
+
+        return getattr(blob, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,6 +5,8 @@ Licence: BSD
 """
 
 import codecs
+import hashlib
+import marshal
 import os
 import re
 import string
@@ -328,6 +330,13 @@ RE_EMOTICONS = [
 ]
 RE_EMOTICONS = re.compile(r"(%s)($|\s)" % "|".join(RE_EMOTICONS))
 
+# Lower-cased emoticon => polarity of the first expression (in EMOTICONS order)
+# that contains it, so assessments() does one lookup per token.
+EMOTICON_POLARITY = {}
+for (_type, _polarity), _emoticons in EMOTICONS.items():
+    for _emoticon in _emoticons:
+        EMOTICON_POLARITY.setdefault(_emoticon.lower(), _polarity)
+
 # Handle sarcasm punctuation (!).
 RE_SARCASM = re.compile(r"\( ?\! ?\)")
 
@@ -849,6 +858,15 @@ NOUN, VERB, ADJECTIVE, ADVERB = "NN", "VB", "JJ", "RB"
 
 RE_SYNSET = re.compile(r"^[acdnrv][-_][0-9]+$")
 
+# Bumped whenever the layout of the compiled lexicon changes.
+LEXICON_CACHE_VERSION = 1
+
+
+def _checksum(path):
+    """Returns the SHA-1 hex digest of the file at the given path."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
 
 def avg(list):
     return sum(list) / float(len(list) or 1)
@@ -868,13 +886,21 @@ class Score(tuple):
 
 
 class Sentiment(lazydict):
-    def __init__(self, path="", language=None, synset=None, confidence=None, **kwargs):
+    def __init__(
+        self, path="", language=None, synset=None, confidence=None, cache=None, **kwargs
+    ):
         """A dictionary of words (adjectives) and polarity scores (positive/negative).
         The value for each word is a dictionary of part-of-speech tags.
         The value for each word POS-tag is a tuple with values for
         polarity (-1.0-1.0), subjectivity (0.0-1.0) and intensity (0.5-2.0).
+        The parsed XML is compiled to the cache file (by default next to the XML,
+        with a .lexicon extension; cache=False disables it) and later loads read
+        the cache instead, as long as it matches the XML checksum.
         """
         self._path = path  # XML file path.
+        if cache is None and path:
+            cache = os.path.splitext(path)[0] + ".lexicon"
+        self._cache = cache or None  # Compiled lexicon file path.
         self._language = None  # XML language attribute ("en", "fr", ...)
         self._confidence = None  # XML confidence attribute threshold (>=).
         self._synset = synset  # XML synset attribute ("wordnet_id", "cornetto_id", ...)
@@ -899,14 +925,32 @@ class Sentiment(lazydict):
 
     def load(self, path=None):
         """Loads the XML-file (with sentiment annotations) from the given path.
-        By default, Sentiment.path is lazily loaded.
+        By default, Sentiment.path is lazily loaded, from the compiled cache when
+        it is up to date (otherwise the XML is parsed and the cache rewritten).
         """
-        # <word form="great" wordnet_id="a-01123879" pos="JJ" polarity="1.0" subjectivity="1.0" intensity="1.0" />
-        # <word form="damnmit" polarity="-0.75" subjectivity="1.0" label="profanity" />
+        cached = not path and self._cache
         if not path:
             path = self._path
         if not os.path.exists(path):
             return
+        checksum = _checksum(path) if cached else None
+        if cached and self._load_cache(checksum):
+            return
+        language, words, labels, synsets = self._parse(path)
+        self._language = language or self._language
+        dict.update(self, words)
+        dict.update(self.labeler, labels)
+        dict.update(self._synsets, synsets)
+        if cached:
+            try:
+                self._save_cache(checksum, (language, words, labels, synsets))
+            except OSError:
+                pass  # Read-only file system: keep parsing the XML.
+
+    def _parse(self, path):
+        """Returns a (language, words, labels, synsets)-tuple read from the XML-file."""
+        # <word form="great" wordnet_id="a-01123879" pos="JJ" polarity="1.0" subjectivity="1.0" intensity="1.0" />
+        # <word form="damnmit" polarity="-0.75" subjectivity="1.0" label="profanity" />
         words, synsets, labels = {}, {}, {}
         xml = ElementTree.parse(path)
         xml = xml.getroot()
@@ -930,7 +974,6 @@ class Sentiment(lazydict):
                     labels[w] = label
                 if synset:
                     synsets.setdefault(synset, []).append(psi)
-        self._language = xml.attrib.get("language", self._language)
         # Average scores of all word senses per part-of-speech tag.
         for w in words:
             words[w] = dict(
@@ -943,9 +986,57 @@ class Sentiment(lazydict):
         # Average scores of all synonyms per synset.
         for id, psi in synsets.items():
             synsets[id] = [avg(each) for each in zip(*psi)]
+        return xml.attrib.get("language"), words, labels, synsets
+
+    def _cache_header(self, checksum):
+        return {
+            "version": LEXICON_CACHE_VERSION,
+            "marshal": marshal.version,
+            "checksum": checksum,
+            "synset": self._synset,
+            "confidence": self._confidence,
+        }
+
+    def _load_cache(self, checksum):
+        """Loads the compiled lexicon if it was built from the same XML and settings.
+        Returns False when the cache is missing, stale or unreadable.
+        """
+        try:
+            # marshal.loads() on the whole file is several times faster than
+            # marshal.load(), which reads the file in small chunks.
+            with open(self._cache, "rb") as f:
+                header, lexicon = marshal.loads(f.read())
+            if header != self._cache_header(checksum):
+                return False
+            language, words, labels, synsets = lexicon
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        self._language = language or self._language
         dict.update(self, words)
         dict.update(self.labeler, labels)
         dict.update(self._synsets, synsets)
+        return True
+
+    def _save_cache(self, checksum, lexicon):
+        # Written to a temporary file first, so concurrent loaders never see
+        # a partial cache.
+        tmp = "%s.%s.tmp" % (self._cache, os.getpid())
+        try:
+            with open(tmp, "wb") as f:
+                f.write(marshal.dumps((self._cache_header(checksum), lexicon)))
+            os.replace(tmp, self._cache)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def compile(self):
+        """Parses the XML-file and (re)writes the compiled lexicon cache.
+        Returns the cache path.
+        """
+        if not self._cache or not os.path.exists(self._path):
+            raise ValueError("Sentiment.compile() needs an XML-file and a cache path")
+        self._save_cache(_checksum(self._path), self._parse(self._path))
+        return self._cache
 
     def synset(self, id, pos=ADJECTIVE):
         """Returns a (polarity, subjectivity)-tuple for the given synset id.
@@ -1118,10 +1209,9 @@ class Sentiment(lazydict):
                 if (
                     w.isalpha() is False and len(w) <= 5 and w not in PUNCTUATION
                 ):  # speedup
-                    for (_type, p), e in EMOTICONS.items():
-                        if w in map(lambda e: e.lower(), e):
-                            a.append(dict(w=[w], p=p, s=1.0, i=1.0, n=1, x=MOOD))
-                            break
+                    p = EMOTICON_POLARITY.get(w)
+                    if p is not None:
+                        a.append(dict(w=[w], p=p, s=1.0, i=1.0, n=1, x=MOOD))
         for i in range(len(a)):
             w = a[i]["w"]
             p = a[i]["p"]
@@ -1132,6 +1222,84 @@ class Sentiment(lazydict):
             a[i] = (w, p * -0.5 if n < 0 else p, s, x)
         return a
 
+    def score(self, words, negation=True):
+        """Returns the (polarity, subjectivity)-tuple that Sentiment.__call__() averages
+        from Sentiment.assessments() for the given list of (word, POS)-tuples.
+        The negation, modifier and exclamation rules are the same, but only the
+        assessment in progress is kept, as local variables, and earlier ones are
+        added to running sums: no chunks, labels or per-word dicts are built.
+        """
+        if dict.__len__(self) == 0:
+            self.load()
+        get = dict.get  # Skips lazydict.__contains__ / __getitem__.
+        modifiers, negations = self.modifiers, self.negations
+        sp = ss = k = 0  # Sums of committed polarity and subjectivity, count.
+        has = False  # Assessment in progress (Sentiment.assessments() a[-1]).
+        pp = ps = pi = 0.0
+        pn = 1
+        m = None  # Preceding modifier.
+        n = None  # Preceding negation.
+        for w, pos in words:
+            if w is None:
+                continue
+            entry = get(self, w)
+            if entry is not None and pos in entry:
+                p, s, i = entry[pos]
+                if m is None:
+                    if has:
+                        sp += pp * -0.5 if pn < 0 else pp
+                        ss += ps
+                        k += 1
+                    has, pp, ps, pi, pn = True, p, s, i, 1
+                else:
+                    pp = max(-1.0, min(p * pi, +1.0))
+                    ps = max(-1.0, min(s * pi, +1.0))
+                    pi = i
+                if n is not None:
+                    pi = 1.0 / pi
+                    pn = -1
+                m = None
+                n = None
+                if pos and pos in modifiers or any(map(entry.__contains__, modifiers)):
+                    m = w
+                if negation and w in negations:
+                    n = w
+            else:
+                if negation and w in negations:
+                    n = w
+                elif n and len(w.strip("'")) > 1:
+                    n = None
+                if (
+                    n is not None
+                    and m is not None
+                    and (pos in modifiers or self.modifier(m))
+                ):
+                    pn = -1
+                    n = None
+                elif m is not None and len(w) > 2:
+                    m = None
+                if w == "!" and has:
+                    pp = max(-1.0, min(pp * 1.25, +1.0))
+                if w == "(!)":
+                    if has:
+                        sp += pp * -0.5 if pn < 0 else pp
+                        ss += ps
+                        k += 1
+                    has, pp, ps, pi, pn = True, 0.0, 1.0, 1.0, 1
+                if w.isalpha() is False and len(w) <= 5 and w not in PUNCTUATION:
+                    p = EMOTICON_POLARITY.get(w)
+                    if p is not None:
+                        if has:
+                            sp += pp * -0.5 if pn < 0 else pp
+                            ss += ps
+                            k += 1
+                        has, pp, ps, pi, pn = True, p, 1.0, 1.0, 1
+        if has:
+            sp += pp * -0.5 if pn < 0 else pp
+            ss += ps
+            k += 1
+        return sp / float(k or 1), ss / float(k or 1)
+
     def annotate(
         self, word, pos=None, polarity=0.0, subjectivity=0.0, intensity=1.0, label=None
     ):
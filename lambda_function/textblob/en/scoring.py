@@ -0,0 +1,46 @@
+"""Polarity and subjectivity with the pattern lexicon alone.
+
+:mod:`textblob.en.sentiments` derives its analyzers from :mod:`textblob.base`,
+which imports all of nltk. This module only needs :mod:`textblob.en` (the
+sentiment lexicon and the regular-expression tokenizer), so a process that
+just scores text starts without nltk. Scores are identical to
+``PatternAnalyzer().analyze(text)``.
+"""
+
+from array import array
+from itertools import repeat
+
+from textblob.en import sentiment
+
+#: Distinct texts whose scores are remembered within one :func:`score_batch` call.
+BATCH_CACHE_SIZE = 65536
+
+
+def words(text):
+    """The lower-cased words ``Sentiment.__call__`` assesses for a string,
+    as (word, POS)-pairs without a POS tag."""
+    words = " ".join(sentiment.tokenizer(text)).lower().split()
+    return zip(words, repeat(None))
+
+
+def score(text):
+    """Returns a (polarity, subjectivity)-tuple for a string."""
+    return sentiment.score(words(text))
+
+
+def score_batch(texts):
+    """Scores an iterable of strings, scoring repeated texts once.
+
+    :rtype: (polarity, subjectivity) ``array("d")`` pair, one value per text
+    """
+    polarity, subjectivity = array("d"), array("d")
+    seen = {}
+    for text in texts:
+        cached = seen.get(text)
+        if cached is None:
+            cached = sentiment.score(words(text))
+            if len(seen) < BATCH_CACHE_SIZE:
+                seen[text] = cached
+        polarity.append(cached[0])
+        subjectivity.append(cached[1])
+    return polarity, subjectivity
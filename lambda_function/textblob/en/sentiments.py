@@ -3,15 +3,65 @@
 .. versionadded:: 0.5.0
 """
 
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
 from collections import namedtuple
+from itertools import repeat
 
 import nltk
+from nltk.probability import sum_logs
+
+try:
+    import numpy
+except ImportError:  # The Lambda bundle ships without NumPy.
+    numpy = None
 
 from textblob.base import CONTINUOUS, DISCRETE, BaseSentimentAnalyzer
 from textblob.decorators import requires_nltk_corpus
 from textblob.en import sentiment as pattern_sentiment
+from textblob.en.scoring import BATCH_CACHE_SIZE as _BATCH_CACHE_SIZE
+from textblob.en.scoring import words as _words
 from textblob.tokenizers import word_tokenize
 
+# Return types, created once instead of on every analyze() call.
+Sentiment = namedtuple("Sentiment", ["polarity", "subjectivity"])
+AssessedSentiment = namedtuple("Sentiment", ["polarity", "subjectivity", "assessments"])
+#: Columnar result of :meth:`PatternAnalyzer.analyze_batch`: ``polarity`` and
+#: ``subjectivity`` are ``array("d")`` with one value per text; ``assessments``
+#: is a list (one per text) or None.
+BatchSentiment = namedtuple(
+    "BatchSentiment", ["polarity", "subjectivity", "assessments"]
+)
+
+#: Columnar result of :meth:`NaiveBayesAnalyzer.analyze_batch`:
+#: ``classification`` is a list of labels, ``p_pos`` and ``p_neg`` are
+#: ``array("d")`` with one value per text.
+BatchClassification = namedtuple(
+    "BatchClassification", ["classification", "p_pos", "p_neg"]
+)
+
+#: Default location of the compiled :class:`NaiveBayesAnalyzer` model.
+NAIVE_BAYES_TABLE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "en-naive-bayes.table"
+)
+
+# nltk's log2(0): the log-probability of features a label never saw.
+_NINF = sum_logs([])
+
+
+def _mean(assessments, column):
+    """Unweighted mean of one assessment column, summed in the same order
+    as ``Sentiment.__call__`` so the result is identical."""
+    total = 0
+    for assessment in assessments:
+        total += assessment[column]
+    return total / float(len(assessments) or 1)
+
 
 class PatternAnalyzer(BaseSentimentAnalyzer):
     """Sentiment analyzer that uses the same implementation as the
@@ -26,24 +76,53 @@ class PatternAnalyzer(BaseSentimentAnalyzer):
     kind = CONTINUOUS
     # This is only here for backwards-compatibility.
     # The return type is actually determined upon calling analyze()
-    RETURN_TYPE = namedtuple("Sentiment", ["polarity", "subjectivity"])
+    RETURN_TYPE = Sentiment
 
     def analyze(self, text, keep_assessments=False):
         """Return the sentiment as a named tuple of the form:
         ``Sentiment(polarity, subjectivity, [assessments])``.
         """
-        #: Return type declaration
+        if not keep_assessments and isinstance(text, str):
+            return Sentiment(*pattern_sentiment.score(_words(text)))
+        score = pattern_sentiment(text)
         if keep_assessments:
-            Sentiment = namedtuple(
-                "Sentiment", ["polarity", "subjectivity", "assessments"]
-            )
-            assessments = pattern_sentiment(text).assessments
-            polarity, subjectivity = pattern_sentiment(text)
-            return Sentiment(polarity, subjectivity, assessments)
+            return AssessedSentiment(score[0], score[1], score.assessments)
+        return Sentiment(score[0], score[1])
 
-        else:
-            Sentiment = namedtuple("Sentiment", ["polarity", "subjectivity"])
-            return Sentiment(*pattern_sentiment(text))
+    def analyze_batch(self, texts, keep_assessments=False):
+        """Score a list or iterator of texts in one call.
+
+        Gives the same scores as calling :meth:`analyze` on each text, but
+        tokenizes and scores each string directly (skipping the per-call
+        type dispatch and ``Score`` objects) and scores repeated texts once.
+
+        :param texts: Iterable of strings.
+        :param keep_assessments: Also return the assessed tokens of each text.
+        :rtype: :class:`BatchSentiment` with ``array("d")`` columns
+        """
+        polarity, subjectivity = array("d"), array("d")
+        assessments = [] if keep_assessments else None
+        assess = pattern_sentiment.assessments
+        score = pattern_sentiment.score
+        seen = {}
+        for text in texts:
+            cached = seen.get(text) if isinstance(text, str) else None
+            if cached is None:
+                if isinstance(text, str) and keep_assessments:
+                    a = assess(_words(text))
+                    cached = (_mean(a, 1), _mean(a, 2), a)
+                elif isinstance(text, str):
+                    cached = score(_words(text)) + (None,)
+                else:
+                    result = pattern_sentiment(text)
+                    cached = (result[0], result[1], result.assessments)
+                if isinstance(text, str) and len(seen) < _BATCH_CACHE_SIZE:
+                    seen[text] = cached
+            polarity.append(cached[0])
+            subjectivity.append(cached[1])
+            if keep_assessments:
+                assessments.append(cached[2])
+        return BatchSentiment(polarity, subjectivity, assessments)
 
 
 def _default_feature_extractor(words):
@@ -51,28 +130,204 @@ def _default_feature_extractor(words):
     return dict((word, True) for word in words)
 
 
+def _aligned(offset):
+    """Rounds a file offset up to the next multiple of 8."""
+    return offset + -offset % 8
+
+
+class NaiveBayesTable:
+    """Read-only log-probability table of a trained
+    :class:`nltk.classify.NaiveBayesClassifier` whose features are word
+    presence flags, as built by the default feature extractor.
+
+    Row 0 holds ``log2 P(label)`` and row ``i + 1`` holds
+    ``log2 P(word_i | label)``, one column per label. The file is
+    memory-mapped, so every process that opens it shares one copy of the
+    table through the page cache; only the word index is built per process.
+
+    The file is a small header followed by the words and the raw ``float64``
+    table; use :meth:`save` to write one from a trained classifier.
+
+    :param str path: Path of the table file.
+    """
+
+    MAGIC = b"TBNBTBL1"
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(self.MAGIC)] != self.MAGIC:
+            raise ValueError("%s is not a Naive Bayes table" % path)
+        offset = len(self.MAGIC) + 4
+        (size,) = struct.unpack_from("<I", self._mmap, len(self.MAGIC))
+        header = json.loads(self._mmap[offset : offset + size])  # noqa: E203
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("%s was written on a different platform" % path)
+        self.path = path
+        self.labels = header["labels"]
+        offset += size
+        words = self._mmap[offset : offset + header["words"]]  # noqa: E203
+        words = words.decode("utf-8").split("\n") if words else []
+        self.index = {word: i for i, word in enumerate(words, 1)}
+        offset = _aligned(offset + header["words"])
+        self.table = memoryview(self._mmap)[offset:].cast("d")
+        self._columns = len(self.labels)
+        self._array = (
+            numpy.frombuffer(self._mmap, numpy.float64, offset=offset).reshape(
+                -1, self._columns
+            )
+            if numpy is not None
+            else None
+        )
+
+    @classmethod
+    def save(cls, classifier, path):
+        """Writes the table of a trained ``NaiveBayesClassifier`` to ``path``
+        (atomically, so concurrent readers never see a partial file) and
+        returns it opened.
+        """
+        labels = list(classifier.labels())
+        features = classifier._feature_probdist
+        words = sorted({fname for _, fname in features})
+        table = array(
+            "d", (classifier._label_probdist.logprob(label) for label in labels)
+        )
+        for word in words:
+            for label in labels:
+                dist = features.get((label, word))
+                table.append(dist.logprob(True) if dist is not None else _NINF)
+        words = "\n".join(words).encode("utf-8")
+        header = json.dumps(
+            {"labels": labels, "words": len(words), "byteorder": sys.byteorder}
+        ).encode("utf-8")
+        end = len(cls.MAGIC) + 4 + len(header) + len(words)
+        tmp = "%s.%s.tmp" % (path, os.getpid())
+        try:
+            with open(tmp, "wb") as f:
+                f.write(cls.MAGIC + struct.pack("<I", len(header)) + header)
+                # Padded so the float64 table can be viewed in place.
+                f.write(words + b"\0" * (_aligned(end) - end))
+                f.write(table.tobytes())
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return cls(path)
+
+    def _rows(self, words):
+        """Table rows of the known words, each counted once, in order."""
+        index = self.index
+        return [index[w] for w in dict.fromkeys(words) if w in index]
+
+    def _result(self, logprob):
+        # Normalized and compared exactly as nltk's DictionaryProbDist(log=True).
+        total = sum_logs(logprob)
+        if total <= _NINF:
+            logprob = [math.log(1.0 / len(logprob), 2)] * len(logprob)
+        else:
+            logprob = [lp - total for lp in logprob]
+        logprob = dict(zip(self.labels, logprob))
+        label = max((lp, label) for label, lp in logprob.items())[1]
+        return label, {label: 2**lp for label, lp in logprob.items()}
+
+    def classify(self, words):
+        """Returns ``(label, {label: probability})`` for an iterable of
+        words, as ``NaiveBayesClassifier.prob_classify`` does for their
+        presence features.
+        """
+        table, columns = self.table, self._columns
+        rows = self._rows(words)
+        logprob = []
+        for column in range(columns):
+            total = table[column]
+            for row in rows:
+                total += table[row * columns + column]
+            logprob.append(total)
+        return self._result(logprob)
+
+    def classify_many(self, documents):
+        """Like :meth:`classify` for a list of word lists, summing the
+        log-probabilities of all documents in one vectorized pass when NumPy
+        is available.
+        """
+        if self._array is None or not documents:
+            return [self.classify(words) for words in documents]
+        rows, owners = [], []
+        for i, words in enumerate(documents):
+            # The prior row first, so each sum runs in the same order as
+            # classify() and the results are identical.
+            document = [0] + self._rows(words)
+            rows.extend(document)
+            owners.extend(repeat(i, len(document)))
+        rows = numpy.array(rows, dtype=numpy.intp)
+        owners = numpy.array(owners, dtype=numpy.intp)
+        columns = [
+            numpy.bincount(
+                owners, weights=self._array[rows, column], minlength=len(documents)
+            ).tolist()
+            for column in range(self._columns)
+        ]
+        return [self._result(list(logprob)) for logprob in zip(*columns)]
+
+
+def _presence_words(text):
+    """The lower-cased words of three or more characters that
+    :class:`NaiveBayesAnalyzer` classifies."""
+    tokens = word_tokenize(text, include_punc=False)
+    return [t.lower() for t in tokens if len(t) >= 3]
+
+
 class NaiveBayesAnalyzer(BaseSentimentAnalyzer):
     """Naive Bayes analyzer that is trained on a dataset of movie reviews.
     Returns results as a named tuple of the form:
     ``Sentiment(classification, p_pos, p_neg)``
 
+    With the default feature extractor the classifier is trained once and
+    saved as a :class:`NaiveBayesTable`; later instances, in any process,
+    memory-map that table instead of retraining.
+
     :param callable feature_extractor: Function that returns a dictionary of
         features, given a list of words.
+    :param str table_path: Compiled model of the default feature extractor
+        (``None`` trains in every process). Ignored for other extractors.
     """
 
     kind = DISCRETE
     #: Return type declaration
     RETURN_TYPE = namedtuple("Sentiment", ["classification", "p_pos", "p_neg"])
 
-    def __init__(self, feature_extractor=_default_feature_extractor):
+    def __init__(
+        self, feature_extractor=_default_feature_extractor, table_path=NAIVE_BAYES_TABLE
+    ):
         super().__init__()
         self._classifier = None
+        self._table = None
         self.feature_extractor = feature_extractor
+        self.table_path = (
+            table_path if feature_extractor is _default_feature_extractor else None
+        )
 
-    @requires_nltk_corpus
     def train(self):
-        """Train the Naive Bayes classifier on the movie review corpus."""
+        """Load the compiled model, or train the Naive Bayes classifier on the
+        movie review corpus and compile it for the next process.
+        """
         super().train()
+        if self.table_path and os.path.exists(self.table_path):
+            try:
+                self._table = NaiveBayesTable(self.table_path)
+                return
+            except (OSError, ValueError, KeyError):
+                pass
+        self._train_classifier()
+        if self.table_path:
+            try:
+                self._table = NaiveBayesTable.save(self._classifier, self.table_path)
+            except OSError:
+                # Read-only location: this process keeps the trained classifier.
+                pass
+
+    @requires_nltk_corpus
+    def _train_classifier(self):
         neg_ids = nltk.corpus.movie_reviews.fileids("neg")
         pos_ids = nltk.corpus.movie_reviews.fileids("pos")
         neg_feats = [
@@ -92,12 +347,29 @@ class NaiveBayesAnalyzer(BaseSentimentAnalyzer):
         train_data = neg_feats + pos_feats
         self._classifier = nltk.classify.NaiveBayesClassifier.train(train_data)
 
+    def compile(self):
+        """Trains the classifier on the movie review corpus and (re)writes the
+        compiled model. Returns the table path.
+        """
+        if not self.table_path:
+            raise ValueError(
+                "NaiveBayesAnalyzer.compile() needs the default feature extractor "
+                "and a table path"
+            )
+        super().train()
+        self._train_classifier()
+        self._table = NaiveBayesTable.save(self._classifier, self.table_path)
+        return self.table_path
+
     def analyze(self, text):
         """Return the sentiment as a named tuple of the form:
         ``Sentiment(classification, p_pos, p_neg)``
         """
         # Lazily train the classifier
         super().analyze(text)
+        if self._table is not None:
+            label, probs = self._table.classify(_presence_words(text))
+            return self.RETURN_TYPE(label, probs.get("pos", 0), probs.get("neg", 0))
         tokens = word_tokenize(text, include_punc=False)
         filtered = (t.lower() for t in tokens if len(t) >= 3)
         feats = self.feature_extractor(filtered)
@@ -107,3 +379,28 @@ class NaiveBayesAnalyzer(BaseSentimentAnalyzer):
             p_pos=prob_dist.prob("pos"),
             p_neg=prob_dist.prob("neg"),
         )
+
+    def analyze_batch(self, texts):
+        """Classify a list or iterator of texts in one call.
+
+        Gives the same results as calling :meth:`analyze` on each text; with
+        the compiled model, the log-probabilities of the whole batch are
+        summed in one vectorized pass over the table.
+
+        :param texts: Iterable of strings.
+        :rtype: :class:`BatchClassification` with ``array("d")`` columns
+        """
+        if not self._trained:
+            self.train()
+        if self._table is not None:
+            results = self._table.classify_many([_presence_words(t) for t in texts])
+        else:
+            results = [
+                (r.classification, {"pos": r.p_pos, "neg": r.p_neg})
+                for r in map(self.analyze, texts)
+            ]
+        return BatchClassification(
+            [label for label, _ in results],
+            array("d", (probs.get("pos", 0) for _, probs in results)),
+            array("d", (probs.get("neg", 0) for _, probs in results)),
+        )
@@ -12,6 +12,7 @@ from textblob.base import BaseSentimentAnalyzer
 from textblob.en.sentiments import (
     CONTINUOUS,
     DISCRETE,
+    BatchSentiment,
     NaiveBayesAnalyzer,
     PatternAnalyzer,
 )
@@ -22,4 +23,5 @@ __all__ = [
     "CONTINUOUS",
     "PatternAnalyzer",
     "NaiveBayesAnalyzer",
+    "BatchSentiment",
 ]